@@ -15,11 +15,16 @@ cdef extern from "math.h":
     float floor(float)
 
 from cpyamf cimport codec, amf3
+from cpyamf.util cimport cBufferedByteStream
 
 import pyamf
 from pyamf import xml, util
+from pyamf.codec import ScanIndex
 
 
+#: The number of numeric array items packed into one write.
+DEF PACK_SIZE = 256
+
 cdef char TYPE_NUMBER      = '\x00'
 cdef char TYPE_BOOL        = '\x01'
 cdef char TYPE_STRING      = '\x02'
@@ -55,11 +60,48 @@ cdef class Context(codec.Context):
 
         return 0
 
+    cpdef object getAMF3Context(self):
+        """
+        @see: L{pyamf.amf0.Context.getAMF3Context}
+        """
+        return self.amf3_context
+
+    cpdef object checkpoint(self):
+        """
+        @see: L{pyamf.codec.Context.checkpoint}
+        """
+        cdef object amf3_checkpoint = None
+
+        if self.amf3_context is not None:
+            amf3_checkpoint = self.amf3_context.checkpoint()
+
+        return (codec.Context.checkpoint(self), amf3_checkpoint)
+
+    cpdef int rollback(self, object checkpoint) except -1:
+        """
+        @see: L{pyamf.codec.Context.rollback}
+        """
+        objects, amf3_checkpoint = checkpoint
+
+        codec.Context.rollback(self, objects)
+
+        if self.amf3_context is None:
+            return 0
+
+        if amf3_checkpoint is None:
+            self.amf3_context.clear()
+        else:
+            self.amf3_context.rollback(amf3_checkpoint)
+
+        return 0
+
 
 cdef class Decoder(codec.Decoder):
     """
     """
 
+    encoding = pyamf.AMF0
+
     cdef public bint use_amf3
     cdef readonly Context context
     cdef amf3.Decoder amf3_decoder
@@ -76,6 +118,18 @@ cdef class Decoder(codec.Decoder):
 
         codec.Codec.__init__(self, *args, **kwargs)
 
+    def reset(self, *args, **kwargs):
+        """
+        @see: L{pyamf.codec._Codec.reset}
+        """
+        self.use_amf3 = kwargs.pop('use_amf3', 0)
+
+        codec.Decoder.reset(self, *args, **kwargs)
+
+        if self.amf3_decoder is not None:
+            self.amf3_decoder.reset(stream=self.stream,
+                timezone_offset=self.timezone_offset)
+
     cdef object readNumber(self):
         cdef double i
 
@@ -116,7 +170,7 @@ cdef class Decoder(codec.Decoder):
 
         return PyUnicode_DecodeUTF8(b, <Py_ssize_t>l, 'strict')
 
-    cdef void readObjectAttributes(self, object obj_attrs):
+    cdef int readObjectAttributes(self, object obj_attrs) except -1:
         cdef object key
         cdef char *peek = NULL
 
@@ -134,6 +188,8 @@ cdef class Decoder(codec.Decoder):
 
         # discard the end marker (TYPE_OBJECTTERM)
 
+        return 0
+
     cdef object readObject(self):
         cdef object obj = ASObject()
 
@@ -296,11 +352,251 @@ cdef class Decoder(codec.Decoder):
         raise pyamf.DecodeError("Unsupported ActionScript type")
 
 
+cdef inline int read_length(char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                           int size, Py_ssize_t *ret):
+    """
+    Reads a big endian unsigned length of C{size} bytes from C{buf},
+    returning C{0} if it is incomplete.
+    """
+    cdef Py_ssize_t result = 0
+    cdef int i
+
+    if end - pos[0] < size:
+        return 0
+
+    for i from 0 <= i < size:
+        result = (result << 8) | <unsigned char>buf[pos[0] + i]
+
+    pos[0] += size
+    ret[0] = result
+
+    return 1
+
+
+cdef inline int skip_bytes(Py_ssize_t end, Py_ssize_t *pos, Py_ssize_t n):
+    if end - pos[0] < n:
+        return 0
+
+    pos[0] += n
+
+    return 1
+
+
+cdef class Scanner(object):
+    """
+    C version of L{pyamf.amf0.Scanner}. Each element is scanned in one pass
+    over the stream buffer. An incomplete element is scanned again from its
+    start when L{scan} is next called.
+
+    @since: 0.7
+    """
+
+    cdef public object context
+    cdef public object index
+    cdef public Py_ssize_t objects
+    cdef public Py_ssize_t offset
+    cdef public amf3.Scanner amf3
+    cdef Py_ssize_t base
+
+    def __init__(self, context=None, index=False):
+        self.amf3 = amf3.Scanner()
+        self.context = context
+        self.index = None
+
+        if index:
+            self.index = ScanIndex()
+
+        self.clear()
+
+    def clear(self):
+        """
+        @see: L{pyamf.codec.Scanner.clear}
+        """
+        self.amf3.clear()
+        self.objects = 0
+
+        if self.index is not None:
+            self.index.clear()
+
+        self.reset()
+
+    def reset(self):
+        """
+        @see: L{pyamf.codec.Scanner.reset}
+        """
+        self.offset = 0
+        self.amf3.reset()
+
+        if self.context is not None:
+            self.amf3.context = self.context.getAMF3Context()
+
+    def scan(self, cBufferedByteStream stream):
+        """
+        @see: L{pyamf.codec.Scanner.scan}
+        """
+        cdef char *buf = NULL
+        cdef Py_ssize_t end, pos = 0
+        cdef Py_ssize_t objects, strings, amf3_objects, traits, size = 0
+        cdef int ret
+
+        self.reset()
+
+        objects = self.objects
+        strings = self.amf3.strings
+        amf3_objects = self.amf3.objects
+        traits = len(self.amf3.traits)
+
+        if self.index is not None:
+            size = len(self.index)
+
+        self.base = stream.tell()
+        end = stream.peek(&buf, stream.remaining())
+
+        ret = self.scanElement(buf, end, &pos, 0)
+
+        if ret == 1:
+            self.offset = self.base + pos
+
+            return self.offset
+
+        self.objects = objects
+        self.amf3.strings = strings
+        self.amf3.objects = amf3_objects
+        del self.amf3.traits[traits:]
+
+        if self.index is not None:
+            self.index.truncate(size)
+
+        if ret == 0:
+            return None
+
+        return -1
+
+    def walk(self, cBufferedByteStream stream):
+        """
+        @see: L{pyamf.codec.Scanner.walk}
+        """
+        return amf3.walk(self, stream)
+
+    cdef int scanObject(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                        int depth) except -2:
+        """
+        Scans name/value pairs up to the object terminator.
+        """
+        cdef Py_ssize_t n
+        cdef int ret
+
+        while 1:
+            if not read_length(buf, end, pos, 2, &n):
+                return 0
+
+            if not skip_bytes(end, pos, n + 1):
+                return 0
+
+            if buf[pos[0] - 1] == TYPE_OBJECTTERM:
+                return 1
+
+            pos[0] -= 1
+            ret = self.scanElement(buf, end, pos, depth)
+
+            if ret != 1:
+                return ret
+
+    cdef int scanElement(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                         int depth) except -2:
+        """
+        Scans the element at C{buf[pos]}.
+
+        @return: C{1} when the element is complete, C{0} if more data is
+            required and C{-1} if the element cannot be scanned.
+        """
+        cdef char t
+        cdef Py_ssize_t i, n
+        cdef int ret
+
+        if pos[0] >= end:
+            return 0
+
+        t = buf[pos[0]]
+
+        if self.index is not None:
+            self.index.append(PyString_FromStringAndSize(&t, 1),
+                self.base + pos[0], depth)
+
+        pos[0] += 1
+
+        if t == TYPE_NULL or t == TYPE_UNDEFINED or t == TYPE_UNSUPPORTED:
+            return 1
+        elif t == TYPE_NUMBER:
+            return skip_bytes(end, pos, 8)
+        elif t == TYPE_BOOL:
+            return skip_bytes(end, pos, 1)
+        elif t == TYPE_STRING:
+            if not read_length(buf, end, pos, 2, &n):
+                return 0
+
+            return skip_bytes(end, pos, n)
+        elif t == TYPE_LONGSTRING or t == TYPE_XML:
+            if not read_length(buf, end, pos, 4, &n):
+                return 0
+
+            if t == TYPE_XML:
+                self.objects += 1
+
+            return skip_bytes(end, pos, n)
+        elif t == TYPE_REFERENCE:
+            return skip_bytes(end, pos, 2)
+        elif t == TYPE_DATE:
+            self.objects += 1
+
+            return skip_bytes(end, pos, 10)
+        elif t == TYPE_OBJECT:
+            self.objects += 1
+
+            return self.scanObject(buf, end, pos, depth + 1)
+        elif t == TYPE_MIXEDARRAY:
+            self.objects += 1
+
+            if not skip_bytes(end, pos, 4):
+                return 0
+
+            return self.scanObject(buf, end, pos, depth + 1)
+        elif t == TYPE_TYPEDOBJECT:
+            self.objects += 1
+
+            if not read_length(buf, end, pos, 2, &n):
+                return 0
+
+            if not skip_bytes(end, pos, n):
+                return 0
+
+            return self.scanObject(buf, end, pos, depth + 1)
+        elif t == TYPE_ARRAY:
+            self.objects += 1
+
+            if not read_length(buf, end, pos, 4, &n):
+                return 0
+
+            for i from 0 <= i < n:
+                ret = self.scanElement(buf, end, pos, depth + 1)
+
+                if ret != 1:
+                    return ret
+
+            return 1
+        elif t == TYPE_AMF3:
+            return self.amf3.scanElement(buf, end, pos, depth + 1)
+
+        return -1
+
+
 cdef class Encoder(codec.Encoder):
     """
     The AMF0 Encoder.
     """
 
+    encoding = pyamf.AMF0
+
     cdef public bint use_amf3
     cdef readonly Context context
     cdef amf3.Encoder amf3_encoder
@@ -316,7 +612,19 @@ cdef class Encoder(codec.Encoder):
         if self.context is None:
             self.context = Context()
 
-        codec.Codec.__init__(self, *args, **kwargs)
+        codec.Encoder.__init__(self, *args, **kwargs)
+
+    def reset(self, *args, **kwargs):
+        """
+        @see: L{pyamf.codec.Encoder.reset}
+        """
+        self.use_amf3 = kwargs.pop('use_amf3', 0)
+
+        codec.Encoder.reset(self, *args, **kwargs)
+
+        if self.amf3_encoder is not None:
+            self.amf3_encoder.reset(stream=self.stream,
+                timezone_offset=self.timezone_offset, sink=self.sink)
 
     cdef inline int writeReference(self, o) except -2:
         """
@@ -342,6 +650,26 @@ cdef class Encoder(codec.Encoder):
     cdef int writeUndefined(self, data) except -1:
         return self.writeType(TYPE_UNDEFINED)
 
+    cdef int writeRawAMF(self, object raw) except -1:
+        """
+        @see: L{pyamf.amf0.Encoder.writeRawAMF}
+        """
+        cdef str bytes = raw.bytes
+
+        if raw.encoding == pyamf.AMF3:
+            return self.writeAMF3(raw)
+
+        self.stream.write(PyString_AS_STRING(bytes), PyString_GET_SIZE(bytes))
+
+        objects, amf3_references = raw.references
+
+        self.context.reserve(objects)
+
+        if amf3_references:
+            self.getAMF3Encoder().context.reserve(*amf3_references)
+
+        return 0
+
     cdef int writeNull(self, n) except -1:
         """
         Write null type to data stream.
@@ -372,6 +700,48 @@ cdef class Encoder(codec.Encoder):
 
         return 0
 
+    def writeNumericArray(self, a):
+        """
+        @see: L{pyamf.codec.Encoder.writeNumericArray}
+        """
+        cdef Py_ssize_t i, end, pos
+        cdef Py_ssize_t n = len(a)
+        cdef char typecode = PyString_AsString(a.typecode)[0]
+        cdef char *buf = NULL
+        cdef char packed[PACK_SIZE * 9]
+        cdef long long ival
+        cdef double dval
+
+        if self.writeReference(a) != -1:
+            return
+
+        self.context.addObject(a)
+
+        self.writeType(TYPE_ARRAY)
+        self.stream.write_ulong(n)
+
+        if n == 0:
+            return
+
+        buf = codec.get_numeric_buffer(a, n)
+        i = 0
+
+        while i < n:
+            end = min(i + PACK_SIZE, n)
+            pos = 0
+
+            while i < end:
+                if codec.read_numeric(buf, typecode, i, &ival, &dval) == 0:
+                    dval = <double>ival
+
+                packed[pos] = TYPE_NUMBER
+                codec.pack_double(&packed[pos + 1], dval)
+                pos += 9
+                i += 1
+
+            self.stream.write(packed, pos)
+            buf = self.flushNumericBlock(a, n, buf)
+
     cdef int writeTuple(self, object a) except -1:
         cdef Py_ssize_t size, i
         cdef PyObject *x
@@ -532,6 +902,25 @@ cdef class Encoder(codec.Encoder):
             self.writeType(TYPE_TYPEDOBJECT)
             self.serialiseString(alias.alias)
 
+        plan = alias.encode_plan
+
+        if plan is not None:
+            for key in plan[0]:
+                self.serialiseString(key)
+                self.writeElement(getattr(o, key, pyamf.Undefined))
+
+            for key in plan[1]:
+                self.serialiseString(key)
+                self.writeElement(getattr(o, key))
+
+            if plan[2]:
+                dynamic_attrs = alias.getDynamicAttributes(o, codec=self)
+
+                if dynamic_attrs:
+                    self._writeDict(dynamic_attrs)
+
+            return self._writeEndObject()
+
         cdef dict attrs = alias.getEncodableAttributes(o, codec=self)
 
         if len(attrs) and alias.static_attrs:
@@ -570,17 +959,21 @@ cdef class Encoder(codec.Encoder):
         self._writeDict(dict(o))
         self._writeEndObject()
 
-    cdef int writeAMF3(self, o) except -1:
+    cdef amf3.Encoder getAMF3Encoder(self):
         if self.amf3_encoder is None:
             self.context.amf3_context = amf3.Context()
 
             self.amf3_encoder = amf3.Encoder(
                 stream=self.stream,
                 context=self.context.amf3_context,
-                timezone_offset=self.timezone_offset)
+                timezone_offset=self.timezone_offset,
+                sink=self.sink)
 
+        return self.amf3_encoder
+
+    cdef int writeAMF3(self, o) except -1:
         self.writeType(TYPE_AMF3)
-        self.amf3_encoder.writeElement(o)
+        self.getAMF3Encoder().writeElement(o)
 
     cdef inline int handleBasicTypes(self, object element, object py_type) except -1:
         if self.use_amf3:
@@ -15,6 +15,7 @@ cdef class ClassDefinition(object):
     cdef Py_ssize_t encoded_ref_size
 
     cdef readonly list static_properties
+    cdef readonly object decode_plan
 
     cdef int writeReference(self, util.cBufferedByteStream stream)
 
@@ -38,6 +39,9 @@ cdef class Context(codec.Context):
     cpdef ClassDefinition getClass(self, object klass)
     cpdef Py_ssize_t addClass(self, ClassDefinition alias, klass) except? -1
 
+    cpdef object checkpoint(self)
+    cpdef int rollback(self, object checkpoint) except -1
+
 
 cdef class Decoder(codec.Decoder):
     cdef public bint use_proxies
@@ -46,10 +50,13 @@ cdef class Decoder(codec.Decoder):
     cdef ClassDefinition _getClassDefinition(self, long ref)
     cdef int _readStatic(self, ClassDefinition class_def, dict obj) except -1
     cdef int _readDynamic(self, ClassDefinition class_def, dict obj) except -1
+    cdef int _readPlan(self, tuple plan, object obj) except -1
 
     cdef object readBytes(self)
     cdef object readInteger(self, int signed=?)
     cdef object readByteArray(self)
+    cdef object readVector(self, char t)
+    cdef object readDictionary(self)
     cdef object readProxy(self, obj)
 
 
@@ -57,5 +64,34 @@ cdef class Encoder(codec.Encoder):
     cdef public bint use_proxies
     cdef readonly Context context
 
+    cdef int _writeObjectPlan(self, object obj, object alias,
+        ClassDefinition definition, int class_ref, tuple plan) except -1
     cdef int writeByteArray(self, object obj) except -1
+    cdef int writeVector(self, object obj) except -1
+    cdef int writeDictionary(self, object obj) except -1
     cdef int writeProxy(self, obj) except -1
+
+
+cdef class Scanner(object):
+    cdef public object context
+    cdef public object index
+    cdef public list traits
+    cdef public Py_ssize_t strings
+    cdef public Py_ssize_t objects
+    cdef public Py_ssize_t offset
+    cdef Py_ssize_t class_base
+    cdef Py_ssize_t base
+
+    cdef int getTrait(self, Py_ssize_t ref, int *encoding,
+                      Py_ssize_t *attr_len) except -1
+    cdef int skipString(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                        unsigned int *ref) except -1
+    cdef int scanElements(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                          int depth, Py_ssize_t n) except -2
+    cdef int scanMembers(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                         int depth) except -2
+    cdef int scanElement(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                         int depth) except -2
+
+
+cdef object walk(object scanner, util.cBufferedByteStream stream)
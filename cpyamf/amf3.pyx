@@ -16,7 +16,9 @@ from cpyamf.util cimport cBufferedByteStream, BufferedByteStream
 from cpyamf cimport codec
 import pyamf
 from pyamf import util, amf3, xml
+from pyamf.codec import ScanIndex
 import types
+import array
 
 
 try:
@@ -25,6 +27,9 @@ except ImportError:
     zlib = None
 
 
+#: The number of numeric array items packed into one write.
+DEF PACK_SIZE = 256
+
 cdef char TYPE_UNDEFINED = '\x00'
 cdef char TYPE_NULL = '\x01'
 cdef char TYPE_BOOL_FALSE = '\x02'
@@ -38,6 +43,11 @@ cdef char TYPE_ARRAY = '\x09'
 cdef char TYPE_OBJECT = '\x0A'
 cdef char TYPE_XMLSTRING = '\x0B'
 cdef char TYPE_BYTEARRAY = '\x0C'
+cdef char TYPE_VECTOR_INT = '\x0D'
+cdef char TYPE_VECTOR_UINT = '\x0E'
+cdef char TYPE_VECTOR_DOUBLE = '\x0F'
+cdef char TYPE_VECTOR_OBJECT = '\x10'
+cdef char TYPE_DICTIONARY = '\x11'
 
 cdef unsigned int REFERENCE_BIT = 0x01
 cdef char REF_CHAR = '\x01'
@@ -54,6 +64,15 @@ cdef int OBJECT_ENCODING_DYNAMIC = 0x02
 cdef int OBJECT_ENCODING_PROXY = 0x03
 
 cdef object ByteArrayType = amf3.ByteArray
+cdef object IntVectorType = amf3.IntVector
+cdef object UintVectorType = amf3.UintVector
+cdef object DoubleVectorType = amf3.DoubleVector
+cdef object ObjectVectorType = amf3.ObjectVector
+cdef tuple VectorTypes = (amf3._NumericVector, amf3.ObjectVector)
+cdef object DictionaryType = amf3.Dictionary
+cdef list DictionaryTypes = amf3.DICTIONARY_TYPES
+cdef object InstanceType = types.InstanceType
+cdef bint swap_vector_items = amf3.SWAP_VECTOR_ITEMS
 cdef object DataInput = amf3.DataInput
 cdef object DataOutput = amf3.DataOutput
 cdef str empty_string = str('')
@@ -73,6 +92,7 @@ cdef class ClassDefinition(object):
         self.encoding = -1
         self.encoded_ref = NULL
         self.encoded_ref_size = -1
+        self.decode_plan = None
 
     def __init__(self, alias):
         self.alias = alias
@@ -192,6 +212,49 @@ cdef class Context(codec.Context):
 
         return ref
 
+    cpdef object checkpoint(self):
+        """
+        @see: L{pyamf.codec.Context.checkpoint}
+        """
+        return (codec.Context.checkpoint(self), self.strings.length,
+            self.class_idx)
+
+    cpdef int rollback(self, object checkpoint) except -1:
+        """
+        @see: L{pyamf.codec.Context.rollback}
+        """
+        cdef Py_ssize_t strings, class_idx, ref
+
+        objects, strings, class_idx = checkpoint
+
+        codec.Context.rollback(self, objects)
+        self.strings.truncate(strings)
+
+        for ref from class_idx <= ref < self.class_idx:
+            self.class_ref.pop(ref, None)
+
+        for klass, class_def in self.classes.items():
+            if (<ClassDefinition>class_def).ref >= class_idx:
+                del self.classes[klass]
+
+        self.class_idx = class_idx
+
+        return 0
+
+    def reserve(self, Py_ssize_t objects, Py_ssize_t strings=0,
+                Py_ssize_t traits=0):
+        """
+        @see: L{pyamf.amf3.Context.reserve}
+        """
+        cdef Py_ssize_t i
+
+        codec.Context.reserve(self, objects)
+
+        for i from 0 <= i < strings:
+            self.strings.append(None)
+
+        self.class_idx += traits
+
     cpdef object getProxyForObject(self, object obj):
         """
         Returns the proxied version of C{obj} as stored in the context, or
@@ -252,6 +315,8 @@ cdef class Decoder(codec.Decoder):
     Decodes an AMF3 data stream.
     """
 
+    encoding = pyamf.AMF3
+
     def __init__(self, *args, **kwargs):
         context = kwargs.pop('context', None)
 
@@ -409,6 +474,10 @@ cdef class Decoder(codec.Decoder):
             for i from 0 <= i < class_def.attr_len:
                 class_def.static_properties.append(self.readString())
 
+        if class_def.encoding == OBJECT_ENCODING_STATIC:
+            class_def.decode_plan = alias.getDecodePlan(
+                class_def.static_properties)
+
         self.context.addClass(class_def, alias.klass)
 
         return class_def
@@ -441,6 +510,40 @@ cdef class Decoder(codec.Decoder):
 
         return 0
 
+    cdef int _readPlan(self, tuple plan, object obj) except -1:
+        """
+        Reads the static members of a sealed trait, storing them directly on
+        C{obj} as described by C{plan}.
+        """
+        cdef object mode = plan[0]
+        cdef tuple slots = plan[1]
+        cdef object target = None
+        cdef object slot
+        cdef object value
+
+        if mode == 'dict':
+            target = obj.__dict__
+        elif mode == 'item':
+            target = obj
+
+        for slot in slots:
+            value = self.readElement()
+
+            if slot is None:
+                continue
+
+            if slot[1]:
+                value = self.context.getObjectForProxy(value)
+
+            if target is None:
+                setattr(obj, slot[0], value)
+            elif PyDict_CheckExact(target):
+                PyDict_SetItem(target, slot[0], value)
+            else:
+                target[slot[0]] = value
+
+        return 0
+
     cdef object readObject(self):
         """
         Reads an object from the stream.
@@ -471,6 +574,14 @@ cdef class Decoder(codec.Decoder):
 
         self.context.addObject(obj)
 
+        if class_def.decode_plan is not None:
+            self._readPlan(class_def.decode_plan, obj)
+
+            if self.use_proxies:
+                return self.readProxy(obj)
+
+            return obj
+
         if class_def.encoding == OBJECT_ENCODING_DYNAMIC:
             self._readStatic(class_def, obj_attrs)
             self._readDynamic(class_def, obj_attrs)
@@ -531,19 +642,26 @@ cdef class Decoder(codec.Decoder):
 
         cdef char *buf = NULL
         cdef object s
-        cdef object compressed = None
+        cdef bint compressed = 0
 
         ref >>= 1
 
-        self.stream.read(&buf, ref)
-        s = PyString_FromStringAndSize(buf, ref)
+        if zlib and ref > 2:
+            self.stream.peek(&buf, 2)
+            compressed = buf[0] == '\x78' and buf[1] == '\x9c'
 
-        if zlib:
-            if ref > 2 and buf[0] == '\x78' and buf[1] == '\x9c':
-                try:
-                    s = zlib.decompress(s)
-                except zlib.error:
-                    pass
+        if compressed:
+            # zlib does not accept the memoryview that read_buffer returns
+            # for a memoryview backed stream
+            self.stream.read(&buf, ref)
+            s = PyString_FromStringAndSize(buf, ref)
+
+            try:
+                s = zlib.decompress(s)
+            except zlib.error:
+                pass
+        else:
+            s = self.stream.read_buffer(ref)
 
         s = (<object>ByteArrayType)(s)
 
@@ -551,6 +669,79 @@ cdef class Decoder(codec.Decoder):
 
         return s
 
+    cdef object readVector(self, char t):
+        """
+        Reads an AMF3 vector from the stream. Numeric items are read in bulk
+        into the underlying C{array.array}.
+
+        @since: 0.7
+        """
+        cdef int ref = _read_ref(self.stream)
+        cdef Py_ssize_t i, size
+        cdef char *buf = NULL
+        cdef object obj
+
+        if ref & REFERENCE_BIT == 0:
+            return self.context.getObject(ref >> 1)
+
+        ref >>= 1
+
+        cdef bint fixed = self.stream.read_uchar() != 0
+
+        if t == TYPE_VECTOR_OBJECT:
+            obj = ObjectVectorType(fixed=fixed, classname=self.readBytes())
+
+            self.context.addObject(obj)
+
+            for i from 0 <= i < ref:
+                obj.append(self.readElement())
+
+            return obj
+
+        if t == TYPE_VECTOR_INT:
+            obj = IntVectorType(fixed=fixed)
+        elif t == TYPE_VECTOR_UINT:
+            obj = UintVectorType(fixed=fixed)
+        else:
+            obj = DoubleVectorType(fixed=fixed)
+
+        # array.fromstring does not accept the memoryview that read_buffer
+        # returns for a memoryview backed stream, so copy the items out
+        size = obj.itemsize * ref
+        self.stream.read(&buf, size)
+
+        obj.fromstring(PyString_FromStringAndSize(buf, size))
+
+        if swap_vector_items:
+            obj.byteswap()
+
+        self.context.addObject(obj)
+
+        return obj
+
+    cdef object readDictionary(self):
+        """
+        Reads a L{Dictionary<pyamf.amf3.Dictionary>} from the stream.
+
+        @since: 0.7
+        """
+        cdef int ref = _read_ref(self.stream)
+        cdef Py_ssize_t i
+        cdef object obj, key
+
+        if ref & REFERENCE_BIT == 0:
+            return self.context.getObject(ref >> 1)
+
+        obj = DictionaryType(weak_keys=self.stream.read_uchar() != 0)
+
+        self.context.addObject(obj)
+
+        for i from 0 <= i < ref >> 1:
+            key = self.readElement()
+            obj.hold(key, self.readElement())
+
+        return obj
+
     cdef object readProxy(self, obj):
         """
         Decodes a proxied object from the stream.
@@ -586,6 +777,10 @@ cdef class Decoder(codec.Decoder):
             return self.readXML()
         elif t == TYPE_XMLSTRING:
             return self.readXML()
+        elif TYPE_VECTOR_INT <= t <= TYPE_VECTOR_OBJECT:
+            return self.readVector(t)
+        elif t == TYPE_DICTIONARY:
+            return self.readDictionary()
 
         raise pyamf.DecodeError("Unsupported ActionScript type")
 
@@ -595,6 +790,8 @@ cdef class Encoder(codec.Encoder):
     The AMF3 Encoder.
     """
 
+    encoding = pyamf.AMF3
+
     def __init__(self, *args, **kwargs):
         self.use_proxies = kwargs.pop('use_proxies', amf3.use_proxies_default)
         context = kwargs.pop('context', None)
@@ -606,6 +803,14 @@ cdef class Encoder(codec.Encoder):
 
         codec.Encoder.__init__(self, *args, **kwargs)
 
+    def reset(self, *args, **kwargs):
+        """
+        @see: L{pyamf.codec.Encoder.reset}
+        """
+        self.use_proxies = kwargs.pop('use_proxies', amf3.use_proxies_default)
+
+        codec.Encoder.reset(self, *args, **kwargs)
+
     cdef inline int writeNull(self, n) except -1:
         """
         Writes a C{null} value to the stream.
@@ -615,6 +820,21 @@ cdef class Encoder(codec.Encoder):
     cdef inline int writeUndefined(self, n) except -1:
         return self.writeType(TYPE_UNDEFINED)
 
+    cdef int writeRawAMF(self, object raw) except -1:
+        """
+        @see: L{pyamf.amf3.Encoder.writeRawAMF}
+        """
+        cdef str bytes = raw.bytes
+
+        if raw.encoding != pyamf.AMF3:
+            raise pyamf.EncodeError('Unable to write AMF%d data to an AMF3 '
+                'stream' % (raw.encoding,))
+
+        self.stream.write(PyString_AS_STRING(bytes), PyString_GET_SIZE(bytes))
+        self.context.reserve(*raw.references)
+
+        return 0
+
     cdef inline int writeBoolean(self, n) except -1:
         if n is True:
             return self.writeType(TYPE_BOOL_TRUE)
@@ -723,6 +943,66 @@ cdef class Encoder(codec.Encoder):
 
         return 0
 
+    def writeNumericArray(self, a):
+        """
+        @see: L{pyamf.codec.Encoder.writeNumericArray}
+        """
+        cdef Py_ssize_t ref, i, end, pos
+        cdef Py_ssize_t n = len(a)
+        cdef char typecode = PyString_AsString(a.typecode)[0]
+        cdef char *buf = NULL
+        cdef char packed[PACK_SIZE * 9]
+        cdef long long ival
+        cdef double dval
+
+        if self.use_proxies == 1:
+            self.writeList(a.tolist())
+
+            return
+
+        self.writeType(TYPE_ARRAY)
+
+        ref = self.context.getObjectReference(a)
+
+        if ref != -1:
+            _encode_integer(self.stream, ref << 1)
+
+            return
+
+        self.context.addObject(a)
+
+        _encode_integer(self.stream, (n << 1) | REFERENCE_BIT)
+        self.writeType('\x01')
+
+        if n == 0:
+            return
+
+        buf = codec.get_numeric_buffer(a, n)
+        i = 0
+
+        while i < n:
+            end = min(i + PACK_SIZE, n)
+            pos = 0
+
+            while i < end:
+                if codec.read_numeric(buf, typecode, i, &ival, &dval) == 0:
+                    if ival >= MIN_29B_INT and ival <= MAX_29B_INT:
+                        packed[pos] = TYPE_INTEGER
+                        pos += 1 + pack_int(&packed[pos + 1], <long>ival)
+                        i += 1
+
+                        continue
+
+                    dval = <double>ival
+
+                packed[pos] = TYPE_NUMBER
+                codec.pack_double(&packed[pos + 1], dval)
+                pos += 9
+                i += 1
+
+            self.stream.write(packed, pos)
+            buf = self.flushNumericBlock(a, n, buf)
+
     cdef int writeTuple(self, object n) except -1:
         cdef Py_ssize_t ref = self.context.getObjectReference(n)
         cdef Py_ssize_t i
@@ -858,6 +1138,7 @@ cdef class Encoder(codec.Encoder):
         cdef PyObject *key
         cdef PyObject *value
         cdef object attrs
+        cdef object plan
 
         if self.use_proxies and not is_proxy:
             return self.writeProxy(obj)
@@ -904,6 +1185,11 @@ cdef class Encoder(codec.Encoder):
 
             return 0
 
+        plan = alias.encode_plan
+
+        if plan is not None:
+            return self._writeObjectPlan(obj, alias, definition, class_ref, plan)
+
         attrs = alias.getEncodableAttributes(obj, codec=self)
 
         if PyDict_CheckExact(attrs) != 1:
@@ -941,6 +1227,51 @@ cdef class Encoder(codec.Encoder):
 
         return 0
 
+    cdef int _writeObjectPlan(self, object obj, object alias,
+            ClassDefinition definition, int class_ref, tuple plan) except -1:
+        """
+        Writes the attributes of C{obj} by following the alias' compiled
+        C{encode_plan}, without building an intermediate C{dict}.
+        """
+        cdef tuple static_attrs = plan[0]
+        cdef tuple sealed_attrs = plan[1]
+        cdef Py_ssize_t ref = 0
+        cdef PyObject *key = NULL
+        cdef PyObject *value = NULL
+        cdef dict attrs
+
+        if static_attrs:
+            if class_ref == 0:
+                for attr in static_attrs:
+                    self.serialiseString(attr)
+
+            for attr in static_attrs:
+                self.writeElement(getattr(obj, attr, pyamf.Undefined))
+
+            if definition.encoding == OBJECT_ENCODING_STATIC:
+                return 0
+
+        if definition.encoding != OBJECT_ENCODING_DYNAMIC:
+            return 0
+
+        for attr in sealed_attrs:
+            self.serialiseString(attr)
+            self.writeElement(getattr(obj, attr))
+
+        if plan[2]:
+            attrs = alias.getDynamicAttributes(obj, codec=self)
+
+            while PyDict_Next(attrs, &ref, &key, &value):
+                attr = <object>key
+
+                if PyInt_Check(attr) or PyLong_Check(attr):
+                    attr = str(attr)
+
+                self.serialiseString(attr)
+                self.writeElement(<object>value)
+
+        return self.stream.write(&REF_CHAR, 1)
+
     cdef int writeByteArray(self, object obj) except -1:
         """
         Writes a L{ByteArray} to the data stream.
@@ -970,6 +1301,78 @@ cdef class Encoder(codec.Encoder):
 
         return 0
 
+    cdef int writeVector(self, object obj) except -1:
+        """
+        Writes an AMF3 vector to the data stream. Numeric items are written
+        in bulk from the underlying C{array.array}.
+
+        @since: 0.7
+        """
+        cdef Py_ssize_t ref
+        cdef object buf
+
+        self.stream.write(PyString_AS_STRING(obj._marker), 1)
+
+        ref = self.context.getObjectReference(obj)
+
+        if ref != -1:
+            _encode_integer(self.stream, ref << 1)
+
+            return 0
+
+        self.context.addObject(obj)
+
+        _encode_integer(self.stream, (len(obj) << 1) | REFERENCE_BIT)
+        self.stream.write_uchar(1 if obj.fixed else 0)
+
+        if isinstance(obj, ObjectVectorType):
+            self.serialiseString(obj.classname)
+
+            for buf in obj:
+                self.writeElement(buf)
+
+            return 0
+
+        if swap_vector_items:
+            obj = array.array(obj.item_type, obj)
+            obj.byteswap()
+
+        buf = obj.tostring()
+
+        return self.stream.write(PyString_AS_STRING(buf),
+            PyString_GET_SIZE(buf))
+
+    cdef int writeDictionary(self, object obj) except -1:
+        """
+        Writes a L{Dictionary<pyamf.amf3.Dictionary>} (or a registered mapping
+        type) to the data stream.
+
+        @since: 0.7
+        """
+        cdef Py_ssize_t ref
+        cdef object key, value
+
+        self.writeType(TYPE_DICTIONARY)
+
+        ref = self.context.getObjectReference(obj)
+
+        if ref != -1:
+            _encode_integer(self.stream, ref << 1)
+
+            return 0
+
+        self.context.addObject(obj)
+
+        _encode_integer(self.stream, (len(obj) << 1) | REFERENCE_BIT)
+        self.stream.write_uchar(
+            1 if getattr(obj, 'weak_keys', False) else 0)
+
+        for key, value in obj.iteritems():
+            self.writeElement(key)
+            self.writeElement(value)
+
+        return 0
+
     cdef int writeXML(self, obj) except -1:
         self.writeType(TYPE_XMLSTRING)
 
@@ -1027,15 +1430,373 @@ cdef class Encoder(codec.Encoder):
         return self.writeObject(proxy, 1)
 
     cdef inline int handleBasicTypes(self, object element, object py_type) except -1:
-        cdef int ret = codec.Encoder.handleBasicTypes(self, element, py_type)
+        cdef int ret
+
+        # registered dictionary types take precedence (e.g. over dict), as
+        # they do in the pure python encoder
+        if PySequence_Contains(DictionaryTypes, py_type):
+            return self.writeDictionary(element)
+
+        ret = codec.Encoder.handleBasicTypes(self, element, py_type)
 
         if ret == 1: # not handled
             if py_type is ByteArrayType:
                 return self.writeByteArray(element)
+            elif issubclass(py_type, VectorTypes):
+                return self.writeVector(element)
+            elif py_type is InstanceType and PySequence_Contains(
+                    DictionaryTypes, element.__class__):
+                # old style mappings, e.g. weakref.WeakKeyDictionary
+                return self.writeDictionary(element)
 
         return ret
 
 
+cdef inline int read_u29(char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                        unsigned int *ret):
+    """
+    Reads an unsigned 29 bit integer from C{buf}, returning C{0} if it is
+    incomplete. See L{decode_int}.
+    """
+    cdef unsigned int result = 0
+    cdef unsigned char b
+    cdef int n = 0
+
+    while 1:
+        if pos[0] >= end:
+            return 0
+
+        b = <unsigned char>buf[pos[0]]
+        pos[0] += 1
+
+        if n == 3:
+            result = (result << 8) | b
+
+            if result & 0x10000000:
+                result = (result << 1) + 1
+
+            break
+
+        result = (result << 7) | (b & 0x7f)
+
+        if b & 0x80 == 0:
+            break
+
+        n += 1
+
+    ret[0] = result
+
+    return 1
+
+
+cdef inline int skip_bytes(Py_ssize_t end, Py_ssize_t *pos, Py_ssize_t n):
+    if end - pos[0] < n:
+        return 0
+
+    pos[0] += n
+
+    return 1
+
+
+cdef class Scanner(object):
+    """
+    C version of L{pyamf.amf3.Scanner}. Each element is scanned in one pass
+    over the stream buffer. An incomplete element is scanned again from its
+    start when L{scan} is next called.
+
+    @since: 0.7
+    """
+
+    def __init__(self, context=None, index=False):
+        self.context = context
+        self.index = None
+
+        if index:
+            self.index = ScanIndex()
+
+        self.clear()
+
+    def clear(self):
+        """
+        @see: L{pyamf.codec.Scanner.clear}
+        """
+        self.traits = []
+        self.strings = 0
+        self.objects = 0
+
+        if self.index is not None:
+            self.index.clear()
+
+        self.reset()
+
+    def reset(self):
+        """
+        @see: L{pyamf.codec.Scanner.reset}
+        """
+        self.offset = 0
+        self.class_base = -1
+
+        if self.context is not None:
+            self.traits = []
+
+    def scan(self, cBufferedByteStream stream):
+        """
+        @see: L{pyamf.codec.Scanner.scan}
+        """
+        cdef char *buf = NULL
+        cdef Py_ssize_t end, pos = 0
+        cdef Py_ssize_t strings, objects, traits, size = 0
+        cdef int ret
+
+        self.reset()
+
+        strings = self.strings
+        objects = self.objects
+        traits = len(self.traits)
+
+        if self.index is not None:
+            size = len(self.index)
+
+        self.base = stream.tell()
+        end = stream.peek(&buf, stream.remaining())
+
+        ret = self.scanElement(buf, end, &pos, 0)
+
+        if ret == 1:
+            self.offset = self.base + pos
+
+            return self.offset
+
+        self.strings = strings
+        self.objects = objects
+        del self.traits[traits:]
+
+        if self.index is not None:
+            self.index.truncate(size)
+
+        if ret == 0:
+            return None
+
+        return -1
+
+    def walk(self, cBufferedByteStream stream):
+        """
+        @see: L{pyamf.codec.Scanner.walk}
+        """
+        return walk(self, stream)
+
+    cdef int getTrait(self, Py_ssize_t ref, int *encoding,
+                      Py_ssize_t *attr_len) except -1:
+        cdef object class_def, trait
+
+        if self.class_base == -1:
+            # the number of traits known to the decoder before this element
+            self.class_base = 0
+
+            if self.context is not None:
+                while self.context.getClassByReference(
+                        self.class_base) is not None:
+                    self.class_base += 1
+
+        if ref < self.class_base:
+            class_def = self.context.getClassByReference(ref)
+
+            encoding[0] = class_def.encoding
+            attr_len[0] = class_def.attr_len
+
+            return 1
+
+        ref -= self.class_base
+
+        if ref >= PyList_GET_SIZE(self.traits):
+            return 0
+
+        trait = self.traits[ref]
+
+        encoding[0] = trait[0]
+        attr_len[0] = trait[1]
+
+        return 1
+
+    cdef int skipString(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                        unsigned int *ref) except -1:
+        if not read_u29(buf, end, pos, ref):
+            return 0
+
+        if ref[0] & REFERENCE_BIT:
+            if not skip_bytes(end, pos, ref[0] >> 1):
+                return 0
+
+            if ref[0] != REFERENCE_BIT:
+                self.strings += 1
+
+        return 1
+
+    cdef int scanElements(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                          int depth, Py_ssize_t n) except -2:
+        cdef Py_ssize_t i
+        cdef int ret
+
+        for i from 0 <= i < n:
+            ret = self.scanElement(buf, end, pos, depth)
+
+            if ret != 1:
+                return ret
+
+        return 1
+
+    cdef int scanMembers(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                         int depth) except -2:
+        """
+        Scans name/value pairs up to the empty name.
+        """
+        cdef unsigned int key
+        cdef int ret
+
+        while 1:
+            if not self.skipString(buf, end, pos, &key):
+                return 0
+
+            if key == REFERENCE_BIT:
+                return 1
+
+            ret = self.scanElement(buf, end, pos, depth)
+
+            if ret != 1:
+                return ret
+
+    cdef int scanElement(self, char *buf, Py_ssize_t end, Py_ssize_t *pos,
+                         int depth) except -2:
+        """
+        Scans the element at C{buf[pos]}.
+
+        @return: C{1} when the element is complete, C{0} if more data is
+            required and C{-1} if the element cannot be scanned.
+        """
+        cdef char t
+        cdef unsigned int ref, key
+        cdef Py_ssize_t i, n, attr_len
+        cdef int encoding, ret
+
+        if pos[0] >= end:
+            return 0
+
+        t = buf[pos[0]]
+
+        if self.index is not None:
+            self.index.append(PyString_FromStringAndSize(&t, 1),
+                self.base + pos[0], depth)
+
+        pos[0] += 1
+
+        if t == TYPE_UNDEFINED or t == TYPE_NULL:
+            return 1
+        elif t == TYPE_BOOL_FALSE or t == TYPE_BOOL_TRUE:
+            return 1
+        elif t == TYPE_INTEGER:
+            return read_u29(buf, end, pos, &ref)
+        elif t == TYPE_NUMBER:
+            return skip_bytes(end, pos, 8)
+        elif t == TYPE_STRING:
+            return self.skipString(buf, end, pos, &ref)
+        elif t < TYPE_XML or t > TYPE_DICTIONARY:
+            return -1
+
+        # the remaining types can all be references
+        if not read_u29(buf, end, pos, &ref):
+            return 0
+
+        if ref & REFERENCE_BIT == 0:
+            return 1
+
+        n = ref >> 1
+        self.objects += 1
+
+        if t == TYPE_XML or t == TYPE_XMLSTRING or t == TYPE_BYTEARRAY:
+            return skip_bytes(end, pos, n)
+        elif t == TYPE_DATE:
+            return skip_bytes(end, pos, 8)
+        elif t == TYPE_VECTOR_INT or t == TYPE_VECTOR_UINT:
+            return skip_bytes(end, pos, 1 + 4 * n)
+        elif t == TYPE_VECTOR_DOUBLE:
+            return skip_bytes(end, pos, 1 + 8 * n)
+        elif t == TYPE_ARRAY:
+            ret = self.scanMembers(buf, end, pos, depth + 1)
+
+            if ret != 1:
+                return ret
+
+            return self.scanElements(buf, end, pos, depth + 1, n)
+        elif t == TYPE_VECTOR_OBJECT:
+            if not skip_bytes(end, pos, 1):
+                return 0
+
+            if not self.skipString(buf, end, pos, &key):
+                return 0
+
+            return self.scanElements(buf, end, pos, depth + 1, n)
+        elif t == TYPE_DICTIONARY:
+            if not skip_bytes(end, pos, 1):
+                return 0
+
+            return self.scanElements(buf, end, pos, depth + 1, n * 2)
+
+        # TYPE_OBJECT
+        if ref & 0x02 == 0:
+            if not self.getTrait(ref >> 2, &encoding, &attr_len):
+                return -1
+        else:
+            # class name followed by the static attribute names
+            if not self.skipString(buf, end, pos, &key):
+                return 0
+
+            encoding = (ref >> 2) & 0x03
+            attr_len = ref >> 4
+
+            for i from 0 <= i < attr_len:
+                if not self.skipString(buf, end, pos, &key):
+                    return 0
+
+            self.traits.append((encoding, attr_len))
+
+        if encoding & OBJECT_ENCODING_EXTERNAL:
+            return -1
+
+        ret = self.scanElements(buf, end, pos, depth + 1, attr_len)
+
+        if ret != 1 or encoding != OBJECT_ENCODING_DYNAMIC:
+            return ret
+
+        return self.scanMembers(buf, end, pos, depth + 1)
+
+
+cdef object walk(object scanner, cBufferedByteStream stream):
+    """
+    @see: L{pyamf.codec.Scanner.walk}
+    """
+    cdef Py_ssize_t pos = stream.tell()
+    cdef list boundaries = []
+    cdef object end
+
+    try:
+        while stream.remaining() > 0:
+            end = scanner.scan(stream)
+
+            if end is None:
+                break
+
+            if end == -1:
+                raise pyamf.DecodeError('Unable to scan the element at '
+                    'offset %d' % (stream.tell(),))
+
+            boundaries.append(end)
+            stream.seek(end)
+    finally:
+        stream.seek(pos)
+
+    return boundaries
+
+
 cdef int encode_int(long i, char **buf) except -1:
     # Use typecasting to get the twos complement representation of i
     cdef unsigned long n = (<unsigned long*>(<void *>(&i)))[0]
@@ -1120,6 +1881,39 @@ cdef int decode_int(cBufferedByteStream stream, int sign=0) except? -1:
     return result
 
 
+cdef inline int pack_int(char *p, long i):
+    """
+    Packs C{i} into C{p} as in L{encode_int}, returning the number of bytes
+    written. C{i} must be in the signed 29 bit range.
+    """
+    cdef unsigned long n = i & 0x1fffffff
+
+    if n > 0x1fffff:
+        p[0] = 0x80 | ((n >> 22) & 0x7f)
+        p[1] = 0x80 | ((n >> 15) & 0x7f)
+        p[2] = 0x80 | ((n >> 8) & 0x7f)
+        p[3] = n & 0xff
+
+        return 4
+
+    if n > 0x3fff:
+        p[0] = 0x80 | ((n >> 14) & 0x7f)
+        p[1] = 0x80 | ((n >> 7) & 0x7f)
+        p[2] = n & 0x7f
+
+        return 3
+
+    if n > 0x7f:
+        p[0] = 0x80 | ((n >> 7) & 0x7f)
+        p[1] = n & 0x7f
+
+        return 2
+
+    p[0] = n
+
+    return 1
+
+
 cdef inline int _encode_integer(cBufferedByteStream stream, int i) except -1:
     cdef char *buf = NULL
     cdef int size = 0
@@ -8,6 +8,12 @@ cdef extern from "Python.h":
 
 from cpyamf cimport util
 
+cdef int read_numeric(char *buf, char typecode, Py_ssize_t i,
+    long long *ival, double *dval) except -1
+cdef char *get_numeric_buffer(object a, Py_ssize_t n) except NULL
+cdef int pack_double(char *p, double d) except -1
+
+
 cdef class IndexedCollection(object):
     """
     Provides reference functionality for amf contexts.
@@ -27,6 +33,7 @@ cdef class IndexedCollection(object):
     cpdef object getByReference(self, Py_ssize_t ref)
     cpdef Py_ssize_t getReferenceTo(self, object obj) except -2
     cpdef Py_ssize_t append(self, object obj) except -1
+    cpdef int truncate(self, Py_ssize_t size) except -1
 
 
 cdef class Context(object):
@@ -36,8 +43,6 @@ cdef class Context(object):
 
     cdef dict class_aliases
     cdef IndexedCollection objects
-    cdef dict unicodes
-    cdef dict _strings
     cdef public dict extra
 
     cpdef int clear(self) except? -1
@@ -47,6 +52,9 @@ cdef class Context(object):
     cpdef Py_ssize_t getObjectReference(self, object obj) except -2
     cpdef Py_ssize_t addObject(self, object obj) except -1
 
+    cpdef object checkpoint(self)
+    cpdef int rollback(self, object checkpoint) except -1
+
     cpdef unicode getStringForBytes(self, object s)
     cpdef str getBytesForString(self, object u)
 
@@ -60,6 +68,7 @@ cdef class Codec(object):
     cdef util.cBufferedByteStream stream
     cdef public bint strict
     cdef public object timezone_offset
+    cdef public object recorder
 
 
 cdef class Decoder(Codec):
@@ -73,6 +82,7 @@ cdef class Decoder(Codec):
     cdef object readXML(self)
 
     cpdef object readElement(self)
+    cdef object readRecordedElement(self, Py_ssize_t pos, char t)
     cdef object readConcreteElement(self, char t)
 
     cpdef int send(self, data) except -1
@@ -85,6 +95,12 @@ cdef class Encoder(Codec):
     cdef dict func_cache
     cdef list use_write_object
     cdef list bucket
+    cdef public object sink
+    cdef Py_ssize_t chunk_size
+    cdef object type_generation
+
+    cdef int setSink(self, object sink, object chunk_size) except -1
+    cpdef int flush(self) except -1
 
     cpdef int serialiseString(self, u) except -1
     cdef inline int writeType(self, char type) except -1
@@ -105,10 +121,15 @@ cdef class Encoder(Codec):
     cpdef int writeObject(self, object o, bint is_proxy=?) except -1
     cdef int writeDict(self, dict o) except -1
     cdef int writeMixedArray(self, object o) except -1
+    cdef int writeRawAMF(self, object raw) except -1
     cdef int writeGenerator(self, object) except -1
+    cdef char *flushNumericBlock(self, object a, Py_ssize_t n,
+        char *buf) except NULL
 
     cdef inline int handleBasicTypes(self, object element, object py_type) except -1
     cdef int checkBadTypes(self, object element, object py_type) except -1
     cpdef int writeElement(self, object element) except -1
+    cdef int writeRecordedElement(self, object element) except -1
+    cdef int writeConcreteElement(self, object element) except -1
 
     cpdef int send(self, data) except -1
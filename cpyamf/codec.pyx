@@ -18,19 +18,26 @@ cdef extern from "datetime.h":
 
 cdef extern from "Python.h":
     bint PyClass_Check(object)
+    int PyObject_AsReadBuffer(object, void **, Py_ssize_t *) except -1
+    long long PY_LLONG_MAX
+    int _PyFloat_Pack8(double, unsigned char *, int) except? -1
 
 from cpyamf.util cimport cBufferedByteStream, BufferedByteStream
 
 import types
 import pyamf
 from pyamf import util, xml
+from pyamf.codec import Sink, TYPE_CACHE, STRING_CACHE, Recorder, Stats
+from pyamf.codec import check_stats
 import datetime
 
 
 cdef object MixedArray = pyamf.MixedArray
 cdef object Undefined = pyamf.Undefined
+cdef object RawAMF = pyamf.RawAMF
 cdef object BuiltinFunctionType = types.BuiltinFunctionType
 cdef object GeneratorType = types.GeneratorType
+cdef object InstanceType = types.InstanceType
 
 PyDateTime_IMPORT
 
@@ -144,6 +151,27 @@ cdef class IndexedCollection(object):
 
         return self.length - 1
 
+    cpdef int truncate(self, Py_ssize_t size) except -1:
+        """
+        Drops every reference from C{size} onwards.
+        """
+        cdef Py_ssize_t i
+        cdef object obj, h
+
+        for i from size <= i < self.length:
+            obj = <object>self.data[i]
+            h = self._ref(obj)
+
+            if self.refs.get(h, None) == i:
+                del self.refs[h]
+
+            Py_DECREF(obj)
+
+        if size < self.length:
+            self.length = size
+
+        return 0
+
     def __iter__(self):
         cdef list x = []
         cdef Py_ssize_t idx
@@ -215,8 +243,6 @@ cdef class Context(object):
         self.objects.clear()
 
         self.class_aliases = {}
-        self.unicodes = {}
-        self._strings = {}
         self.extra = {}
 
         return 0
@@ -230,6 +256,27 @@ cdef class Context(object):
     cpdef inline Py_ssize_t addObject(self, object obj) except -1:
         return self.objects.append(obj)
 
+    cpdef object checkpoint(self):
+        """
+        @see: L{pyamf.codec.Context.checkpoint}
+        """
+        return self.objects.length
+
+    def reserve(self, Py_ssize_t objects):
+        """
+        @see: L{pyamf.codec.Context.reserve}
+        """
+        cdef Py_ssize_t i
+
+        for i from 0 <= i < objects:
+            self.objects.append(None)
+
+    cpdef int rollback(self, object checkpoint) except -1:
+        """
+        @see: L{pyamf.codec.Context.rollback}
+        """
+        return self.objects.truncate(checkpoint)
+
     cpdef object getClassAlias(self, object klass):
         """
         Gets a class alias based on the supplied C{klass}.
@@ -259,41 +306,15 @@ cdef class Context(object):
 
     cpdef unicode getStringForBytes(self, object s):
         """
-        Returns the corresponding unicode object for a given string. If there
-        is no unicode object, one is created.
-
-        @since: 0.6
+        @see: L{pyamf.codec.Context.getStringForBytes}
         """
-        cdef object ret = self.unicodes.get(s, None)
-
-        if ret is not None:
-            return ret
-
-        cdef unicode u = s.decode('utf-8')
-
-        self.unicodes[s] = u
-        self._strings[u] = s
-
-        return u
+        return STRING_CACHE.getStringForBytes(s)
 
     cpdef str getBytesForString(self, object u):
         """
-        Returns the corresponding utf-8 encoded string for a given unicode
-        object. If there is no string, one is encoded.
-
-        @since: 0.6
+        @see: L{pyamf.codec.Context.getBytesForString}
         """
-        cdef object ret = self._strings.get(u, None)
-
-        if ret is not None:
-            return ret
-
-        cdef str s = u.encode('utf-8')
-
-        self.unicodes[s] = u
-        self._strings[u] = s
-
-        return s
+        return STRING_CACHE.getBytesForString(u)
 
 
 cdef class Codec(object):
@@ -316,6 +337,7 @@ cdef class Codec(object):
         self.stream = None
         self.strict = 0
         self.timezone_offset = None
+        self.recorder = None
 
     def __init__(self, stream=None, strict=False, timezone_offset=None):
         if not isinstance(stream, BufferedByteStream):
@@ -326,6 +348,53 @@ cdef class Codec(object):
 
         self.timezone_offset = timezone_offset
 
+        check_stats(self)
+
+    def reset(self, stream=None, strict=False, timezone_offset=None):
+        """
+        @see: L{pyamf.codec._Codec.reset}
+        """
+        if not isinstance(stream, BufferedByteStream):
+            stream = BufferedByteStream(stream)
+
+        self.stream = <cBufferedByteStream>stream
+        self.strict = strict
+
+        self.timezone_offset = timezone_offset
+
+        (<object>self).context.clear()
+
+        if self.recorder is not None:
+            self.recorder.reset()
+        else:
+            check_stats(self)
+
+    def enableStats(self, stats=None):
+        """
+        @see: L{pyamf.codec._Codec.enableStats}
+        """
+        if stats is None:
+            stats = Stats()
+
+        self.recorder = Recorder(self.encoding, stats)
+
+        return stats
+
+    def disableStats(self):
+        """
+        @see: L{pyamf.codec._Codec.disableStats}
+        """
+        self.recorder = None
+
+    def getStats(self):
+        """
+        @see: L{pyamf.codec._Codec.getStats}
+        """
+        if self.recorder is None:
+            return None
+
+        return self.recorder.stats.getSnapshot()
+
 
 cdef class Decoder(Codec):
     """
@@ -368,6 +437,9 @@ cdef class Decoder(Codec):
 
         t = self.stream.read_char()
 
+        if self.recorder is not None:
+            return self.readRecordedElement(pos, t)
+
         try:
             return self.readConcreteElement(t)
         except IOError:
@@ -375,6 +447,30 @@ cdef class Decoder(Codec):
 
             raise
 
+    cdef object readRecordedElement(self, Py_ssize_t pos, char t):
+        """
+        Reads an element, collecting statistics about it.
+        """
+        recorder = self.recorder
+
+        recorder.enter(pos, PyString_FromStringAndSize(&t, 1))
+
+        try:
+            obj = self.readConcreteElement(t)
+        except IOError:
+            recorder.abort()
+            self.stream.seek(pos)
+
+            raise
+        except:
+            recorder.abort()
+
+            raise
+
+        recorder.leave(self.stream, obj)
+
+        return obj
+
     cdef object readConcreteElement(self, char t):
         """
         The workhorse function. Overridden in subclasses
@@ -410,6 +506,59 @@ cdef class Encoder(Codec):
         self.func_cache = {}
         self.use_write_object = []
         self.bucket = []
+        self.sink = None
+
+    def __init__(self, *args, **kwargs):
+        sink = kwargs.pop('sink', None)
+        chunk_size = kwargs.pop('chunk_size', None)
+
+        Codec.__init__(self, *args, **kwargs)
+
+        self.type_generation = pyamf.TYPE_GENERATION
+        self.setSink(sink, chunk_size)
+
+    def reset(self, *args, **kwargs):
+        """
+        @see: L{pyamf.codec.Encoder.reset}
+        """
+        sink = kwargs.pop('sink', None)
+        chunk_size = kwargs.pop('chunk_size', None)
+
+        Codec.reset(self, *args, **kwargs)
+
+        self.bucket = []
+
+        if self.type_generation != pyamf.TYPE_GENERATION:
+            self.func_cache = {}
+            self.use_write_object = []
+            self.type_generation = pyamf.TYPE_GENERATION
+
+        self.setSink(sink, chunk_size)
+
+    cdef int setSink(self, object sink, object chunk_size) except -1:
+        if sink is not None:
+            if not isinstance(sink, Sink):
+                sink = Sink(sink, chunk_size)
+
+            self.chunk_size = sink.chunk_size
+
+        self.sink = sink
+
+        return 0
+
+    cpdef int flush(self) except -1:
+        """
+        @see: L{pyamf.codec.Encoder.flush}
+        """
+        if self.sink is None:
+            return 0
+
+        if self.recorder is not None:
+            self.recorder.flushed(self.stream)
+
+        self.sink.write(self.stream.getvalue())
+
+        return self.stream.truncate()
 
     cpdef int serialiseString(self, u) except -1:
         raise NotImplementedError
@@ -470,6 +619,25 @@ cdef class Encoder(Codec):
             except StopIteration:
                 return 0
 
+    def writeNumericArray(self, a):
+        """
+        @see: L{pyamf.codec.Encoder.writeNumericArray}
+        """
+        raise NotImplementedError
+
+    cdef char *flushNumericBlock(self, object a, Py_ssize_t n,
+                                 char *buf) except NULL:
+        """
+        Called after each block of the numeric array C{a} has been written.
+        Flushes to the sink and returns the (possibly moved) item buffer.
+        """
+        if self.sink is None or self.stream.tell() < self.chunk_size:
+            return buf
+
+        self.flush()
+
+        return get_numeric_buffer(a, n)
+
     cdef int writeSequence(self, object iterable) except -1:
         """
         Encodes an iterable. The default is to write If the iterable has an al
@@ -494,6 +662,9 @@ cdef class Encoder(Codec):
     cdef int writeMixedArray(self, object o) except -1:
         raise NotImplementedError
 
+    cdef int writeRawAMF(self, object raw) except -1:
+        raise NotImplementedError
+
     cdef inline int handleBasicTypes(self, object element, object py_type) except -1:
         """
         @return: 0 = handled, -1 = error, 1 = not handled
@@ -528,6 +699,8 @@ cdef class Encoder(Codec):
             ret = self.writeDate(element)
         elif py_type is MixedArray:
             ret = self.writeMixedArray(element)
+        elif py_type is RawAMF:
+            ret = self.writeRawAMF(element)
         elif py_type is GeneratorType:
             ret = self.writeGenerator(element)
         elif PySequence_Contains(self.use_write_object, py_type):
@@ -554,11 +727,39 @@ cdef class Encoder(Codec):
         return 0
 
     cpdef int writeElement(self, object element) except -1:
+        if self.recorder is not None:
+            return self.writeRecordedElement(element)
+
+        return self.writeConcreteElement(element)
+
+    cdef int writeRecordedElement(self, object element) except -1:
+        """
+        Writes an element, collecting statistics about it.
+        """
+        recorder = self.recorder
+
+        recorder.enter(self.stream.tell())
+
+        try:
+            self.writeConcreteElement(element)
+        except:
+            recorder.abort()
+
+            raise
+
+        recorder.leave(self.stream, element)
+
+        return 0
+
+    cdef int writeConcreteElement(self, object element) except -1:
         cdef int ret = 0
         cdef object py_type = type(element)
         cdef object func = None
         cdef int use_proxy
 
+        if self.sink is not None and self.stream.tell() >= self.chunk_size:
+            self.flush()
+
         ret = self.handleBasicTypes(element, py_type)
 
         if ret == 1:
@@ -570,14 +771,18 @@ cdef class Encoder(Codec):
 
                 if func is None:
                     self.checkBadTypes(element, py_type)
-                    self.use_write_object.append(py_type)
+
+                    # all old style instances share a type
+                    if py_type is not InstanceType:
+                        self.use_write_object.append(py_type)
 
                     if isinstance(element, (list, tuple)):
                         return self.writeSequence(element)
 
                     return self.writeObject(element)
 
-                self.func_cache[py_type] = func
+                if py_type is not InstanceType:
+                    self.func_cache[py_type] = func
 
             func(element)
 
@@ -617,6 +822,74 @@ cdef class Encoder(Codec):
         return self
 
 
+cdef char *get_numeric_buffer(object a, Py_ssize_t n) except NULL:
+    """
+    Returns a pointer to the items of the non empty C{array.array} C{a} which
+    must still hold C{n} items.
+    """
+    cdef void *buf = NULL
+    cdef Py_ssize_t size
+
+    PyObject_AsReadBuffer(a, &buf, &size)
+
+    if buf == NULL or size != n * a.itemsize:
+        raise pyamf.EncodeError('Array changed size during encoding')
+
+    return <char *>buf
+
+
+cdef int pack_double(char *p, double d) except -1:
+    """
+    Packs C{d} into C{p} as a big endian 8 byte float.
+    """
+    return _PyFloat_Pack8(d, <unsigned char *>p, 0)
+
+
+cdef int read_numeric(char *buf, char typecode, Py_ssize_t i,
+                      long long *ival, double *dval) except -1:
+    """
+    Reads item C{i} of an C{array.array} buffer. Integers are stored in
+    C{ival} (returns 0), floats and integers that do not fit in C{ival} are
+    stored in C{dval} (returns 1).
+    """
+    cdef unsigned long u
+
+    if typecode == c'd':
+        dval[0] = (<double *>buf)[i]
+    elif typecode == c'f':
+        dval[0] = (<float *>buf)[i]
+    elif typecode == c'b':
+        ival[0] = (<signed char *>buf)[i]
+    elif typecode == c'B':
+        ival[0] = (<unsigned char *>buf)[i]
+    elif typecode == c'h':
+        ival[0] = (<short *>buf)[i]
+    elif typecode == c'H':
+        ival[0] = (<unsigned short *>buf)[i]
+    elif typecode == c'i':
+        ival[0] = (<int *>buf)[i]
+    elif typecode == c'I':
+        ival[0] = (<unsigned int *>buf)[i]
+    elif typecode == c'l':
+        ival[0] = (<long *>buf)[i]
+    elif typecode == c'L':
+        u = (<unsigned long *>buf)[i]
+
+        if u > <unsigned long>PY_LLONG_MAX:
+            dval[0] = u
+
+            return 1
+
+        ival[0] = u
+    else:
+        raise ValueError('Unknown typecode %r' % (chr(typecode),))
+
+    if typecode == c'd' or typecode == c'f':
+        return 1
+
+    return 0
+
+
 cdef class _CustomTypeFunc(object):
     """
     Support for custom type mappings when encoding.
@@ -637,14 +910,9 @@ cdef class _CustomTypeFunc(object):
 
 
 cdef object get_custom_type_func(object encoder, object data):
-    cdef _CustomTypeFunc ret
+    func = TYPE_CACHE.get(data)
 
-    for type_, func in pyamf.TYPE_MAP.iteritems():
-        try:
-            if isinstance(data, type_):
-                return _CustomTypeFunc(encoder, func)
-        except TypeError:
-            if callable(type_) and type_(data):
-                return _CustomTypeFunc(encoder, func)
+    if func is None:
+        return None
 
-    return None
+    return _CustomTypeFunc(encoder, func)
@@ -15,14 +15,21 @@ cdef class cBufferedByteStream:
     cdef Py_ssize_t size # total size of the alloc'd buffer
     cdef Py_ssize_t length
     cdef Py_ssize_t min_buf_size
+    cdef object source # the object that owns buffer, if borrowed
+    cdef Py_buffer view
+    cdef bint borrowed
 
     cpdef inline Py_ssize_t tell(self) except -1
     cdef int write(self, char *buf, Py_ssize_t size) except -1
     cdef inline int _init_buffer(self)
+    cdef int _release_buffer(self) except -1
+    cdef int _borrow(self, object obj) except -1
+    cdef int _own_buffer(self) except -1
     cdef int _actually_increase_buffer(self, Py_ssize_t size) except -1
     cdef int _increase_buffer(self, Py_ssize_t size) except -1
     cdef inline bint has_available(self, Py_ssize_t size) except -1
     cdef int read(self, char **buf, Py_ssize_t size) except -1
+    cpdef object read_buffer(self, Py_ssize_t size)
     cpdef bint at_eof(self) except -1
     cpdef inline Py_ssize_t remaining(self) except -1
     cpdef int seek(self, Py_ssize_t pos, int mode=*) except -1
@@ -65,3 +72,5 @@ cdef class BufferedByteStream(cBufferedByteStream):
     Provides the ability to read arbitrary data types from the underlying
     stream.
     """
+
+    cdef int _set_value(self, object value) except -1
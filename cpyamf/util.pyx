@@ -53,6 +53,18 @@ cdef object pyamf_NaN = python.NaN
 cdef object pyamf_NegInf = python.NegInf
 cdef object pyamf_PosInf = python.PosInf
 cdef object empty_unicode = unicode('')
+cdef object buffer_types = python.buffer_types
+cdef object memoryview_type = getattr(python.builtins, 'memoryview', None)
+
+
+cdef object slice_buffer(object source, Py_ssize_t offset, Py_ssize_t size):
+    """
+    Returns a zero-copy slice of C{source}.
+    """
+    if memoryview_type is not None and isinstance(source, memoryview_type):
+        return source[offset:offset + size]
+
+    return PyBuffer_FromObject(source, offset, size)
 
 
 @cython.profile(False)
@@ -200,18 +212,90 @@ cdef class cBufferedByteStream(object):
         self.buffer = NULL
         self.min_buf_size = 512
         self.size = 0
+        self.source = None
+        self.borrowed = 0
 
     def __dealloc__(self):
-        if self.buffer != NULL:
+        # self.source may already have been cleared by the gc at this point
+        if self.borrowed:
+            PyBuffer_Release(&self.view)
+            self.borrowed = 0
+        elif self.buffer != NULL:
             free(self.buffer)
 
         self.buffer = NULL
 
-    cdef inline int _init_buffer(self) except -1:
-        if self.buffer != NULL:
+    cdef int _release_buffer(self) except -1:
+        """
+        Frees the underlying buffer or, if it is borrowed, releases the view
+        on it.
+        """
+        if self.borrowed:
+            PyBuffer_Release(&self.view)
+            self.borrowed = 0
+            self.source = None
+        elif self.buffer != NULL:
             free(self.buffer)
 
-            self.buffer = NULL
+        self.buffer = NULL
+
+        return 0
+
+    cdef int _borrow(self, object obj) except -1:
+        """
+        Makes this stream a zero-copy view on the buffer exposed by C{obj}.
+        The contents are only copied if the stream is written to.
+        """
+        if not PyObject_CheckBuffer(obj):
+            raise TypeError('%r does not support the buffer interface' % (obj,))
+
+        self._release_buffer()
+
+        PyObject_GetBuffer(obj, &self.view, PyBUF_SIMPLE)
+
+        self.borrowed = 1
+        self.source = obj
+        self.buffer = <char *>self.view.buf
+        self.length = self.view.len
+        self.size = self.view.len
+        self.pos = 0
+
+        return 0
+
+    cdef int _own_buffer(self) except -1:
+        """
+        Copies a borrowed buffer so that it can be written to.
+        """
+        if not self.borrowed:
+            return 0
+
+        cdef Py_ssize_t size = self.length
+        cdef char *buf
+
+        if size < self.min_buf_size:
+            size = self.min_buf_size
+
+        if size < 1:
+            size = 1
+
+        buf = <char *>malloc(size)
+
+        if buf == NULL:
+            PyErr_NoMemory()
+
+        memcpy(buf, self.buffer, self.length)
+
+        PyBuffer_Release(&self.view)
+        self.borrowed = 0
+        self.source = None
+
+        self.buffer = buf
+        self.size = size
+
+        return 0
+
+    cdef inline int _init_buffer(self) except -1:
+        self._release_buffer()
 
         self.pos = 0
         self.length = 0
@@ -273,6 +357,9 @@ cdef class cBufferedByteStream(object):
         if size == 0:
             return 0
 
+        if self.borrowed:
+            self._own_buffer()
+
         self._increase_buffer(size)
 
         memcpy(self.buffer + self.pos, buf, size)
@@ -320,6 +407,28 @@ cdef class cBufferedByteStream(object):
 
         return 0
 
+    cpdef object read_buffer(self, Py_ssize_t size):
+        """
+        Reads C{size} bytes from the stream. If this stream is a view on
+        another object, a zero-copy slice of that object is returned (a
+        C{buffer}, or a C{memoryview} if that is what the stream wraps),
+        otherwise a C{str}.
+
+        @since: 0.7
+        """
+        cdef char *buf = NULL
+        cdef Py_ssize_t pos = self.pos
+
+        if size < 0:
+            raise IOError('Cannot read backwards')
+
+        self.read(&buf, size)
+
+        if not self.borrowed:
+            return PyString_FromStringAndSize(buf, size)
+
+        return slice_buffer(self.source, pos, size)
+
     cpdef inline bint at_eof(self) except -1:
         """
         Returns C{True} if the internal pointer is at the end of the stream.
@@ -365,6 +474,9 @@ cdef class cBufferedByteStream(object):
         """
         Get raw data from buffer.
         """
+        if self.borrowed and PyString_CheckExact(self.source):
+            return self.source
+
         return PyString_FromStringAndSize(self.buffer, self.length)
 
     cdef Py_ssize_t peek(self, char **buf, Py_ssize_t size) except -1:
@@ -920,21 +1032,31 @@ cdef class BufferedByteStream(cBufferedByteStream):
             pass
         elif isinstance(buf, cBufferedByteStream):
             x = <cBufferedByteStream>buf
-            self.write(x.getvalue())
+            self._borrow(x.getvalue())
+        elif PyString_CheckExact(buf) or isinstance(buf, buffer_types):
+            self._borrow(buf)
         elif isinstance(buf, (str, unicode)):
             self.write(buf)
         elif hasattr(buf, 'getvalue'):
-            self.write(buf.getvalue())
+            self._set_value(buf.getvalue())
         elif hasattr(buf, 'read') and hasattr(buf, 'seek') and hasattr(buf, 'tell'):
             old_pos = buf.tell()
             buf.seek(0)
-            self.write(buf.read())
+            self._set_value(buf.read())
             buf.seek(old_pos)
         else:
             raise TypeError("Unable to coerce buf->StringIO")
 
         self.seek(0)
 
+    cdef int _set_value(self, object value) except -1:
+        if PyString_CheckExact(value):
+            return self._borrow(value)
+
+        self.write(value)
+
+        return 0
+
     property endian:
         def __set__(self, value):
             if PyString_Check(value) == 0:
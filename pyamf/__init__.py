@@ -47,6 +47,15 @@ CLASS_LOADERS = set()
 #: @see: L{get_type}, L{add_type}, and L{remove_type}
 TYPE_MAP = {}
 
+#: Incremented each time the custom type map or the class alias registry
+#: changes, invalidating L{codec.TYPE_CACHE<pyamf.codec.TYPE_CACHE>}.
+#: @since: 0.7
+TYPE_GENERATION = 0
+
+#: The codec pools, keyed by encoding.
+#: @see: L{codec_pool}
+_codec_pools = {}
+
 #: Maps error classes to string codes.
 #: @see: L{add_error_class} and L{remove_error_class}
 ERROR_CLASS_MAP = {
@@ -196,6 +205,77 @@ class TypedObject(dict):
             'required.' % (self.alias,))
 
 
+class RawAMF(object):
+    """
+    An element that has already been encoded. The encoders write C{bytes}
+    straight to the stream, so a large value that is sent many times only
+    has to be encoded once (see L{encode_raw}).
+
+    The bytes must not hold any references as they are only valid at the
+    point in the stream where they were written. The decoder still adds the
+    objects, strings and traits it reads to its reference tables, so
+    C{references} records how many there are for the encoder to skip.
+
+    @ivar bytes: The encoded element.
+    @type bytes: C{str}
+    @ivar encoding: The encoding of C{bytes}. One of L{ENCODING_TYPES}.
+    @ivar references: The number of reference table entries the element
+        adds. For AMF3 this is C{(objects, strings, traits)}. For AMF0 it is
+        C{(objects, amf3)} where C{amf3} holds the counts of any embedded AMF3
+        data or is C{None}. If not supplied, the counts are found with a
+        L{codec.Scanner<pyamf.codec.Scanner>}.
+    @raise TypeError: C{bytes} is not a C{str}.
+    @raise ValueError: C{bytes} is not a single complete element.
+    @raise DecodeError: The references could not be counted.
+    @since: 0.7
+    """
+
+    __slots__ = ('bytes', 'encoding', 'references')
+
+    def __init__(self, bytes, encoding=AMF3, references=None):
+        if not isinstance(bytes, str):
+            raise TypeError('str expected for bytes (got %r)' % (
+                type(bytes),))
+
+        if encoding not in ENCODING_TYPES:
+            raise ValueError("Unknown encoding %r" % (encoding,))
+
+        self.bytes = bytes
+        self.encoding = encoding
+
+        if references is None:
+            references = self._countReferences()
+
+        self.references = references
+
+    def _countReferences(self):
+        scanner = get_scanner(self.encoding)
+
+        if scanner.walk(util.BufferedByteStream(self.bytes)) != [
+                len(self.bytes)]:
+            raise ValueError('Expected a single complete AMF%d element' % (
+                self.encoding,))
+
+        if self.encoding == AMF3:
+            return (scanner.objects, scanner.strings, len(scanner.traits))
+
+        amf3 = (scanner.amf3.objects, scanner.amf3.strings,
+            len(scanner.amf3.traits))
+
+        if amf3 == (0, 0, 0):
+            amf3 = None
+
+        return (scanner.objects, amf3)
+
+    def __len__(self):
+        return len(self.bytes)
+
+    def __repr__(self):
+        return '<%s.%s AMF%d (%d bytes) at 0x%x>' % (
+            self.__class__.__module__, self.__class__.__name__,
+            self.encoding, len(self.bytes), id(self))
+
+
 class TypedObjectClassAlias(ClassAlias):
     """
     The meta class for L{TypedObject} used to adapt PyAMF.
@@ -258,6 +338,7 @@ def register_class(klass, alias=None):
         CLASS_CACHE[x.alias] = x
 
     CLASS_CACHE[klass] = x
+    _bump_type_generation()
 
     return x
 
@@ -277,6 +358,7 @@ def unregister_class(alias):
         del CLASS_CACHE[x.alias]
 
     del CLASS_CACHE[x.klass]
+    _bump_type_generation()
 
     return x
 
@@ -423,6 +505,8 @@ def decode(stream, *args, **kwargs):
     @type stream: byte data
     @kwarg encoding: AMF encoding type. One of L{ENCODING_TYPES}.
     @type encoding: C{int}
+    @kwarg lazy: Decode arrays and objects on first access (see
+        L{get_decoder}).
     @return: A generator that will decode each element in the stream.
     """
     encoding = kwargs.pop('encoding', DEFAULT_ENCODING)
@@ -438,46 +522,103 @@ def encode(*args, **kwargs):
     @param args: The Python data to be encoded.
     @kwarg encoding: AMF encoding type. One of L{ENCODING_TYPES}.
     @type encoding: C{int}
-    @return: A L{util.BufferedByteStream} object that contains the data.
+    @kwarg sink: A file like object, socket or callable that will receive the
+        encoded data in chunks as encoding proceeds (see L{codec.Sink}).
+    @kwarg chunk_size: The size of the chunks written to C{sink}.
+    @return: A L{util.BufferedByteStream} object that contains the data or,
+        if C{sink} was supplied, the number of bytes written to it.
     """
     encoding = kwargs.pop('encoding', DEFAULT_ENCODING)
     encoder = get_encoder(encoding, **kwargs)
 
     [encoder.writeElement(el) for el in args]
 
+    if encoder.sink is not None:
+        encoder.flush()
+
+        return encoder.sink.written
+
     stream = encoder.stream
     stream.seek(0)
 
     return stream
 
 
+def encode_raw(obj, encoding=DEFAULT_ENCODING, **kwargs):
+    """
+    Encodes C{obj} into a L{RawAMF} that can be written anywhere in an AMF
+    stream of the same encoding. Every value is written in full, so objects
+    that appear more than once in C{obj} are repeated.
+
+    Additional keyword arguments are passed to the encoder.
+
+    @param encoding: AMF encoding type. One of L{ENCODING_TYPES}.
+    @type encoding: C{int}
+    @raise EncodeError: C{obj} contains a reference cycle.
+    @raise ValueError: Unknown C{encoding}.
+    @since: 0.7
+    """
+    if encoding == AMF0:
+        from pyamf.amf0 import RawEncoder
+    elif encoding == AMF3:
+        from pyamf.amf3 import RawEncoder
+    else:
+        raise ValueError("Unknown encoding %r" % (encoding,))
+
+    encoder = RawEncoder(**kwargs)
+    encoder.writeElement(obj)
+
+    return RawAMF(encoder.stream.getvalue(), encoding,
+        encoder.getReferences())
+
+
 def get_decoder(encoding, *args, **kwargs):
     """
     Returns a L{codec.Decoder} capable of decoding AMF[C{encoding}] streams.
 
     @param encoding: AMF encoding type. One of L{ENCODING_TYPES}.
     @type encoding: C{int}
+    @kwarg lazy: Return arrays and objects as L{amf3.LazyProxy} instances
+        whose members are only decoded when they are used. Only supported by
+        the pure python decoders.
     @raise ValueError: Unknown C{encoding}.
     """
+    lazy = kwargs.pop('lazy', False)
+
     def _get_decoder_class():
         if encoding == AMF0:
-            try:
-                from cpyamf import amf0
-            except ImportError:
-                from pyamf import amf0
+            if not lazy:
+                try:
+                    from cpyamf import amf0
+
+                    return amf0.Decoder
+                except ImportError:
+                    pass
+
+            from pyamf import amf0
 
             return amf0.Decoder
         elif encoding == AMF3:
-            try:
-                from cpyamf import amf3
-            except ImportError:
-                from pyamf import amf3
+            if not lazy:
+                try:
+                    from cpyamf import amf3
+
+                    return amf3.Decoder
+                except ImportError:
+                    pass
+
+            from pyamf import amf3
 
             return amf3.Decoder
 
         raise ValueError("Unknown encoding %r" % (encoding,))
 
-    return _get_decoder_class()(*args, **kwargs)
+    klass = _get_decoder_class()
+
+    if lazy:
+        kwargs['lazy'] = True
+
+    return klass(*args, **kwargs)
 
 
 def get_encoder(encoding, *args, **kwargs):
@@ -509,6 +650,85 @@ def get_encoder(encoding, *args, **kwargs):
     return _get_encoder_class()(*args, **kwargs)
 
 
+def codec_pool(encoding):
+    """
+    Returns the process wide L{codec.CodecPool} of encoders and decoders for
+    C{encoding}.
+
+    @param encoding: AMF encoding type. One of L{ENCODING_TYPES}.
+    @type encoding: C{int}
+    @raise ValueError: Unknown C{encoding}.
+    @since: 0.7
+    """
+    try:
+        return _codec_pools[encoding]
+    except KeyError:
+        pass
+
+    if encoding not in ENCODING_TYPES:
+        raise ValueError("Unknown encoding %r" % (encoding,))
+
+    from pyamf import codec
+
+    return _codec_pools.setdefault(encoding, codec.CodecPool(encoding))
+
+
+def get_incremental_decoder(encoding, *args, **kwargs):
+    """
+    Returns a L{codec.IncrementalDecoder} - a push parser that is fed AMF
+    data as it arrives and returns the completed elements.
+
+    Additional arguments are passed to L{get_decoder}.
+
+    @param encoding: AMF encoding type. One of L{ENCODING_TYPES}.
+    @type encoding: C{int}
+    @raise ValueError: Unknown C{encoding}.
+    @since: 0.7
+    """
+    from pyamf import codec
+
+    if encoding == AMF0:
+        from pyamf.amf0 import Scanner
+    elif encoding == AMF3:
+        from pyamf.amf3 import Scanner
+    else:
+        raise ValueError("Unknown encoding %r" % (encoding,))
+
+    decoder = get_decoder(encoding, *args, **kwargs)
+
+    return codec.IncrementalDecoder(decoder, Scanner(decoder.context))
+
+
+def get_scanner(encoding, context=None, index=False):
+    """
+    Returns a L{codec.Scanner} that walks AMF[C{encoding}] streams without
+    decoding them. The C implementation is used if it is available; it
+    scans each element in one pass and is not resumable.
+
+    @param encoding: AMF encoding type. One of L{ENCODING_TYPES}.
+    @type encoding: C{int}
+    @param context: The context of the decoder that will read the stream.
+    @param index: Record the type, offset and depth of each value in a
+        L{codec.ScanIndex}.
+    @raise ValueError: Unknown C{encoding}.
+    @since: 0.7
+    """
+    if encoding == AMF0:
+        try:
+            from cpyamf.amf0 import Scanner
+        except ImportError:
+            from pyamf.amf0 import Scanner
+    elif encoding == AMF3:
+        try:
+            from cpyamf.amf3 import Scanner
+        except ImportError:
+            from pyamf.amf3 import Scanner
+    else:
+        raise ValueError("Unknown encoding %r" % (encoding,))
+
+    return Scanner(context, index)
+
+
 def blaze_loader(alias):
     """
     Loader for BlazeDS framework compatibility classes, specifically
@@ -580,6 +800,18 @@ def add_type(type_, func=None):
         _check_type(type_)
 
     TYPE_MAP[type_] = func
+    _bump_type_generation()
+
+
+def _bump_type_generation():
+    """
+    Invalidates any type dispatch decisions cached by the encoders.
+
+    @see: L{TYPE_GENERATION}
+    """
+    global TYPE_GENERATION
+
+    TYPE_GENERATION += 1
 
 
 def get_type(type_):
@@ -609,6 +841,7 @@ def remove_type(type_):
     declaration = get_type(type_)
 
     del TYPE_MAP[type_]
+    _bump_type_generation()
 
     return declaration
 
@@ -753,6 +986,8 @@ def register_alias_type(klass, *args):
             CLASS_CACHE[k] = alias_klass
             CLASS_CACHE[v.klass] = alias_klass
 
+    _bump_type_generation()
+
 
 def unregister_alias_type(klass):
     """
@@ -760,7 +995,10 @@ def unregister_alias_type(klass):
 
     @see: L{register_alias_type}
     """
-    return ALIAS_TYPES.pop(klass, None)
+    ret = ALIAS_TYPES.pop(klass, None)
+    _bump_type_generation()
+
+    return ret
 
 
 def register_package(module=None, package=None, separator='.', ignore=[],
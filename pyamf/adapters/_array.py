@@ -4,8 +4,10 @@
 """
 U{array<http://docs.python.org/library/array.html>} adapter module.
 
-Will convert all array.array instances to a python list before encoding. All
-type information is lost (but degrades nicely).
+Numeric arrays are written in bulk as an AMF array of numbers (see
+L{pyamf.codec.Encoder.writeNumericArray}), all other array.array instances
+are converted to a python list before encoding. All type information is lost
+(but degrades nicely).
 
 @since: 0.5
 """
@@ -13,8 +15,23 @@ type information is lost (but degrades nicely).
 import array
 
 import pyamf
-from pyamf.adapters import util
+
+
+def write_array(obj, encoder=None):
+    """
+    Writes a numeric C{array.array} in bulk, anything else is converted to a
+    C{list}.
+
+    @since: 0.7
+    """
+    # imported here as L{pyamf.codec} itself imports C{array}
+    from pyamf import codec
+
+    if obj.typecode not in codec.NUMERIC_TYPECODES:
+        return list(obj)
+
+    encoder.writeNumericArray(obj)
 
 
 if hasattr(array, 'ArrayType'):
-    pyamf.add_type(array.ArrayType, util.to_list)
+    pyamf.add_type(array.ArrayType, write_array)
@@ -0,0 +1,46 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+U{NumPy<http://numpy.scipy.org>} adapter module.
+
+One dimensional arrays of integers or floats are written in bulk as an AMF
+array of numbers (see L{pyamf.codec.Encoder.writeNumericArray}). All other
+arrays are converted to (nested) python lists before encoding.
+
+@since: 0.7
+"""
+
+import array
+
+import numpy
+
+import pyamf
+
+
+def write_ndarray(obj, encoder=None):
+    """
+    Called when an instance of C{numpy.ndarray} is about to be encoded to an
+    AMF stream.
+    """
+    if obj.ndim != 1:
+        return obj.tolist()
+
+    kind = obj.dtype.kind
+
+    if kind == 'f':
+        typecode = 'd'
+    elif kind == 'i':
+        typecode = 'l'
+    elif kind == 'u':
+        typecode = 'L'
+    else:
+        return obj.tolist()
+
+    a = array.array(typecode)
+    a.fromstring(obj.astype(typecode).tostring())
+
+    encoder.writeNumericArray(a)
+
+
+pyamf.add_type(numpy.ndarray, write_ndarray)
@@ -13,6 +13,12 @@ import pyamf
 from pyamf import python, util
 
 
+#: The most decode plans that an alias keeps. The attribute names of a trait
+#: come from the stream, so an unbounded cache would let a client grow the
+#: (process wide) aliases at will.
+MAX_DECODE_PLANS = 64
+
+
 class UnknownClassAlias(Exception):
     """
     Raised if the AMF stream specifies an Actionscript class that does not
@@ -282,8 +288,52 @@ class ClassAlias(object):
         if issubclass(self.klass, dict) or self.klass is dict:
             self.is_dict = True
 
+        self._compile_encode_plan()
+        self._decode_plans = {}
+
         self._compiled = True
 
+    def _compile_encode_plan(self):
+        """
+        Builds C{encode_plan}, a recipe that allows the encoders to write
+        instances of the aliased class without going through
+        L{getEncodableAttributes} (and the temporary C{dict} that it returns).
+
+        The plan is a tuple of C{(static_attrs, sealed_attrs, dynamic)}:
+         - C{static_attrs}: attribute names written in order, a missing
+           attribute is encoded as L{pyamf.Undefined}.
+         - C{sealed_attrs}: the remaining fixed attribute names (sorted).
+         - C{dynamic}: whether L{getDynamicAttributes} must be called to
+           fetch the per instance attributes.
+
+        C{encode_plan} is C{None} if the alias requires the full
+        L{getEncodableAttributes} treatment, e.g. when it is overridden by a
+        subclass or proxy/synonym attributes are in play.
+
+        @since: 0.7
+        """
+        self.encode_plan = None
+
+        if self.external or self.is_dict:
+            return
+
+        if self.proxy_attrs or self.synonym_attrs:
+            return
+
+        if (self.__class__.getEncodableAttributes.im_func is not
+                ClassAlias.getEncodableAttributes.im_func):
+            return
+
+        static_attrs = tuple(self.static_attrs or ())
+        sealed_attrs = ()
+
+        if not self.dynamic and self.non_static_encodable_properties:
+            sealed_attrs = list(self.non_static_encodable_properties)
+            sealed_attrs.sort()
+            sealed_attrs = tuple(sealed_attrs)
+
+        self.encode_plan = (static_attrs, sealed_attrs, bool(self.dynamic))
+
     def is_compiled(self):
         return self._compiled
 
@@ -417,6 +467,36 @@ class ClassAlias(object):
 
         return attrs
 
+    def getDynamicAttributes(self, obj, codec=None):
+        """
+        Returns a C{dict} of the attributes of C{obj} that are not covered by
+        C{static_attrs}. Used by the encoders when following C{encode_plan}.
+
+        @param codec: An optional argument that will contain the encoder
+            instance calling this function.
+        @since: 0.7
+        """
+        if self.shortcut_encode:
+            return obj.__dict__.copy()
+
+        dynamic_props = set(util.get_properties(obj))
+
+        if self.encodable_properties:
+            dynamic_props.update(self.encodable_properties)
+
+        if self.static_attrs:
+            dynamic_props.difference_update(self.static_attrs)
+
+        if self.exclude_attrs:
+            dynamic_props.difference_update(self.exclude_attrs)
+
+        attrs = {}
+
+        for attr in dynamic_props:
+            attrs[attr] = getattr(obj, attr)
+
+        return attrs
+
     def getDecodableAttributes(self, obj, attrs, codec=None):
         """
         Returns a dictionary of attributes for C{obj} that has been filtered,
@@ -526,6 +606,151 @@ class ClassAlias(object):
 
         util.set_attrs(obj, attrs)
 
+    def getDecodePlan(self, static_properties):
+        """
+        Returns a compiled plan for applying the attributes of a sealed trait
+        (one with no dynamic members) to instances of the aliased class. The
+        result of L{getDecodableAttributes}/L{applyAttributes} only depends on
+        the attribute names, so this is worked out once and cached. The cache
+        is emptied once it holds L{MAX_DECODE_PLANS} plans.
+
+        The plan is a tuple of C{(mode, slots)}. C{mode} is one of C{'dict'}
+        (store into C{obj.__dict__}), C{'item'} (C{obj[name] = value}) or
+        C{'attr'} (C{setattr}). C{slots} has an entry for each of
+        C{static_properties}, in order - C{None} if the value is to be
+        discarded, otherwise a tuple of C{(name, is_proxy)}.
+
+        @param static_properties: The list of attribute names in the order
+            that they appear in the stream.
+        @return: The plan or C{None} if the attributes must be applied via
+            L{applyAttributes}.
+        @since: 0.7
+        """
+        if not self._compiled:
+            self.compile()
+
+        key = tuple(static_properties)
+
+        try:
+            return self._decode_plans[key]
+        except KeyError:
+            pass
+
+        plan = self._compile_decode_plan(key)
+
+        if len(self._decode_plans) >= MAX_DECODE_PLANS:
+            self._decode_plans = {}
+
+        self._decode_plans[key] = plan
+
+        return plan
+
+    def _compile_decode_plan(self, static_properties):
+        """
+        Mirrors L{getDecodableAttributes} and L{applyAttributes} for a known
+        set of attribute names.
+
+        @see: L{getDecodePlan}
+        """
+        klass = self.__class__
+
+        if (klass.applyAttributes.im_func is not
+                ClassAlias.applyAttributes.im_func):
+            return None
+
+        if (klass.getDecodableAttributes.im_func is not
+                ClassAlias.getDecodableAttributes.im_func):
+            return None
+
+        if self.external:
+            return None
+
+        if len(set(static_properties)) != len(static_properties):
+            return None
+
+        mode = 'attr'
+
+        if hasattr(self.klass, '__setitem__'):
+            mode = 'item'
+
+        # name -> index into static_properties
+        attrs = {}
+
+        for i, name in enumerate(static_properties):
+            attrs[name] = i
+
+        proxied = ()
+
+        if self.shortcut_decode:
+            if self.is_dict:
+                mode = 'item'
+            elif not self.sealed:
+                mode = 'dict'
+        else:
+            props = set(static_properties)
+
+            if self.static_attrs:
+                if self.static_attrs_set.difference(props):
+                    # let getDecodableAttributes raise the error
+                    return None
+
+                props.difference_update(self.static_attrs)
+
+            if props:
+                attrs = self._filter_decode_plan(attrs, props)
+
+                if attrs is None:
+                    return None
+
+                if self.proxy_attrs is not None:
+                    proxied = self.proxy_attrs
+
+        slots = [None] * len(static_properties)
+
+        for name, i in attrs.iteritems():
+            slots[i] = (name, static_properties[i] in proxied)
+
+        return mode, tuple(slots)
+
+    def _filter_decode_plan(self, attrs, props):
+        changed = False
+
+        if not self.dynamic:
+            if not self.decodable_properties:
+                props = set()
+            else:
+                props.intersection_update(self.decodable_properties)
+
+            changed = True
+
+        if self.readonly_attrs:
+            props.difference_update(self.readonly_attrs)
+            changed = True
+
+        if self.exclude_attrs:
+            props.difference_update(self.exclude_attrs)
+            changed = True
+
+        if self.synonym_attrs:
+            for k, v in self.synonym_attrs.iteritems():
+                if k not in attrs:
+                    continue
+
+                attrs[v] = attrs.pop(k)
+
+        if not changed:
+            return attrs
+
+        a = {}
+
+        for p in props:
+            if p not in attrs:
+                return None
+
+            a[p] = attrs[p]
+
+        return a
+
     def getCustomProperties(self):
         """
         Overrride this to provide known static properties based on the aliased
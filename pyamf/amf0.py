@@ -19,7 +19,7 @@ LocalConnection, SharedObjects and other classes in the Adobe Flash Player.
 import datetime
 
 import pyamf
-from pyamf import util, codec, xml, python
+from pyamf import util, codec, xml, python, amf3
 
 
 #: Represented as 9 bytes: 1 byte for C{0x00} and 8 bytes a double
@@ -89,6 +89,12 @@ TYPE_TYPEDOBJECT = '\x10'
 #: reaches it's logical conclusion (for example, an object has no more keys).
 TYPE_AMF3        = '\x11'
 
+# frame types used by L{Scanner}
+_SCAN_VALUE = 0
+_SCAN_OBJECT = 1
+_SCAN_DENSE = 2
+_SCAN_AMF3 = 3
+
 
 class Context(codec.Context):
     """
@@ -114,7 +120,8 @@ class Context(codec.Context):
             return encoder
 
         encoder = pyamf.get_encoder(pyamf.AMF3, stream=amf0_encoder.stream,
-            timezone_offset=amf0_encoder.timezone_offset)
+            timezone_offset=amf0_encoder.timezone_offset,
+            sink=amf0_encoder.sink)
         self.extra['amf3_encoder'] = encoder
 
         return encoder
@@ -125,17 +132,85 @@ class Context(codec.Context):
         if decoder:
             return decoder
 
+        kwargs = {}
+
+        if getattr(amf0_decoder, 'lazy', False):
+            kwargs['lazy'] = True
+
         decoder = pyamf.get_decoder(pyamf.AMF3, stream=amf0_decoder.stream,
-            timezone_offset=amf0_decoder.timezone_offset)
+            timezone_offset=amf0_decoder.timezone_offset, **kwargs)
         self.extra['amf3_decoder'] = decoder
 
         return decoder
 
+    def getAMF3Context(self):
+        """
+        Returns the context of the AMF3 decoder (or encoder), or C{None} if no
+        AMF3 data has been handled yet.
+
+        @since: 0.7
+        """
+        for key in ('amf3_decoder', 'amf3_encoder'):
+            amf3_codec = self.extra.get(key, None)
+
+            if amf3_codec:
+                return amf3_codec.context
+
+    def checkpoint(self):
+        """
+        @see: L{codec.Context.checkpoint}
+        @since: 0.7
+        """
+        amf3_context = self.getAMF3Context()
+
+        if amf3_context is not None:
+            amf3_context = amf3_context.checkpoint()
+
+        return (codec.Context.checkpoint(self), amf3_context)
+
+    def rollback(self, checkpoint):
+        """
+        @see: L{codec.Context.rollback}
+        @since: 0.7
+        """
+        objects, amf3_checkpoint = checkpoint
+
+        codec.Context.rollback(self, objects)
+
+        amf3_context = self.getAMF3Context()
+
+        if amf3_context is None:
+            return
+
+        if amf3_checkpoint is None:
+            amf3_context.clear()
+        else:
+            amf3_context.rollback(amf3_checkpoint)
+
 class Decoder(codec.Decoder):
     """
     Decodes an AMF0 stream.
+
+    @ivar lazy: Whether embedded AMF3 data is decoded lazily (see
+        L{amf3.LazyProxy}). AMF0 elements are always decoded up front.
+    @type lazy: C{bool}
     """
 
+    encoding = pyamf.AMF0
+
+    def __init__(self, *args, **kwargs):
+        self.lazy = kwargs.pop('lazy', False)
+
+        codec.Decoder.__init__(self, *args, **kwargs)
+
+    def reset(self, *args, **kwargs):
+        """
+        @see: L{codec.Decoder.reset}
+        """
+        self.lazy = kwargs.pop('lazy', False)
+
+        codec.Decoder.reset(self, *args, **kwargs)
+
     def buildContext(self):
         return Context()
 
@@ -378,6 +453,135 @@ class Decoder(codec.Decoder):
         return root
 
 
+class Scanner(codec.Scanner):
+    """
+    Resumable structural scanner for AMF0 streams. AMF3 data embedded in the
+    stream is handed off to an L{amf3.Scanner}, which keeps its own counts.
+    The L{index} records the embedded AMF3 data as a single L{TYPE_AMF3}
+    value.
+
+    @see: L{codec.IncrementalDecoder}
+    @since: 0.7
+    """
+
+    def __init__(self, context=None, index=False):
+        self.amf3 = amf3.Scanner()
+
+        codec.Scanner.__init__(self, context, index)
+
+    def clear(self):
+        self.amf3.clear()
+
+        codec.Scanner.clear(self)
+
+    def reset(self):
+        codec.Scanner.reset(self)
+
+        self.amf3.reset()
+
+        if self.context is not None:
+            self.amf3.context = self.context.getAMF3Context()
+
+    def begin(self):
+        self.frames.append([_SCAN_VALUE])
+
+    def _save(self):
+        return (codec.Scanner._save(self), self.amf3._save())
+
+    def _restore(self, state):
+        codec.Scanner._restore(self, state[0])
+
+        self.amf3._restore(state[1])
+
+    def _step(self, stream):
+        frames = self.frames
+        frame = frames[-1]
+        kind = frame[0]
+
+        if kind == _SCAN_AMF3:
+            ret = self.amf3._run(stream)
+
+            if ret == 1:
+                frames.pop()
+
+            return ret
+        elif kind == _SCAN_DENSE:
+            if frame[1] == 0:
+                frames.pop()
+            else:
+                frame[1] -= 1
+                frames.append([_SCAN_VALUE])
+
+            return 1
+        elif kind == _SCAN_OBJECT:
+            self._skip(stream, stream.read_ushort())
+
+            if stream.read(1) == TYPE_OBJECTTERM:
+                frames.pop()
+            else:
+                stream.seek(-1, 1)
+                frames.append([_SCAN_VALUE])
+
+            return 1
+
+        t = stream.read(1)
+
+        if self.index is not None:
+            self.index.append(t, stream.tell() - 1, len(frames) - 1)
+
+        if t in (TYPE_NULL, TYPE_UNDEFINED, TYPE_UNSUPPORTED):
+            pass
+        elif t == TYPE_NUMBER:
+            self._skip(stream, 8)
+        elif t == TYPE_BOOL:
+            self._skip(stream, 1)
+        elif t == TYPE_STRING:
+            self._skip(stream, stream.read_ushort())
+        elif t == TYPE_LONGSTRING:
+            self._skip(stream, stream.read_ulong())
+        elif t == TYPE_XML:
+            self._skip(stream, stream.read_ulong())
+            self.objects += 1
+        elif t == TYPE_REFERENCE:
+            self._skip(stream, 2)
+        elif t == TYPE_DATE:
+            self._skip(stream, 10)
+            self.objects += 1
+        elif t == TYPE_OBJECT:
+            self.objects += 1
+            frames[-1] = [_SCAN_OBJECT]
+
+            return 1
+        elif t == TYPE_MIXEDARRAY:
+            self._skip(stream, 4)
+            self.objects += 1
+            frames[-1] = [_SCAN_OBJECT]
+
+            return 1
+        elif t == TYPE_TYPEDOBJECT:
+            self._skip(stream, stream.read_ushort())
+            self.objects += 1
+            frames[-1] = [_SCAN_OBJECT]
+
+            return 1
+        elif t == TYPE_ARRAY:
+            self.objects += 1
+            frames[-1] = [_SCAN_DENSE, stream.read_ulong()]
+
+            return 1
+        elif t == TYPE_AMF3:
+            frames[-1] = [_SCAN_AMF3]
+            self.amf3.begin()
+
+            return 1
+        else:
+            return -1
+
+        frames.pop()
+
+        return 1
+
+
 class Encoder(codec.Encoder):
     """
     Encodes an AMF0 stream.
@@ -387,11 +591,21 @@ class Encoder(codec.Encoder):
     @type use_amf3: C{bool}
     """
 
+    encoding = pyamf.AMF0
+
     def __init__(self, *args, **kwargs):
         codec.Encoder.__init__(self, *args, **kwargs)
 
         self.use_amf3 = kwargs.pop('use_amf3', False)
 
+    def reset(self, *args, **kwargs):
+        """
+        @see: L{codec.Encoder.reset}
+        """
+        self.use_amf3 = kwargs.pop('use_amf3', False)
+
+        codec.Encoder.reset(self, *args, **kwargs)
+
     def buildContext(self):
         return Context()
 
@@ -429,6 +643,29 @@ class Encoder(codec.Encoder):
         """
         self.writeType(TYPE_NULL)
 
+    def writeRawAMF(self, raw):
+        """
+        Writes pre-encoded data to the stream. AMF3 data is written in the
+        same way as any other AMF3 element.
+
+        @type raw: L{pyamf.RawAMF}
+        @since: 0.7
+        """
+        if raw.encoding == pyamf.AMF3:
+            self.writeAMF3(raw)
+
+            return
+
+        self.stream.write(raw.bytes)
+
+        objects, amf3_references = raw.references
+
+        self.context.reserve(objects)
+
+        if amf3_references:
+            amf3_encoder = self.context.getAMF3Encoder(self)
+            amf3_encoder.context.reserve(*amf3_references)
+
     def writeList(self, a):
         """
         Write array to the stream.
@@ -446,6 +683,23 @@ class Encoder(codec.Encoder):
         for data in a:
             self.writeElement(data)
 
+    def writeNumericArray(self, a):
+        """
+        @see: L{codec.Encoder.writeNumericArray}
+        """
+        if self.writeReference(a) != -1:
+            return
+
+        self.context.addObject(a)
+
+        self.writeType(TYPE_ARRAY)
+        self.stream.write_ulong(len(a))
+
+        self._writeNumericBlocks(a, self._writeNumbers)
+
+    def _writeNumbers(self, block):
+        self.stream.write(codec.pack_numbers(TYPE_NUMBER, block))
+
     def writeNumber(self, n):
         """
         Write number to the data stream .
@@ -596,6 +850,29 @@ class Encoder(codec.Encoder):
             self.writeType(TYPE_TYPEDOBJECT)
             self.serialiseString(alias.alias)
 
+        plan = alias.encode_plan
+
+        if plan is not None:
+            static_attrs, sealed_attrs, dynamic = plan
+
+            for key in static_attrs:
+                self.serialiseString(key)
+                self.writeElement(getattr(o, key, pyamf.Undefined))
+
+            for key in sealed_attrs:
+                self.serialiseString(key)
+                self.writeElement(getattr(o, key))
+
+            if dynamic:
+                attrs = alias.getDynamicAttributes(o, codec=self)
+
+                if attrs:
+                    self._writeDict(attrs)
+
+            self._writeEndObject()
+
+            return
+
         attrs = alias.getEncodableAttributes(o, codec=self)
 
         if alias.static_attrs and attrs:
@@ -657,6 +934,40 @@ class Encoder(codec.Encoder):
         self.context.getAMF3Encoder(self).writeElement(data)
 
 
+class RawContext(Context):
+    """
+    A context that never finds a reference, used by L{RawEncoder}.
+
+    @since: 0.7
+    """
+
+    def getObjectReference(self, obj):
+        return -1
+
+    def getAMF3Encoder(self, amf0_encoder):
+        encoder = self.extra.get('amf3_encoder', None)
+
+        if encoder:
+            return encoder
+
+        encoder = amf3.RawEncoder(stream=amf0_encoder.stream,
+            timezone_offset=amf0_encoder.timezone_offset)
+        self.extra['amf3_encoder'] = encoder
+
+        return encoder
+
+
+class RawEncoder(codec.RawEncoderMixIn, Encoder):
+    """
+    Encodes the self contained AMF0 data for L{pyamf.encode_raw}.
+
+    @since: 0.7
+    """
+
+    def buildContext(self):
+        return RawContext()
+
+
 class RecordSet(object):
     """
     I represent the C{RecordSet} class used in Adobe Flash Remoting to hold
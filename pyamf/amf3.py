@@ -23,6 +23,10 @@ L{ByteArray} and L{ArrayCollection}.
 
 import datetime
 import zlib
+import array
+import sys
+import weakref
+import UserDict
 
 import pyamf
 from pyamf import codec, util, xml, python
@@ -30,6 +34,14 @@ from pyamf import codec, util, xml, python
 
 __all__ = [
     'ByteArray',
+    'IntVector',
+    'UintVector',
+    'DoubleVector',
+    'ObjectVector',
+    'Dictionary',
+    'LazyProxy',
+    'register_dictionary_type',
+    'unregister_dictionary_type',
     'Context',
     'Encoder',
     'Decoder',
@@ -108,6 +120,30 @@ TYPE_XMLSTRING = '\x0B'
 #: @see: U{Parsing ByteArrays on OSFlash (external)
 #: <http://osflash.org/documentation/amf3/parsing_byte_arrays>}
 TYPE_BYTEARRAY = '\x0C'
+#: Flash Player 10 introduced typed arrays, C{Vector.<int>} is a vector of
+#: 32 bit signed integers. After the length (or reference) and a byte that
+#: flags a fixed length vector, the items are written as 4 byte big endian
+#: values.
+#: @see: L{IntVector}
+TYPE_VECTOR_INT = '\x0D'
+#: C{Vector.<uint>}, encoded as L{TYPE_VECTOR_INT} but the items are
+#: unsigned.
+#: @see: L{UintVector}
+TYPE_VECTOR_UINT = '\x0E'
+#: C{Vector.<Number>}, encoded as L{TYPE_VECTOR_INT} but the items are
+#: 8 byte big endian floats.
+#: @see: L{DoubleVector}
+TYPE_VECTOR_DOUBLE = '\x0F'
+#: C{Vector.<Object>} (or a vector of any other class). After the fixed
+#: length flag comes the name of the item type, followed by the items as AMF3
+#: values.
+#: @see: L{ObjectVector}
+TYPE_VECTOR_OBJECT = '\x10'
+#: A C{flash.utils.Dictionary}, a map that can have any value (including
+#: objects) as keys. After the length (or reference) and a byte that flags
+#: C{weakKeys}, the key/value pairs are written as AMF3 values.
+#: @see: L{Dictionary}
+TYPE_DICTIONARY = '\x11'
 
 #: Reference bit.
 REFERENCE_BIT = 0x01
@@ -122,6 +158,31 @@ MIN_29B_INT = -0x10000000
 
 ENCODED_INT_CACHE = {}
 
+#: Numeric vector items are big endian, swap them on little endian machines.
+SWAP_VECTOR_ITEMS = sys.byteorder == 'little'
+
+# frame types used by L{Scanner}
+_SCAN_VALUE = 0
+_SCAN_ASSOC = 1
+_SCAN_DENSE = 2
+_SCAN_OBJECT = 3
+
+#: The elements that take an object reference, mapped to the L{Decoder}
+#: method that reads them. These are decoded lazily if requested.
+_LAZY_READERS = {
+    TYPE_ARRAY: 'readArray',
+    TYPE_OBJECT: 'readObject',
+    TYPE_DATE: 'readDate',
+    TYPE_XML: 'readXML',
+    TYPE_XMLSTRING: 'readXMLString',
+    TYPE_BYTEARRAY: 'readByteArray',
+    TYPE_VECTOR_INT: 'readIntVector',
+    TYPE_VECTOR_UINT: 'readUintVector',
+    TYPE_VECTOR_DOUBLE: 'readDoubleVector',
+    TYPE_VECTOR_OBJECT: 'readObjectVector',
+    TYPE_DICTIONARY: 'readDictionary',
+}
+
 
 class ObjectEncoding:
     """
@@ -552,6 +613,376 @@ class ByteArray(util.BufferedByteStream, DataInput, DataOutput):
         self.compressed = True
 
 
+class _NumericVector(array.array):
+    """
+    Base class for the numeric AMF3 vectors, an C{array.array} of a fixed
+    item type. The items are read and written in bulk.
+
+    @ivar fixed: Whether the vector has a fixed length.
+    @type fixed: C{bool}
+    @since: 0.7
+    """
+
+    #: The C{array.array} typecode of the items.
+    item_type = None
+
+    def __new__(cls, items=(), fixed=False):
+        return array.array.__new__(cls, cls.item_type, items)
+
+    def __init__(self, items=(), fixed=False):
+        self.fixed = fixed
+
+    def __reduce__(self):
+        return (self.__class__, (self.tolist(), self.fixed))
+
+    def __repr__(self):
+        return '%s(%r, fixed=%r)' % (self.__class__.__name__,
+            self.tolist(), self.fixed)
+
+
+class IntVector(_NumericVector):
+    """
+    A C{Vector.<int>} of 32 bit signed integers.
+
+    @see: U{Vector on Adobe Help (external)
+    <http://help.adobe.com/en_US/FlashPlatform/reference/actionscript/3/Vector.html>}
+    @since: 0.7
+    """
+
+    item_type = 'i'
+    _marker = TYPE_VECTOR_INT
+
+
+class UintVector(_NumericVector):
+    """
+    A C{Vector.<uint>} of 32 bit unsigned integers.
+
+    @since: 0.7
+    """
+
+    item_type = 'I'
+    _marker = TYPE_VECTOR_UINT
+
+
+class DoubleVector(_NumericVector):
+    """
+    A C{Vector.<Number>} of 64 bit floats.
+
+    @since: 0.7
+    """
+
+    item_type = 'd'
+    _marker = TYPE_VECTOR_DOUBLE
+
+
+class ObjectVector(list):
+    """
+    A C{Vector.<Object>}, or a vector of any other class.
+
+    @ivar fixed: Whether the vector has a fixed length.
+    @type fixed: C{bool}
+    @ivar classname: The (aliased) name of the item type, e.g. C{'String'}. The
+        empty string is used for C{Vector.<Object>}.
+    @type classname: C{str}
+    @since: 0.7
+    """
+
+    _marker = TYPE_VECTOR_OBJECT
+
+    def __init__(self, items=(), fixed=False, classname=''):
+        list.__init__(self, items)
+
+        self.fixed = fixed
+        self.classname = classname
+
+    def __repr__(self):
+        return 'ObjectVector(%s, fixed=%r, classname=%r)' % (
+            list.__repr__(self), self.fixed, self.classname)
+
+
+class _IdentityKey(object):
+    """
+    Stands in for an unhashable key in a L{Dictionary}, comparing by
+    identity.
+    """
+
+    __slots__ = ('id',)
+
+    def __init__(self, obj):
+        self.id = id(obj)
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __eq__(self, other):
+        return type(other) is _IdentityKey and other.id == self.id
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+
+class Dictionary(UserDict.DictMixin, object):
+    """
+    A C{flash.utils.Dictionary}. Unlike a C{dict}, any object can be used as
+    a key - unhashable keys (e.g. a C{list} or an anonymous object decoded as
+    a C{dict}) are stored as is and compared by identity.
+
+    If C{weak_keys} is set then keys that support weak references are not
+    kept alive by the dictionary, the entry is removed when the key is
+    garbage collected. Decoded dictionaries only carry the flag (to encode it
+    again), their keys are kept alive (see L{hold}).
+
+    @ivar weak_keys: Corresponds to C{weakKeys} in ActionScript.
+    @type weak_keys: C{bool}
+    @see: U{Dictionary on Adobe Help (external)
+    <http://help.adobe.com/en_US/FlashPlatform/reference/actionscript/3/flash/utils/Dictionary.html>}
+    @since: 0.7
+    """
+
+    __hash__ = None
+
+    def __init__(self, items=(), weak_keys=False):
+        self.weak_keys = weak_keys
+        self._data = {}
+
+        if hasattr(items, 'iteritems'):
+            items = items.iteritems()
+
+        for key, value in items:
+            self[key] = value
+
+    def _token(self, key):
+        try:
+            hash(key)
+        except TypeError:
+            return _IdentityKey(key)
+
+        if self.weak_keys:
+            try:
+                return weakref.ref(key)
+            except TypeError:
+                pass
+
+        return key
+
+    def _remover(self, token):
+        selfref = weakref.ref(self)
+
+        def remove(ref):
+            d = selfref()
+
+            if d is not None:
+                d._data.pop(token, None)
+
+        return remove
+
+    def __getitem__(self, key):
+        try:
+            return self._data[self._token(key)][1]
+        except KeyError:
+            raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        token = self._token(key)
+
+        if self.weak_keys:
+            try:
+                ref = weakref.ref(key, self._remover(token))
+            except TypeError:
+                pass
+            else:
+                self._data[token] = (ref, value, True)
+
+                return
+
+        self._data[token] = (key, value, False)
+
+    def hold(self, key, value):
+        """
+        Sets C{key} to C{value}, keeping C{key} alive whatever L{weak_keys}.
+        The decoders store keys this way as nothing else refers to them.
+        """
+        self._data[self._token(key)] = (key, value, False)
+
+    def __delitem__(self, key):
+        try:
+            del self._data[self._token(key)]
+        except KeyError:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self._token(key) in self._data
+
+    has_key = __contains__
+
+    def __len__(self):
+        return len(self._data)
+
+    def iteritems(self):
+        for key, value, weak in self._data.values():
+            if weak:
+                key = key()
+
+                if key is None:
+                    continue
+
+            yield key, value
+
+    def __iter__(self):
+        for key, value in self.iteritems():
+            yield key
+
+    iterkeys = __iter__
+
+    def keys(self):
+        return list(self.iterkeys())
+
+    def __eq__(self, other):
+        if not hasattr(other, 'iteritems'):
+            return NotImplemented
+
+        try:
+            if len(self) != len(other):
+                return False
+
+            for key, value in self.iteritems():
+                if key not in other or other[key] != value:
+                    return False
+        except TypeError:
+            return False
+
+        return True
+
+    def __ne__(self, other):
+        ret = self.__eq__(other)
+
+        if ret is NotImplemented:
+            return ret
+
+        return not ret
+
+    def __repr__(self):
+        return 'Dictionary({%s}, weak_keys=%r)' % (', '.join([
+            '%r: %r' % x for x in self.iteritems()]), self.weak_keys)
+
+
+#: Python mapping types that are encoded as a L{Dictionary}. Use
+#: L{register_dictionary_type} to add to this list.
+DICTIONARY_TYPES = [Dictionary]
+
+
+def register_dictionary_type(klass):
+    """
+    Encode instances of the mapping type C{klass} as an AMF3 L{Dictionary}.
+    The items are written straight from C{klass.iteritems}. A C{weak_keys}
+    attribute on the instance is honoured.
+
+    @raise TypeError: C{klass} is not a class.
+    @since: 0.7
+    """
+    if not isinstance(klass, python.class_types):
+        raise TypeError('class type expected (got %r)' % (klass,))
+
+    if klass not in DICTIONARY_TYPES:
+        DICTIONARY_TYPES.append(klass)
+        pyamf._bump_type_generation()
+
+
+def unregister_dictionary_type(klass):
+    """
+    Reverses L{register_dictionary_type}.
+
+    @raise KeyError: C{klass} is not registered.
+    @since: 0.7
+    """
+    if klass not in DICTIONARY_TYPES:
+        raise KeyError(klass)
+
+    DICTIONARY_TYPES.remove(klass)
+    pyamf._bump_type_generation()
+
+
+class LazyProxy(object):
+    """
+    Stands in for an array or object read by a L{Decoder} in lazy mode. The
+    members are only decoded when the proxy is first used (attribute, item or
+    iteration access), any arrays or objects amongst them are proxied in turn
+    so untouched parts of the stream are never decoded.
+
+    @since: 0.7
+    """
+
+    __slots__ = ('_deferred', '_obj')
+
+    def __init__(self, deferred):
+        object.__setattr__(self, '_deferred', deferred)
+        object.__setattr__(self, '_obj', None)
+
+    def materialize(self):
+        """
+        Decodes (once) and returns the proxied array or object.
+        """
+        obj = self._obj
+
+        if obj is None:
+            obj = self._deferred.session.replay(self._deferred)
+            object.__setattr__(self, '_obj', obj)
+
+        return obj
+
+    @property
+    def materialized(self):
+        """
+        Whether the members of the proxied object have been decoded.
+        """
+        return self._obj is not None
+
+    def __getattr__(self, name):
+        return getattr(self.materialize(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.materialize(), name, value)
+
+    def __delattr__(self, name):
+        delattr(self.materialize(), name)
+
+    def __getitem__(self, key):
+        return self.materialize()[key]
+
+    def __setitem__(self, key, value):
+        self.materialize()[key] = value
+
+    def __delitem__(self, key):
+        del self.materialize()[key]
+
+    def __len__(self):
+        return len(self.materialize())
+
+    def __iter__(self):
+        return iter(self.materialize())
+
+    def __contains__(self, item):
+        return item in self.materialize()
+
+    def __nonzero__(self):
+        return bool(self.materialize())
+
+    def __eq__(self, other):
+        if isinstance(other, LazyProxy):
+            other = other.materialize()
+
+        return self.materialize() == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __repr__(self):
+        if self._obj is None:
+            return '<LazyProxy at 0x%x (not materialized)>' % (id(self),)
+
+        return '<LazyProxy %r>' % (self._obj,)
+
+
 class ClassDefinition(object):
     """
     This is an internal class used by L{Encoder}/L{Decoder} to hold details
@@ -561,6 +992,7 @@ class ClassDefinition(object):
     def __init__(self, alias):
         self.alias = alias
         self.reference = None
+        self.decode_plan = None
 
         alias.compile()
 
@@ -694,6 +1126,45 @@ class Context(codec.Context):
 
         return ref
 
+    def checkpoint(self):
+        """
+        @see: L{codec.Context.checkpoint}
+        @since: 0.7
+        """
+        return (codec.Context.checkpoint(self), len(self.strings),
+            self.class_idx)
+
+    def rollback(self, checkpoint):
+        """
+        @see: L{codec.Context.rollback}
+        @since: 0.7
+        """
+        objects, strings, class_idx = checkpoint
+
+        codec.Context.rollback(self, objects)
+        self.strings.truncate(strings)
+
+        for ref in xrange(class_idx, self.class_idx):
+            self.class_ref.pop(ref, None)
+
+        for klass, class_def in self.classes.items():
+            if class_def.reference >= class_idx:
+                del self.classes[klass]
+
+        self.class_idx = class_idx
+
+    def reserve(self, objects, strings=0, traits=0):
+        """
+        @see: L{codec.Context.reserve}
+        @since: 0.7
+        """
+        codec.Context.reserve(self, objects)
+
+        for i in xrange(strings):
+            self.strings.append(None)
+
+        self.class_idx += traits
+
     def getObjectForProxy(self, proxy):
         """
         Returns the unproxied version of C{proxy} as stored in the context, or
@@ -743,20 +1214,153 @@ class Context(codec.Context):
         return proxied
 
 
+class _Deferred(object):
+    """
+    An entry in the object reference table for an element that was skipped
+    by a lazy L{Decoder}.
+
+    @ivar start: The offset of the type marker of the element.
+    @ivar end: The offset just past the element.
+    @ivar slot: The object reference of the element.
+    @ivar next_slot: The first object reference after the element (and all of
+        the elements it contains).
+    @ivar value: The decoded element (or its L{LazyProxy}).
+    """
+
+    __slots__ = ('session', 'type', 'start', 'end', 'slot', 'next_slot',
+        'value')
+
+    def __init__(self, session, type, start, slot):
+        self.session = session
+        self.type = type
+        self.start = start
+        self.slot = slot
+
+        self.end = None
+        self.next_slot = None
+        self.value = None
+
+
+class _ReplayContext(Context):
+    """
+    The context used to decode the members of a L{_Deferred} element. The
+    reference tables were completely filled when the element was skipped so
+    any additions are ignored.
+    """
+
+    def __init__(self, session):
+        Context.__init__(self)
+
+        self._objects.list = session.objects
+        self.strings.list = session.strings
+        self.class_ref = session.class_ref
+
+        self.deferred = None
+
+    def addObject(self, obj):
+        deferred = self.deferred
+
+        if deferred.value is None:
+            deferred.value = obj
+
+        return deferred.slot
+
+    def addString(self, s):
+        return -1
+
+    def addClass(self, alias, klass):
+        return -1
+
+
+class _LazySession(object):
+    """
+    The reference tables (and stream) that the L{_Deferred} elements read by
+    a lazy L{Decoder} refer to. They outlive the decoder context being
+    cleared.
+    """
+
+    def __init__(self, decoder):
+        context = decoder.context
+
+        self.stream = decoder.stream
+        self.objects = context._objects.list
+        self.strings = context.strings.list
+        self.class_ref = context.class_ref
+
+        self.strict = decoder.strict
+        self.timezone_offset = decoder.timezone_offset
+        self.use_proxies = decoder.use_proxies
+
+        self.decoder = None
+
+    def replay(self, deferred):
+        """
+        Decodes C{deferred} from the stream, returning the result.
+        """
+        decoder = self.decoder
+
+        if decoder is None:
+            decoder = self.decoder = Decoder(self.stream,
+                context=_ReplayContext(self), strict=self.strict,
+                timezone_offset=self.timezone_offset,
+                use_proxies=self.use_proxies, lazy=True)
+
+        stream = self.stream
+        context = decoder.context
+
+        state = (stream.tell(), decoder._replay, context.deferred)
+
+        decoder._replay = [deferred.slot + 1]
+        context.deferred = deferred
+
+        try:
+            stream.seek(deferred.start + 1)
+
+            return getattr(decoder, _LAZY_READERS[deferred.type])()
+        finally:
+            stream.seek(state[0])
+            decoder._replay = state[1]
+            context.deferred = state[2]
+
+
 class Decoder(codec.Decoder):
     """
     Decodes an AMF3 data stream.
     """
 
+    encoding = pyamf.AMF3
+
     def __init__(self, *args, **kwargs):
         self.use_proxies = kwargs.pop('use_proxies', use_proxies_default)
+        self.lazy = kwargs.pop('lazy', False)
+
+        self._session = None
+        self._replay = None
 
         codec.Decoder.__init__(self, *args, **kwargs)
 
+    def reset(self, *args, **kwargs):
+        """
+        @see: L{codec.Decoder.reset}
+        """
+        self.use_proxies = kwargs.pop('use_proxies', use_proxies_default)
+        lazy = kwargs.pop('lazy', False)
+
+        self._session = None
+
+        codec.Decoder.reset(self, *args, **kwargs)
+
+        if lazy != self.lazy:
+            self.lazy = lazy
+            self._func_cache = {}
+
     def buildContext(self):
         return Context()
 
     def getTypeFunc(self, data):
+        if self.lazy and data in _LAZY_READERS:
+            return self._readLazy
+
         if data == TYPE_UNDEFINED:
             return self.readUndefined
         elif data == TYPE_NULL:
@@ -783,6 +1387,16 @@ class Decoder(codec.Decoder):
             return self.readXMLString
         elif data == TYPE_BYTEARRAY:
             return self.readByteArray
+        elif data == TYPE_VECTOR_INT:
+            return self.readIntVector
+        elif data == TYPE_VECTOR_UINT:
+            return self.readUintVector
+        elif data == TYPE_VECTOR_DOUBLE:
+            return self.readDoubleVector
+        elif data == TYPE_VECTOR_OBJECT:
+            return self.readObjectVector
+        elif data == TYPE_DICTIONARY:
+            return self.readDictionary
 
     def readProxy(self, obj):
         """
@@ -982,6 +1596,10 @@ class Decoder(codec.Decoder):
 
                 class_def.static_properties.append(key)
 
+        if class_def.encoding == ObjectEncoding.STATIC:
+            class_def.decode_plan = alias.getDecodePlan(
+                class_def.static_properties)
+
         self.context.addClass(class_def, alias.klass)
 
         return class_def
@@ -997,6 +1615,38 @@ class Decoder(codec.Decoder):
             obj[attr] = self.readElement()
             attr = self.readBytes()
 
+    def _readPlan(self, plan, obj):
+        """
+        Reads the static members of a sealed trait, storing them directly on
+        C{obj} as described by C{plan}.
+
+        @see: L{ClassAlias.getDecodePlan<pyamf.alias.ClassAlias.getDecodePlan>}
+        """
+        mode, slots = plan
+
+        if mode == 'dict':
+            target = obj.__dict__
+        elif mode == 'item':
+            target = obj
+        else:
+            target = None
+
+        for slot in slots:
+            value = self.readElement()
+
+            if slot is None:
+                continue
+
+            name, is_proxy = slot
+
+            if is_proxy:
+                value = self.context.getObjectForProxy(value)
+
+            if target is None:
+                setattr(obj, name, value)
+            else:
+                target[name] = value
+
     def readObject(self):
         """
         Reads an object from the stream.
@@ -1023,7 +1673,6 @@ class Decoder(codec.Decoder):
         alias = class_def.alias
 
         obj = alias.createInstance(codec=self)
-        obj_attrs = dict()
 
         self.context.addObject(obj)
 
@@ -1034,15 +1683,20 @@ class Decoder(codec.Decoder):
                 obj = self.readProxy(obj)
 
             return obj
-        elif class_def.encoding == ObjectEncoding.DYNAMIC:
-            self._readStatic(class_def, obj_attrs)
-            self._readDynamic(class_def, obj_attrs)
-        elif class_def.encoding == ObjectEncoding.STATIC:
-            self._readStatic(class_def, obj_attrs)
+        elif class_def.decode_plan is not None:
+            self._readPlan(class_def.decode_plan, obj)
         else:
-            raise pyamf.DecodeError("Unknown object encoding")
+            obj_attrs = dict()
+
+            if class_def.encoding == ObjectEncoding.DYNAMIC:
+                self._readStatic(class_def, obj_attrs)
+                self._readDynamic(class_def, obj_attrs)
+            elif class_def.encoding == ObjectEncoding.STATIC:
+                self._readStatic(class_def, obj_attrs)
+            else:
+                raise pyamf.DecodeError("Unknown object encoding")
 
-        alias.applyAttributes(obj, obj_attrs, codec=self)
+            alias.applyAttributes(obj, obj_attrs, codec=self)
 
         if self.use_proxies is True:
             obj = self.readProxy(obj)
@@ -1091,13 +1745,19 @@ class Decoder(codec.Decoder):
         if ref & REFERENCE_BIT == 0:
             return self.context.getObject(ref >> 1)
 
-        buffer = self.stream.read(ref >> 1)
+        length = ref >> 1
+
+        if length >= 2 and self.stream.peek(2) == ByteArray._zlib_header:
+            # zlib does not accept the memoryview that read_buffer returns
+            # for a memoryview backed stream
+            buffer = self.stream.read(length)
 
-        if buffer[0:2] == ByteArray._zlib_header:
             try:
                 buffer = zlib.decompress(buffer)
             except zlib.error:
                 pass
+        else:
+            buffer = self.stream.read_buffer(length)
 
         obj = ByteArray(buffer)
 
@@ -1105,33 +1765,518 @@ class Decoder(codec.Decoder):
 
         return obj
 
+    def _readNumericVector(self, klass):
+        ref = self.readInteger(False)
 
-class Encoder(codec.Encoder):
-    """
-    Encodes an AMF3 data stream.
-    """
+        if ref & REFERENCE_BIT == 0:
+            return self.context.getObject(ref >> 1)
 
-    def __init__(self, *args, **kwargs):
-        self.use_proxies = kwargs.pop('use_proxies', use_proxies_default)
-        self.string_references = kwargs.pop('string_references', True)
+        obj = klass(fixed=self.stream.read_uchar() != 0)
+        obj.fromstring(self.stream.read(obj.itemsize * (ref >> 1)))
 
-        codec.Encoder.__init__(self, *args, **kwargs)
+        if SWAP_VECTOR_ITEMS:
+            obj.byteswap()
 
-    def buildContext(self):
-        return Context()
+        self.context.addObject(obj)
 
-    def getTypeFunc(self, data):
+        return obj
+
+    def readIntVector(self):
         """
-        @see: L{codec.Encoder.getTypeFunc}
+        Reads an L{IntVector} from the stream.
+
+        @since: 0.7
         """
-        t = type(data)
+        return self._readNumericVector(IntVector)
 
-        if t in python.int_types:
-            return self.writeInteger
-        elif t is ByteArray:
-            return self.writeByteArray
-        elif t is pyamf.MixedArray:
-            return self.writeDict
+    def readUintVector(self):
+        """
+        Reads a L{UintVector} from the stream.
+
+        @since: 0.7
+        """
+        return self._readNumericVector(UintVector)
+
+    def readDoubleVector(self):
+        """
+        Reads a L{DoubleVector} from the stream.
+
+        @since: 0.7
+        """
+        return self._readNumericVector(DoubleVector)
+
+    def readObjectVector(self):
+        """
+        Reads an L{ObjectVector} from the stream.
+
+        @since: 0.7
+        """
+        ref = self.readInteger(False)
+
+        if ref & REFERENCE_BIT == 0:
+            return self.context.getObject(ref >> 1)
+
+        fixed = self.stream.read_uchar() != 0
+        obj = ObjectVector(fixed=fixed, classname=self.readBytes())
+
+        self.context.addObject(obj)
+
+        obj.extend([self.readElement() for i in xrange(ref >> 1)])
+
+        return obj
+
+    def readDictionary(self):
+        """
+        Reads a L{Dictionary} from the stream.
+
+        @since: 0.7
+        """
+        ref = self.readInteger(False)
+
+        if ref & REFERENCE_BIT == 0:
+            return self.context.getObject(ref >> 1)
+
+        obj = Dictionary(weak_keys=self.stream.read_uchar() != 0)
+
+        self.context.addObject(obj)
+
+        for i in xrange(ref >> 1):
+            key = self.readElement()
+            obj.hold(key, self.readElement())
+
+        return obj
+
+    def _readLazy(self):
+        """
+        Reads an element that is decoded lazily (see L{LazyProxy}). The first
+        time the element is seen it is skipped, recording its position and
+        filling in the reference tables as it goes.
+        """
+        stream = self.stream
+        start = stream.tell() - 1
+        ref = decode_int(stream)
+
+        if ref & REFERENCE_BIT == 0:
+            deferred = self.context.getObject(ref >> 1)
+
+            if deferred is None:
+                raise pyamf.ReferenceError('Unknown reference %d' % (ref >> 1,))
+        elif self._replay is None:
+            stream.seek(start)
+            deferred = self._defer()
+        else:
+            # the members of an element being replayed were already skipped
+            deferred = self.context.getObject(self._replay[0])
+
+            self._replay[0] = deferred.next_slot
+            stream.seek(deferred.end)
+
+        if deferred.value is None:
+            if deferred.type in (TYPE_ARRAY, TYPE_OBJECT):
+                deferred.value = LazyProxy(deferred)
+            else:
+                deferred.session.replay(deferred)
+
+        return deferred.value
+
+    def _getSession(self):
+        session = self._session
+        objects = self.context._objects.list
+
+        if session is None or session.objects is not objects:
+            session = self._session = _LazySession(self)
+
+        return session
+
+    def _defer(self):
+        """
+        Skips the element at the current position of the stream, returning
+        its L{_Deferred} reference table entry.
+        """
+        stream = self.stream
+        deferred = self._skipObject(self._getSession(), stream.tell(),
+            stream.read(1))
+
+        if stream.tell() > len(stream):
+            raise IOError
+
+        return deferred
+
+    def _skipObject(self, session, start, t):
+        """
+        Skips an element that takes an object reference. The type marker
+        C{t} has been read.
+        """
+        stream = self.stream
+        context = self.context
+        ref = decode_int(stream)
+
+        deferred = _Deferred(session, t, start, len(context._objects))
+
+        if t == TYPE_OBJECT:
+            if ref & 0x02:
+                encoding = (ref >> 2) & 0x03
+            else:
+                encoding = context.getClassByReference(ref >> 2).encoding
+
+            if encoding in (ObjectEncoding.EXTERNAL, ObjectEncoding.PROXY):
+                # only the object itself knows how to read its members
+                stream.seek(start + 1)
+                deferred.value = self.readObject()
+
+                context._objects.list[deferred.slot] = deferred
+                deferred.end = stream.tell()
+                deferred.next_slot = len(context._objects)
+
+                return deferred
+
+        context.addObject(deferred)
+
+        n = ref >> 1
+        skip = self._skipElement
+
+        if t == TYPE_ARRAY:
+            while self._skipKey():
+                skip(session)
+
+            for i in xrange(n):
+                skip(session)
+        elif t == TYPE_OBJECT:
+            class_def = self._getClassDefinition(n)
+
+            for i in xrange(class_def.attr_len):
+                skip(session)
+
+            if class_def.encoding == ObjectEncoding.DYNAMIC:
+                while self._skipKey():
+                    skip(session)
+        elif t == TYPE_DATE:
+            stream.seek(8, 1)
+        elif t in (TYPE_XML, TYPE_XMLSTRING, TYPE_BYTEARRAY):
+            stream.seek(n, 1)
+        elif t in (TYPE_VECTOR_INT, TYPE_VECTOR_UINT):
+            stream.seek(1 + 4 * n, 1)
+        elif t == TYPE_VECTOR_DOUBLE:
+            stream.seek(1 + 8 * n, 1)
+        elif t == TYPE_VECTOR_OBJECT:
+            stream.seek(1, 1)
+            self._skipKey()
+
+            for i in xrange(n):
+                skip(session)
+        elif t == TYPE_DICTIONARY:
+            stream.seek(1, 1)
+
+            for i in xrange(n * 2):
+                skip(session)
+
+        deferred.end = stream.tell()
+        deferred.next_slot = len(context._objects)
+
+        return deferred
+
+    def _skipKey(self):
+        """
+        Skips a string (that is not preceded by a type marker), adding it to
+        the reference table. Returns C{False} for the empty string.
+        """
+        ref = decode_int(self.stream)
+
+        if ref == REFERENCE_BIT:
+            return False
+
+        if ref & REFERENCE_BIT:
+            self.context.addString(self.stream.read(ref >> 1))
+
+        return True
+
+    def _skipElement(self, session):
+        """
+        Skips the next element, keeping the reference tables in step.
+        """
+        stream = self.stream
+        t = stream.read(1)
+
+        if t == TYPE_STRING:
+            self._skipKey()
+        elif t == TYPE_INTEGER:
+            decode_int(stream)
+        elif t in _LAZY_READERS:
+            pos = stream.tell()
+
+            if decode_int(stream) & REFERENCE_BIT:
+                stream.seek(pos)
+                self._skipObject(session, pos - 1, t)
+        elif t == TYPE_NUMBER:
+            stream.seek(8, 1)
+        elif t not in (TYPE_UNDEFINED, TYPE_NULL, TYPE_BOOL_FALSE,
+                TYPE_BOOL_TRUE):
+            raise pyamf.DecodeError("Unsupported ActionScript type %s" % (
+                hex(ord(t)),))
+
+
+class Scanner(codec.Scanner):
+    """
+    Resumable structural scanner for AMF3 streams.
+
+    Traits that are defined by earlier elements are looked up in the decoder
+    L{context<Context>}, those defined by the element being scanned are
+    tracked in L{traits}. Without a context, L{traits} holds every trait
+    scanned since L{clear}.
+
+    @ivar traits: C{(encoding, attr_len)} for each trait defined by the element
+        being scanned.
+    @type traits: C{list}
+    @ivar strings: The number of string references created by the scanned
+        data.
+    @type strings: C{int}
+    @see: L{codec.IncrementalDecoder}
+    @since: 0.7
+    """
+
+    def clear(self):
+        self.traits = []
+        self.strings = 0
+
+        codec.Scanner.clear(self)
+
+    def reset(self):
+        codec.Scanner.reset(self)
+
+        if self.context is not None:
+            self.traits = []
+
+        self.class_base = None
+
+    def begin(self):
+        self.frames.append([_SCAN_VALUE])
+
+    def _save(self):
+        return (codec.Scanner._save(self), self.strings, len(self.traits))
+
+    def _restore(self, state):
+        codec.Scanner._restore(self, state[0])
+
+        self.strings = state[1]
+        del self.traits[state[2]:]
+
+    def _skipString(self, stream):
+        """
+        Moves past a string, returning the reference header.
+        """
+        ref = decode_int(stream)
+
+        if ref & REFERENCE_BIT:
+            self._skip(stream, ref >> 1)
+
+            if ref != REFERENCE_BIT:
+                self.strings += 1
+
+        return ref
+
+    def _getTrait(self, ref):
+        if self.class_base is None:
+            # the number of traits known to the decoder before this element
+            self.class_base = 0
+
+            if self.context is not None:
+                while self.context.getClassByReference(
+                        self.class_base) is not None:
+                    self.class_base += 1
+
+        if ref < self.class_base:
+            class_def = self.context.getClassByReference(ref)
+
+            return (class_def.encoding, class_def.attr_len)
+
+        try:
+            return self.traits[ref - self.class_base]
+        except IndexError:
+            return None
+
+    def _scanTraits(self, stream, ref):
+        if ref & REFERENCE_BIT == 0:
+            return self._getTrait(ref >> 1)
+
+        ref >>= 1
+
+        # class name followed by the static attribute names
+        self._skipString(stream)
+        attr_len = ref >> 2
+
+        for i in xrange(attr_len):
+            self._skipString(stream)
+
+        trait = (ref & 0x03, attr_len)
+        self.traits.append(trait)
+
+        return trait
+
+    def _step(self, stream):
+        frames = self.frames
+        frame = frames[-1]
+        kind = frame[0]
+
+        if kind == _SCAN_DENSE:
+            if frame[1] == 0:
+                frames.pop()
+            else:
+                frame[1] -= 1
+                frames.append([_SCAN_VALUE])
+
+            return 1
+        elif kind == _SCAN_OBJECT:
+            if frame[1] > 0:
+                frame[1] -= 1
+                frames.append([_SCAN_VALUE])
+            elif not frame[2] or self._skipString(stream) == REFERENCE_BIT:
+                frames.pop()
+            else:
+                frames.append([_SCAN_VALUE])
+
+            return 1
+        elif kind == _SCAN_ASSOC:
+            if self._skipString(stream) == REFERENCE_BIT:
+                frames[-1] = [_SCAN_DENSE, frame[1]]
+            else:
+                frames.append([_SCAN_VALUE])
+
+            return 1
+
+        t = stream.read(1)
+
+        if self.index is not None:
+            self.index.append(t, stream.tell() - 1, len(frames) - 1)
+
+        if t in (TYPE_UNDEFINED, TYPE_NULL, TYPE_BOOL_FALSE, TYPE_BOOL_TRUE):
+            pass
+        elif t == TYPE_INTEGER:
+            decode_int(stream)
+        elif t == TYPE_NUMBER:
+            self._skip(stream, 8)
+        elif t == TYPE_STRING:
+            self._skipString(stream)
+        elif t in (TYPE_XML, TYPE_XMLSTRING, TYPE_BYTEARRAY):
+            ref = decode_int(stream)
+
+            if ref & REFERENCE_BIT:
+                self._skip(stream, ref >> 1)
+                self.objects += 1
+        elif t == TYPE_DATE:
+            if decode_int(stream) & REFERENCE_BIT:
+                self._skip(stream, 8)
+                self.objects += 1
+        elif t == TYPE_ARRAY:
+            ref = decode_int(stream)
+
+            if ref & REFERENCE_BIT:
+                self.objects += 1
+                frames[-1] = [_SCAN_ASSOC, ref >> 1]
+
+                return 1
+        elif t in (TYPE_VECTOR_INT, TYPE_VECTOR_UINT):
+            ref = decode_int(stream)
+
+            if ref & REFERENCE_BIT:
+                self._skip(stream, 1 + 4 * (ref >> 1))
+                self.objects += 1
+        elif t == TYPE_VECTOR_DOUBLE:
+            ref = decode_int(stream)
+
+            if ref & REFERENCE_BIT:
+                self._skip(stream, 1 + 8 * (ref >> 1))
+                self.objects += 1
+        elif t == TYPE_VECTOR_OBJECT:
+            ref = decode_int(stream)
+
+            if ref & REFERENCE_BIT:
+                self._skip(stream, 1)
+                self._skipString(stream)
+
+                self.objects += 1
+                frames[-1] = [_SCAN_DENSE, ref >> 1]
+
+                return 1
+        elif t == TYPE_DICTIONARY:
+            ref = decode_int(stream)
+
+            if ref & REFERENCE_BIT:
+                self._skip(stream, 1)
+
+                self.objects += 1
+                frames[-1] = [_SCAN_DENSE, ref & ~REFERENCE_BIT]
+
+                return 1
+        elif t == TYPE_OBJECT:
+            ref = decode_int(stream)
+
+            if ref & REFERENCE_BIT:
+                self.objects += 1
+                trait = self._scanTraits(stream, ref >> 1)
+
+                if trait is None:
+                    return -1
+
+                encoding, attr_len = trait
+
+                if encoding in (ObjectEncoding.EXTERNAL, ObjectEncoding.PROXY):
+                    return -1
+
+                frames[-1] = [_SCAN_OBJECT, attr_len,
+                    encoding == ObjectEncoding.DYNAMIC]
+
+                return 1
+        else:
+            return -1
+
+        frames.pop()
+
+        return 1
+
+
+class Encoder(codec.Encoder):
+    """
+    Encodes an AMF3 data stream.
+    """
+
+    encoding = pyamf.AMF3
+
+    def __init__(self, *args, **kwargs):
+        self.use_proxies = kwargs.pop('use_proxies', use_proxies_default)
+        self.string_references = kwargs.pop('string_references', True)
+
+        codec.Encoder.__init__(self, *args, **kwargs)
+
+    def reset(self, *args, **kwargs):
+        """
+        @see: L{codec.Encoder.reset}
+        """
+        self.use_proxies = kwargs.pop('use_proxies', use_proxies_default)
+        self.string_references = kwargs.pop('string_references', True)
+
+        codec.Encoder.reset(self, *args, **kwargs)
+
+    def buildContext(self):
+        return Context()
+
+    def getTypeFunc(self, data):
+        """
+        @see: L{codec.Encoder.getTypeFunc}
+        """
+        t = type(data)
+
+        # the class, not the type, of old style instances (e.g.
+        # weakref.WeakKeyDictionary) is registered
+        if getattr(data, '__class__', t) in DICTIONARY_TYPES:
+            return self.writeDictionary
+        elif t in python.int_types:
+            return self.writeInteger
+        elif t is ByteArray:
+            return self.writeByteArray
+        elif t is pyamf.MixedArray:
+            return self.writeDict
+        elif issubclass(t, (_NumericVector, ObjectVector)):
+            return self.writeVector
 
         return codec.Encoder.getTypeFunc(self, data)
 
@@ -1141,6 +2286,20 @@ class Encoder(codec.Encoder):
         """
         self.stream.write(TYPE_UNDEFINED)
 
+    def writeRawAMF(self, raw):
+        """
+        Writes pre-encoded data to the stream.
+
+        @type raw: L{pyamf.RawAMF}
+        @since: 0.7
+        """
+        if raw.encoding != pyamf.AMF3:
+            raise pyamf.EncodeError('Unable to write AMF%d data to an AMF3 '
+                'stream' % (raw.encoding,))
+
+        self.stream.write(raw.bytes)
+        self.context.reserve(*raw.references)
+
     def writeNull(self, n):
         """
         Writes a C{null} value to the stream.
@@ -1307,6 +2466,48 @@ class Encoder(codec.Encoder):
 
         [self.writeElement(x) for x in n]
 
+    def writeNumericArray(self, a):
+        """
+        @see: L{codec.Encoder.writeNumericArray}
+        """
+        if self.use_proxies:
+            self.writeList(a.tolist())
+
+            return
+
+        self.stream.write(TYPE_ARRAY)
+
+        ref = self.context.getObjectReference(a)
+
+        if ref != -1:
+            self._writeInteger(ref << 1)
+
+            return
+
+        self.context.addObject(a)
+
+        self._writeInteger((len(a) << 1) | REFERENCE_BIT)
+        self.stream.write('\x01')
+
+        if a.typecode in 'fd':
+            self._writeNumericBlocks(a, self._writeNumbers)
+        else:
+            self._writeNumericBlocks(a, self._writeIntegers)
+
+    def _writeNumbers(self, block):
+        self.stream.write(codec.pack_numbers(TYPE_NUMBER, block))
+
+    def _writeIntegers(self, block):
+        lo, hi = min(block), max(block)
+
+        if lo >= MIN_29B_INT and hi <= MAX_29B_INT:
+            self.stream.write(TYPE_INTEGER +
+                TYPE_INTEGER.join(map(encode_int, block)))
+        elif lo > MAX_29B_INT or hi < MIN_29B_INT:
+            self._writeNumbers(block)
+        else:
+            [self.writeInteger(x) for x in block]
+
     def writeDict(self, n):
         """
         Writes a C{dict} to the stream.
@@ -1454,6 +2655,13 @@ class Encoder(codec.Encoder):
 
             return
 
+        plan = alias.encode_plan
+
+        if plan is not None:
+            self._writeObjectPlan(obj, alias, definition, class_ref, plan)
+
+            return
+
         attrs = alias.getEncodableAttributes(obj, codec=self)
 
         if alias.static_attrs:
@@ -1479,6 +2687,104 @@ class Encoder(codec.Encoder):
 
             self.stream.write('\x01')
 
+    def _writeObjectPlan(self, obj, alias, definition, class_ref, plan):
+        """
+        Writes the attributes of C{obj} by following the alias' compiled
+        C{encode_plan}, without building an intermediate C{dict}.
+
+        @since: 0.7
+        """
+        static_attrs, sealed_attrs, dynamic = plan
+
+        if static_attrs:
+            if not class_ref:
+                for attr in static_attrs:
+                    self.serialiseString(attr)
+
+            for attr in static_attrs:
+                self.writeElement(getattr(obj, attr, pyamf.Undefined))
+
+            if definition.encoding == ObjectEncoding.STATIC:
+                return
+
+        if definition.encoding != ObjectEncoding.DYNAMIC:
+            return
+
+        for attr in sealed_attrs:
+            self.serialiseString(attr)
+            self.writeElement(getattr(obj, attr))
+
+        if dynamic:
+            attrs = alias.getDynamicAttributes(obj, codec=self)
+
+            for attr, value in attrs.iteritems():
+                if type(attr) in python.int_types:
+                    attr = str(attr)
+
+                self.serialiseString(attr)
+                self.writeElement(value)
+
+        self.stream.write('\x01')
+
+    def writeVector(self, n):
+        """
+        Writes an L{IntVector}, L{UintVector}, L{DoubleVector} or
+        L{ObjectVector} to the stream.
+
+        @since: 0.7
+        """
+        self.stream.write(n._marker)
+
+        ref = self.context.getObjectReference(n)
+
+        if ref != -1:
+            self._writeInteger(ref << 1)
+
+            return
+
+        self.context.addObject(n)
+
+        self._writeInteger((len(n) << 1) | REFERENCE_BIT)
+        self.stream.write_uchar(int(bool(n.fixed)))
+
+        if isinstance(n, ObjectVector):
+            self.serialiseString(n.classname)
+
+            [self.writeElement(x) for x in n]
+
+            return
+
+        if SWAP_VECTOR_ITEMS:
+            n = array.array(n.item_type, n)
+            n.byteswap()
+
+        self.stream.write(n.tostring())
+
+    def writeDictionary(self, n):
+        """
+        Writes a L{Dictionary} (or a mapping type registered with
+        L{register_dictionary_type}) to the stream.
+
+        @since: 0.7
+        """
+        self.stream.write(TYPE_DICTIONARY)
+
+        ref = self.context.getObjectReference(n)
+
+        if ref != -1:
+            self._writeInteger(ref << 1)
+
+            return
+
+        self.context.addObject(n)
+
+        self._writeInteger((len(n) << 1) | REFERENCE_BIT)
+        self.stream.write_uchar(int(bool(getattr(n, 'weak_keys', False))))
+
+        for key, value in n.iteritems():
+            self.writeElement(key)
+            self.writeElement(value)
+
     def writeByteArray(self, n):
         """
         Writes a L{ByteArray} to the data stream.
@@ -1522,6 +2828,34 @@ class Encoder(codec.Encoder):
         self.serialiseString(xml.tostring(n).encode('utf-8'))
 
 
+class RawContext(Context):
+    """
+    A context that never finds a reference, used by L{RawEncoder}.
+
+    @since: 0.7
+    """
+
+    def getObjectReference(self, obj):
+        return -1
+
+    def getStringReference(self, s):
+        return -1
+
+    def getClass(self, klass):
+        return None
+
+
+class RawEncoder(codec.RawEncoderMixIn, Encoder):
+    """
+    Encodes the self contained AMF3 data for L{pyamf.encode_raw}.
+
+    @since: 0.7
+    """
+
+    def buildContext(self):
+        return RawContext()
+
+
 def encode_int(n):
     """
     Encodes an int as a variable length signed 29-bit integer as defined by
@@ -1603,3 +2937,4 @@ def decode_int(stream, signed=False):
 
 
 pyamf.register_class(ByteArray)
+pyamf.add_type(LazyProxy, lambda proxy, encoder: proxy.materialize())
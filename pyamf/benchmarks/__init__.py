@@ -0,0 +1,407 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Codec throughput benchmarks.
+
+Runs the workloads in L{pyamf.benchmarks.workloads} against the pure python
+codecs and the C{cpyamf} extensions and reports the operations per second,
+megabytes per second and allocations of each operation. Results can be saved
+as JSON so that two runs (e.g. before and after a change) can be compared::
+
+    python -m pyamf.benchmarks -o before.json
+    python -m pyamf.benchmarks -o after.json
+    python -m pyamf.benchmarks --compare before.json after.json
+
+Each implementation is measured in a separate interpreter so that the pure
+python run cannot pick up any of the C{cpyamf} extensions.
+
+@since: 0.7
+"""
+
+import gc
+import os.path
+import platform
+import subprocess
+import sys
+import timeit
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+import pyamf
+
+
+#: The implementations that can be benchmarked.
+IMPLEMENTATIONS = ('pure', 'cpyamf')
+
+#: The operations measured for each workload.
+OPERATIONS = ('encode', 'decode')
+
+#: Bumped when the layout of the saved results changes.
+RESULTS_VERSION = 1
+
+#: The code run by the child interpreter for each implementation. C{cpyamf}
+#: is blocked for the pure python run before C{pyamf} is first imported.
+_CHILD = """
+import sys
+if sys.argv[1] == 'pure':
+    sys.modules['cpyamf'] = None
+from pyamf import benchmarks
+benchmarks._child(sys.argv[1:])
+"""
+
+#: The directory that C{pyamf} (and C{cpyamf}) are imported from, resolved
+#: at import time as C{pyamf.__file__} may be relative to the working
+#: directory.
+_PYAMF_DIR = os.path.dirname(os.path.dirname(os.path.abspath(
+    pyamf.__file__)))
+
+
+def get_implementation():
+    """
+    Returns the name of the implementation used by this interpreter, one of
+    L{IMPLEMENTATIONS}.
+    """
+    try:
+        from cpyamf import amf3
+    except ImportError:
+        return 'pure'
+
+    return 'cpyamf'
+
+
+def measure(func, min_time=0.2, repeat=3):
+    """
+    Times C{func} and counts the objects it allocates.
+
+    The number of calls is doubled until a batch takes at least C{min_time}
+    seconds and the best of C{repeat} batches is used.
+
+    Allocations are read from the counter of the youngest garbage collector
+    generation, which goes up for each container object (lists, dicts,
+    instances, ...) created and down for each one freed. The result of
+    C{func} is kept alive while counting, so the figure is the number of
+    those objects that a single call creates and returns (or leaves
+    behind). Temporaries freed before C{func} returns, strings, numbers and
+    objects that the interpreter reuses from its free lists are not counted.
+
+    @return: A C{tuple} of the operations per second and the number of
+        garbage collected objects allocated by a single call.
+    """
+    func()
+
+    number = 1
+    timer = timeit.default_timer
+
+    while True:
+        start = timer()
+
+        for i in xrange(number):
+            func()
+
+        elapsed = timer() - start
+
+        if elapsed >= min_time:
+            break
+
+        number *= 2
+
+    best = elapsed
+
+    for i in xrange(repeat - 1):
+        start = timer()
+
+        for i in xrange(number):
+            func()
+
+        best = min(best, timer() - start)
+
+    enabled = gc.isenabled()
+    gc.collect()
+    gc.disable()
+
+    try:
+        before = gc.get_count()[0]
+        result = func()
+        allocations = gc.get_count()[0] - before
+
+        del result
+    finally:
+        if enabled:
+            gc.enable()
+
+    return number / max(best, 1e-9), allocations
+
+
+def run_workload(workload, min_time=0.2, repeat=3):
+    """
+    Benchmarks each of the L{OPERATIONS} of C{workload} with the codecs of
+    this interpreter.
+
+    @type workload: L{workloads.Workload}
+    @return: A C{list} of result C{dict}s.
+    """
+    implementation = get_implementation()
+    data = workload.setup()
+    encoded = workload.encode(data)
+    size = len(encoded)
+
+    results = []
+
+    for operation in OPERATIONS:
+        if operation == 'encode':
+            func = lambda: workload.encode(data)
+        else:
+            func = lambda: workload.decode(encoded)
+
+        ops, allocations = measure(func, min_time, repeat)
+
+        results.append({
+            'implementation': implementation,
+            'workload': workload.name,
+            'operation': operation,
+            'bytes': size,
+            'ops_per_sec': ops,
+            'mb_per_sec': ops * size / 1e6,
+            'allocations': allocations
+        })
+
+    return results
+
+
+def get_workloads(names=None):
+    """
+    Returns the registered workloads, optionally limited to C{names}.
+
+    @raise ValueError: Unknown workload name.
+    """
+    from pyamf.benchmarks import workloads
+
+    if not names:
+        return list(workloads.WORKLOADS)
+
+    lookup = dict([(w.name, w) for w in workloads.WORKLOADS])
+    ret = []
+
+    for name in names:
+        try:
+            ret.append(lookup[name])
+        except KeyError:
+            raise ValueError('Unknown workload %r' % (name,))
+
+    return ret
+
+
+def run(implementations=IMPLEMENTATIONS, names=None, min_time=0.2,
+        repeat=3):
+    """
+    Runs the benchmarks for each of C{implementations}, each in its own
+    interpreter. Implementations that are not available (e.g. C{cpyamf} has
+    not been built) are skipped.
+
+    @param names: The names of the workloads to run, all of them by default.
+    @return: The results, suitable for L{save}.
+    """
+    get_workloads(names)
+
+    results = []
+
+    for implementation in implementations:
+        if implementation not in IMPLEMENTATIONS:
+            raise ValueError('Unknown implementation %r' % (implementation,))
+
+        args = [sys.executable, '-c', _CHILD, implementation,
+            repr(min_time), repr(repeat)] + list(names or [])
+
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(
+            [_PYAMF_DIR] + [p for p in [env.get('PYTHONPATH')] if p])
+
+        p = subprocess.Popen(args, stdout=subprocess.PIPE, env=env)
+        output = p.communicate()[0]
+
+        if p.returncode != 0:
+            raise RuntimeError('Benchmark of %r failed (exit status %d)' % (
+                implementation, p.returncode))
+
+        child = json.loads(output)
+
+        if child['implementation'] != implementation:
+            # cpyamf is not available in this environment
+            continue
+
+        results.extend(child['results'])
+
+    return {
+        'version': RESULTS_VERSION,
+        'pyamf': str(pyamf.version),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results
+    }
+
+
+def _child(argv):
+    """
+    Entry point of the interpreters started by L{run}. Writes the results of
+    this implementation to stdout as JSON.
+    """
+    min_time, repeat = float(argv[1]), int(argv[2])
+    results = []
+
+    for workload in get_workloads(argv[3:]):
+        results.extend(run_workload(workload, min_time, repeat))
+
+    json.dump({
+        'implementation': get_implementation(),
+        'results': results
+    }, sys.stdout)
+
+
+def save(results, filename):
+    """
+    Writes C{results} from L{run} to C{filename} as JSON.
+    """
+    fp = open(filename, 'wb')
+
+    try:
+        json.dump(results, fp, indent=2, sort_keys=True)
+    finally:
+        fp.close()
+
+
+def load(filename):
+    """
+    Reads results previously written by L{save}.
+
+    @raise ValueError: The results were saved in an unsupported format.
+    """
+    fp = open(filename, 'rb')
+
+    try:
+        results = json.load(fp)
+    finally:
+        fp.close()
+
+    if results.get('version') != RESULTS_VERSION:
+        raise ValueError('Unsupported results version %r' % (
+            results.get('version'),))
+
+    return results
+
+
+def _key(result):
+    return (result['workload'], result['operation'],
+        result['implementation'])
+
+
+def compare(old, new):
+    """
+    Compares two sets of results.
+
+    @return: A sorted C{list} of C{(workload, operation, implementation,
+        old ops/s, new ops/s, speedup)} for each benchmark that is in both
+        C{old} and C{new}. A speedup above 1.0 means C{new} is faster.
+    """
+    before = dict([(_key(r), r) for r in old['results']])
+    ret = []
+
+    for result in new['results']:
+        key = _key(result)
+
+        if key not in before:
+            continue
+
+        old_ops = before[key]['ops_per_sec']
+        new_ops = result['ops_per_sec']
+
+        ret.append(key + (old_ops, new_ops, new_ops / max(old_ops, 1e-9)))
+
+    ret.sort()
+
+    return ret
+
+
+def format_results(results):
+    """
+    Returns C{results} from L{run} as a printable table.
+    """
+    lines = ['%-18s %-7s %-7s %12s %10s %8s %12s' % ('workload', 'op',
+        'impl', 'ops/s', 'MB/s', 'allocs', 'bytes')]
+
+    for r in sorted(results['results'], key=_key):
+        lines.append('%-18s %-7s %-7s %12.1f %10.2f %8d %12d' % (
+            r['workload'], r['operation'], r['implementation'],
+            r['ops_per_sec'], r['mb_per_sec'], r['allocations'],
+            r['bytes']))
+
+    return '\n'.join(lines)
+
+
+def format_comparison(rows):
+    """
+    Returns the result of L{compare} as a printable table.
+    """
+    lines = ['%-18s %-7s %-7s %12s %12s %8s' % ('workload', 'op', 'impl',
+        'old ops/s', 'new ops/s', 'speedup')]
+
+    for row in rows:
+        lines.append('%-18s %-7s %-7s %12.1f %12.1f %7.2fx' % row)
+
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    """
+    Command line entry point, see C{python -m pyamf.benchmarks --help}.
+    """
+    from optparse import OptionParser
+
+    parser = OptionParser(usage='%prog [options] [workload ...]\n'
+        '       %prog --compare OLD NEW')
+
+    parser.add_option('-i', '--implementation', action='append',
+        dest='implementations', choices=IMPLEMENTATIONS,
+        help='Implementation to benchmark, may be repeated (default: all)')
+    parser.add_option('-t', '--min-time', type='float', default=0.2,
+        help='Minimum time in seconds of each timed batch [%default]')
+    parser.add_option('-r', '--repeat', type='int', default=3,
+        help='Number of timed batches, the best is reported [%default]')
+    parser.add_option('-o', '--output', metavar='FILE',
+        help='Save the results to FILE as JSON')
+    parser.add_option('-c', '--compare', action='store_true', default=False,
+        help='Compare two saved results')
+    parser.add_option('-l', '--list', action='store_true', default=False,
+        help='List the available workloads')
+
+    options, args = parser.parse_args(argv)
+
+    if options.list:
+        for workload in get_workloads():
+            print '%-18s %s' % (workload.name, workload.description)
+
+        return 0
+
+    if options.compare:
+        if len(args) != 2:
+            parser.error('--compare requires two results files')
+
+        print format_comparison(compare(load(args[0]), load(args[1])))
+
+        return 0
+
+    try:
+        results = run(options.implementations or IMPLEMENTATIONS, args,
+            options.min_time, options.repeat)
+    except ValueError, e:
+        parser.error(str(e))
+
+    print format_results(results)
+
+    if options.output:
+        save(results, options.output)
+
+    return 0
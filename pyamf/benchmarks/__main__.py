@@ -0,0 +1,15 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Runs the codec benchmarks, see L{pyamf.benchmarks}.
+
+@since: 0.7
+"""
+
+import sys
+
+from pyamf.benchmarks import main
+
+
+sys.exit(main())
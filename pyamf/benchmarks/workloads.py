@@ -0,0 +1,229 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Repeatable workloads for L{pyamf.benchmarks}.
+
+Every workload builds the same payload on each run so that results from
+different runs and machines can be compared.
+
+@since: 0.7
+"""
+
+import datetime
+
+import pyamf
+from pyamf import amf3, remoting, sol
+from pyamf.flex import ArrayCollection, messaging
+
+
+#: All registered workloads, in the order they are run.
+WORKLOADS = []
+
+
+class Record(object):
+    """
+    A typed object used by the object list and graph workloads.
+    """
+
+    def __init__(self, id=None, name=None, score=None, active=None):
+        self.id = id
+        self.name = name
+        self.score = score
+        self.active = active
+
+
+pyamf.register_class(Record, 'org.pyamf.benchmarks.Record')
+
+
+class Workload(object):
+    """
+    A payload and the way to encode and decode it.
+
+    @ivar name: The unique name of the workload.
+    @ivar description: A one line summary of the workload.
+    @ivar encoding: The AMF encoding used.
+    @ivar factory: Callable that returns the payload.
+    """
+
+    def __init__(self, name, description, factory, encoding=pyamf.AMF3):
+        self.name = name
+        self.description = description
+        self.factory = factory
+        self.encoding = encoding
+
+    def __repr__(self):
+        return '<%s %r>' % (self.__class__.__name__, self.name)
+
+    def setup(self):
+        """
+        Returns the payload.
+        """
+        return self.factory()
+
+    def encode(self, data):
+        """
+        Returns C{data} encoded as a C{str}.
+        """
+        return pyamf.encode(data, encoding=self.encoding).getvalue()
+
+    def decode(self, bytes):
+        """
+        Decodes every element in C{bytes}.
+        """
+        return list(pyamf.decode(bytes, encoding=self.encoding))
+
+
+class EnvelopeWorkload(Workload):
+    """
+    Encodes and decodes a whole remoting envelope.
+    """
+
+    def encode(self, data):
+        return remoting.encode(data).getvalue()
+
+    def decode(self, bytes):
+        return remoting.decode(bytes)
+
+
+class SOLWorkload(Workload):
+    """
+    Encodes and decodes a Local Shared Object.
+    """
+
+    def encode(self, data):
+        return sol.encode('benchmark', data, encoding=self.encoding).getvalue()
+
+    def decode(self, bytes):
+        return sol.decode(bytes)
+
+
+def register(workload):
+    """
+    Adds C{workload} to L{WORKLOADS}.
+
+    @raise ValueError: A workload with the same name is already registered.
+    """
+    for w in WORKLOADS:
+        if w.name == workload.name:
+            raise ValueError('Workload %r already registered' % (w.name,))
+
+    WORKLOADS.append(workload)
+
+    return workload
+
+
+def make_envelope():
+    envelope = remoting.Envelope(pyamf.AMF0)
+
+    envelope['/1'] = remoting.Request('service.getUser', [
+        42, u'session-token', {'fields': ['name', 'email']}])
+    envelope['/2'] = remoting.Response({
+        'id': 42,
+        'name': u'John Doe',
+        'email': u'john@example.com',
+        'roles': [u'admin', u'user']
+    })
+
+    return envelope
+
+
+def make_records():
+    return [Record(i, u'record %d' % (i,), i * 0.5, bool(i % 2))
+        for i in xrange(1000)]
+
+
+def make_graph(depth=10):
+    """
+    Returns a binary tree of C{depth} levels in which every node refers back
+    to the root and its parent, exercising the reference tables.
+    """
+    root = {'name': u'root', 'parent': None}
+
+    def branch(node, level):
+        if level == depth:
+            node['children'] = []
+
+            return
+
+        node['children'] = []
+
+        for i in xrange(2):
+            child = {'name': u'node', 'parent': node, 'root': root}
+            node['children'].append(child)
+            branch(child, level + 1)
+
+    branch(root, 1)
+
+    return root
+
+
+def make_strings():
+    ret = [u'unique string number %d \xe9\u4e2d' % (i,)
+        for i in xrange(1000)]
+
+    # repeated strings are sent by reference in AMF3
+    return ret + ret[:500]
+
+
+def make_dates():
+    start = datetime.datetime(2010, 1, 1)
+    step = datetime.timedelta(minutes=37)
+
+    return [start + step * i for i in xrange(1000)]
+
+
+def make_bytearrays():
+    return [amf3.ByteArray('\x00\x01\x02\x03' * 16384)] + [
+        amf3.ByteArray(chr(i) * 256) for i in xrange(100)]
+
+
+def make_flex():
+    rows = ArrayCollection([{
+        'id': i,
+        'label': u'row %d' % (i,),
+        'created': datetime.datetime(2010, 1, 1, 0, 0, i % 60)
+    } for i in xrange(200)])
+
+    return messaging.AcknowledgeMessage(
+        messageId='A9B3A5F7-2D0E-4C7C-8B3A-6E1F4E5E9D10',
+        correlationId='5E0B1C6D-7A8F-4B2C-9D3E-1F2A3B4C5D6E',
+        clientId='0F1E2D3C-4B5A-6978-8796-A5B4C3D2E1F0',
+        timestamp=1262304000000, timeToLive=0, headers={}, body=rows)
+
+
+def make_sol():
+    return {
+        'user': u'John Doe',
+        'visits': 1234,
+        'scores': [i * 1.5 for i in xrange(100)],
+        'settings': dict([('key%d' % (i,), u'value %d' % (i,))
+            for i in xrange(50)])
+    }
+
+
+register(EnvelopeWorkload('envelope',
+    'Small remoting request/response envelope', make_envelope,
+    pyamf.AMF0))
+
+for _encoding, _suffix in ((pyamf.AMF0, 'amf0'), (pyamf.AMF3, 'amf3')):
+    register(Workload('objects-' + _suffix,
+        'List of 1000 typed objects', make_records, _encoding))
+    register(Workload('graph-' + _suffix,
+        'Tree of 1023 nodes with back references', make_graph, _encoding))
+    register(Workload('strings-' + _suffix,
+        'List of 1500 unicode strings, 500 repeated', make_strings,
+        _encoding))
+    register(Workload('dates-' + _suffix,
+        'List of 1000 datetimes', make_dates, _encoding))
+
+register(Workload('bytearray', 'One 64KB and 100 small ByteArrays',
+    make_bytearrays))
+register(Workload('flex', 'AcknowledgeMessage with an ArrayCollection body',
+    make_flex))
+
+for _encoding, _suffix in ((pyamf.AMF0, 'amf0'), (pyamf.AMF3, 'amf3')):
+    register(SOLWorkload('sol-' + _suffix, 'Local Shared Object', make_sol,
+        _encoding))
+
+del _encoding, _suffix
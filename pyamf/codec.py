@@ -7,6 +7,10 @@ Provides basic functionality for all pyamf.amf?.[De|E]ncoder classes.
 
 import types
 import datetime
+import threading
+import timeit
+import struct
+import array
 
 import pyamf
 from pyamf import util, python, xml
@@ -15,7 +19,20 @@ __all__ = [
     'IndexedCollection',
     'Context',
     'Decoder',
-    'Encoder'
+    'Encoder',
+    'Scanner',
+    'ScanIndex',
+    'IncrementalDecoder',
+    'Sink',
+    'TypeCache',
+    'TYPE_CACHE',
+    'StringCache',
+    'STRING_CACHE',
+    'CodecPool',
+    'NUMERIC_TYPECODES',
+    'Stats',
+    'enable_stats',
+    'get_stats'
 ]
 
 try:
@@ -26,6 +43,27 @@ except NameError:
     str = bytes
 
 
+#: The C{array.array} typecodes handled by L{Encoder.writeNumericArray}.
+NUMERIC_TYPECODES = 'bBhHiIlLfd'
+
+#: The number of items that L{Encoder.writeNumericArray} packs at a time.
+NUMERIC_BLOCK_SIZE = 1024
+
+
+def pack_numbers(marker, values):
+    """
+    Returns C{values} packed as big endian doubles, each one preceded by the
+    type C{marker}.
+
+    @since: 0.7
+    """
+    n = len(values)
+    args = [marker] * (n * 2)
+    args[1::2] = values
+
+    return struct.pack('>' + 'cd' * n, *args)
+
+
 class IndexedCollection(object):
     """
     Store references to objects and provides an api to query references.
@@ -92,6 +130,21 @@ class IndexedCollection(object):
 
         return idx
 
+    def truncate(self, size):
+        """
+        Drops every reference from C{size} onwards, e.g. to forget the objects
+        of a partially decoded element.
+
+        @since: 0.7
+        """
+        for idx in xrange(size, len(self.list)):
+            h = self.func(self.list[idx])
+
+            if self.dict.get(h, None) == idx:
+                del self.dict[h]
+
+        del self.list[size:]
+
     def __eq__(self, other):
         if isinstance(other, list):
             return self.list == other
@@ -120,6 +173,153 @@ class IndexedCollection(object):
             id(self))
 
 
+class _Generations(object):
+    """
+    A bounded mapping that approximates LRU eviction with two generations.
+
+    New and recently used entries live in C{young}. When C{young} holds half
+    of the allowed entries (or bytes) it becomes C{old}, dropping the
+    previous C{old}. Entries found in C{old} are moved back to C{young}.
+    """
+
+    def __init__(self, size, max_bytes):
+        self.size = size // 2
+        self.max_bytes = max_bytes // 2
+
+        self.clear()
+
+    def clear(self):
+        self.young = {}
+        self.old = {}
+        self.bytes = 0
+
+    def __len__(self):
+        return len(self.young) + len(self.old)
+
+    def promote(self, key, size):
+        """
+        Moves C{key} from the old generation to the young one, returning the
+        value or C{None} if not found.
+        """
+        value = self.old.pop(key, None)
+
+        if value is not None:
+            self.set(key, value, size)
+
+        return value
+
+    def set(self, key, value, size):
+        if len(self.young) >= self.size or self.bytes >= self.max_bytes:
+            self.old = self.young
+            self.young = {}
+            self.bytes = 0
+
+        self.young[key] = value
+        self.bytes += size
+
+
+class StringCache(object):
+    """
+    A process wide, bounded cache of utf-8 encoded byte strings <-> unicode
+    objects, shared by the pure python and C{cpyamf} contexts so that common
+    strings (property names, enum-like values) are not transcoded again for
+    every request.
+
+    Entries are keyed by the actual string (in each direction separately)
+    and evicted in (approximately) least recently used order. Strings longer
+    than L{max_length} bytes are not cached.
+
+    @ivar hits: The number of lookups answered by the cache.
+    @type hits: C{int}
+    @ivar misses: The number of lookups that had to transcode.
+    @type misses: C{int}
+    @since: 0.7
+    """
+
+    #: The maximum number of entries held for each direction.
+    size = 4096
+    #: The maximum number of (utf-8 encoded) bytes held for each direction.
+    max_bytes = 1024 * 1024
+    #: The maximum length (in utf-8 encoded bytes) of a cached string.
+    max_length = 256
+
+    def __init__(self, size=None, max_bytes=None, max_length=None):
+        if size is not None:
+            self.size = size
+
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+
+        if max_length is not None:
+            self.max_length = max_length
+
+        self.unicodes = _Generations(self.size, self.max_bytes)
+        self.strings = _Generations(self.size, self.max_bytes)
+
+        self.clear()
+
+    def __len__(self):
+        return len(self.unicodes) + len(self.strings)
+
+    def clear(self):
+        """
+        Empties the cache and resets the counters.
+        """
+        self.unicodes.clear()
+        self.strings.clear()
+
+        self.hits = 0
+        self.misses = 0
+
+    def getStringForBytes(self, s):
+        """
+        Returns the unicode object for the utf-8 encoded byte string C{s}.
+        """
+        u = self.unicodes.young.get(s, None)
+
+        if u is None:
+            u = self.unicodes.promote(s, len(s))
+
+            if u is None:
+                self.misses += 1
+                u = s.decode('utf-8')
+
+                if len(s) <= self.max_length:
+                    self.unicodes.set(s, u, len(s))
+
+                return u
+
+        self.hits += 1
+
+        return u
+
+    def getBytesForString(self, u):
+        """
+        Returns the utf-8 encoded byte string for the unicode object C{u}.
+        """
+        s = self.strings.young.get(u, None)
+
+        if s is None:
+            s = self.strings.promote(u, len(u))
+
+            if s is None:
+                self.misses += 1
+                s = u.encode('utf-8')
+
+                if len(s) <= self.max_length:
+                    self.strings.set(u, s, len(s))
+
+                return s
+
+        self.hits += 1
+
+        return s
+
+
+#: The L{StringCache} used by all contexts.
+STRING_CACHE = StringCache()
+
+
 class Context(object):
     """
     The base context for all AMF [de|en]coding.
@@ -132,8 +332,6 @@ class Context(object):
     @type _objects: L{IndexedCollection}
     @ivar _class_aliases: Lookup of C{class} -> L{pyamf.ClassAlias} as
         determined by L{pyamf.get_class_alias}
-    @ivar _unicodes: Lookup of utf-8 encoded byte strings -> string objects
-        (aka strings/unicodes).
     """
 
     def __init__(self):
@@ -147,7 +345,6 @@ class Context(object):
         """
         self._objects.clear()
         self._class_aliases = {}
-        self._unicodes = {}
         self.extra = {}
 
     def getObject(self, ref):
@@ -177,6 +374,34 @@ class Context(object):
         """
         return self._objects.append(obj)
 
+    def checkpoint(self):
+        """
+        Returns a marker for the current state of the reference tables. See
+        L{rollback}.
+
+        @since: 0.7
+        """
+        return len(self._objects)
+
+    def rollback(self, checkpoint):
+        """
+        Forgets all references that have been added since C{checkpoint} was
+        returned by L{checkpoint}.
+
+        @since: 0.7
+        """
+        self._objects.truncate(checkpoint)
+
+    def reserve(self, objects):
+        """
+        Skips C{objects} references that were added to the stream without this
+        context, for example by L{pyamf.RawAMF} data.
+
+        @since: 0.7
+        """
+        for i in xrange(objects):
+            self._objects.append(None)
+
     def getClassAlias(self, klass):
         """
         Gets a class alias based on the supplied C{klass}. If one is not found
@@ -214,16 +439,9 @@ class Context(object):
         If there is no string object, one is created.
 
         @since: 0.6
+        @see: L{STRING_CACHE}
         """
-        h = hash(s)
-        u = self._unicodes.get(h, None)
-
-        if u is not None:
-            return u
-
-        u = self._unicodes[h] = s.decode('utf-8')
-
-        return u
+        return STRING_CACHE.getStringForBytes(s)
 
     def getBytesForString(self, u):
         """
@@ -231,16 +449,9 @@ class Context(object):
         object. If there is no string, one is encoded.
 
         @since: 0.6
+        @see: L{STRING_CACHE}
         """
-        h = hash(u)
-        s = self._unicodes.get(h, None)
-
-        if s is not None:
-            return s
-
-        s = self._unicodes[h] = u.encode('utf-8')
-
-        return s
+        return STRING_CACHE.getBytesForString(u)
 
 
 class _Codec(object):
@@ -255,11 +466,20 @@ class _Codec(object):
     @ivar timezone_offset: The offset from I{UTC} for any C{datetime} objects
         being encoded. Default to C{None} means no offset.
     @type timezone_offset: C{datetime.timedelta} or C{int} or C{None}
+    @ivar recorder: Collects the statistics of the codec, if enabled (see
+        L{enableStats}).
+    @type recorder: L{Recorder} or C{None}
     """
 
+    #: The AMF encoding of the codec. Set by the subclasses.
+    encoding = None
+
+    recorder = None
+
     def __init__(self, stream=None, context=None, strict=False,
                  timezone_offset=None):
-        if isinstance(stream, basestring) or stream is None:
+        if (stream is None or isinstance(stream, basestring) or
+                isinstance(stream, python.buffer_types)):
             stream = util.BufferedByteStream(stream)
 
         self.stream = stream
@@ -268,6 +488,83 @@ class _Codec(object):
         self.timezone_offset = timezone_offset
 
         self._func_cache = {}
+        self._type_generation = pyamf.TYPE_GENERATION
+
+        check_stats(self)
+
+    def reset(self, stream=None, strict=False, timezone_offset=None):
+        """
+        Prepares the codec to be reused with C{stream} (see L{CodecPool}).
+        The context is cleared but the type function cache is kept, unless
+        the custom types have changed since it was built.
+
+        @since: 0.7
+        """
+        if (stream is None or isinstance(stream, basestring) or
+                isinstance(stream, python.buffer_types)):
+            stream = util.BufferedByteStream(stream)
+
+        self.stream = stream
+        self.strict = strict
+        self.timezone_offset = timezone_offset
+
+        self.context.clear()
+
+        if self._type_generation != pyamf.TYPE_GENERATION:
+            self._func_cache = {}
+            self._type_generation = pyamf.TYPE_GENERATION
+
+        if self.recorder is not None:
+            self.recorder.reset()
+        else:
+            check_stats(self)
+
+    def enableStats(self, stats=None):
+        """
+        Counts the elements, bytes and time spent on each AMF type and class
+        alias that the codec handles from now on.
+
+        @param stats: Where to collect the figures. A new instance is used by
+            default.
+        @type stats: L{Stats}
+        @return: The L{Stats} that collect the figures.
+        @since: 0.7
+        """
+        if stats is None:
+            stats = Stats()
+
+        self.recorder = Recorder(self.encoding, stats)
+        self._instrument(True)
+
+        return stats
+
+    def disableStats(self):
+        """
+        Stops collecting statistics.
+
+        @since: 0.7
+        """
+        self.recorder = None
+        self._instrument(False)
+
+    def getStats(self):
+        """
+        Returns a snapshot of the statistics of the codec (see
+        L{Stats.getSnapshot}) or C{None} if they are not enabled.
+
+        @since: 0.7
+        """
+        if self.recorder is None:
+            return None
+
+        return self.recorder.stats.getSnapshot()
+
+    def _instrument(self, enabled):
+        """
+        Replaces the element function of the instance with one that records
+        statistics, so that uninstrumented codecs pay nothing.
+        """
+        raise NotImplementedError
 
     def buildContext(self):
         """
@@ -344,132 +641,757 @@ class Decoder(_Codec):
 
             raise
 
+    def _readRecordedElement(self):
+        recorder = self.recorder
+        stream = self.stream
+
+        recorder.enter(stream.tell(), stream.peek(1))
+
+        try:
+            obj = self.__class__.readElement(self)
+        except:
+            recorder.abort()
+
+            raise
+
+        recorder.leave(stream, obj)
+
+        return obj
+
+    def _instrument(self, enabled):
+        if enabled:
+            self.readElement = self._readRecordedElement
+        else:
+            self.__dict__.pop('readElement', None)
+
     def __iter__(self):
         return self
 
 
-class _CustomTypeFunc(object):
+class ScanIndex(object):
     """
-    Support for custom type mappings when encoding.
+    A compact record of the values found by a L{Scanner}, in stream order.
+
+    @ivar types: The type marker of each value.
+    @type types: C{array.array} of C{'B'}
+    @ivar offsets: The stream offset of each type marker.
+    @type offsets: C{array.array} of C{'L'}
+    @ivar depths: How many containers each value is nested in.
+    @type depths: C{array.array} of C{'H'}
+    @since: 0.7
     """
 
-    def __init__(self, encoder, func):
-        self.encoder = encoder
-        self.func = func
+    def __init__(self):
+        self.clear()
 
-    def __call__(self, data, **kwargs):
-        ret = self.func(data, encoder=self.encoder)
+    def clear(self):
+        """
+        Empties the index.
+        """
+        self.types = array.array('B')
+        self.offsets = array.array('L')
+        self.depths = array.array('H')
 
-        if ret is not None:
-            self.encoder.writeElement(ret)
+    def append(self, marker, offset, depth):
+        """
+        Records the value with type C{marker} found at C{offset}.
+        """
+        self.types.append(ord(marker))
+        self.offsets.append(offset)
+        self.depths.append(depth)
 
+    def truncate(self, size):
+        """
+        Forgets all but the first C{size} values.
+        """
+        del self.types[size:]
+        del self.offsets[size:]
+        del self.depths[size:]
 
-class Encoder(_Codec):
-    """
-    Base AMF encoder.
+    def __len__(self):
+        return len(self.types)
 
-    When using this to encode arbitrary object, the only 'public' method is
-    C{writeElement} all others are private and are subject to change in future
-    versions.
+    def __getitem__(self, idx):
+        """
+        @return: C{(marker, offset, depth)}
+        """
+        return (chr(self.types[idx]), self.offsets[idx], self.depths[idx])
 
-    The encoder also supports an generator interface. Feed the encoder Python
-    object using L{send} and get AMF bytes out using L{next}.
+    def __iter__(self):
+        for i in xrange(len(self.types)):
+            yield self[i]
+
+
+class Scanner(object):
+    """
+    Base class for the resumable structural scanners. A scanner works out
+    where the next complete element in a stream ends without building any
+    Python objects. Parse state is kept between calls to L{scan} so that
+    scanning continues from where it stopped when more data arrives.
+
+    The scanner counts the entries that the scanned data adds to the
+    reference tables. Without a context the scanner keeps any tables that it
+    needs to follow the structure of later elements (e.g. AMF3 traits), so a
+    sequence of elements can be L{walked<walk>} without decoding any of them.
+
+    @ivar context: The context of the decoder that will decode the scanned
+        elements. Used to resolve references to earlier elements.
+    @ivar frames: The stack of containers that are currently open.
+    @type frames: C{list}
+    @ivar offset: Where scanning will continue in the stream.
+    @ivar objects: The number of object references created by the scanned
+        data.
+    @type objects: C{int}
+    @ivar index: Records the type and offset of every scanned value, if
+        requested.
+    @type index: L{ScanIndex} or C{None}
+    @since: 0.7
     """
 
-    def __init__(self, *args, **kwargs):
-        _Codec.__init__(self, *args, **kwargs)
+    def __init__(self, context=None, index=False):
+        self.context = context
+        self.index = None
 
-        self.bucket = []
+        if index:
+            self.index = ScanIndex()
 
-    def _write_type(self, obj, **kwargs):
+        self.clear()
+
+    def clear(self):
         """
-        Subclasses should override this and all write[type] functions
+        Forgets the reference tables, the index and any partially scanned
+        element.
         """
-        raise NotImplementedError
+        self.objects = 0
 
-    writeNull = _write_type
-    writeBytes = _write_type
-    writeString = _write_type
-    writeBoolean = _write_type
-    writeNumber = _write_type
-    writeList = _write_type
-    writeUndefined = _write_type
-    writeDate = _write_type
-    writeXML = _write_type
-    writeObject = _write_type
+        if self.index is not None:
+            self.index.clear()
 
-    def writeSequence(self, iterable):
+        self.reset()
+
+    def reset(self):
         """
-        Encodes an iterable. The default is to write If the iterable has an al
+        Forgets any partially scanned element.
+        """
+        self.frames = []
+        self.offset = 0
+
+    def scan(self, stream):
+        """
+        Scans the element that starts at the current position of C{stream}.
+        The stream position is not changed.
+
+        Scanning a new element discards the state of the previous one, so
+        each completed element must have been decoded before L{scan} is called
+        again.
+
+        @return: The offset just past the end of the element, C{None} if more
+            data is required or C{-1} if the element cannot be measured
+            without actually decoding it.
         """
+        pos = stream.tell()
+
+        if not self.frames:
+            self.reset()
+            self.begin()
+        else:
+            stream.seek(self.offset)
+
         try:
-            alias = self.context.getClassAlias(iterable.__class__)
-        except (AttributeError, pyamf.UnknownClassAlias):
-            self.writeList(list(iterable))
+            ret = self._run(stream)
+            self.offset = stream.tell()
+        finally:
+            stream.seek(pos)
+
+        if ret == 1:
+            return self.offset
+        elif ret == 0:
+            return None
 
-            return
+        return -1
 
-        if alias.external:
-            # a is a subclassed list with a registered alias - push to the
-            # correct method
-            self.writeObject(iterable)
+    def walk(self, stream):
+        """
+        Scans the elements from the current position of C{stream} to its end
+        without decoding them. The stream position is not changed.
 
-            return
+        @return: A C{list} of the offsets just past each complete element. An
+            incomplete element at the end of the stream is ignored.
+        @raise DecodeError: An element cannot be measured structurally.
+        """
+        pos = stream.tell()
+        boundaries = []
 
-        self.writeList(list(iterable))
+        try:
+            while stream.remaining() > 0:
+                state = self._save()
+                end = self.scan(stream)
 
-    def writeGenerator(self, gen):
+                if end is None:
+                    # forget the incomplete element
+                    self._restore(state)
+                    self.reset()
+
+                    break
+
+                if end == -1:
+                    raise pyamf.DecodeError('Unable to scan the element at '
+                        'offset %d' % (stream.tell(),))
+
+                boundaries.append(end)
+                stream.seek(end)
+        finally:
+            stream.seek(pos)
+
+        return boundaries
+
+    def begin(self):
         """
-        Iterates over a generator object and encodes all that is returned.
+        Starts scanning a new element.
         """
-        n = getattr(gen, 'next')
+        raise NotImplementedError
 
-        while True:
-            try:
-                self.writeElement(n())
-            except StopIteration:
-                break
+    def _save(self):
+        """
+        Returns the state that L{_step} changes besides the open frames.
+        """
+        if self.index is None:
+            return (self.objects, 0)
 
-    def getTypeFunc(self, data):
+        return (self.objects, len(self.index))
+
+    def _restore(self, state):
         """
-        Returns a callable that will encode C{data} to C{self.stream}. If
-        C{data} is unencodable, then C{None} is returned.
+        Reverts to a state returned by L{_save}.
         """
-        if data is None:
-            return self.writeNull
+        self.objects = state[0]
 
-        t = type(data)
+        if self.index is not None:
+            self.index.truncate(state[1])
 
-        # try types that we know will work
-        if t is str or issubclass(t, str):
-            return self.writeBytes
-        if t is unicode or issubclass(t, unicode):
-            return self.writeString
-        elif t is bool:
-            return self.writeBoolean
-        elif t is float:
-            return self.writeNumber
-        elif t in python.int_types:
-            return self.writeNumber
-        elif t in (list, tuple):
-            return self.writeList
-        elif t is types.GeneratorType:
+    def _run(self, stream):
+        """
+        Scans tokens until all open frames are closed.
+
+        @return: C{1} when the element is complete, C{0} if more data is
+            required and C{-1} if the element cannot be scanned.
+        """
+        frames = self.frames
+
+        while frames:
+            pos = stream.tell()
+            state = self._save()
+
+            try:
+                ret = self._step(stream)
+            except IOError:
+                stream.seek(pos)
+                self._restore(state)
+
+                return 0
+
+            if ret != 1:
+                return ret
+
+        return 1
+
+    def _step(self, stream):
+        """
+        Scans the next token for the innermost frame. A token is either read
+        in its entirety or an C{IOError} is raised before any state changes.
+        """
+        raise NotImplementedError
+
+    def _skip(self, stream, n):
+        """
+        Moves past C{n} bytes, insisting that they are available.
+        """
+        if stream.remaining() < n:
+            raise IOError
+
+        stream.seek(n, 1)
+
+
+class IncrementalDecoder(object):
+    """
+    A push parser for AMF streams that arrive piecemeal, e.g. from a socket.
+
+    Data is passed to L{feed} which returns the elements that it completed.
+    A L{Scanner} tracks the structure of the element in flight so that each
+    element is decoded exactly once, when all of its bytes have arrived.
+    Decoded bytes are discarded from the stream as they are consumed so
+    memory use is bounded by the largest element, not by the lifetime of the
+    connection.
+
+    Elements that cannot be measured structurally (such as
+    C{IExternalizable} objects) are decoded speculatively as data arrives;
+    the context is rolled back if they turn out to be incomplete.
+
+    @ivar decoder: The underlying L{Decoder}.
+    @ivar scanner: The L{Scanner} for the decoder's encoding.
+    @since: 0.7
+    """
+
+    def __init__(self, decoder, scanner):
+        self.decoder = decoder
+        self.scanner = scanner
+
+        self._opaque = False
+        self._needed = 0
+
+    def feed(self, data):
+        """
+        Adds C{data} to the decode buffer.
+
+        @return: A C{list} of the elements that were completed by C{data}.
+        """
+        stream = self.decoder.stream
+        stream.append(data)
+
+        elements = []
+
+        while stream.remaining() > 0:
+            if not self._opaque:
+                end = self.scanner.scan(stream)
+
+                if end is None:
+                    break
+
+                if end != -1:
+                    elements.append(self.decoder.readElement())
+
+                    continue
+
+                self._opaque = True
+
+            if len(stream) < self._needed:
+                break
+
+            context = self.decoder.context
+            checkpoint = context.checkpoint()
+            pos = stream.tell()
+
+            try:
+                element = self.decoder.readElement()
+            except (IOError, pyamf.EOStream):
+                context.rollback(checkpoint)
+                stream.seek(pos)
+
+                self._needed = len(stream) + 1
+
+                break
+
+            elements.append(element)
+
+            self.scanner.reset()
+            self._opaque = False
+            self._needed = 0
+
+        consumed = stream.tell()
+
+        if consumed > 0:
+            stream.consume()
+
+            self.scanner.offset -= consumed
+
+            if self._needed:
+                self._needed -= consumed
+
+        return elements
+
+
+class TypeCache(object):
+    """
+    Process wide cache of the L{pyamf.TYPE_MAP} function (or C{None}) that
+    handles each type, shared by the pure python and C{cpyamf} encoders.
+
+    Encoders are usually short lived (e.g. one per remoting response) so a
+    per instance cache alone means that the linear scan of the type map is
+    paid again for every type in every request. The cache is invalidated by
+    comparing against L{pyamf.TYPE_GENERATION} and is pre-seeded with the
+    builtin types when (re)built.
+
+    @ivar generation: The value of L{pyamf.TYPE_GENERATION} that the entries
+        were resolved against.
+    @since: 0.7
+    """
+
+    #: Sample instances of the builtin types that the cache is seeded with.
+    seed_values = [
+        None, '', u'', True, 0, 0.0, [], (), {}, pyamf.Undefined,
+        datetime.datetime(1970, 1, 1), datetime.date(1970, 1, 1),
+        pyamf.ASObject(), pyamf.MixedArray()
+    ]
+
+    def __init__(self):
+        self.generation = None
+        self.entries = {}
+
+    def reset(self):
+        """
+        Discards the cached entries and seeds the cache from
+        L{seed_values}. Callable predicates in the type map are not run
+        against the seed values.
+        """
+        self.entries = {}
+        self.generation = pyamf.TYPE_GENERATION
+
+        for value in self.seed_values:
+            func, cacheable = self._find(value, False)
+
+            if cacheable:
+                self.entries[type(value)] = func
+
+    def find(self, data):
+        """
+        Scans L{pyamf.TYPE_MAP} for the custom type function that handles
+        C{data}. The result is not cached.
+        """
+        return self._find(data)[0]
+
+    def _find(self, data, predicates=True):
+        """
+        Scans L{pyamf.TYPE_MAP} for C{data}.
+
+        @param predicates: Whether callable predicates in the type map are
+            run against C{data}.
+        @return: The function (or C{None}) and whether that result holds for
+            every value of C{type(data)}. It does not if a predicate was
+            consulted (it depends on the value) or C{data} is an old style
+            instance or class (all of which share a type).
+        """
+        cacheable = type(data) not in (types.InstanceType, types.ClassType)
+
+        for type_, func in pyamf.TYPE_MAP.iteritems():
+            try:
+                if isinstance(data, type_):
+                    return func, cacheable
+            except TypeError:
+                if not python.callable(type_):
+                    continue
+
+                cacheable = False
+
+                if not predicates:
+                    return None, False
+
+                if type_(data):
+                    return func, False
+
+        return None, cacheable
+
+    def get(self, data):
+        """
+        Returns the custom type function for the type of C{data} or C{None}
+        if the type map does not handle it.
+        """
+        if self.generation != pyamf.TYPE_GENERATION:
+            self.reset()
+
+        t = type(data)
+
+        try:
+            return self.entries[t]
+        except KeyError:
+            pass
+
+        func, cacheable = self._find(data)
+
+        if cacheable:
+            self.entries[t] = func
+
+        return func
+
+
+#: The L{TypeCache} used by all encoders.
+TYPE_CACHE = TypeCache()
+
+
+class _CustomTypeFunc(object):
+    """
+    Support for custom type mappings when encoding.
+    """
+
+    def __init__(self, encoder, func):
+        self.encoder = encoder
+        self.func = func
+
+    def __call__(self, data, **kwargs):
+        ret = self.func(data, encoder=self.encoder)
+
+        if ret is not None:
+            self.encoder.writeElement(ret)
+
+
+class Sink(object):
+    """
+    Receives the output of an L{Encoder} in chunks as encoding proceeds, so
+    that the encoded bytes never have to be held in memory all at once.
+
+    @ivar chunk_size: The encoder flushes its stream to the sink once it holds
+        at least this many bytes.
+    @type chunk_size: C{int}
+    @ivar written: The number of bytes written to the target so far.
+    @type written: C{int}
+    @since: 0.7
+    """
+
+    #: The default value for L{chunk_size}.
+    chunk_size = 64 * 1024
+
+    def __init__(self, target, chunk_size=None):
+        """
+        @param target: A file like object, a socket or a callable (e.g. the
+            WSGI C{write} callable) that accepts C{str}.
+        """
+        write = getattr(target, 'write', None)
+
+        if write is None:
+            write = getattr(target, 'sendall', None)
+
+        if write is None:
+            if not python.callable(target):
+                raise TypeError('Expected a file like object, socket or '
+                    'callable for the sink (got %r)' % (target,))
+
+            write = target
+
+        self.target = target
+        self._write = write
+
+        if chunk_size is not None:
+            self.chunk_size = chunk_size
+
+        self.written = 0
+
+        self._measuring = False
+        self._measured = 0
+
+    def write(self, data):
+        """
+        Writes C{data} to the target.
+        """
+        if self._measuring:
+            self._measured += len(data)
+
+            return
+
+        self._write(data)
+        self.written += len(data)
+
+    def writeWithLength(self, encoder, func, *args):
+        """
+        Writes a C{ulong} length prefix to C{encoder}'s stream followed by the
+        output of calling C{func(*args)}.
+
+        The length has to be known before the bytes can be sent, so C{func} is
+        called twice: once to determine the size (the output is discarded and
+        the context restored afterwards) and again to write the bytes.
+
+        @raise EncodeError: The second pass produced a different number of
+            bytes, e.g. because a generator was exhausted by the first.
+        """
+        stream = encoder.stream
+        context = encoder.context
+
+        encoder.flush()
+        checkpoint = context.checkpoint()
+
+        self._measuring = True
+        self._measured = 0
+
+        try:
+            func(*args)
+
+            size = self._measured + stream.tell()
+        finally:
+            self._measuring = False
+            stream.truncate()
+            context.rollback(checkpoint)
+
+        stream.write_ulong(size)
+        start = self.written + stream.tell()
+
+        func(*args)
+
+        if self.written + stream.tell() - start != size:
+            raise pyamf.EncodeError('Expected to write %d bytes, wrote %d '
+                'instead' % (size, self.written + stream.tell() - start))
+
+
+class Encoder(_Codec):
+    """
+    Base AMF encoder.
+
+    When using this to encode arbitrary object, the only 'public' method is
+    C{writeElement} all others are private and are subject to change in future
+    versions.
+
+    The encoder also supports an generator interface. Feed the encoder Python
+    object using L{send} and get AMF bytes out using L{next}.
+
+    @ivar sink: If set, the encoded bytes are written to this L{Sink} in
+        chunks as encoding proceeds (see L{flush}). Supplied as the C{sink}
+        (and optionally C{chunk_size}) keyword argument.
+    @type sink: L{Sink} or C{None}
+    """
+
+    def __init__(self, *args, **kwargs):
+        sink = kwargs.pop('sink', None)
+        chunk_size = kwargs.pop('chunk_size', None)
+
+        _Codec.__init__(self, *args, **kwargs)
+
+        self.bucket = []
+
+        if sink is not None and not isinstance(sink, Sink):
+            sink = Sink(sink, chunk_size)
+
+        self.sink = sink
+
+    def reset(self, *args, **kwargs):
+        """
+        @see: L{_Codec.reset}
+        """
+        sink = kwargs.pop('sink', None)
+        chunk_size = kwargs.pop('chunk_size', None)
+
+        _Codec.reset(self, *args, **kwargs)
+
+        self.bucket = []
+
+        if sink is not None and not isinstance(sink, Sink):
+            sink = Sink(sink, chunk_size)
+
+        self.sink = sink
+
+    def flush(self):
+        """
+        Writes the contents of the stream to the L{sink<Sink>} (if there is
+        one) and empties the stream.
+
+        @since: 0.7
+        """
+        if self.sink is None:
+            return
+
+        if self.recorder is not None:
+            self.recorder.flushed(self.stream)
+
+        self.sink.write(self.stream.getvalue())
+        self.stream.truncate()
+
+    def writeNumericArray(self, a):
+        """
+        Writes the C{array.array} C{a} (of one of the L{NUMERIC_TYPECODES})
+        as an AMF array. The items are packed a block at a time rather than
+        dispatched one by one through L{writeElement}.
+
+        @since: 0.7
+        """
+        raise NotImplementedError
+
+    def _writeNumericBlocks(self, a, func):
+        """
+        Calls C{func} with each block of L{NUMERIC_BLOCK_SIZE} items of C{a},
+        flushing to the sink in between.
+        """
+        for i in xrange(0, len(a), NUMERIC_BLOCK_SIZE):
+            func(a[i:i + NUMERIC_BLOCK_SIZE])
+
+            sink = self.sink
+
+            if sink is not None and self.stream.tell() >= sink.chunk_size:
+                self.flush()
+
+    def _write_type(self, obj, **kwargs):
+        """
+        Subclasses should override this and all write[type] functions
+        """
+        raise NotImplementedError
+
+    writeNull = _write_type
+    writeBytes = _write_type
+    writeString = _write_type
+    writeBoolean = _write_type
+    writeNumber = _write_type
+    writeList = _write_type
+    writeUndefined = _write_type
+    writeDate = _write_type
+    writeXML = _write_type
+    writeObject = _write_type
+
+    def writeSequence(self, iterable):
+        """
+        Encodes an iterable. The default is to write If the iterable has an al
+        """
+        try:
+            alias = self.context.getClassAlias(iterable.__class__)
+        except (AttributeError, pyamf.UnknownClassAlias):
+            self.writeList(list(iterable))
+
+            return
+
+        if alias.external:
+            # a is a subclassed list with a registered alias - push to the
+            # correct method
+            self.writeObject(iterable)
+
+            return
+
+        self.writeList(list(iterable))
+
+    def writeGenerator(self, gen):
+        """
+        Iterates over a generator object and encodes all that is returned.
+        """
+        n = getattr(gen, 'next')
+
+        while True:
+            try:
+                self.writeElement(n())
+            except StopIteration:
+                break
+
+    def getTypeFunc(self, data):
+        """
+        Returns a callable that will encode C{data} to C{self.stream}. If
+        C{data} is unencodable, then C{None} is returned.
+        """
+        if data is None:
+            return self.writeNull
+
+        t = type(data)
+
+        # try types that we know will work
+        if t is str or issubclass(t, str):
+            return self.writeBytes
+        if t is unicode or issubclass(t, unicode):
+            return self.writeString
+        elif t is bool:
+            return self.writeBoolean
+        elif t is float:
+            return self.writeNumber
+        elif t in python.int_types:
+            return self.writeNumber
+        elif t in (list, tuple):
+            return self.writeList
+        elif t is types.GeneratorType:
             return self.writeGenerator
         elif t is pyamf.UndefinedType:
             return self.writeUndefined
+        elif t is pyamf.RawAMF:
+            return self.writeRawAMF
         elif t in (datetime.date, datetime.datetime, datetime.time):
             return self.writeDate
         elif xml.is_xml(data):
             return self.writeXML
 
         # check for any overridden types
-        for type_, func in pyamf.TYPE_MAP.iteritems():
-            try:
-                if isinstance(data, type_):
-                    return _CustomTypeFunc(self, func)
-            except TypeError:
-                if python.callable(type_) and type_(data):
-                    return _CustomTypeFunc(self, func)
+        func = TYPE_CACHE.get(data)
+
+        if func is not None:
+            return _CustomTypeFunc(self, func)
 
         if isinstance(data, (list, tuple)):
             return self.writeSequence
@@ -493,6 +1415,11 @@ class Encoder(_Codec):
         Encodes C{data} to AMF. If the data is not able to be matched to an AMF
         type, then L{pyamf.EncodeError} will be raised.
         """
+        sink = self.sink
+
+        if sink is not None and self.stream.tell() >= sink.chunk_size:
+            self.flush()
+
         key = type(data)
         func = None
 
@@ -505,10 +1432,32 @@ class Encoder(_Codec):
                 raise pyamf.EncodeError('Unable to encode %r (type %r)' % (
                     data, key))
 
-            self._func_cache[key] = func
+            # all old style instances share a type
+            if key is not types.InstanceType:
+                self._func_cache[key] = func
 
         func(data)
 
+    def _writeRecordedElement(self, data):
+        recorder = self.recorder
+
+        recorder.enter(self.stream.tell())
+
+        try:
+            self.__class__.writeElement(self, data)
+        except:
+            recorder.abort()
+
+            raise
+
+        recorder.leave(self.stream, data)
+
+    def _instrument(self, enabled):
+        if enabled:
+            self.writeElement = self._writeRecordedElement
+        else:
+            self.__dict__.pop('writeElement', None)
+
     def send(self, element):
         self.bucket.append(element)
 
@@ -530,3 +1479,428 @@ class Encoder(_Codec):
 
     def __iter__(self):
         return self
+
+
+class RawEncoderMixIn(object):
+    """
+    Writes every value in full for L{pyamf.encode_raw}. The context of the
+    encoder must never find a reference.
+
+    @ivar ancestors: The ids of the elements that are being written.
+    @since: 0.7
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.ancestors = set()
+
+        super(RawEncoderMixIn, self).__init__(*args, **kwargs)
+
+    def writeElement(self, data):
+        key = id(data)
+
+        if key in self.ancestors:
+            raise pyamf.EncodeError('Unable to encode a reference cycle '
+                'through %r' % (type(data),))
+
+        self.ancestors.add(key)
+
+        try:
+            super(RawEncoderMixIn, self).writeElement(data)
+        finally:
+            self.ancestors.discard(key)
+
+    def getReferences(self):
+        """
+        Returns the number of references the encoded data adds to the
+        reference tables, see L{pyamf.RawAMF.references}.
+        """
+        return self.context.checkpoint()
+
+
+class CodecPool(object):
+    """
+    A thread safe pool of warm encoders and decoders for one AMF encoding.
+
+    Setting up a codec (its context, reference collections, type function
+    cache and any embedded AMF3 codec) is measurable when handling many
+    small requests. Pooled codecs are L{reset<_Codec.reset>} when acquired
+    so their contexts are cleared but their caches are kept.
+
+    Use L{pyamf.codec_pool} to get the shared pool for an encoding.
+
+    @ivar size: The maximum number of idle encoders (and decoders) kept.
+    @type size: C{int}
+    @since: 0.7
+    """
+
+    size = 16
+
+    def __init__(self, encoding, size=None):
+        self.encoding = encoding
+
+        if size is not None:
+            self.size = size
+
+        self.encoders = []
+        self.decoders = []
+        self.lock = threading.Lock()
+
+    def _acquire(self, idle, factory, args, kwargs):
+        self.lock.acquire()
+
+        try:
+            if not idle:
+                codec = None
+            else:
+                codec = idle.pop()
+        finally:
+            self.lock.release()
+
+        if codec is None:
+            return factory(self.encoding, *args, **kwargs)
+
+        codec.reset(*args, **kwargs)
+
+        return codec
+
+    def acquireEncoder(self, *args, **kwargs):
+        """
+        Returns an encoder, accepting the same arguments as
+        L{pyamf.get_encoder}. Hand it back with L{release} when done.
+        """
+        return self._acquire(self.encoders, pyamf.get_encoder, args, kwargs)
+
+    def acquireDecoder(self, *args, **kwargs):
+        """
+        Returns a decoder, accepting the same arguments as
+        L{pyamf.get_decoder}. Hand it back with L{release} when done.
+        """
+        return self._acquire(self.decoders, pyamf.get_decoder, args, kwargs)
+
+    def release(self, codec):
+        """
+        Returns C{codec} to the pool. It is L{reset<_Codec.reset>} to an
+        empty stream and no sink so that the pool does not keep the
+        encoded/decoded objects, the bytes or the destination alive. The
+        codec must not be used afterwards.
+        """
+        codec.reset()
+
+        if hasattr(codec, 'writeElement'):
+            idle = self.encoders
+        else:
+            idle = self.decoders
+
+        self.lock.acquire()
+
+        try:
+            if len(idle) < self.size:
+                idle.append(codec)
+        finally:
+            self.lock.release()
+
+
+class Stats(object):
+    """
+    Element counts, bytes and cumulative time collected by instrumented
+    codecs (see L{Encoder.enableStats} and L{enable_stats}).
+
+    Every element is counted against its AMF type marker. The bytes and time
+    of a type exclude the elements nested inside it, so the figures of all
+    the types add up to the totals of the stream. Typed objects are also
+    counted against their class alias, including the elements nested inside
+    them.
+
+    @ivar types: C{[count, bytes, time]} by type marker name (e.g.
+        C{'TYPE_STRING'}).
+    @type types: C{dict}
+    @ivar aliases: C{[count, bytes, time]} by class alias.
+    @type aliases: C{dict}
+    @since: 0.7
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        self.clear()
+
+    def clear(self):
+        """
+        Forgets all of the collected figures.
+        """
+        self.types = {}
+        self.aliases = {}
+
+    def add(self, other):
+        """
+        Adds the figures of the L{Stats} C{other} to this instance.
+        """
+        self.lock.acquire()
+
+        try:
+            for mine, theirs in ((self.types, other.types),
+                    (self.aliases, other.aliases)):
+                for key, (count, size, elapsed) in theirs.iteritems():
+                    try:
+                        entry = mine[key]
+                    except KeyError:
+                        mine[key] = [count, size, elapsed]
+
+                        continue
+
+                    entry[0] += count
+                    entry[1] += size
+                    entry[2] += elapsed
+        finally:
+            self.lock.release()
+
+    def getSnapshot(self):
+        """
+        Returns a copy of the collected figures as C{{'types': {name:
+        {'count': int, 'bytes': int, 'time': float}}, 'aliases': {...}}}.
+        C{time} is in seconds.
+        """
+        ret = {}
+
+        self.lock.acquire()
+
+        try:
+            for name, figures in (('types', self.types),
+                    ('aliases', self.aliases)):
+                ret[name] = dict([(key, {
+                    'count': count,
+                    'bytes': size,
+                    'time': elapsed
+                }) for key, (count, size, elapsed) in figures.iteritems()])
+        finally:
+            self.lock.release()
+
+        return ret
+
+
+class Recorder(object):
+    """
+    Collects the statistics of a single codec. The codec calls L{enter}
+    before and L{leave} after each element.
+
+    The figures of each top level element are added to the L{Stats} of the
+    codec and, while L{enable_stats} is on, to the process wide figures.
+
+    @ivar stats: The figures of the codec.
+    @type stats: L{Stats}
+    @ivar frames: The elements that are being encoded or decoded, each as
+        C{[offset, marker, nested bytes, nested time, start time]}.
+    @ivar base: The number of bytes that have been flushed from the stream of
+        an encoder.
+    """
+
+    timer = staticmethod(timeit.default_timer)
+
+    def __init__(self, encoding, stats):
+        self.encoding = encoding
+        self.stats = stats
+        self.names, self.objects = _get_markers(encoding)
+        self.pending = Stats()
+        self.classes = {}
+
+        self.reset()
+
+    def reset(self):
+        """
+        Forgets any unfinished elements, ready for a new stream.
+        """
+        self.frames = []
+        self.base = 0
+        self.pending.clear()
+
+    def enter(self, pos, marker=None):
+        """
+        Starts an element at C{pos} in the stream. Encoders cannot supply the
+        C{marker} as it is not written yet.
+        """
+        self.frames.append([self.base + pos, marker, 0, 0.0, self.timer()])
+
+    def abort(self):
+        """
+        The current element failed.
+        """
+        self.frames.pop()
+
+        if not self.frames:
+            self.pending.clear()
+
+    def leave(self, stream, obj):
+        """
+        Finishes the current element, C{obj}, with C{stream} positioned just
+        past it.
+        """
+        now = self.timer()
+        frames = self.frames
+        start, marker, nested, nested_time, started = frames.pop()
+
+        size = self.base + stream.tell() - start
+        elapsed = now - started
+        own = size - nested
+
+        if own <= 0:
+            # wrote nothing of its own (e.g. a generator), its nested
+            # elements belong to the enclosing one
+            size, elapsed = nested, nested_time
+        else:
+            if marker is None:
+                marker = self._peek(stream, start - self.base)
+
+            self._record(self.pending.types, self.names.get(marker, marker),
+                own, elapsed - nested_time)
+
+            if marker in self.objects:
+                alias = self.getAlias(obj)
+
+                if alias:
+                    self._record(self.pending.aliases, alias, size, elapsed)
+
+        if frames:
+            parent = frames[-1]
+            parent[2] += size
+            parent[3] += elapsed
+
+            return
+
+        self.stats.add(self.pending)
+
+        if _stats_enabled:
+            get_stats(self.encoding).add(self.pending)
+
+        self.pending.clear()
+
+    def flushed(self, stream):
+        """
+        The encoder is about to move the contents of C{stream} to its sink.
+        """
+        for frame in self.frames:
+            if frame[1] is None:
+                frame[1] = self._peek(stream, frame[0] - self.base)
+
+        self.base += len(stream)
+
+    def getAlias(self, obj):
+        """
+        Returns the class alias of C{obj} or C{None} if it is anonymous.
+        """
+        klass = obj.__class__
+
+        try:
+            return self.classes[klass]
+        except KeyError:
+            pass
+
+        if klass is pyamf.TypedObject:
+            return obj.alias
+
+        try:
+            alias = pyamf.get_class_alias(klass).alias or None
+        except (pyamf.UnknownClassAlias, TypeError):
+            alias = None
+
+        self.classes[klass] = alias
+
+        return alias
+
+    def _peek(self, stream, offset):
+        if offset < 0 or offset >= len(stream):
+            # nothing written yet
+            return None
+
+        pos = stream.tell()
+
+        stream.seek(offset)
+
+        try:
+            return stream.read(1)
+        finally:
+            stream.seek(pos)
+
+    def _record(self, figures, key, size, elapsed):
+        try:
+            entry = figures[key]
+        except KeyError:
+            figures[key] = [1, size, elapsed]
+
+            return
+
+        entry[0] += 1
+        entry[1] += size
+        entry[2] += elapsed
+
+
+#: Process wide L{Stats} by AMF encoding.
+_stats = {}
+_stats_enabled = False
+_markers = {}
+
+
+def _get_markers(encoding):
+    """
+    Returns the names of the type markers of C{encoding} and the markers of
+    typed objects.
+    """
+    try:
+        return _markers[encoding]
+    except KeyError:
+        pass
+
+    if encoding == pyamf.AMF0:
+        from pyamf import amf0 as module
+
+        objects = (module.TYPE_OBJECT, module.TYPE_TYPEDOBJECT)
+    elif encoding == pyamf.AMF3:
+        from pyamf import amf3 as module
+
+        objects = (module.TYPE_OBJECT,)
+    else:
+        raise ValueError("Unknown encoding %r" % (encoding,))
+
+    names = dict([(value, name) for name, value in vars(module).items()
+        if name.startswith('TYPE_')])
+
+    _markers[encoding] = names, objects
+
+    return names, objects
+
+
+def enable_stats(enabled=True):
+    """
+    Turns the process wide codec statistics on or off. While on, every
+    encoder and decoder that is created (or L{reset<_Codec.reset>}) is
+    instrumented and adds its figures to L{get_stats}.
+
+    Instrumentation slows the codecs down, the codecs pay nothing for it while
+    it is off.
+
+    @since: 0.7
+    """
+    global _stats_enabled
+
+    _stats_enabled = bool(enabled)
+
+
+def get_stats(encoding):
+    """
+    Returns the process wide L{Stats} of C{encoding}.
+
+    @since: 0.7
+    """
+    try:
+        return _stats[encoding]
+    except KeyError:
+        _get_markers(encoding)
+
+        return _stats.setdefault(encoding, Stats())
+
+
+def check_stats(codec):
+    """
+    Instruments C{codec} if the process wide statistics are on.
+    """
+    if _stats_enabled and codec.recorder is None:
+        codec.enableStats()
@@ -19,6 +19,7 @@ func_types = (
 class_types = [type]
 int_types = [int]
 str_types = [str]
+buffer_types = []
 
 try:
     int_types.append(long)
@@ -35,10 +36,21 @@ try:
 except:
     pass
 
+for _name in ('buffer', 'bytearray', 'memoryview'):
+    try:
+        buffer_types.append(getattr(builtins, _name))
+    except AttributeError:
+        pass
+
+del _name
+
 
 int_types = tuple(int_types)
 str_types = tuple(str_types)
 class_types = tuple(class_types)
+#: Types that expose the buffer interface that can be read without copying.
+#: @since: 0.7
+buffer_types = tuple(buffer_types)
 
 PosInf = 1e300000
 NegInf = -1e300000
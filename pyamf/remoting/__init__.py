@@ -30,7 +30,8 @@ import pyamf
 from pyamf import util
 
 
-__all__ = ['Envelope', 'Request', 'Response', 'decode', 'encode']
+__all__ = ['Envelope', 'Request', 'Response', 'decode', 'encode',
+    'IncrementalDecoder']
 
 #: Succesful call.
 STATUS_OK = 0
@@ -373,6 +374,15 @@ def _read_header(stream, decoder, strict=False):
     return (name, required, data)
 
 
+def _skip_header(stream):
+    """
+    Moves past the name, required flag and length of a header.
+    """
+    stream.seek(stream.read_ushort(), 1)
+    stream.read_uchar()
+    stream.read_ulong()
+
+
 def _write_header(name, header, required, stream, encoder, strict=False):
     """
     Write AMF message header.
@@ -391,6 +401,12 @@ def _write_header(name, header, required, stream, encoder, strict=False):
     stream.write_utf8_string(name)
 
     stream.write_uchar(required)
+
+    if strict and encoder.sink is not None:
+        encoder.sink.writeWithLength(encoder, encoder.writeElement, header)
+
+        return
+
     write_pos = stream.tell()
 
     stream.write_ulong(0)
@@ -404,6 +420,15 @@ def _write_header(name, header, required, stream, encoder, strict=False):
         stream.seek(new_pos)
 
 
+def _skip_body(stream):
+    """
+    Moves past the target, response and length of a body.
+    """
+    stream.seek(stream.read_ushort(), 1)
+    stream.seek(stream.read_ushort(), 1)
+    stream.read_ulong()
+
+
 def _read_body(stream, decoder, strict=False, logger=None):
     """
     Read an AMF message body from the stream.
@@ -527,6 +552,11 @@ def _write_body(name, message, stream, encoder, strict=False):
 
         return
 
+    if encoder.sink is not None:
+        encoder.sink.writeWithLength(encoder, _encode_body, message)
+
+        return
+
     write_pos = stream.tell()
     stream.write_ulong(0)
     old_pos = stream.tell()
@@ -578,9 +608,17 @@ def get_fault(data):
     return get_fault_class(level, **e)(**e)
 
 
-def decode(stream, strict=False, logger=None, timezone_offset=None):
+def decode(stream, strict=False, logger=None, timezone_offset=None,
+           lazy=False):
     """
-    Decodes the incoming stream as a remoting message.
+    Decodes the incoming stream as a remoting message. The decoder is taken
+    from (and returned to) L{pyamf.codec_pool}.
+
+    In C{lazy} mode AMF3 arrays and objects (e.g. the Flex messages in the
+    bodies) are returned as L{LazyProxy<pyamf.amf3.LazyProxy>} instances that
+    decode their members on first access. This is useful to inspect a few
+    fields (such as C{destination} and C{operation}) without decoding the
+    whole request.
 
     @type stream: L{BufferedByteStream<pyamf.util.BufferedByteStream>}
     @param strict: Enforce strict decoding. Default is C{False}.
@@ -594,6 +632,9 @@ def decode(stream, strict=False, logger=None, timezone_offset=None):
         this is required for legacy systems.
     @type timezone_offset: U{datetime.datetime.timedelta<http://
         docs.python.org/library/datetime.html#datetime.timedelta>}
+    @param lazy: Decode AMF3 arrays and objects on first access. Introduced
+        in 0.7.
+    @type lazy: C{bool}
 
     @return: Message L{envelope<Envelope>}.
     @rtype: L{Envelope}
@@ -613,27 +654,40 @@ def decode(stream, strict=False, logger=None, timezone_offset=None):
         raise pyamf.DecodeError("Malformed stream (amfVersion=%d)" %
             msg.amfVersion)
 
-    decoder = pyamf.get_decoder(pyamf.AMF0, stream, strict=strict,
-        timezone_offset=timezone_offset)
+    if lazy:
+        # lazy decoders are not pooled, the proxies refer to them
+        pool = None
+        decoder = pyamf.get_decoder(pyamf.AMF0, stream, strict=strict,
+            timezone_offset=timezone_offset, lazy=True)
+    else:
+        pool = pyamf.codec_pool(pyamf.AMF0)
+        decoder = pool.acquireDecoder(stream, strict=strict,
+            timezone_offset=timezone_offset)
+
     context = decoder.context
 
     decoder.use_amf3 = msg.amfVersion == pyamf.AMF3
-    header_count = stream.read_ushort()
 
-    for i in xrange(header_count):
-        name, required, data = _read_header(stream, decoder, strict)
-        msg.headers[name] = data
+    try:
+        header_count = stream.read_ushort()
+
+        for i in xrange(header_count):
+            name, required, data = _read_header(stream, decoder, strict)
+            msg.headers[name] = data
 
-        if required:
-            msg.headers.set_required(name)
+            if required:
+                msg.headers.set_required(name)
 
-    body_count = stream.read_short()
+        body_count = stream.read_short()
 
-    for i in xrange(body_count):
-        context.clear()
+        for i in xrange(body_count):
+            context.clear()
 
-        target, payload = _read_body(stream, decoder, strict, logger)
-        msg[target] = payload
+            target, payload = _read_body(stream, decoder, strict, logger)
+            msg[target] = payload
+    finally:
+        if pool is not None:
+            pool.release(decoder)
 
     if strict and stream.remaining() > 0:
         raise RuntimeError("Unable to fully consume the buffer")
@@ -644,10 +698,235 @@ def decode(stream, strict=False, logger=None, timezone_offset=None):
     return msg
 
 
-def encode(msg, strict=False, logger=None, timezone_offset=None):
+class IncrementalDecoder(object):
+    """
+    A push parser for remoting envelopes that arrive piecemeal, e.g. from a
+    socket.
+
+    Data is passed to L{feed}, which returns the bodies that it completed so
+    that each can be handled before the rest of the envelope has arrived.
+    The structure of each header and body is scanned as data arrives so that
+    it is decoded exactly once and consumed bytes are discarded, bounding
+    memory use by the largest body rather than by the whole envelope.
+
+    @ivar envelope: The envelope decoded so far. The headers are complete
+        once the first body has been returned.
+    @type envelope: L{Envelope}
+    @since: 0.7
+    """
+
+    PREAMBLE, HEADERS, BODY_COUNT, BODIES, DONE = range(5)
+
+    def __init__(self, strict=False, logger=None, timezone_offset=None):
+        from pyamf.amf0 import Scanner
+
+        self.strict = strict
+        self.logger = logger
+
+        self.stream = util.BufferedByteStream()
+        self.decoder = pyamf.get_decoder(pyamf.AMF0, self.stream,
+            strict=strict, timezone_offset=timezone_offset)
+        self.scanner = Scanner(self.decoder.context)
+
+        self.envelope = Envelope()
+        self.state = self.PREAMBLE
+        self.remaining = 0
+
+        # the offset of the data of the header or body in flight, if known
+        self._data = None
+        self._opaque = False
+        self._needed = 0
+
+    def done(self):
+        """
+        Whether the whole envelope has been decoded.
+        """
+        return self.state == self.DONE
+
+    def feed(self, data):
+        """
+        Adds C{data} to the decode buffer.
+
+        @return: A C{list} of C{(name, message)} tuples for the bodies that
+            were completed by C{data}.
+        @raise DecodeError: The envelope is malformed.
+        """
+        stream = self.stream
+        stream.append(data)
+
+        bodies = []
+
+        while self.state != self.DONE:
+            if self.state == self.PREAMBLE:
+                if stream.remaining() < 4:
+                    break
+
+                self.envelope.amfVersion = stream.read_ushort()
+
+                if self.envelope.amfVersion > 0x09:
+                    raise pyamf.DecodeError("Malformed stream "
+                        "(amfVersion=%d)" % (self.envelope.amfVersion,))
+
+                self.decoder.use_amf3 = \
+                    self.envelope.amfVersion == pyamf.AMF3
+                self.remaining = stream.read_ushort()
+                self.state = self.HEADERS
+            elif self.state == self.HEADERS:
+                if not self.remaining:
+                    self.state = self.BODY_COUNT
+
+                    continue
+
+                header = self._readPart(_skip_header, _read_header)
+
+                if header is None:
+                    break
+
+                name, required, data = header
+                self.envelope.headers[name] = data
+
+                if required:
+                    self.envelope.headers.set_required(name)
+
+                self.remaining -= 1
+            elif self.state == self.BODY_COUNT:
+                if stream.remaining() < 2:
+                    break
+
+                self.remaining = stream.read_short()
+                self.state = self.BODIES
+            elif self.state == self.BODIES:
+                if self.remaining <= 0:
+                    self.state = self.DONE
+
+                    continue
+
+                body = self._readPart(_skip_body, self._readBody, True)
+
+                if body is None:
+                    break
+
+                self.envelope[body[0]] = body[1]
+                bodies.append(body)
+                self.remaining -= 1
+
+        consumed = stream.tell()
+
+        if consumed > 0:
+            stream.consume()
+
+            self.scanner.offset -= consumed
+
+            if self._data is not None:
+                self._data -= consumed
+
+            if self._needed:
+                self._needed -= consumed
+
+        return bodies
+
+    def _attempt(self, func):
+        """
+        Calls C{func} to decode the next part of the envelope, rewinding the
+        stream and the context if it is incomplete.
+
+        @return: The result of C{func} or C{None}.
+        """
+        stream = self.stream
+        context = self.decoder.context
+        checkpoint = context.checkpoint()
+        pos = stream.tell()
+
+        try:
+            return func(stream, self.decoder, self.strict)
+        except (IOError, pyamf.EOStream):
+            context.rollback(checkpoint)
+            stream.seek(pos)
+
+            return None
+
+    def _readBody(self, stream, decoder, strict):
+        return _read_body(stream, decoder, strict, self.logger)
+
+    def _readPart(self, skip, read, clear=False):
+        """
+        Decodes the next header or body once all of it has arrived.
+
+        @param skip: Moves past the fields that precede the data of the part,
+            raising C{IOError} if they are incomplete.
+        @param read: Decodes the part, e.g. L{_read_body}.
+        @param clear: Whether the part has its own reference tables.
+        @return: The result of C{read} or C{None}.
+        """
+        stream = self.stream
+        pos = stream.tell()
+
+        if self._data is None:
+            try:
+                skip(stream)
+            except IOError:
+                stream.seek(pos)
+
+                return None
+
+            if stream.tell() > len(stream):
+                stream.seek(pos)
+
+                return None
+
+            self._data = stream.tell()
+            stream.seek(pos)
+
+            if clear:
+                self.decoder.context.clear()
+                self.scanner.clear()
+
+        if not self._opaque:
+            stream.seek(self._data)
+
+            try:
+                end = self.scanner.scan(stream)
+            finally:
+                stream.seek(pos)
+
+            if end is None:
+                return None
+
+            self._opaque = end == -1
+
+        if self._opaque:
+            if len(stream) < self._needed:
+                return None
+
+            part = self._attempt(read)
+
+            if part is None:
+                self._needed = len(stream) + 1
+
+                return None
+        else:
+            part = read(stream, self.decoder, self.strict)
+
+        self.scanner.reset()
+        self._data = None
+        self._opaque = False
+        self._needed = 0
+
+        return part
+
+
+def encode(msg, strict=False, logger=None, timezone_offset=None, sink=None,
+           chunk_size=None):
     """
     Encodes and returns the L{msg<Envelope>} as an AMF stream.
 
+    If C{sink} is supplied, the encoded message is written to it in chunks of
+    C{chunk_size} bytes as encoding proceeds rather than being built in
+    memory (see L{pyamf.codec.Sink}). In strict mode each header and body is
+    encoded twice so that its length can be written up front.
+
+    The encoder is taken from (and returned to) L{pyamf.codec_pool}.
+
     @param strict: Enforce strict encoding. Default is C{False}. Specifically
         header/body lengths will be written correctly, instead of the default 0.
         Default is C{False}. Introduced in 0.4.
@@ -661,29 +940,42 @@ def encode(msg, strict=False, logger=None, timezone_offset=None):
         this is required for legacy systems.
     @type timezone_offset: U{datetime.datetime.timedelta<http://
         docs.python.org/library/datetime.html#datetime.timedelta>}
-    @rtype: L{BufferedByteStream<pyamf.util.BufferedByteStream>}
+    @param sink: A file like object, socket or callable that will receive the
+        encoded bytes.
+    @param chunk_size: The size of the chunks written to C{sink}.
+    @rtype: L{BufferedByteStream<pyamf.util.BufferedByteStream>} or, if
+        C{sink} was supplied, the number of bytes written to it.
     """
     stream = util.BufferedByteStream()
 
-    encoder = pyamf.get_encoder(pyamf.AMF0, stream, strict=strict,
-        timezone_offset=timezone_offset)
+    pool = pyamf.codec_pool(pyamf.AMF0)
+    encoder = pool.acquireEncoder(stream, strict=strict,
+        timezone_offset=timezone_offset, sink=sink, chunk_size=chunk_size)
 
     if msg.amfVersion == pyamf.AMF3:
         encoder.use_amf3 = True
 
-    stream.write_ushort(msg.amfVersion)
-    stream.write_ushort(len(msg.headers))
+    try:
+        stream.write_ushort(msg.amfVersion)
+        stream.write_ushort(len(msg.headers))
+
+        for name, header in msg.headers.iteritems():
+            _write_header(name, header, int(msg.headers.is_required(name)),
+                stream, encoder, strict)
+
+        stream.write_short(len(msg))
 
-    for name, header in msg.headers.iteritems():
-        _write_header(name, header, int(msg.headers.is_required(name)),
-            stream, encoder, strict)
+        for name, message in msg.iteritems():
+            encoder.context.clear()
 
-    stream.write_short(len(msg))
+            _write_body(name, message, stream, encoder, strict)
 
-    for name, message in msg.iteritems():
-        encoder.context.clear()
+        if encoder.sink is not None:
+            encoder.flush()
 
-        _write_body(name, message, stream, encoder, strict)
+            return encoder.sink.written
+    finally:
+        pool.release(encoder)
 
     stream.seek(0)
 
@@ -7,26 +7,27 @@ Remoting client implementation.
 @since: 0.1
 """
 
+import sys
+import threading
 import urllib2
 import urlparse
 
 import pyamf
 from pyamf import remoting
+from pyamf.remoting.client import pool
 
 try:
-    from gzip import GzipFile
+    import zlib
 except ImportError:
-    GzipFile = False
-
-try:
-    from cStringIO import StringIO
-except ImportError:
-    from StringIO import StringIO
+    zlib = None
 
 
 #: Default user agent is `PyAMF/x.x(.x)`.
 DEFAULT_USER_AGENT = 'PyAMF/%s' % (pyamf.version,)
 
+#: The number of bytes of the response that are read and decoded at a time.
+READ_SIZE = 65536
+
 
 class ServiceMethodProxy(object):
     """
@@ -79,7 +80,9 @@ class ServiceProxy(object):
         is called, the AMF request is immediately sent to the remote gateway
         and a response is returned. If set to C{False}, a L{RequestWrapper}
         is returned, waiting for the underlying gateway to fire the
-        L{execute <RemotingService.execute>} method.
+        L{execute <RemotingService.execute>} method. If the gateway coalesces
+        calls, a L{RequestWrapper} is returned that is sent with the other
+        calls made within the window, see L{RequestWrapper.wait}.
     @type _auto_execute: C{bool}
     """
 
@@ -96,6 +99,11 @@ class ServiceProxy(object):
         Executed when a L{ServiceMethodProxy} is called. Adds a request to the
         underlying gateway.
         """
+        coalescer = getattr(self._gw, 'coalescer', None)
+
+        if self._auto_execute and coalescer is not None:
+            return coalescer.addRequest(method_proxy, *args)
+
         request = self._gw.addRequest(method_proxy, *args)
 
         if self._auto_execute:
@@ -147,6 +155,9 @@ class RequestWrapper(object):
         self.service = service
         self.args = args
 
+        self.exc_info = None
+        self.finished = threading.Event()
+
     def __str__(self):
         return str(self.id)
 
@@ -154,12 +165,62 @@ class RequestWrapper(object):
         """
         A response has been received by the gateway.
         """
-        self.response = response
-        self.result = self.response.body
+        self._finish(response)
 
         if isinstance(self.result, remoting.ErrorFault):
             self.result.raiseException()
 
+    def _finish(self, response):
+        """
+        Stores C{response} without raising its fault, see L{wait}.
+        """
+        self.response = response
+        self.result = self.response.body
+        self.finished.set()
+
+    def setError(self, exc_info):
+        """
+        The request could not be sent, C{exc_info} is raised by L{wait}.
+
+        @since: 0.7
+        """
+        self.exc_info = exc_info
+        self.finished.set()
+
+    def done(self):
+        """
+        Whether the response (or an error) has been received.
+
+        @since: 0.7
+        """
+        return self.finished.isSet()
+
+    def wait(self, timeout=None):
+        """
+        Blocks until the response has been received and returns its body.
+
+        @param timeout: The number of seconds to wait, forever by default.
+        @raise RuntimeError: No response within C{timeout} seconds.
+        @raise RemotingError: The remote call failed.
+        @since: 0.7
+        """
+        self.finished.wait(timeout)
+
+        if not self.finished.isSet():
+            raise RuntimeError('No response to %s within %r seconds' % (
+                self.id, timeout))
+
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+
+        if getattr(self.response, 'status', None) == remoting.STATUS_ERROR:
+            if hasattr(self.result, 'raiseException'):
+                self.result.raiseException()
+
+            raise remoting.RemotingError
+
+        return self.result
+
     def _get_result(self):
         """
         Returns the result of the called remote request. If the request has not
@@ -177,6 +238,108 @@ class RequestWrapper(object):
     result = property(_get_result, _set_result)
 
 
+class Coalescer(object):
+    """
+    Merges the calls made through a L{RemotingService} into one envelope.
+
+    The pending calls are sent when C{window} seconds have passed since the
+    first of them, when there are C{size} of them or when L{flush} is
+    called. Calls may be made from any thread.
+
+    @ivar gw: The underlying gateway.
+    @type gw: L{RemotingService}
+    @ivar window: The number of seconds a call waits for others to join it.
+        C{None} waits for C{size} calls or L{flush}.
+    @type window: C{float}
+    @ivar size: The maximum number of calls in one envelope.
+    @type size: C{int}
+    @since: 0.7
+    """
+
+    def __init__(self, gw, window=None, size=None):
+        self.gw = gw
+        self.window = window
+        self.size = size
+
+        self.requests = []
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def addRequest(self, service, *args):
+        """
+        Queues a call of C{service}.
+
+        @return: The pending request.
+        @rtype: L{RequestWrapper}
+        """
+        flush = False
+
+        self.lock.acquire()
+
+        try:
+            wrapper = self.gw.request_class(self.gw,
+                '/%d' % self.gw.request_number, service, *args)
+
+            self.gw.request_number += 1
+            self.requests.append(wrapper)
+
+            if self.size is not None and len(self.requests) >= self.size:
+                flush = True
+            elif self.window is not None and self.timer is None:
+                self.timer = threading.Timer(self.window, self.flush)
+                self.timer.setDaemon(True)
+                self.timer.start()
+        finally:
+            self.lock.release()
+
+        if self.gw.logger:
+            self.gw.logger.debug('Coalescing request %s%r', service, args)
+
+        if flush:
+            self.flush()
+
+        return wrapper
+
+    def flush(self):
+        """
+        Sends the pending calls in one envelope and hands each
+        L{RequestWrapper} its response.
+        """
+        self.lock.acquire()
+
+        try:
+            requests, self.requests = self.requests, []
+            timer, self.timer = self.timer, None
+        finally:
+            self.lock.release()
+
+        if timer is not None:
+            timer.cancel()
+
+        if not requests:
+            return
+
+        try:
+            envelope = self.gw._execute(requests)
+        except:
+            exc_info = sys.exc_info()
+
+            for request in requests:
+                if not request.done():
+                    request.setError(exc_info)
+
+            return
+
+        for request in requests:
+            if request.done():
+                continue
+
+            try:
+                envelope[request.id]
+            except KeyError:
+                request.setError(sys.exc_info())
+
+
 class RemotingService(object):
     """
     Acts as a client for AMF calls.
@@ -205,11 +368,22 @@ class RemotingService(object):
     @ivar strict: Whether to use strict AMF en/decoding or not.
     @type strict: C{boolean}
     @ivar opener: The function used to power the connection to the remote
-        server. Defaults to U{urllib2.urlopen<http://
-        docs.python.org/library/urllib2.html#urllib2.urlopen>}.
+        server. Defaults to the C{open} method of a C{urllib2} opener that
+        keeps the connections to the server open between calls, see
+        L{pool.build_opener}.
     @type opener: C{function}
+    @ivar pool: The idle connections used by the default opener. Defaults to
+        L{pool.DEFAULT_POOL}, which is shared by all services.
+    @type pool: L{pool.ConnectionPool}
+    @ivar coalescer: Merges the calls of auto executing services into one
+        envelope. Enabled by the C{coalesce_window} (seconds) and/or
+        C{coalesce_size} (number of calls) arguments, C{None} otherwise.
+    @type coalescer: L{Coalescer}
     """
 
+    #: The class that wraps each request, see L{addRequest}.
+    request_class = RequestWrapper
+
     def __init__(self, url, amf_version=pyamf.AMF0, **kwargs):
         self.original_url = url
         self.amf_version = amf_version
@@ -224,11 +398,23 @@ class RemotingService(object):
         self.referer = kwargs.pop('referer', None)
         self.strict = kwargs.pop('strict', False)
         self.logger = kwargs.pop('logger', None)
-        self.opener = kwargs.pop('opener', urllib2.urlopen)
+        self.pool = kwargs.pop('pool', pool.DEFAULT_POOL)
+        self.opener = kwargs.pop('opener', None)
+
+        coalesce_window = kwargs.pop('coalesce_window', None)
+        coalesce_size = kwargs.pop('coalesce_size', None)
 
         if kwargs:
             raise TypeError('Unexpected keyword arguments %r' % (kwargs,))
 
+        if self.opener is None:
+            self.opener = pool.build_opener(self.pool).open
+
+        self.coalescer = None
+
+        if coalesce_window is not None or coalesce_size is not None:
+            self.coalescer = Coalescer(self, coalesce_window, coalesce_size)
+
         self._setUrl(url)
 
     def _setUrl(self, url):
@@ -306,7 +492,7 @@ class RemotingService(object):
         """
         Adds a request to be sent to the remoting gateway.
         """
-        wrapper = RequestWrapper(self, '/%d' % self.request_number,
+        wrapper = self.request_class(self, '/%d' % self.request_number,
             service, *args)
 
         self.request_number += 1
@@ -370,6 +556,10 @@ class RemotingService(object):
             'User-Agent': self.user_agent
         })
 
+        if zlib is not None:
+            # the response is decompressed as it is decoded
+            headers['Accept-Encoding'] = 'gzip, deflate'
+
         if self.referer is not None:
             headers['Referer'] = self.referer
 
@@ -385,15 +575,7 @@ class RemotingService(object):
 
         self.removeRequest(request)
 
-        body = remoting.encode(self.getAMFRequest([request]), strict=self.strict)
-
-        http_request = urllib2.Request(self._root_url, body.getvalue(),
-            self._get_execute_headers())
-
-        if self.proxy_args:
-            http_request.set_proxy(*self.proxy_args)
-
-        envelope = self._getResponse(http_request)
+        envelope = self._execute([request])
 
         return envelope[request.id]
 
@@ -407,6 +589,22 @@ class RemotingService(object):
         for r in requests:
             self.removeRequest(r)
 
+        return self._execute(requests)
+
+    def flush(self):
+        """
+        Sends the calls waiting to be coalesced, see L{Coalescer.flush}.
+
+        @since: 0.7
+        """
+        if self.coalescer is not None:
+            self.coalescer.flush()
+
+    def _execute(self, requests):
+        """
+        Sends C{requests} in one envelope and returns the response envelope.
+        Each request is handed its response as soon as it has been decoded.
+        """
         body = remoting.encode(self.getAMFRequest(requests),
             strict=self.strict)
 
@@ -416,13 +614,20 @@ class RemotingService(object):
         if self.proxy_args:
             http_request.set_proxy(*self.proxy_args)
 
-        envelope = self._getResponse(http_request)
+        envelope = self._getResponse(http_request, requests)
 
         return envelope
 
-    def _getResponse(self, http_request):
+    def _getResponse(self, http_request, requests=None):
         """
         Gets and handles the HTTP response from the remote gateway.
+
+        The response is decoded as it is read, a body at a time, and
+        compressed responses are decompressed on the fly, so the whole body
+        is never held in memory at once.
+
+        @param requests: The L{RequestWrapper}s that are handed their
+            response as soon as it has been decoded.
         """
         if self.logger:
             self.logger.debug('Sending POST request to %s', self._root_url)
@@ -456,27 +661,82 @@ class RemotingService(object):
             raise remoting.RemotingError('Incorrect MIME type received. '
                 '(got: %s)' % (content_type,))
 
-        bytes = fbh.read(int(content_length))
+        decompressor = None
 
-        if self.logger:
-            self.logger.debug('Read %d bytes for the response', len(bytes))
+        if content_encoding:
+            content_encoding = content_encoding.strip().lower()
 
-        if content_encoding and content_encoding.strip().lower() == 'gzip':
-            if not GzipFile:
+        if content_encoding in ('gzip', 'deflate'):
+            if zlib is None:
                 raise remoting.RemotingError(
                     'Decompression of Content-Encoding: %s not available.' % (
                         content_encoding,))
 
-            compressedstream = StringIO(bytes)
-            gzipper = GzipFile(fileobj=compressedstream)
-            bytes = gzipper.read()
-            gzipper.close()
+            if content_encoding == 'gzip':
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            else:
+                decompressor = zlib.decompressobj()
+
+        decoder = remoting.IncrementalDecoder(strict=self.strict)
+        waiting = dict([(r.id, r) for r in requests or []])
 
-        response = remoting.decode(bytes, strict=self.strict)
+        remaining = int(content_length)
+        read = 0
+
+        while remaining != 0:
+            if remaining > 0:
+                bytes = fbh.read(min(remaining, READ_SIZE))
+                remaining -= len(bytes)
+            else:
+                bytes = fbh.read(READ_SIZE)
+
+            if not bytes:
+                break
+
+            read += len(bytes)
+
+            if decompressor is not None:
+                try:
+                    bytes = decompressor.decompress(bytes)
+                except zlib.error, e:
+                    raise IOError(str(e))
+
+            self._decodeResponse(decoder, bytes, waiting)
+
+        if decompressor is not None:
+            self._decodeResponse(decoder, decompressor.flush(), waiting)
+
+        if self.logger:
+            self.logger.debug('Read %d bytes for the response', read)
+
+        if not decoder.done():
+            raise IOError('Incomplete remoting envelope')
+
+        response = decoder.envelope
 
         if self.logger:
             self.logger.debug('Response: %s', response)
 
+        self._handleResponseHeaders(response)
+
+        return response
+
+    def _decodeResponse(self, decoder, bytes, waiting):
+        """
+        Decodes the next part of the response and hands the completed bodies
+        to the requests in C{waiting}.
+        """
+        for name, message in decoder.feed(bytes):
+            request = waiting.pop(name, None)
+
+            if request is not None:
+                request._finish(message)
+
+    def _handleResponseHeaders(self, response):
+        """
+        Applies the gateway URL and persistent header changes requested by
+        the headers of the C{response} envelope.
+        """
         if remoting.APPEND_TO_GATEWAY_URL in response.headers:
             self.original_url += response.headers[remoting.APPEND_TO_GATEWAY_URL]
 
@@ -493,8 +753,6 @@ class RemotingService(object):
             for k, v in data.iteritems():
                 self.headers[k] = v
 
-        return response
-
     def setCredentials(self, username, password):
         """
         Sets authentication credentials for accessing the remote gateway.
@@ -0,0 +1,688 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Non-blocking remoting client.
+
+L{AsyncRemotingService} sends envelopes without waiting for the response, so
+one thread can have many calls to one or more gateways in flight at once.
+The sockets are driven by the C{asyncore} loop, either by calling
+L{AsyncRemotingService.run} or L{AsyncRequestWrapper.wait} or by an
+application that already runs C{asyncore.loop}::
+
+    gw = AsyncRemotingService('http://example.org/gateway')
+    service = gw.getService('reports')
+
+    calls = [service.get(i) for i in xrange(10)]
+
+    gw.run()
+
+    results = [call.wait() for call in calls]
+
+Each service keeps up to C{max_connections} persistent HTTP connections to
+its gateway. Responses are decoded as they arrive and every body is handed
+to its L{AsyncRequestWrapper} as soon as it is complete. Only C{http}
+gateways are supported.
+
+@since: 0.7
+"""
+
+import asyncore
+import socket
+import sys
+import time
+import zlib
+
+import pyamf
+from pyamf import remoting
+from pyamf.remoting import client
+from pyamf.remoting.client import pool
+
+
+#: The default number of connections that a service opens to its gateway.
+DEFAULT_MAX_CONNECTIONS = 10
+
+#: The number of bytes read from a socket at a time.
+READ_SIZE = 65536
+
+
+class AsyncRequestWrapper(client.RequestWrapper):
+    """
+    A request that is answered asynchronously.
+
+    @ivar callbacks: Called with the request once it is done.
+    @type callbacks: C{list}
+    """
+
+    def __init__(self, *args, **kwargs):
+        client.RequestWrapper.__init__(self, *args, **kwargs)
+
+        self.callbacks = []
+
+    def addCallback(self, func):
+        """
+        Calls C{func} with this request once it is done, at once if it is
+        already done.
+        """
+        if self.done():
+            func(self)
+        else:
+            self.callbacks.append(func)
+
+    def _finish(self, response):
+        client.RequestWrapper._finish(self, response)
+        self._fire()
+
+    def setError(self, exc_info):
+        client.RequestWrapper.setError(self, exc_info)
+        self._fire()
+
+    def _fire(self):
+        callbacks, self.callbacks = self.callbacks, []
+
+        for func in callbacks:
+            func(self)
+
+    def wait(self, timeout=None):
+        """
+        Runs the C{asyncore} loop until the response has been received and
+        returns its body.
+
+        @see: L{client.RequestWrapper.wait}
+        """
+        if not self.gw.run(timeout, self.done):
+            raise RuntimeError('No response to %s within %r seconds' % (
+                self.id, timeout))
+
+        return client.RequestWrapper.wait(self, 0)
+
+
+class AsyncServiceProxy(client.ServiceProxy):
+    """
+    Calls return an L{AsyncRequestWrapper} rather than the result. Auto
+    executing calls are sent immediately, each in its own envelope.
+    """
+
+    def _call(self, method_proxy, *args):
+        request = self._gw.addRequest(method_proxy, *args)
+
+        if self._auto_execute:
+            self._gw.execute_single(request)
+
+        return request
+
+
+class Call(object):
+    """
+    One envelope sent to the gateway.
+
+    @ivar requests: The requests in the envelope, by id.
+    @type requests: C{dict}
+    @ivar body: The encoded envelope.
+    @type body: C{str}
+    @ivar attempts: The number of times the envelope has been sent.
+    @type attempts: C{int}
+    """
+
+    def __init__(self, requests, body):
+        self.requests = dict([(r.id, r) for r in requests])
+        self.body = body
+        self.attempts = 0
+
+    def resolve(self, name, message):
+        """
+        Hands the response C{message} to the request C{name}.
+        """
+        request = self.requests.get(name, None)
+
+        if request is not None and not request.done():
+            request._finish(message)
+
+    def fail(self, exc_info):
+        """
+        Fails all requests that have not been answered with C{exc_info}.
+        """
+        for request in self.requests.itervalues():
+            if not request.done():
+                request.setError(exc_info)
+
+
+class ChunkedDecoder(object):
+    """
+    Decodes a C{Transfer-Encoding: chunked} HTTP body as it arrives.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.size = None
+        self.finished = False
+
+    def feed(self, data):
+        """
+        @return: The payload that C{data} completed.
+        """
+        self.buffer += data
+        ret = []
+
+        while not self.finished:
+            if self.size is None:
+                i = self.buffer.find('\r\n')
+
+                if i == -1:
+                    break
+
+                line, self.buffer = self.buffer[:i], self.buffer[i + 2:]
+                self.size = int(line.split(';', 1)[0].strip(), 16)
+
+                if self.size == 0:
+                    # ignore the trailers
+                    self.finished = True
+
+                continue
+
+            if len(self.buffer) < self.size + 2:
+                # hand on what has arrived of the chunk
+                n = min(self.size, len(self.buffer))
+                ret.append(self.buffer[:n])
+
+                self.buffer = self.buffer[n:]
+                self.size -= n
+
+                break
+
+            ret.append(self.buffer[:self.size])
+            self.buffer = self.buffer[self.size + 2:]
+            self.size = None
+
+        return ''.join(ret)
+
+
+class Connection(asyncore.dispatcher):
+    """
+    A persistent HTTP connection to the gateway of a service that sends one
+    L{Call} at a time.
+
+    @ivar service: The owning service.
+    @type service: L{AsyncRemotingService}
+    @ivar call: The call in flight.
+    @type call: L{Call} or C{None}
+    @ivar released: When the connection became idle.
+    @ivar reused: Whether the call in flight was sent over a connection that
+        had been idle.
+    """
+
+    def __init__(self, service, address):
+        asyncore.dispatcher.__init__(self, map=service.map)
+
+        self.service = service
+        self.call = None
+        self.released = None
+        self.outgoing = ''
+
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.connect(address)
+
+    def sendCall(self, call, request):
+        """
+        Sends C{request}, the HTTP request of C{call}.
+        """
+        self.call = call
+        self.reused = self.released is not None
+        self.released = None
+        self.outgoing = request
+
+        self.received = 0
+        self.buffer = ''
+        self.headers = None
+        self.length = None
+        self.chunked = None
+        self.decompressor = None
+        self.keep_alive = False
+        self.decoder = remoting.IncrementalDecoder(strict=self.service.strict,
+            logger=self.service.logger)
+
+        call.attempts += 1
+
+    def writable(self):
+        return bool(self.outgoing) or not self.connected
+
+    def handle_connect(self):
+        pass
+
+    def handle_write(self):
+        sent = self.send(self.outgoing)
+        self.outgoing = self.outgoing[sent:]
+
+    def handle_read(self):
+        data = self.recv(READ_SIZE)
+
+        if not data or self.call is None:
+            return
+
+        self.received += len(data)
+
+        try:
+            if self.headers is None:
+                self.buffer += data
+                i = self.buffer.find('\r\n\r\n')
+
+                if i == -1:
+                    return
+
+                head, data = self.buffer[:i], self.buffer[i + 4:]
+                self.buffer = ''
+                self.readHeaders(head)
+
+            self.readBody(data)
+        except:
+            self.abort(sys.exc_info())
+
+    def readHeaders(self, head):
+        """
+        Parses the status line and headers of the HTTP response.
+
+        @raise RemotingError: The response is not a remoting envelope.
+        """
+        lines = head.split('\r\n')
+        version, status = lines[0].split(None, 2)[:2]
+
+        headers = {}
+
+        for line in lines[1:]:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+        self.headers = headers
+
+        if int(status) != 200:
+            raise remoting.RemotingError('HTTP error %s' % (lines[0],))
+
+        content_type = headers.get('content-type', '')
+
+        if content_type.split(';')[0].strip() != remoting.CONTENT_TYPE:
+            raise remoting.RemotingError('Incorrect MIME type received. '
+                '(got: %s)' % (content_type,))
+
+        connection = headers.get('connection', '').lower()
+
+        if version == 'HTTP/1.1':
+            self.keep_alive = connection != 'close'
+        else:
+            self.keep_alive = connection == 'keep-alive'
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            self.chunked = ChunkedDecoder()
+        elif 'content-length' in headers:
+            self.length = int(headers['content-length'])
+        else:
+            self.keep_alive = False
+
+        encoding = headers.get('content-encoding', '').lower()
+
+        if encoding == 'gzip':
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif encoding == 'deflate':
+            self.decompressor = zlib.decompressobj()
+        elif encoding not in ('', 'identity'):
+            raise remoting.RemotingError('Decompression of '
+                'Content-Encoding: %s not available.' % (encoding,))
+
+    def readBody(self, data):
+        """
+        Decodes C{data}, the next part of the HTTP body, and completes the
+        call once the whole body has been read.
+        """
+        finished = False
+
+        if self.chunked is not None:
+            data = self.chunked.feed(data)
+            finished = self.chunked.finished
+        elif self.length is not None:
+            data = data[:self.length]
+            self.length -= len(data)
+            finished = self.length == 0
+
+        if self.decompressor is not None:
+            data = self.decompressor.decompress(data)
+
+            if finished:
+                data += self.decompressor.flush()
+
+        if data:
+            for name, message in self.decoder.feed(data):
+                self.call.resolve(name, message)
+
+        if finished:
+            self.finish()
+
+    def finish(self):
+        """
+        The whole response has been read.
+        """
+        call, self.call = self.call, None
+
+        if not self.decoder.done():
+            try:
+                raise pyamf.DecodeError('Incomplete remoting envelope')
+            except pyamf.DecodeError:
+                call.fail(sys.exc_info())
+        else:
+            self.service._handleResponseHeaders(self.decoder.envelope)
+            call.fail((remoting.RemotingError,
+                remoting.RemotingError('No response to the request'), None))
+
+        self.decoder = None
+
+        if self.keep_alive:
+            self.service.release(self)
+        else:
+            self.close()
+            self.service.discard(self)
+
+    def abort(self, exc_info):
+        """
+        Fails the call in flight with C{exc_info} and closes the connection.
+        """
+        call, self.call = self.call, None
+
+        self.close()
+        self.service.discard(self)
+
+        if call is not None:
+            call.fail(exc_info)
+
+    def handle_close(self):
+        call = self.call
+
+        if call is None:
+            # an idle connection that the server closed
+            self.close()
+            self.service.discard(self)
+
+            return
+
+        if self.length is None and self.chunked is None and \
+                self.headers is not None:
+            # the body is delimited by the end of the connection
+            self.length = 0
+            self.keep_alive = False
+
+            self.readBody('')
+
+            return
+
+        self.call = None
+        self.close()
+        self.service.discard(self)
+
+        if self.received == 0 and call.attempts == 1 and self.reused:
+            # a reused connection that the server closed, resend it
+            self.service.send(call)
+
+            return
+
+        try:
+            raise remoting.RemotingError('Connection closed before the '
+                'response was received')
+        except remoting.RemotingError:
+            call.fail(sys.exc_info())
+
+    def handle_error(self):
+        exc_info = sys.exc_info()
+
+        if isinstance(exc_info[1], socket.error):
+            exc_info = (remoting.RemotingError,
+                remoting.RemotingError(str(exc_info[1])), exc_info[2])
+
+        self.abort(exc_info)
+
+
+class AsyncRemotingService(client.RemotingService):
+    """
+    A non-blocking L{client.RemotingService}.
+
+    Requests are built (and headers, credentials and gateway URL changes are
+    handled) exactly as for the blocking client. L{execute} and
+    L{execute_single} send the envelope and return at once.
+
+    @ivar map: The C{asyncore} socket map. Defaults to the global map so
+        that the calls of all services are driven by the same loop.
+    @type map: C{dict}
+    @ivar max_connections: The maximum number of connections to the gateway.
+        Calls wait for a connection to become available.
+    @type max_connections: C{int}
+    @ivar idle_timeout: Idle connections older than this many seconds are
+        closed. C{None} keeps them until the server closes them.
+    @type idle_timeout: C{float}
+    """
+
+    request_class = AsyncRequestWrapper
+
+    def __init__(self, url, amf_version=pyamf.AMF0, **kwargs):
+        self.map = kwargs.pop('map', None)
+        self.max_connections = kwargs.pop('max_connections',
+            DEFAULT_MAX_CONNECTIONS)
+        self.idle_timeout = kwargs.pop('idle_timeout',
+            pool.DEFAULT_IDLE_TIMEOUT)
+
+        self.connections = []
+        self.idle = []
+        self.queue = []
+
+        client.RemotingService.__init__(self, url, amf_version, **kwargs)
+
+    def _setUrl(self, url):
+        client.RemotingService._setUrl(self, url)
+
+        if self.url[0] != 'http':
+            raise ValueError('Unsupported scheme %r' % (self.url[0],))
+
+        netloc = self.url[1].split('@')[-1].split(':', 1)
+
+        if len(netloc) == 1:
+            self.address = (netloc[0], 80)
+        else:
+            self.address = (netloc[0], int(netloc[1]))
+
+        self.selector = self.url[2] or '/'
+
+        if self.url[4]:
+            self.selector += '?' + self.url[4]
+
+    def getService(self, name, auto_execute=True):
+        """
+        Returns an L{AsyncServiceProxy} for C{name}.
+
+        @see: L{client.RemotingService.getService}
+        """
+        if not isinstance(name, basestring):
+            raise TypeError('string type required')
+
+        return AsyncServiceProxy(self, name, auto_execute)
+
+    def execute_single(self, request):
+        """
+        Sends C{request} in its own envelope.
+
+        @return: C{request}, answered once the loop has run.
+        @rtype: L{AsyncRequestWrapper}
+        """
+        self.removeRequest(request)
+        self.sendRequests([request])
+
+        return request
+
+    def execute(self):
+        """
+        Sends all pending requests in one envelope.
+
+        @return: The requests, answered once the loop has run.
+        @rtype: C{list} of L{AsyncRequestWrapper}
+        """
+        requests = self.requests[:]
+
+        for r in requests:
+            self.removeRequest(r)
+
+        if requests:
+            self.sendRequests(requests)
+
+        return requests
+
+    def sendRequests(self, requests):
+        """
+        Encodes C{requests} into an envelope and queues it for sending.
+        """
+        body = remoting.encode(self.getAMFRequest(requests),
+            strict=self.strict).getvalue()
+
+        self.send(Call(requests, body))
+
+    def send(self, call):
+        """
+        Sends C{call} over an idle connection, or a new one if there are
+        fewer than L{max_connections}. Otherwise C{call} waits for a
+        connection to be released.
+        """
+        self.queue.append(call)
+        self._dispatch()
+
+    def _dispatch(self):
+        now = time.time()
+
+        while self.queue:
+            connection = None
+
+            while self.idle:
+                connection = self.idle.pop()
+
+                if self.idle_timeout is None or \
+                        now - connection.released < self.idle_timeout:
+                    break
+
+                connection.close()
+                self.discard(connection)
+                connection = None
+
+            call = self.queue[0]
+
+            if connection is None:
+                if len(self.connections) >= self.max_connections:
+                    break
+
+                try:
+                    connection = Connection(self, self.address)
+                except socket.error, e:
+                    self.queue.pop(0)
+                    call.fail((remoting.RemotingError,
+                        remoting.RemotingError(str(e)), sys.exc_info()[2]))
+
+                    continue
+
+                self.connections.append(connection)
+
+            self.queue.pop(0)
+
+            if self.logger:
+                self.logger.debug('Sending POST request to %s',
+                    self._root_url)
+
+            connection.sendCall(call, self._getHTTPRequest(call.body))
+
+    def _getHTTPRequest(self, body):
+        headers = self._get_execute_headers()
+
+        headers.update({
+            'Host': self.url[1].split('@')[-1],
+            'Content-Length': str(len(body)),
+            'Connection': 'keep-alive'
+        })
+
+        lines = ['POST %s HTTP/1.1' % (self.selector,)]
+
+        for name, value in headers.iteritems():
+            lines.append('%s: %s' % (name, value))
+
+        return '\r\n'.join(lines) + '\r\n\r\n' + body
+
+    def release(self, connection):
+        """
+        C{connection} has read its response and may be reused.
+        """
+        connection.released = time.time()
+        self.idle.append(connection)
+
+        self._dispatch()
+
+    def discard(self, connection):
+        """
+        C{connection} has been closed.
+        """
+        if connection in self.connections:
+            self.connections.remove(connection)
+
+        if connection in self.idle:
+            self.idle.remove(connection)
+
+        self._dispatch()
+
+    def busy(self):
+        """
+        Whether any call is queued or in flight.
+        """
+        if self.queue:
+            return True
+
+        for connection in self.connections:
+            if connection.call is not None:
+                return True
+
+        return False
+
+    def run(self, timeout=None, until=None):
+        """
+        Runs the C{asyncore} loop until C{until()} returns C{True}, or by
+        default until no calls are in flight.
+
+        @param timeout: The maximum number of seconds to run for.
+        @return: Whether the condition was met.
+        """
+        if until is None:
+            until = lambda: not self.busy()
+
+        deadline = None
+
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        while not until():
+            wait = 1.0
+
+            if deadline is not None:
+                wait = min(wait, deadline - time.time())
+
+                if wait <= 0:
+                    return False
+
+            asyncore.loop(wait, False, self.map, 1)
+
+        return True
+
+    def close(self):
+        """
+        Closes all connections and fails the calls that have not been
+        answered.
+        """
+        queue, self.queue = self.queue, []
+
+        for connection in self.connections[:]:
+            try:
+                raise remoting.RemotingError('Service closed')
+            except remoting.RemotingError:
+                connection.abort(sys.exc_info())
+
+        for call in queue:
+            try:
+                raise remoting.RemotingError('Service closed')
+            except remoting.RemotingError:
+                call.fail(sys.exc_info())
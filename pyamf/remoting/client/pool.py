@@ -0,0 +1,388 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Persistent HTTP connections for the remoting client.
+
+L{RemotingService<pyamf.remoting.client.RemotingService>} sends its requests
+through C{urllib2} handlers that keep the connection to each host open once a
+response has been read, so consecutive calls skip the TCP (and SSL) setup.
+Idle connections are kept in a L{ConnectionPool} that is safe to share
+between threads; a connection is only ever used by one request at a time.
+
+@since: 0.7
+"""
+
+import httplib
+import socket
+import threading
+import time
+import urllib2
+
+
+#: The number of idle connections kept per host.
+DEFAULT_POOL_SIZE = 10
+
+#: Idle connections older than this many seconds are closed, rather than
+#: risk the server having dropped them.
+DEFAULT_IDLE_TIMEOUT = 30.0
+
+#: Errors raised while sending a request. The request has not been sent in
+#: its entirety, so if the connection was idle in the pool it is retried once
+#: on a new connection. Time outs are never retried.
+SEND_ERRORS = (socket.error, httplib.CannotSendRequest)
+
+
+class StaleConnection(Exception):
+    """
+    Raised by L{PooledHandlerMixIn.send} when the server had closed an idle
+    connection before the request reached it, so it is safe to send again.
+    """
+
+
+def _no_status_line(error):
+    """
+    Whether the C{httplib.BadStatusLine} C{error} was raised because the
+    connection was closed before anything was received.
+    """
+    line = getattr(error, 'line', '')
+
+    return line in ('', "''") or line.startswith('No status line')
+
+
+class ConnectionPool(object):
+    """
+    Idle HTTP connections, keyed by scheme, host and port.
+
+    @ivar size: The maximum number of idle connections kept per host. More
+        connections than this may be open at once, the surplus are closed
+        when they are released.
+    @type size: C{int}
+    @ivar idle_timeout: The number of seconds an idle connection is kept.
+        C{None} keeps them until the server closes them.
+    @type idle_timeout: C{float}
+    """
+
+    def __init__(self, size=DEFAULT_POOL_SIZE,
+            idle_timeout=DEFAULT_IDLE_TIMEOUT, clock=time.time):
+        self.size = size
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+
+        self.connections = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        """
+        Returns the number of idle connections.
+        """
+        self.lock.acquire()
+
+        try:
+            return sum([len(x) for x in self.connections.itervalues()])
+        finally:
+            self.lock.release()
+
+    def acquire(self, key):
+        """
+        Removes an idle connection for C{key} from the pool.
+
+        @return: The connection or C{None} if there is none.
+        """
+        expired = []
+        connection = None
+
+        self.lock.acquire()
+
+        try:
+            idle = self.connections.get(key, [])
+            now = self.clock()
+
+            while idle:
+                connection, released = idle.pop()
+
+                if self.idle_timeout is None or \
+                        now - released < self.idle_timeout:
+                    break
+
+                expired.append(connection)
+                connection = None
+
+            if not idle:
+                self.connections.pop(key, None)
+        finally:
+            self.lock.release()
+
+        for c in expired:
+            c.close()
+
+        return connection
+
+    def release(self, key, connection):
+        """
+        Returns C{connection} to the pool once its response has been read.
+        It is closed if the pool for C{key} is full.
+        """
+        self.lock.acquire()
+
+        try:
+            idle = self.connections.setdefault(key, [])
+
+            if len(idle) < self.size:
+                idle.append((connection, self.clock()))
+                connection = None
+        finally:
+            self.lock.release()
+
+        if connection is not None:
+            connection.close()
+
+    def clear(self):
+        """
+        Closes all idle connections.
+        """
+        self.lock.acquire()
+
+        try:
+            connections = self.connections
+            self.connections = {}
+        finally:
+            self.lock.release()
+
+        for idle in connections.itervalues():
+            for connection, released in idle:
+                connection.close()
+
+
+class PooledResponse(object):
+    """
+    A file like wrapper around a C{httplib.HTTPResponse} that returns the
+    connection to the pool when the body has been read.
+    """
+
+    def __init__(self, pool, key, connection, response):
+        self.pool = pool
+        self.key = key
+        self.connection = connection
+        self.response = response
+
+    def _done(self):
+        connection, self.connection = self.connection, None
+
+        if connection is None:
+            return
+
+        if self.response.will_close:
+            connection.close()
+        else:
+            self.pool.release(self.key, connection)
+
+    def read(self, amt=None):
+        if amt is None or amt < 0:
+            data = self.response.read()
+        else:
+            data = self.response.read(amt)
+
+        if self.response.isclosed():
+            self._done()
+
+        return data
+
+    def readline(self):
+        chars = []
+
+        while True:
+            c = self.read(1)
+            chars.append(c)
+
+            if not c or c == '\n':
+                break
+
+        return ''.join(chars)
+
+    def close(self):
+        """
+        Closes the connection if the body has not been read completely.
+        """
+        connection, self.connection = self.connection, None
+
+        if connection is not None:
+            connection.close()
+
+        self.response.close()
+
+
+class PooledHandlerMixIn:
+    """
+    Implements C{urllib2} C{http(s)_open} on top of a L{ConnectionPool}.
+
+    @ivar pool: The pool of idle connections.
+    @type pool: L{ConnectionPool}
+    """
+
+    connection_class = None
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def connect(self, req):
+        """
+        Returns a new connection for C{req}.
+        """
+        host = req.get_host()
+        timeout = getattr(req, 'timeout', None)
+
+        if timeout is None or timeout is socket._GLOBAL_DEFAULT_TIMEOUT:
+            connection = self.connection_class(host)
+        else:
+            connection = self.connection_class(host, timeout=timeout)
+
+        tunnel_host = getattr(req, '_tunnel_host', None)
+
+        if tunnel_host:
+            connection.set_tunnel(tunnel_host)
+
+        return connection
+
+    def getKey(self, req):
+        return (req.get_type(), req.get_host(),
+            getattr(req, '_tunnel_host', None))
+
+    def do_open(self, req):
+        if not req.get_host():
+            raise urllib2.URLError('no host given')
+
+        headers = dict(req.unredirected_hdrs)
+
+        for k, v in req.headers.items():
+            headers.setdefault(k, v)
+
+        headers = dict([(k.title(), v) for k, v in headers.items()])
+        headers['Connection'] = 'keep-alive'
+
+        key = self.getKey(req)
+        connection = self.pool.acquire(key)
+        response = None
+
+        try:
+            if connection is not None:
+                try:
+                    response = self.send(connection, req, headers, True)
+                except StaleConnection:
+                    # the server closed the idle connection, try a fresh one
+                    pass
+
+            if response is None:
+                response = self.send(self.connect(req), req, headers)
+        except (socket.error, httplib.HTTPException), e:
+            raise urllib2.URLError(e)
+
+        connection = response.connection
+
+        fp = PooledResponse(self.pool, key, connection, response)
+        resp = urllib2.addinfourl(fp, response.msg, req.get_full_url())
+
+        resp.code = response.status
+        resp.msg = response.reason
+
+        return resp
+
+    def send(self, connection, req, headers, reused=False):
+        """
+        Sends C{req} over C{connection}.
+
+        Remoting requests are not idempotent, so they are only sent again if
+        the server cannot have seen them: C{reused} connections raise
+        L{StaleConnection} if the request could not be written, or if the
+        server closed the connection without answering. Any other error
+        (including a time out) is raised as is.
+
+        @param reused: C{connection} was idle in the pool.
+        @return: The C{httplib.HTTPResponse} with the connection as its
+            C{connection} attribute.
+        """
+        try:
+            try:
+                connection.request(req.get_method(), req.get_selector(),
+                    req.get_data(), headers)
+            except socket.timeout:
+                raise
+            except SEND_ERRORS, e:
+                if reused:
+                    raise StaleConnection(e)
+
+                raise
+
+            try:
+                response = connection.getresponse()
+            except httplib.BadStatusLine, e:
+                # no status line at all means that the server closed the
+                # idle connection, anything else is a bad response
+                if reused and _no_status_line(e):
+                    raise StaleConnection(e)
+
+                raise
+        except:
+            connection.close()
+
+            raise
+
+        response.connection = connection
+
+        return response
+
+
+class PooledHTTPHandler(PooledHandlerMixIn, urllib2.HTTPHandler):
+    """
+    Replaces C{urllib2.HTTPHandler} with persistent connections.
+    """
+
+    connection_class = httplib.HTTPConnection
+
+    def __init__(self, pool):
+        urllib2.HTTPHandler.__init__(self)
+        PooledHandlerMixIn.__init__(self, pool)
+
+    def http_open(self, req):
+        return self.do_open(req)
+
+
+if hasattr(urllib2, 'HTTPSHandler'):
+    class PooledHTTPSHandler(PooledHandlerMixIn, urllib2.HTTPSHandler):
+        """
+        Replaces C{urllib2.HTTPSHandler} with persistent connections.
+        """
+
+        connection_class = httplib.HTTPSConnection
+
+        def __init__(self, pool):
+            urllib2.HTTPSHandler.__init__(self)
+            PooledHandlerMixIn.__init__(self, pool)
+
+        def https_open(self, req):
+            return self.do_open(req)
+else:
+    PooledHTTPSHandler = None
+
+
+#: The pool shared by all L{RemotingService
+#: <pyamf.remoting.client.RemotingService>}s that are not given their own.
+DEFAULT_POOL = ConnectionPool()
+
+
+def build_opener(pool=None, *handlers):
+    """
+    Returns a C{urllib2.OpenerDirector} that keeps connections open in
+    C{pool}, L{DEFAULT_POOL} by default.
+
+    @param handlers: Additional C{urllib2} handlers.
+    """
+    if pool is None:
+        pool = DEFAULT_POOL
+
+    handlers = (PooledHTTPHandler(pool),) + handlers
+
+    if PooledHTTPSHandler is not None:
+        handlers += (PooledHTTPSHandler(pool),)
+
+    return urllib2.build_opener(*handlers)
@@ -10,6 +10,12 @@ Remoting server implementations.
 import sys
 import types
 import datetime
+import time
+import timeit
+import threading
+import bisect
+import Queue
+import zlib
 
 import pyamf
 from pyamf import remoting, util, python
@@ -25,6 +31,36 @@ SERVER_NAME = 'PyAMF/%s %s/%s' % (
     '.'.join(map(lambda x: str(x), sys.version_info[0:3]))
 )
 
+#: The target that L{GatewayMetrics} records whole requests against.
+ALL_TARGETS = '*'
+
+#: The target that L{GatewayMetrics} records requests for services that are
+#: not registered against, so that clients cannot grow the figures at will.
+UNKNOWN_TARGET = '?'
+
+#: Measures the durations recorded by L{GatewayMetrics}.
+clock = timeit.default_timer
+
+#: The response compressions supported, in order of preference.
+COMPRESSIONS = ('gzip', 'deflate')
+
+#: Responses smaller than this many bytes are not compressed.
+COMPRESS_THRESHOLD = 1024
+
+#: The default C{zlib} compression level (1-9) of responses.
+COMPRESS_LEVEL = 6
+
+#: Responses of at least this many bytes are compressed as they are sent by
+#: the gateways that can stream, rather than all at once.
+STREAM_THRESHOLD = 256 * 1024
+
+#: The number of bytes compressed at a time when streaming.
+COMPRESS_CHUNK_SIZE = 64 * 1024
+
+#: Compressed requests that expand to more than this many bytes are
+#: rejected, so that a small request cannot exhaust the memory of the server.
+MAX_REQUEST_SIZE = 16 * 1024 * 1024
+
 
 class BaseServiceError(pyamf.BaseError):
     """
@@ -61,14 +97,17 @@ class ServiceWrapper(object):
     @type service: C{callable}
     @ivar description: A description of the service.
     @type description: C{str}
+    @ivar cache: How the responses of the service are cached.
+    @type cache: L{CachePolicy} or C{None}
     """
     def __init__(self, service, description=None, authenticator=None,
-        expose_request=None, preprocessor=None):
+        expose_request=None, preprocessor=None, cache=None):
         self.service = service
         self.description = description
         self.authenticator = authenticator
         self.expose_request = expose_request
         self.preprocessor = preprocessor
+        self.cache = cache
 
     def __cmp__(self, other):
         if isinstance(other, ServiceWrapper):
@@ -211,6 +250,29 @@ class ServiceWrapper(object):
 
         return self.preprocessor
 
+    def getCachePolicy(self, service_request=None):
+        """
+        @since: 0.7
+        """
+        if service_request is None:
+            return self.cache
+
+        methods = self.getMethods()
+
+        if service_request.method is None:
+            if hasattr(self.service, '_pyamf_cache'):
+                return self.service._pyamf_cache
+
+        if service_request.method not in methods:
+            return self.cache
+
+        method = methods[service_request.method]
+
+        if hasattr(method, '_pyamf_cache'):
+            return method._pyamf_cache
+
+        return self.cache
+
 
 class ServiceRequest(object):
     """
@@ -223,7 +285,12 @@ class ServiceRequest(object):
     @ivar method: The method to call on the service. A value of C{None}
         means that the service will be called directly.
     @type method: C{None} or C{str}
+    @ivar target: The name the service was requested by.
+    @type target: C{str}
     """
+
+    target = None
+
     def __init__(self, amf_request, service, method):
         self.request = amf_request
         self.service = service
@@ -233,6 +300,567 @@ class ServiceRequest(object):
         return self.service(self.method, args)
 
 
+class CachePolicy(object):
+    """
+    Marks the responses of a service as cacheable (see L{cache}).
+
+    @ivar ttl: The number of seconds a response is kept for. C{None} keeps it
+        until it is evicted or invalidated.
+    @type ttl: C{int}, C{float} or C{None}
+    @ivar key: Called with the arguments of a service call and returns a
+        hashable key for its response. By default the arguments are the key.
+        Calls without a hashable key are not cached.
+    @type key: C{callable} or C{None}
+    @since: 0.7
+    """
+
+    def __init__(self, ttl=None, key=None):
+        self.ttl = ttl
+        self.key = key
+
+    def getKey(self, args):
+        """
+        Returns the key of the response to a call with C{args}, or C{None} if
+        it cannot be cached.
+        """
+        if self.key is None:
+            key = tuple(args)
+        else:
+            key = self.key(*args)
+
+        try:
+            hash(key)
+        except TypeError:
+            return None
+
+        return key
+
+
+class ResponseCache(object):
+    """
+    A thread safe, least recently used cache of encoded service responses.
+
+    Responses are held as L{pyamf.RawAMF} so a hit is copied straight into the
+    response. The number of responses and the number of encoded bytes are
+    both bounded.
+
+    @ivar hits: The number of lookups answered by the cache.
+    @type hits: C{int}
+    @ivar misses: The number of lookups that were not.
+    @type misses: C{int}
+    @ivar evictions: The number of responses dropped to stay in bounds.
+    @type evictions: C{int}
+    @ivar bytes: The number of encoded bytes held.
+    @type bytes: C{int}
+    @since: 0.7
+    """
+
+    #: The maximum number of responses held.
+    size = 1024
+    #: The maximum number of encoded bytes held.
+    max_bytes = 16 * 1024 * 1024
+
+    def __init__(self, size=None, max_bytes=None, clock=time.time):
+        if size is not None:
+            self.size = size
+
+        if max_bytes is not None:
+            self.max_bytes = max_bytes
+
+        self.clock = clock
+        self.lock = threading.Lock()
+
+        self.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def clear(self):
+        """
+        Empties the cache and resets the counters.
+        """
+        self.lock.acquire()
+
+        try:
+            # a circular doubly linked list of [prev, next, key, raw, expires]
+            # with the most recently used entry after the root
+            self.root = root = []
+            root[:] = [root, root, None, None, None]
+            self.entries = {}
+            self.bytes = 0
+        finally:
+            self.lock.release()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _unlink(self, link):
+        prev, next = link[0], link[1]
+        prev[1] = next
+        next[0] = prev
+
+    def _remove(self, link):
+        self._unlink(link)
+
+        del self.entries[link[2]]
+        self.bytes -= len(link[3])
+
+    def get(self, key):
+        """
+        Returns the response stored for C{key}, or C{None} if there is none
+        or it has expired.
+
+        @rtype: L{pyamf.RawAMF}
+        """
+        now = self.clock()
+
+        self.lock.acquire()
+
+        try:
+            link = self.entries.get(key, None)
+
+            if link is not None and link[4] is not None and link[4] <= now:
+                self._remove(link)
+                link = None
+
+            if link is None:
+                self.misses += 1
+
+                return None
+
+            self._unlink(link)
+
+            root = self.root
+            link[0], link[1] = root, root[1]
+            root[1][0] = root[1] = link
+
+            self.hits += 1
+
+            return link[3]
+        finally:
+            self.lock.release()
+
+    def set(self, key, raw, ttl=None):
+        """
+        Stores the response C{raw} under C{key} for C{ttl} seconds. Responses
+        bigger than L{max_bytes} are not stored.
+
+        @type raw: L{pyamf.RawAMF}
+        """
+        if len(raw) > self.max_bytes:
+            return
+
+        expires = None
+
+        if ttl is not None:
+            expires = self.clock() + ttl
+
+        self.lock.acquire()
+
+        try:
+            link = self.entries.get(key, None)
+
+            if link is not None:
+                self._remove(link)
+
+            root = self.root
+            link = [root, root[1], key, raw, expires]
+            root[1][0] = root[1] = link
+
+            self.entries[key] = link
+            self.bytes += len(raw)
+
+            while len(self.entries) > self.size or self.bytes > self.max_bytes:
+                self._remove(root[0])
+                self.evictions += 1
+        finally:
+            self.lock.release()
+
+    def invalidate(self, match=None):
+        """
+        Drops the responses whose key C{match} returns C{True} for, or every
+        response if C{match} is C{None}.
+
+        @return: The number of responses dropped.
+        """
+        self.lock.acquire()
+
+        try:
+            links = self.entries.values()
+
+            if match is not None:
+                links = [link for link in links if match(link[2])]
+
+            for link in links:
+                self._remove(link)
+
+            return len(links)
+        finally:
+            self.lock.release()
+
+    def getStats(self):
+        """
+        Returns a C{dict} of the counters, the size of the cache and the
+        fraction of lookups that were hits.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = 0.0
+
+        if lookups:
+            hit_rate = float(self.hits) / lookups
+
+        return {
+            'entries': len(self.entries),
+            'bytes': self.bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': hit_rate
+        }
+
+
+class Histogram(object):
+    """
+    Counts values in buckets with exponentially growing upper bounds, so that
+    percentiles can be estimated in constant space.
+
+    @ivar bounds: The sorted upper bounds of the buckets. Larger values are
+        counted in an extra bucket.
+    @ivar counts: The number of values in each bucket.
+    @ivar count: The number of values.
+    @ivar total: The sum of the values.
+    @since: 0.7
+    """
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+
+        self.clear()
+
+    def clear(self):
+        """
+        Forgets all of the values.
+        """
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value, index=None):
+        """
+        Counts C{value}. The bucket C{index} can be supplied if it is already
+        known.
+        """
+        if index is None:
+            index = bisect.bisect_left(self.bounds, value)
+
+        self.counts[index] += 1
+        self.count += 1
+        self.total += value
+
+        if self.min is None or value < self.min:
+            self.min = value
+
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def getPercentile(self, percent):
+        """
+        Returns an estimate of the value below which C{percent} of the values
+        fall, or C{None} if there are no values. The estimate is the upper
+        bound of the bucket it falls in.
+        """
+        if not self.count:
+            return None
+
+        rank = self.count * percent / 100.0
+        seen = 0
+
+        for index, n in enumerate(self.counts):
+            seen += n
+
+            if seen >= rank and n:
+                if index == len(self.bounds):
+                    return self.max
+
+                return min(self.bounds[index], self.max)
+
+        return self.max
+
+    def getSnapshot(self):
+        """
+        Returns a C{dict} of the count, sum, mean, minimum, maximum and the
+        50th, 90th and 99th percentiles of the values.
+        """
+        mean = None
+
+        if self.count:
+            mean = self.total / float(self.count)
+
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'mean': mean,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.getPercentile(50),
+            'p90': self.getPercentile(90),
+            'p99': self.getPercentile(99)
+        }
+
+
+class GatewayMetrics(object):
+    """
+    Thread safe latency and throughput figures of a gateway, by target.
+
+    The durations (in seconds) of each phase of a call and the sizes (in
+    bytes) of the requests and responses are kept in L{Histogram}s, along
+    with the number of errors. Figures that belong to a whole request
+    (decoding, encoding and the sizes) are recorded against every target in
+    the request and against L{ALL_TARGETS}. Requests for services that are
+    not registered are recorded against L{UNKNOWN_TARGET}.
+
+    Only the bucket counters are updated while the lock is held.
+
+    @since: 0.7
+    """
+
+    #: The recorded durations, in seconds.
+    timings = ('decode', 'authenticate', 'preprocess', 'call', 'encode')
+    #: The recorded sizes, in bytes.
+    sizes = ('bytes_in', 'bytes_out')
+
+    #: The bucket bounds of durations, from 10us to ~84s.
+    time_bounds = tuple([0.00001 * 2 ** i for i in xrange(24)])
+    #: The bucket bounds of sizes, from 64 bytes to 512MB.
+    size_bounds = tuple([64 * 2 ** i for i in xrange(24)])
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        self.clear()
+
+    def clear(self):
+        """
+        Forgets all of the figures.
+        """
+        self.lock.acquire()
+
+        try:
+            self.targets = {}
+        finally:
+            self.lock.release()
+
+    def _getFigures(self, target):
+        try:
+            return self.targets[target]
+        except KeyError:
+            figures = self.targets[target] = {'errors': 0}
+
+            return figures
+
+    def record(self, targets, name, value):
+        """
+        Records C{value} of the figure C{name} (one of L{timings} or
+        L{sizes}) for each of C{targets}.
+        """
+        if name in self.sizes:
+            bounds = self.size_bounds
+        else:
+            bounds = self.time_bounds
+
+        index = bisect.bisect_left(bounds, value)
+
+        self.lock.acquire()
+
+        try:
+            for target in targets:
+                figures = self._getFigures(target)
+
+                try:
+                    histogram = figures[name]
+                except KeyError:
+                    histogram = figures[name] = Histogram(bounds)
+
+                histogram.add(value, index)
+        finally:
+            self.lock.release()
+
+    def error(self, targets):
+        """
+        Counts an error for each of C{targets}.
+        """
+        self.lock.acquire()
+
+        try:
+            for target in targets:
+                self._getFigures(target)['errors'] += 1
+        finally:
+            self.lock.release()
+
+    def getSnapshot(self, target=None):
+        """
+        Returns the figures of C{target}, or of all targets by name if
+        C{target} is C{None}. Each histogram is summarised by
+        L{Histogram.getSnapshot}.
+        """
+        self.lock.acquire()
+
+        try:
+            if target is not None:
+                targets = [target]
+            else:
+                targets = self.targets.keys()
+
+            ret = {}
+
+            for name in targets:
+                figures = self.targets.get(name, None)
+
+                if figures is None:
+                    continue
+
+                snapshot = ret[name] = {}
+
+                for key, value in figures.iteritems():
+                    if isinstance(value, Histogram):
+                        value = value.getSnapshot()
+
+                    snapshot[key] = value
+        finally:
+            self.lock.release()
+
+        if target is not None:
+            return ret.get(target, None)
+
+        return ret
+
+
+class Future(object):
+    """
+    The result of a call submitted to a L{ThreadPool}.
+
+    @since: 0.7
+    """
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.exc_info = None
+
+    def done(self):
+        """
+        Whether the call has finished.
+        """
+        return self.event.isSet()
+
+    def set_result(self, value):
+        self.value = value
+        self.event.set()
+
+    def set_exc_info(self, exc_info):
+        self.exc_info = exc_info
+        self.event.set()
+
+    def result(self, timeout=None):
+        """
+        Waits for the call to finish and returns its result, raising the
+        exception of the call if it failed.
+
+        @raise RuntimeError: The call did not finish within C{timeout}
+            seconds.
+        """
+        self.event.wait(timeout)
+
+        if not self.event.isSet():
+            raise RuntimeError('Timed out waiting for the result')
+
+        if self.exc_info is not None:
+            raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+
+        return self.value
+
+
+class ThreadPool(object):
+    """
+    A bounded pool of daemon worker threads, started as they are needed.
+
+    Provides the C{submit} method of a C{concurrent.futures} executor, which
+    is all that L{BaseGateway} needs to process the bodies of a request
+    concurrently.
+
+    @ivar size: The maximum number of worker threads.
+    @type size: C{int}
+    @since: 0.7
+    """
+
+    def __init__(self, size=4):
+        if size < 1:
+            raise ValueError('size must be at least 1')
+
+        self.size = size
+        self.queue = Queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Schedules C{func(*args, **kwargs)} to be called by a worker thread.
+
+        @rtype: L{Future}
+        """
+        future = Future()
+
+        self.lock.acquire()
+
+        try:
+            if len(self.workers) < self.size:
+                worker = threading.Thread(target=self._work)
+                worker.setDaemon(True)
+                worker.start()
+
+                self.workers.append(worker)
+        finally:
+            self.lock.release()
+
+        self.queue.put((future, func, args, kwargs))
+
+        return future
+
+    def shutdown(self):
+        """
+        Stops the worker threads once the calls already submitted finish.
+        """
+        self.lock.acquire()
+
+        try:
+            workers, self.workers = self.workers, []
+        finally:
+            self.lock.release()
+
+        for worker in workers:
+            self.queue.put(None)
+
+        for worker in workers:
+            worker.join()
+
+    def _work(self):
+        while True:
+            task = self.queue.get()
+
+            if task is None:
+                return
+
+            future, func, args, kwargs = task
+
+            try:
+                future.set_result(func(*args, **kwargs))
+            except:
+                future.set_exc_info(sys.exc_info())
+
+
 class ServiceCollection(dict):
     """
     I hold a collection of services, mapping names to objects.
@@ -244,6 +872,124 @@ class ServiceCollection(dict):
         return value in self.values()
 
 
+def get_accepted_encoding(accept_encoding):
+    """
+    Picks the compression to use for a response from the C{Accept-Encoding}
+    header of the request. C{gzip} is preferred over C{deflate} if the
+    client accepts both equally.
+
+    @return: C{'gzip'}, C{'deflate'} or C{None}.
+    @since: 0.7
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = {}
+
+    for item in accept_encoding.split(','):
+        params = item.split(';')
+        name = params[0].strip().lower()
+        q = 1.0
+
+        for param in params[1:]:
+            param = param.split('=', 1)
+
+            if len(param) == 2 and param[0].strip().lower() == 'q':
+                try:
+                    q = float(param[1])
+                except ValueError:
+                    q = 0.0
+
+        if name == 'x-gzip':
+            name = 'gzip'
+
+        accepted[name] = q
+
+    best, best_q = None, 0.0
+
+    for encoding in COMPRESSIONS:
+        q = accepted.get(encoding, accepted.get('*', 0.0))
+
+        if q > best_q:
+            best, best_q = encoding, q
+
+    return best
+
+
+def _get_wbits(encoding):
+    if encoding in ('gzip', 'x-gzip'):
+        return 16 + zlib.MAX_WBITS
+    elif encoding == 'deflate':
+        return zlib.MAX_WBITS
+
+    raise IOError('Unsupported Content-Encoding %r' % (encoding,))
+
+
+def iter_compress(data, encoding, level=COMPRESS_LEVEL,
+        chunk_size=COMPRESS_CHUNK_SIZE):
+    """
+    Compresses C{data} with C{encoding} (C{gzip} or C{deflate}), yielding
+    the output as each C{chunk_size} piece of C{data} is compressed.
+
+    @since: 0.7
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED,
+        _get_wbits(encoding))
+
+    for i in xrange(0, len(data), chunk_size):
+        chunk = compressor.compress(data[i:i + chunk_size])
+
+        if chunk:
+            yield chunk
+
+    yield compressor.flush()
+
+
+def compress(data, encoding, level=COMPRESS_LEVEL):
+    """
+    Returns C{data} compressed with C{encoding} (C{gzip} or C{deflate}).
+
+    @since: 0.7
+    """
+    return ''.join(iter_compress(data, encoding, level))
+
+
+def decompress(data, encoding, max_size=None):
+    """
+    Returns C{data} decompressed according to its C{Content-Encoding}.
+
+    @param max_size: The most bytes that C{data} may expand to, C{None} for
+        no limit. Decompression stops as soon as it is exceeded.
+    @raise IOError: The encoding is not supported, C{data} is corrupt or
+        it expands to more than C{max_size} bytes.
+    @since: 0.7
+    """
+    if encoding:
+        encoding = encoding.strip().lower()
+
+    if not encoding or encoding == 'identity':
+        return data
+
+    decompressor = zlib.decompressobj(_get_wbits(encoding))
+
+    try:
+        if max_size is None:
+            return decompressor.decompress(data) + decompressor.flush()
+
+        ret = decompressor.decompress(data, max_size + 1)
+
+        if len(ret) <= max_size:
+            ret += decompressor.flush()
+    except zlib.error, e:
+        raise IOError(str(e))
+
+    if len(ret) > max_size:
+        raise IOError('Request body expands to more than %d bytes' % (
+            max_size,))
+
+    return ret
+
+
 class BaseGateway(object):
     """
     Generic Remoting gateway.
@@ -268,6 +1014,28 @@ class BaseGateway(object):
     @ivar debug: Provides debugging information when an error occurs. Use only
         in non production settings.
     @type debug: C{bool}
+    @ivar response_cache: Holds the encoded responses of cacheable services
+        (see L{cache}). C{None} disables caching.
+    @type response_cache: L{ResponseCache} or C{None}
+    @ivar metrics: Latency and throughput figures by target. C{None}
+        disables them.
+    @type metrics: L{GatewayMetrics} or C{None}
+    @ivar executor: Processes the bodies of a request concurrently (see
+        L{processEnvelope}). Anything with the C{submit} method of a
+        C{concurrent.futures} executor, or supply an C{int} for a
+        L{ThreadPool} of that size. C{None} (the default) processes the
+        bodies one after the other.
+    @ivar compress_threshold: Responses of at least this many bytes are
+        compressed if the client accepts it (see L{getResponseEncoding}).
+        C{None} disables compression. Defaults to L{COMPRESS_THRESHOLD}.
+    @type compress_threshold: C{int} or C{None}
+    @ivar compress_level: The C{zlib} compression level (1-9) of responses.
+        Defaults to L{COMPRESS_LEVEL}.
+    @type compress_level: C{int}
+    @ivar max_request_size: Compressed requests that expand to more than this
+        many bytes are rejected as bad requests. C{None} removes the limit.
+        Defaults to L{MAX_REQUEST_SIZE}.
+    @type max_request_size: C{int} or C{None}
     """
 
     _request_class = ServiceRequest
@@ -288,6 +1056,17 @@ class BaseGateway(object):
         self.timezone_offset = kwargs.pop('timezone_offset', None)
 
         self.debug = kwargs.pop('debug', False)
+        self.response_cache = kwargs.pop('response_cache', ResponseCache())
+        self.metrics = kwargs.pop('metrics', GatewayMetrics())
+        self.executor = kwargs.pop('executor', None)
+        self.compress_threshold = kwargs.pop('compress_threshold',
+            COMPRESS_THRESHOLD)
+        self.compress_level = kwargs.pop('compress_level', COMPRESS_LEVEL)
+        self.max_request_size = kwargs.pop('max_request_size',
+            MAX_REQUEST_SIZE)
+
+        if isinstance(self.executor, (int, long)):
+            self.executor = ThreadPool(self.executor)
 
         if kwargs:
             raise TypeError('Unknown kwargs: %r' % (kwargs,))
@@ -296,7 +1075,8 @@ class BaseGateway(object):
             self.addService(service, name)
 
     def addService(self, service, name=None, description=None,
-        authenticator=None, expose_request=None, preprocessor=None):
+        authenticator=None, expose_request=None, preprocessor=None,
+        cache=None):
         """
         Adds a service to the gateway.
 
@@ -304,6 +1084,9 @@ class BaseGateway(object):
         @type service: C{callable}, class instance, or a module
         @param name: The name of the service.
         @type name: C{str}
+        @param cache: Caches the responses of the service, unless a method
+            has its own policy (see L{cache<pyamf.remoting.gateway.cache>}).
+        @type cache: L{CachePolicy} or C{None}
         @raise pyamf.remoting.RemotingError: Service already exists.
         @raise TypeError: C{service} cannot be a scalar value.
         @raise TypeError: C{service} must be C{callable} or a module.
@@ -332,7 +1115,7 @@ class BaseGateway(object):
             raise remoting.RemotingError("Service %s already exists" % name)
 
         self.services[name] = ServiceWrapper(service, description,
-            authenticator, expose_request, preprocessor)
+            authenticator, expose_request, preprocessor, cache)
 
     def _get_timezone_offset(self):
         if self.timezone_offset is None:
@@ -368,22 +1151,27 @@ class BaseGateway(object):
         @type request: L{Request<pyamf.remoting.Request>}
         @rtype: L{ServiceRequest}
         """
+        service_request = None
+
         try:
-            return self._request_class(
+            service_request = self._request_class(
                 request.envelope, self.services[target], None)
         except KeyError:
             pass
 
-        try:
-            sp = target.split('.')
-            name, meth = '.'.join(sp[:-1]), sp[-1]
+        if service_request is None:
+            try:
+                sp = target.split('.')
+                name, meth = '.'.join(sp[:-1]), sp[-1]
 
-            return self._request_class(
-                request.envelope, self.services[name], meth)
-        except (ValueError, KeyError):
-            pass
+                service_request = self._request_class(
+                    request.envelope, self.services[name], meth)
+            except (ValueError, KeyError):
+                raise UnknownServiceError("Unknown service %s" % target)
+
+        service_request.target = target
 
-        raise UnknownServiceError("Unknown service %s" % target)
+        return service_request
 
     def getProcessor(self, request):
         """
@@ -415,6 +1203,41 @@ class BaseGateway(object):
         """
         raise NotImplementedError
 
+    def processEnvelope(self, request, process):
+        """
+        Builds the response to the envelope C{request} by calling
+        C{process(message)} for each of its bodies.
+
+        If there is an L{executor} the bodies are processed concurrently: the
+        first one in the calling thread and the rest by the executor. The
+        responses are put back in the order of the requests. C{process} must
+        not share per body state (like the attributes of an HTTP request)
+        with the other bodies.
+
+        @return: The AMF response.
+        @rtype: L{Envelope<pyamf.remoting.Envelope>}
+        @since: 0.7
+        """
+        response = remoting.Envelope(request.amfVersion)
+        bodies = request.items()
+
+        if self.executor is None or len(bodies) < 2:
+            for name, message in bodies:
+                response[name] = process(message)
+
+            return response
+
+        futures = [self.executor.submit(process, message)
+            for name, message in bodies[1:]]
+
+        results = [process(bodies[0][1])]
+        results.extend([future.result() for future in futures])
+
+        for (name, message), result in zip(bodies, results):
+            response[name] = result
+
+        return response
+
     def mustExposeRequest(self, service_request):
         """
         Decides whether the underlying http request should be exposed as the
@@ -469,7 +1292,8 @@ class BaseGateway(object):
             http_request = kwargs.get('http_request', None)
             args = (http_request,) + args
 
-        return authenticator(*args) == True
+        return self.timeCall(service_request.target, 'authenticate',
+            authenticator, *args) == True
 
     def getPreprocessor(self, service_request):
         """
@@ -500,17 +1324,327 @@ class BaseGateway(object):
             http_request = kwargs.get('http_request', None)
             args = (http_request,) + args
 
-        return processor(*args)
+        return self.timeCall(service_request.target, 'preprocess', processor,
+            *args)
+
+    def getCachePolicy(self, service_request):
+        """
+        Gets the L{CachePolicy} for the service_request, looking at the
+        service method first and then at the service level. Returns C{None}
+        if the response cannot be cached.
+
+        @since: 0.7
+        """
+        if self.response_cache is None:
+            return None
+
+        return service_request.service.getCachePolicy(service_request)
+
+    def getCacheKey(self, service_request, policy, args):
+        """
+        Returns the key of the cached response to C{service_request}, or
+        C{None} if it cannot be cached. Responses are cached separately for
+        AMF0 and AMF3 clients.
+
+        @since: 0.7
+        """
+        key = policy.getKey(args)
+
+        if key is None:
+            return None
+
+        encoding = pyamf.AMF0
+
+        if getattr(service_request.request, 'amfVersion', None) == pyamf.AMF3:
+            encoding = pyamf.AMF3
+
+        return (service_request.service, service_request.method, encoding,
+            key)
+
+    def cacheResponse(self, policy, key, result):
+        """
+        Encodes C{result} and stores it in L{response_cache}.
+
+        @return: The L{pyamf.RawAMF} that was stored, or C{result} if it could
+            not be encoded.
+        @since: 0.7
+        """
+        try:
+            raw = pyamf.encode_raw(result, key[2],
+                timezone_offset=self._get_timezone_offset())
+        except pyamf.EncodeError:
+            return result
+
+        self.response_cache.set(key, raw, policy.ttl)
+
+        return raw
+
+    def invalidateResponses(self, target=None, *args):
+        """
+        Drops cached responses. With a C{target} only those of that service
+        (method) are dropped, and if C{args} are also supplied only the
+        response to a call with C{args}.
+
+        @return: The number of responses dropped.
+        @raise UnknownServiceError: Unknown service.
+        @since: 0.7
+        """
+        if self.response_cache is None:
+            return 0
+
+        if target is None:
+            return self.response_cache.invalidate()
+
+        service_request = self.getServiceRequest(remoting.Request(target),
+            target)
+        service, method = service_request.service, service_request.method
+        key = None
+
+        if args:
+            policy = self.getCachePolicy(service_request)
+
+            if policy is None:
+                return 0
+
+            key = policy.getKey(args)
+
+        def match(k):
+            if k[0] is not service or k[1] != method:
+                return False
+
+            return key is None or k[3] == key
+
+        return self.response_cache.invalidate(match)
 
     def callServiceRequest(self, service_request, *args, **kwargs):
         """
-        Executes the service_request call
+        Executes the service_request call. The responses of cacheable
+        services are served from and stored in L{response_cache}.
         """
+        return self.timeCall(service_request.target, 'call',
+            self._callServiceRequest, service_request, *args, **kwargs)
+
+    def _callServiceRequest(self, service_request, *args, **kwargs):
+        key = None
+        policy = self.getCachePolicy(service_request)
+
+        if policy is not None:
+            key = self.getCacheKey(service_request, policy, args)
+
+            if key is not None:
+                raw = self.response_cache.get(key)
+
+                if raw is not None:
+                    return raw
+
         if self.mustExposeRequest(service_request):
             http_request = kwargs.get('http_request', None)
             args = (http_request,) + args
 
-        return service_request(*args)
+        result = service_request(*args)
+
+        if key is None:
+            return result
+
+        return self.cacheResponse(policy, key, result)
+
+    def getTargets(self, envelope):
+        """
+        Returns the names of the services requested in C{envelope}, as
+        recorded by L{metrics} (see L{getMetricsTarget}). Flex messaging
+        requests are named by the destination and operation of their
+        C{RemotingMessage}.
+
+        @since: 0.7
+        """
+        targets = []
+
+        for name, message in envelope:
+            target = message.target
+
+            if target == 'null' or not target:
+                try:
+                    ro_request = message.body[0]
+                    target = ro_request.operation
+                except (AttributeError, IndexError, TypeError):
+                    continue
+
+                if getattr(ro_request, 'destination', None):
+                    target = '%s.%s' % (ro_request.destination, target)
+
+            if not target:
+                continue
+
+            target = self.getMetricsTarget(target)
+
+            if target not in targets:
+                targets.append(target)
+
+        return targets
+
+    def getMetricsTarget(self, target):
+        """
+        Returns the name that the figures of C{target} are recorded against:
+        C{target} itself if it names a registered service or a public method
+        of one, L{UNKNOWN_TARGET} otherwise.
+
+        @since: 0.7
+        """
+        if not isinstance(target, basestring):
+            return UNKNOWN_TARGET
+
+        if target in self.services:
+            return target
+
+        sp = target.split('.')
+        name, method = '.'.join(sp[:-1]), sp[-1]
+
+        if not name or method.startswith('_') or name not in self.services:
+            return UNKNOWN_TARGET
+
+        if not python.callable(getattr(self.services[name].service, method,
+                None)):
+            return UNKNOWN_TARGET
+
+        return target
+
+    def getMetrics(self, target=None):
+        """
+        Returns the figures of C{target}, or of all targets, from L{metrics}
+        (see L{GatewayMetrics.getSnapshot}). Returns C{None} if metrics are
+        disabled.
+
+        @since: 0.7
+        """
+        if self.metrics is None:
+            return None
+
+        return self.metrics.getSnapshot(target)
+
+    def timeCall(self, target, name, func, *args, **kwargs):
+        """
+        Calls C{func} and records its duration as the figure C{name} of
+        C{target} in L{metrics}. An exception is counted as an error.
+
+        @since: 0.7
+        """
+        if self.metrics is None:
+            return func(*args, **kwargs)
+
+        target = self.getMetricsTarget(target)
+        start = clock()
+
+        try:
+            result = func(*args, **kwargs)
+        except:
+            self.metrics.error([target])
+
+            raise
+
+        return self.recordDuration([target], name, start, result)
+
+    def recordDuration(self, targets, name, start, result):
+        """
+        Records the time since C{start} as the figure C{name} of C{targets}.
+
+        @return: C{result}
+        @since: 0.7
+        """
+        self.metrics.record(targets, name, clock() - start)
+
+        return result
+
+    def decodeRequest(self, body, content_encoding=None, **kwargs):
+        """
+        Decodes the AMF request C{body} with L{remoting.decode}, recording the
+        time taken and the size of the request in L{metrics}.
+
+        @param content_encoding: The C{Content-Encoding} of C{body}, which is
+            decompressed first if it is C{gzip} or C{deflate}.
+        @raise IOError: Unsupported C{content_encoding}, corrupt C{body} or
+            C{body} expands to more than L{max_request_size} bytes.
+        @since: 0.7
+        """
+        body = decompress(body, content_encoding, self.max_request_size)
+
+        if self.metrics is None:
+            return remoting.decode(body, **kwargs)
+
+        start = clock()
+
+        try:
+            request = remoting.decode(body, **kwargs)
+        except:
+            self.metrics.error([ALL_TARGETS])
+
+            raise
+
+        targets = [ALL_TARGETS] + self.getTargets(request)
+
+        self.recordDuration(targets, 'decode', start, request)
+        self.metrics.record(targets, 'bytes_in', len(body))
+
+        return request
+
+    def encodeResponse(self, response, request=None, **kwargs):
+        """
+        Encodes the AMF C{response} with L{remoting.encode}, recording the
+        time taken and the size of the response in L{metrics} against the
+        targets of C{request}.
+
+        @since: 0.7
+        """
+        if self.metrics is None:
+            return remoting.encode(response, **kwargs)
+
+        targets = [ALL_TARGETS]
+
+        if request is not None:
+            targets += self.getTargets(request)
+
+        start = clock()
+
+        try:
+            stream = remoting.encode(response, **kwargs)
+        except:
+            self.metrics.error(targets)
+
+            raise
+
+        self.recordDuration(targets, 'encode', start, stream)
+        self.metrics.record(targets, 'bytes_out', len(stream))
+
+        return stream
+
+    def getResponseEncoding(self, accept_encoding, size):
+        """
+        Returns the compression for a response of C{size} bytes to a request
+        with the C{Accept-Encoding} header C{accept_encoding}, or C{None} if
+        it should not be compressed.
+
+        @since: 0.7
+        """
+        if self.compress_threshold is None or size < self.compress_threshold:
+            return None
+
+        return get_accepted_encoding(accept_encoding)
+
+    def compressResponse(self, data, encoding):
+        """
+        Returns the response C{data} compressed with C{encoding}.
+
+        @since: 0.7
+        """
+        return compress(data, encoding, self.compress_level)
+
+    def iterCompressResponse(self, data, encoding):
+        """
+        Returns an iterator of the response C{data} compressed with
+        C{encoding} in pieces, for gateways that can stream the response.
+
+        @since: 0.7
+        """
+        return iter_compress(data, encoding, self.compress_level)
 
 
 def authenticate(func, c, expose_request=False):
@@ -588,6 +1722,32 @@ def preprocess(func, c, expose_request=False):
     return func
 
 
+def cache(func, ttl=None, key=None):
+    """
+    A decorator that caches the encoded responses of a service method for
+    C{ttl} seconds, keyed on the result of calling C{key} with the arguments
+    of the call (see L{CachePolicy}). Only use it for methods whose result
+    depends on nothing but their arguments.
+
+    @raise TypeError: C{func} and C{key} must be callable.
+    @since: 0.7
+    """
+    if not python.callable(func):
+        raise TypeError('func must be callable')
+
+    if key is not None and not python.callable(key):
+        raise TypeError('key must be callable')
+
+    attr = func
+
+    if isinstance(func, types.UnboundMethodType):
+        attr = func.im_func
+
+    setattr(attr, '_pyamf_cache', CachePolicy(ttl, key))
+
+    return func
+
+
 def format_exception():
     import traceback
 
@@ -11,6 +11,8 @@ servers.
 @since: 0.1.0
 """
 
+import copy
+
 django = __import__('django.http')
 http = django.http
 conf = __import__('django.conf')
@@ -74,15 +76,18 @@ class DjangoGateway(gateway.BaseGateway):
         @type request: L{Envelope<pyamf.remoting.Envelope>}
         @rtype: L{Envelope<pyamf.remoting.Envelope>}
         """
-        response = remoting.Envelope(request.amfVersion)
+        def process(message):
+            r = http_request
 
-        for name, message in request:
-            http_request.amf_request = message
+            if self.executor is not None:
+                r = copy.copy(http_request)
 
+            r.amf_request = message
             processor = self.getProcessor(message)
-            response[name] = processor(message, http_request=http_request)
 
-        return response
+            return processor(message, http_request=r)
+
+        return self.processEnvelope(request, process)
 
     def __call__(self, http_request):
         """
@@ -96,7 +101,9 @@ class DjangoGateway(gateway.BaseGateway):
 
         # Decode the request
         try:
-            request = remoting.decode(http_request.raw_post_data,
+            request = self.decodeRequest(http_request.raw_post_data,
+                content_encoding=http_request.META.get(
+                    'HTTP_CONTENT_ENCODING'),
                 strict=self.strict, logger=self.logger,
                 timezone_offset=timezone_offset)
         except (pyamf.DecodeError, IOError):
@@ -157,7 +164,8 @@ class DjangoGateway(gateway.BaseGateway):
 
         # Encode the response
         try:
-            stream = remoting.encode(response, strict=self.strict,
+            stream = self.encodeResponse(response, request,
+                strict=self.strict,
                 logger=self.logger, timezone_offset=timezone_offset)
         except:
             if self.logger:
@@ -173,11 +181,22 @@ class DjangoGateway(gateway.BaseGateway):
                 mimetype='text/plain', content=response)
 
         buf = stream.getvalue()
+        encoding = self.getResponseEncoding(
+            http_request.META.get('HTTP_ACCEPT_ENCODING'), len(buf))
+
+        if encoding is not None:
+            buf = self.compressResponse(buf, encoding)
 
         http_response = http.HttpResponse(mimetype=remoting.CONTENT_TYPE)
         http_response['Server'] = gateway.SERVER_NAME
         http_response['Content-Length'] = str(len(buf))
 
+        if self.compress_threshold is not None:
+            http_response['Vary'] = 'Accept-Encoding'
+
+        if encoding is not None:
+            http_response['Content-Encoding'] = encoding
+
         http_response.write(buf)
 
         return http_response
@@ -48,15 +48,22 @@ class WebAppGateway(webapp.RequestHandler, gateway.BaseGateway):
         :rtype: :class:`Envelope<pyamf.remoting.Envelope>`
         :return: The AMF Response.
         """
-        response = remoting.Envelope(request.amfVersion)
+        def process(message):
+            http_request = self.request
 
-        for name, message in request:
-            self.request.amf_request = message
+            if self.executor is not None:
+                # webob keeps the attributes of a request in its environ
+                environ = dict(http_request.environ)
+                environ['webob.adhoc_attrs'] = dict(
+                    environ.get('webob.adhoc_attrs', {}))
+                http_request = http_request.__class__(environ)
 
+            http_request.amf_request = message
             processor = self.getProcessor(message)
-            response[name] = processor(message, http_request=self.request)
 
-        return response
+            return processor(message, http_request=http_request)
+
+        return self.processEnvelope(request, process)
 
     def get(self):
         self.response.headers['Content-Type'] = 'text/plain'
@@ -73,8 +80,10 @@ class WebAppGateway(webapp.RequestHandler, gateway.BaseGateway):
 
         # Decode the request
         try:
-            request = remoting.decode(body, strict=self.strict,
-                logger=self.logger, timezone_offset=timezone_offset)
+            request = self.decodeRequest(body,
+                content_encoding=self.request.headers.get('Content-Encoding'),
+                strict=self.strict, logger=self.logger,
+                timezone_offset=timezone_offset)
         except (DecodeError, IOError):
             if self.logger:
                 self.logger.exception('Error decoding AMF request')
@@ -140,7 +149,8 @@ class WebAppGateway(webapp.RequestHandler, gateway.BaseGateway):
 
         # Encode the response
         try:
-            stream = remoting.encode(response, strict=self.strict,
+            stream = self.encodeResponse(response, request,
+                strict=self.strict,
                 logger=self.logger, timezone_offset=timezone_offset)
         except:
             if self.logger:
@@ -160,6 +170,15 @@ class WebAppGateway(webapp.RequestHandler, gateway.BaseGateway):
             return
 
         response = stream.getvalue()
+        encoding = self.getResponseEncoding(
+            self.request.headers.get('Accept-Encoding'), len(response))
+
+        if encoding is not None:
+            response = self.compressResponse(response, encoding)
+            self.response.headers['Content-Encoding'] = encoding
+
+        if self.compress_threshold is not None:
+            self.response.headers['Vary'] = 'Accept-Encoding'
 
         self.response.headers['Content-Type'] = remoting.CONTENT_TYPE
         self.response.headers['Content-Length'] = str(len(response))
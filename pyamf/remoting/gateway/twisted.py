@@ -40,6 +40,10 @@ from pyamf.remoting import gateway, amf0, amf3
 
 __all__ = ['TwistedGateway']
 
+#: Request bodies of at least this many bytes are decoded in a thread, smaller
+#: ones are decoded in the reactor thread.
+THREAD_THRESHOLD = 64 * 1024
+
 
 class AMF0RequestProcessor(amf0.RequestProcessor):
     """
@@ -199,9 +203,18 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
     """
     Twisted Remoting gateway for C{twisted.web}.
 
+    Service methods may return a C{Deferred} (e.g. one decorated with
+    C{defer.inlineCallbacks}). The bodies of a request are processed
+    concurrently and the responses keep the order of the requests.
+
     @ivar expose_request: Forces the underlying HTTP request to be the first
         argument to any service call.
     @type expose_request: C{bool}
+    @ivar thread_threshold: The size in bytes from which request bodies are
+        decoded in a thread rather than blocking the reactor. C{None} decodes
+        every request in a thread. Defaults to L{THREAD_THRESHOLD}. Compressed
+        request bodies are always decoded in a thread.
+    @type thread_threshold: C{int}
     """
 
     allowedMethods = ('POST',)
@@ -210,6 +223,9 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
         if 'expose_request' not in kwargs:
             kwargs['expose_request'] = True
 
+        self.thread_threshold = kwargs.pop('thread_threshold',
+            THREAD_THRESHOLD)
+
         gateway.BaseGateway.__init__(self, *args, **kwargs)
         resource.Resource.__init__(self)
 
@@ -261,9 +277,23 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
             self._finaliseRequest(request, 400, body)
 
         request.content.seek(0, 0)
+        body = request.content.read()
         timezone_offset = self._get_timezone_offset()
-
-        d = threads.deferToThread(remoting.decode, request.content.read(),
+        content_encoding = request.getHeader('content-encoding')
+
+        if content_encoding and \
+                content_encoding.strip().lower() != 'identity':
+            # the size of a compressed body says nothing about how much work
+            # decompressing it will be.
+            call = threads.deferToThread
+        elif self.thread_threshold is None or \
+                len(body) >= self.thread_threshold:
+            call = threads.deferToThread
+        else:
+            call = defer.maybeDeferred
+
+        d = call(self.decodeRequest, body,
+            content_encoding=content_encoding,
             strict=self.strict, logger=self.logger,
             timezone_offset=timezone_offset)
 
@@ -273,17 +303,38 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
 
             x = self.getResponse(request, amf_request)
 
-            x.addCallback(self.sendResponse, request)
+            x.addCallback(self.sendResponse, request, amf_request)
 
         # Process the request
         d.addCallback(cb).addErrback(handleDecodeError)
 
         return server.NOT_DONE_YET
 
-    def sendResponse(self, amf_response, request):
+    def sendResponse(self, amf_response, request, amf_request=None):
+        def encode():
+            # runs in a thread, so compression does not block the reactor
+            body = self.encodeResponse(amf_response, amf_request,
+                strict=self.strict, logger=self.logger,
+                timezone_offset=timezone_offset).getvalue()
+
+            encoding = self.getResponseEncoding(
+                request.getHeader('accept-encoding'), len(body))
+
+            if encoding is not None:
+                body = self.compressResponse(body, encoding)
+
+            return body, encoding
+
         def cb(result):
-            self._finaliseRequest(request, 200, result.getvalue(),
-                remoting.CONTENT_TYPE)
+            body, encoding = result
+
+            if self.compress_threshold is not None:
+                request.setHeader('Vary', 'Accept-Encoding')
+
+            if encoding is not None:
+                request.setHeader('Content-Encoding', encoding)
+
+            self._finaliseRequest(request, 200, body, remoting.CONTENT_TYPE)
 
         def eb(failure):
             """
@@ -304,9 +355,7 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
             self._finaliseRequest(request, 500, body)
 
         timezone_offset = self._get_timezone_offset()
-        d = threads.deferToThread(remoting.encode, amf_response,
-            strict=self.strict, logger=self.logger,
-            timezone_offset=timezone_offset)
+        d = threads.deferToThread(encode)
 
         d.addCallback(cb).addErrback(eb)
 
@@ -332,22 +381,24 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
         @type amf_request: L{Envelope<pyamf.remoting.Envelope>}
         """
         response = remoting.Envelope(amf_request.amfVersion)
+        names = []
         dl = []
 
-        def cb(body, name):
-            response[name] = body
-
         for name, message in amf_request:
             processor = self.getProcessor(message)
 
             http_request.amf_request = message
 
-            d = defer.maybeDeferred(
-                processor, message, http_request=http_request)
+            names.append(name)
+            dl.append(defer.maybeDeferred(
+                processor, message, http_request=http_request))
 
-            dl.append(d.addCallback(cb, name))
+        def cb2(results):
+            # the bodies finish in any order, respond in the request order
+            for name, (success, body) in zip(names, results):
+                if success:
+                    response[name] = body
 
-        def cb2(result):
             return response
 
         def eb(failure):
@@ -394,7 +445,8 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
             http_request = kwargs.get('http_request', None)
             args = (http_request,) + args
 
-        return defer.maybeDeferred(authenticator, *args)
+        return self.timeCall(service_request.target, 'authenticate',
+            defer.maybeDeferred, authenticator, *args)
 
     def preprocessRequest(self, service_request, *args, **kwargs):
         """
@@ -414,4 +466,39 @@ class TwistedGateway(gateway.BaseGateway, resource.Resource):
             http_request = kwargs.get('http_request', None)
             args = (http_request,) + args
 
-        return defer.maybeDeferred(processor, *args)
+        return self.timeCall(service_request.target, 'preprocess',
+            defer.maybeDeferred, processor, *args)
+
+    def recordDuration(self, targets, name, start, result):
+        """
+        Records the duration once C{result} has fired if it is a
+        C{Deferred}. A failure is counted as an error.
+
+        @see: L{gateway.BaseGateway.recordDuration}
+        @since: 0.7
+        """
+        if not isinstance(result, defer.Deferred):
+            return gateway.BaseGateway.recordDuration(self, targets, name,
+                start, result)
+
+        def eb(failure):
+            self.metrics.error(targets)
+
+            return failure
+
+        return result.addCallbacks(
+            lambda r: gateway.BaseGateway.recordDuration(self, targets, name,
+                start, r), eb)
+
+    def cacheResponse(self, policy, key, result):
+        """
+        Caches the response once C{result} has fired if it is a C{Deferred}.
+
+        @see: L{gateway.BaseGateway.cacheResponse}
+        @since: 0.7
+        """
+        if not isinstance(result, defer.Deferred):
+            return gateway.BaseGateway.cacheResponse(self, policy, key, result)
+
+        return result.addCallback(
+            lambda r: gateway.BaseGateway.cacheResponse(self, policy, key, r))
@@ -32,8 +32,18 @@ __all__ = ['WSGIGateway']
 class WSGIGateway(gateway.BaseGateway):
     """
     WSGI Remoting Gateway.
+
+    @ivar stats_path: If set, C{GET} requests for this path (relative to the
+        gateway, i.e. the C{PATH_INFO}) are answered with the L{metrics} of
+        the gateway as JSON.
+    @type stats_path: C{str} or C{None}
     """
 
+    def __init__(self, *args, **kwargs):
+        self.stats_path = kwargs.pop('stats_path', None)
+
+        gateway.BaseGateway.__init__(self, *args, **kwargs)
+
     def getResponse(self, request, environ):
         """
         Processes the AMF request, returning an AMF response.
@@ -43,14 +53,18 @@ class WSGIGateway(gateway.BaseGateway):
         @rtype: L{Envelope<pyamf.remoting.Envelope>}
         @return: The AMF Response.
         """
-        response = remoting.Envelope(request.amfVersion)
+        def process(message):
+            http_request = environ
 
-        for name, message in request:
+            if self.executor is not None:
+                http_request = environ.copy()
+
+            http_request['pyamf.request'] = message
             processor = self.getProcessor(message)
-            environ['pyamf.request'] = message
-            response[name] = processor(message, http_request=environ)
 
-        return response
+            return processor(message, http_request=http_request)
+
+        return self.processEnvelope(request, process)
 
     def badRequestMethod(self, environ, start_response):
         """
@@ -67,11 +81,51 @@ class WSGIGateway(gateway.BaseGateway):
 
         return [response]
 
+    def getStatsResponse(self, environ, start_response):
+        """
+        Returns the L{metrics} of the gateway as JSON.
+
+        @since: 0.7
+        """
+        try:
+            import json
+        except ImportError:
+            import simplejson as json
+
+        metrics = self.getMetrics()
+
+        if metrics is None:
+            response = "404 Not Found\n\nMetrics are disabled."
+
+            start_response('404 Not Found', [
+                ('Content-Type', 'text/plain'),
+                ('Content-Length', str(len(response))),
+                ('Server', gateway.SERVER_NAME),
+            ])
+
+            return [response]
+
+        response = json.dumps(metrics, sort_keys=True)
+
+        start_response('200 OK', [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(response))),
+            ('Cache-Control', 'no-cache'),
+            ('Server', gateway.SERVER_NAME),
+        ])
+
+        return [response]
+
     def __call__(self, environ, start_response):
         """
         @rtype: C{StringIO}
         @return: File-like object.
         """
+        if (self.stats_path is not None and
+                environ['REQUEST_METHOD'] == 'GET' and
+                environ.get('PATH_INFO') == self.stats_path):
+            return self.getStatsResponse(environ, start_response)
+
         if environ['REQUEST_METHOD'] != 'POST':
             return self.badRequestMethod(environ, start_response)
 
@@ -81,8 +135,10 @@ class WSGIGateway(gateway.BaseGateway):
 
         # Decode the request
         try:
-            request = remoting.decode(body, strict=self.strict,
-                logger=self.logger, timezone_offset=timezone_offset)
+            request = self.decodeRequest(body,
+                content_encoding=environ.get('HTTP_CONTENT_ENCODING'),
+                strict=self.strict, logger=self.logger,
+                timezone_offset=timezone_offset)
         except (pyamf.DecodeError, IOError):
             if self.logger:
                 self.logger.exception('Error decoding AMF request')
@@ -151,7 +207,8 @@ class WSGIGateway(gateway.BaseGateway):
 
         # Encode the response
         try:
-            stream = remoting.encode(response, strict=self.strict,
+            stream = self.encodeResponse(response, request,
+                strict=self.strict,
                 timezone_offset=timezone_offset)
         except:
             if self.logger:
@@ -172,11 +229,34 @@ class WSGIGateway(gateway.BaseGateway):
             return [response]
 
         response = stream.getvalue()
-
-        start_response('200 OK', [
+        headers = [
             ('Content-Type', remoting.CONTENT_TYPE),
-            ('Content-Length', str(len(response))),
             ('Server', gateway.SERVER_NAME),
-        ])
+        ]
+
+        if self.compress_threshold is not None:
+            headers.append(('Vary', 'Accept-Encoding'))
+
+        encoding = self.getResponseEncoding(
+            environ.get('HTTP_ACCEPT_ENCODING'), len(response))
+
+        if encoding is None:
+            headers.append(('Content-Length', str(len(response))))
+            start_response('200 OK', headers)
+
+            return [response]
+
+        headers.append(('Content-Encoding', encoding))
+
+        if len(response) >= gateway.STREAM_THRESHOLD:
+            # compress the response as the server sends it
+            start_response('200 OK', headers)
+
+            return self.iterCompressResponse(response, encoding)
+
+        response = self.compressResponse(response, encoding)
+
+        headers.append(('Content-Length', str(len(response))))
+        start_response('200 OK', headers)
 
         return [response]
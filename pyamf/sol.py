@@ -82,51 +82,67 @@ def decode(stream, strict=True):
     return (root_name, values)
 
 
-def encode(name, values, strict=True, encoding=pyamf.AMF0):
+def encode(name, values, strict=True, encoding=pyamf.AMF0, sink=None,
+           chunk_size=None):
     """
     Produces a SharedObject encoded stream based on the name and values.
 
     @param name: The root name of the SharedObject.
     @param values: A `dict` of name value pairs to be encoded in the stream.
     @param strict: Ensure that the SOL stream is as spec compatible as possible.
-    @return: A SharedObject encoded stream.
+    @param sink: A file like object, socket or callable that will receive the
+        encoded bytes in chunks as encoding proceeds (see
+        L{pyamf.codec.Sink}). If C{strict} is set, the values are encoded twice
+        so that the length can be written before them.
+    @param chunk_size: The size of the chunks written to C{sink}.
+    @return: A SharedObject encoded stream or, if C{sink} was supplied, the
+        number of bytes written to it.
     @rtype: L{BufferedByteStream<pyamf.util.BufferedByteStream>}, a file like
         object.
     """
-    encoder = pyamf.get_encoder(encoding)
+    encoder = pyamf.get_encoder(encoding, sink=sink, chunk_size=chunk_size)
     stream = encoder.stream
+    name = name.encode('utf-8')
 
-    # write the header
-    stream.write(HEADER_VERSION)
+    def _encode_body():
+        # write the signature
+        stream.write(HEADER_SIGNATURE)
 
-    if strict:
-        length_pos = stream.tell()
+        # write the root name
+        stream.write_ushort(len(name))
+        stream.write(name)
 
-    stream.write_ulong(0)
+        # write the padding
+        stream.write(PADDING_BYTE * 3)
+        stream.write_uchar(encoding)
 
-    # write the signature
-    stream.write(HEADER_SIGNATURE)
+        for n, v in values.iteritems():
+            encoder.serialiseString(n)
+            encoder.writeElement(v)
 
-    # write the root name
-    name = name.encode('utf-8')
+            # write the padding
+            stream.write(PADDING_BYTE)
 
-    stream.write_ushort(len(name))
-    stream.write(name)
+    # write the header
+    stream.write(HEADER_VERSION)
 
-    # write the padding
-    stream.write(PADDING_BYTE * 3)
-    stream.write_uchar(encoding)
+    if strict and encoder.sink is not None:
+        encoder.sink.writeWithLength(encoder, _encode_body)
+    else:
+        if strict:
+            length_pos = stream.tell()
 
-    for n, v in values.iteritems():
-        encoder.serialiseString(n)
-        encoder.writeElement(v)
+        stream.write_ulong(0)
+        _encode_body()
 
-        # write the padding
-        stream.write(PADDING_BYTE)
+        if strict:
+            stream.seek(length_pos)
+            stream.write_ulong(stream.remaining() - 4)
+
+    if encoder.sink is not None:
+        encoder.flush()
 
-    if strict:
-        stream.seek(length_pos)
-        stream.write_ulong(stream.remaining() - 4)
+        return encoder.sink.written
 
     stream.seek(0)
 
@@ -42,3 +42,67 @@ class ArrayTestCase(unittest.TestCase):
 
     def test_amf3(self):
         self.assertEqual(self.encdec(pyamf.AMF3), self.orig)
+
+
+class NumericArrayTestCase(unittest.TestCase):
+    """
+    Numeric arrays are written in bulk.
+    """
+
+    def setUp(self):
+        if not array:
+            self.skipTest("'array' not available")
+
+    def assertEncodes(self, obj, encoding):
+        self.assertEqual(pyamf.encode(obj, encoding=encoding).getvalue(),
+            pyamf.encode(obj.tolist(), encoding=encoding).getvalue())
+
+        self.assertEqual(pyamf.decode(pyamf.encode(obj, encoding=encoding),
+            encoding=encoding).next(), obj.tolist())
+
+    def test_double(self):
+        obj = array.array('d', [0.1, -2.5, 1e300, 3.0] * 1000)
+
+        self.assertEncodes(obj, pyamf.AMF0)
+        self.assertEncodes(obj, pyamf.AMF3)
+
+    def test_int(self):
+        obj = array.array('l', [0, -1, 127, 128, 16383, 16384, 2097152,
+            0x0FFFFFFF, 0x10000000, -0x10000000, -0x10000001] * 500)
+
+        self.assertEncodes(obj, pyamf.AMF0)
+        self.assertEncodes(obj, pyamf.AMF3)
+
+    def test_typecodes(self):
+        for typecode in 'bBhHiIlLf':
+            obj = array.array(typecode, [0, 1, 2, 100])
+
+            self.assertEncodes(obj, pyamf.AMF0)
+            self.assertEncodes(obj, pyamf.AMF3)
+
+    def test_empty(self):
+        obj = array.array('d')
+
+        self.assertEncodes(obj, pyamf.AMF0)
+        self.assertEncodes(obj, pyamf.AMF3)
+
+    def test_reference(self):
+        obj = array.array('i', [1, 2, 3])
+
+        for encoding in (pyamf.AMF0, pyamf.AMF3):
+            x, y = pyamf.decode(pyamf.encode(obj, obj, encoding=encoding),
+                encoding=encoding)
+
+            self.assertEqual(x, [1, 2, 3])
+            self.assertTrue(x is y)
+
+    def test_sink(self):
+        obj = array.array('d', range(10000))
+        chunks = []
+
+        pyamf.encode(obj, encoding=pyamf.AMF3, sink=chunks.append,
+            chunk_size=1024)
+
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(''.join(chunks),
+            pyamf.encode(obj.tolist(), encoding=pyamf.AMF3).getvalue())
@@ -0,0 +1,47 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for the L{numpy} L{pyamf.adapters._numpy} module.
+
+@since: 0.7
+"""
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import unittest
+
+import pyamf
+
+
+class NumpyTestCase(unittest.TestCase):
+    """
+    Tests for C{numpy.ndarray}
+    """
+
+    def setUp(self):
+        if not numpy:
+            self.skipTest("'numpy' not available")
+
+    def assertEncodes(self, obj):
+        for encoding in (pyamf.AMF0, pyamf.AMF3):
+            bytes = pyamf.encode(obj, encoding=encoding).getvalue()
+
+            self.assertEqual(bytes,
+                pyamf.encode(obj.tolist(), encoding=encoding).getvalue())
+
+    def test_float(self):
+        self.assertEncodes(numpy.arange(1000, dtype='float64') / 3)
+        self.assertEncodes(numpy.arange(10, dtype='float32'))
+
+    def test_int(self):
+        self.assertEncodes(numpy.arange(-500, 500, dtype='int16'))
+        self.assertEncodes(numpy.array([0, 2 ** 40], dtype='int64'))
+        self.assertEncodes(numpy.array([0, 2 ** 40], dtype='uint64'))
+
+    def test_other(self):
+        self.assertEncodes(numpy.array([[1.0, 2.0], [3.0, 4.0]]))
+        self.assertEncodes(numpy.array([True, False]))
@@ -19,6 +19,8 @@ except ImportError:
 
     import unittest
 
+from StringIO import StringIO
+
 import pyamf
 from pyamf import remoting
 from pyamf.remoting import gateway
@@ -364,11 +366,51 @@ class TwistedServerTestCase(BaseTestCase):
         return d.addCallback(cb)
 
 
+    def test_body_order(self):
+        """
+        Bodies that finish out of order are returned in the request order.
+        """
+        first = defer.Deferred()
+
+        def slow():
+            return first
+
+        def fast():
+            reactor.callLater(0, first.callback, 'slow')
+
+            return 'fast'
+
+        self.gw.addService(slow)
+        self.gw.addService(fast)
+
+        env = remoting.Envelope(pyamf.AMF0)
+        env['/1'] = remoting.Request('slow', body=[])
+        env['/2'] = remoting.Request('fast', body=[])
+
+        d = self.getPage(remoting.encode(env).getvalue())
+        d.addCallback(lambda result: remoting.decode(result))
+
+        def cb(response):
+            self.assertEqual([name for name, body in response],
+                ['/1', '/2'])
+            self.assertEqual(response['/1'].body, 'slow')
+            self.assertEqual(response['/2'].body, 'fast')
+
+        return d.addCallback(cb)
+
+
 class DummyHTTPRequest:
-    def __init__(self):
+    def __init__(self, received_headers=None):
         self.headers = {}
+        self.received_headers = {}
         self.finished = False
 
+        for n, v in (received_headers or {}).items():
+            self.received_headers[n.lower()] = v
+
+    def getHeader(self, n):
+        return self.received_headers.get(n.lower())
+
     def setResponseCode(self, status):
         self.status = status
 
@@ -408,6 +450,85 @@ class TwistedGatewayTestCase(BaseTestCase):
         self.assertTrue(isinstance(gw.getProcessor(a3), twisted.AMF3RequestProcessor))
         self.assertTrue(isinstance(gw.getProcessor(a0), twisted.AMF0RequestProcessor))
 
+    def test_thread_threshold(self):
+        calls = []
+
+        def deferToThread(func, *args, **kwargs):
+            if func.__name__ == 'decodeRequest':
+                calls.append(args[0])
+
+            return defer.maybeDeferred(func, *args, **kwargs)
+
+        self.patch(twisted.threads, 'deferToThread', deferToThread)
+
+        gw = twisted.TwistedGateway(thread_threshold=100)
+        self.assertEqual(twisted.TwistedGateway().thread_threshold,
+            twisted.THREAD_THRESHOLD)
+
+        small = remoting.Envelope(pyamf.AMF0)
+        small['/1'] = remoting.Request('echo', body=['a'])
+        small = remoting.encode(small).getvalue()
+
+        large = remoting.Envelope(pyamf.AMF0)
+        large['/1'] = remoting.Request('echo', body=['a' * 100])
+        large = remoting.encode(large).getvalue()
+
+        for body in (small, large):
+            request = DummyHTTPRequest()
+            request.content = StringIO(body)
+            gw.render_POST(request)
+
+            self.assertTrue(request.finished)
+            self.assertEqual(request.status, 200)
+
+        self.assertEqual(calls, [large])
+
+        gw.thread_threshold = None
+        request = DummyHTTPRequest()
+        request.content = StringIO(small)
+        gw.render_POST(request)
+
+        self.assertEqual(calls, [large, small])
+
+    def test_thread_threshold_compressed(self):
+        """
+        Compressed bodies are decoded in a thread whatever their size.
+        """
+        calls = []
+
+        def deferToThread(func, *args, **kwargs):
+            if func.__name__ == 'decodeRequest':
+                calls.append(kwargs['content_encoding'])
+
+            return defer.maybeDeferred(func, *args, **kwargs)
+
+        self.patch(twisted.threads, 'deferToThread', deferToThread)
+
+        gw = twisted.TwistedGateway(thread_threshold=100)
+
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/1'] = remoting.Request('echo', body=['a' * 100])
+        body = gateway.compress(remoting.encode(envelope).getvalue(), 'gzip')
+
+        self.assertTrue(len(body) < gw.thread_threshold)
+
+        request = DummyHTTPRequest({'Content-Encoding': 'gzip'})
+        request.content = StringIO(body)
+        gw.render_POST(request)
+
+        self.assertTrue(request.finished)
+        self.assertEqual(request.status, 200)
+        self.assertEqual(calls, ['gzip'])
+
+        envelope['/1'] = remoting.Request('echo', body=['a'])
+
+        request = DummyHTTPRequest({'Content-Encoding': 'identity'})
+        request.content = StringIO(remoting.encode(envelope).getvalue())
+        gw.render_POST(request)
+
+        self.assertTrue(request.finished)
+        self.assertEqual(calls, ['gzip'])
+
 
 class AMF0RequestProcessorTestCase(BaseTestCase):
     """
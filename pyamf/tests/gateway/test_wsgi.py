@@ -172,3 +172,165 @@ class WSGIServerTestCase(unittest.TestCase):
         message = envelope['/1']
 
         self.assertEqual(message.body, now)
+
+    def test_stats(self):
+        import json
+
+        self.gw = WSGIGateway(stats_path='/stats')
+        self.gw.addService(lambda x: x, 'echo')
+
+        self.doRequest(self.makeRequest('echo', 'hello'), None)
+
+        def start_response(status, headers):
+            self.assertEqual(status, '200 OK')
+            self.assertTrue(('Content-Type', 'application/json') in headers)
+
+        response = self.gw({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/stats'},
+            start_response)
+        stats = json.loads(''.join(response))
+
+        self.assertEqual(stats['echo']['call']['count'], 1)
+        self.assertEqual(stats['*']['bytes_in']['count'], 1)
+
+        self.gw.metrics = None
+
+        def not_found(status, headers):
+            self.assertEqual(status, '404 Not Found')
+            self.executed = True
+
+        self.executed = False
+        self.gw({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/stats'}, not_found)
+        self.assertTrue(self.executed)
+
+    def test_no_stats_path(self):
+        def bad_response(status, headers):
+            self.assertEqual(status, '400 Bad Request')
+            self.executed = True
+
+        self.gw({'REQUEST_METHOD': 'GET', 'PATH_INFO': '/stats'},
+            bad_response)
+        self.assertTrue(self.executed)
+
+    def test_concurrent(self):
+        self.gw = WSGIGateway(executor=2, expose_request=True)
+
+        def echo(http_request, x):
+            return http_request['pyamf.request'].body[0] == x and x
+
+        self.gw.addService(echo)
+
+        envelope = remoting.Envelope(pyamf.AMF0)
+
+        for i in range(4):
+            envelope['/%d' % (i,)] = remoting.Request('echo', body=[i + 1])
+
+        response = self.doRequest(remoting.encode(envelope), None)
+        response = remoting.decode(''.join(response))
+
+        self.assertEqual([message.body for name, message in response],
+            [1, 2, 3, 4])
+
+        self.gw.executor.shutdown()
+
+    def test_compression(self):
+        import zlib
+
+        self.gw.addService(lambda x: x, 'echo')
+        headers = {}
+
+        def start_response(status, h):
+            self.assertEqual(status, '200 OK')
+            headers.clear()
+            headers.update(dict(h))
+
+        # small responses are not worth compressing
+        response = ''.join(self.doRequest(self.makeRequest('echo', 'spam'),
+            start_response, HTTP_ACCEPT_ENCODING='gzip'))
+
+        self.assertFalse('Content-Encoding' in headers)
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertEqual(remoting.decode(response)['/1'].body, 'spam')
+
+        body = 'spam' * 1000
+        request = self.makeRequest('echo', body).getvalue()
+
+        response = ''.join(self.doRequest(util.BufferedByteStream(request),
+            start_response, HTTP_ACCEPT_ENCODING='deflate;q=0.5, gzip'))
+
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Content-Length'], str(len(response)))
+
+        response = zlib.decompress(response, 16 + zlib.MAX_WBITS)
+        self.assertEqual(remoting.decode(response)['/1'].body, body)
+
+        # the client does not accept compression
+        response = ''.join(self.doRequest(util.BufferedByteStream(request),
+            start_response))
+
+        self.assertFalse('Content-Encoding' in headers)
+        self.assertEqual(remoting.decode(response)['/1'].body, body)
+
+    def test_stream_compression(self):
+        import zlib
+        from pyamf.remoting import gateway
+
+        self.gw.addService(lambda x: x, 'echo')
+        headers = {}
+
+        def start_response(status, h):
+            headers.update(dict(h))
+
+        body = 'spam' * gateway.STREAM_THRESHOLD
+        response = self.doRequest(self.makeRequest('echo', body),
+            start_response, HTTP_ACCEPT_ENCODING='deflate')
+
+        self.assertFalse(isinstance(response, list))
+        self.assertEqual(headers['Content-Encoding'], 'deflate')
+        self.assertFalse('Content-Length' in headers)
+
+        response = zlib.decompress(''.join(response))
+        self.assertEqual(remoting.decode(response)['/1'].body, body)
+
+    def test_compressed_request(self):
+        import zlib
+
+        self.gw.addService(lambda x: x, 'echo')
+
+        def start_response(status, headers):
+            self.assertEqual(status, '200 OK')
+
+        request = zlib.compress(self.makeRequest('echo', 'spam').getvalue())
+        response = self.doRequest(util.BufferedByteStream(request),
+            start_response, HTTP_CONTENT_ENCODING='deflate')
+
+        self.assertEqual(remoting.decode(''.join(response))['/1'].body,
+            'spam')
+
+        def bad_request(status, headers):
+            self.assertEqual(status, '400 Bad Request')
+
+        self.doRequest(util.BufferedByteStream(request), bad_request,
+            HTTP_CONTENT_ENCODING='gzip')
+        self.doRequest(util.BufferedByteStream(request), bad_request,
+            HTTP_CONTENT_ENCODING='br')
+
+    def test_compressed_request_limit(self):
+        """
+        A compressed request may not expand beyond C{max_request_size}.
+        """
+        import zlib
+
+        self.gw = WSGIGateway(max_request_size=1024)
+        self.gw.addService(lambda x: x, 'echo')
+
+        def start_response(status, headers):
+            self.assertEqual(status, '400 Bad Request')
+
+        request = zlib.compress(self.makeRequest('echo',
+            '\x00' * 100000).getvalue())
+
+        self.assertTrue(len(request) < 1024)
+
+        self.doRequest(util.BufferedByteStream(request), start_response,
+            HTTP_CONTENT_ENCODING='deflate')
+        self.assertTrue(self.executed)
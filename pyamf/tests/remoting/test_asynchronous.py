@@ -0,0 +1,226 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for the non-blocking remoting client.
+
+@since: 0.7
+"""
+
+import BaseHTTPServer
+import gzip
+import socket
+import SocketServer
+import threading
+import time
+import unittest
+
+import pyamf
+from pyamf import remoting, util
+from pyamf.remoting.client import asynchronous
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Answers each request body with its arguments, after sleeping for the
+    number of seconds given by a C{sleep} call. The path selects how the
+    response is framed.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections.append(self.client_address)
+
+    def do_POST(self):
+        request = remoting.decode(
+            self.rfile.read(int(self.headers['Content-Length'])))
+
+        if self.path == '/error':
+            self.send_response(500)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+            return
+
+        env = remoting.Envelope(pyamf.AMF0)
+
+        for name, message in request:
+            if message.target == 'sleep':
+                time.sleep(message.body[0])
+
+            env[name] = remoting.Response(message.body)
+
+        body = remoting.encode(env).getvalue()
+
+        self.send_response(200)
+        self.send_header('Content-Type', remoting.CONTENT_TYPE)
+
+        if self.path == '/gzip':
+            buf = util.BufferedByteStream()
+            f = gzip.GzipFile(fileobj=buf, mode='wb')
+            f.write(body)
+            f.close()
+
+            body = buf.getvalue()
+
+            self.send_header('Content-Encoding', 'gzip')
+
+        if self.path == '/chunked':
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+
+            for i in xrange(0, len(body), 7):
+                chunk = body[i:i + 7]
+                self.wfile.write('%x\r\n%s\r\n' % (len(chunk), chunk))
+
+            self.wfile.write('0\r\n\r\n')
+
+            return
+
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Server(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+class AsyncRemotingServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = Server(('127.0.0.1', 0), Handler)
+        self.server.connections = []
+
+        self.thread = threading.Thread(target=self.server.serve_forever,
+            args=(0.05,))
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+        self.map = {}
+        self.services = []
+
+    def tearDown(self):
+        for gw in self.services:
+            gw.close()
+
+        self.server.shutdown()
+        self.server.server_close()
+
+    def getService(self, path='/', **kwargs):
+        gw = asynchronous.AsyncRemotingService('http://127.0.0.1:%d%s' % (
+            self.server.server_address[1], path), map=self.map, **kwargs)
+
+        self.services.append(gw)
+
+        return gw
+
+    def test_create(self):
+        gw = self.getService()
+
+        self.assertEqual(gw.address, ('127.0.0.1',
+            self.server.server_address[1]))
+        self.assertEqual(gw.selector, '/')
+
+        self.assertRaises(ValueError, asynchronous.AsyncRemotingService,
+            'https://example.org')
+
+    def test_call(self):
+        service = self.getService().getService('echo')
+
+        call = service(1, 2)
+
+        self.assertTrue(isinstance(call, asynchronous.AsyncRequestWrapper))
+        self.assertFalse(call.done())
+        self.assertEqual(call.wait(5), [1, 2])
+
+    def test_in_flight(self):
+        gw = self.getService(max_connections=5)
+        service = gw.getService('sleep')
+
+        start = time.time()
+        calls = [service(0.3) for i in xrange(5)]
+
+        self.assertTrue(gw.run(5))
+        self.assertTrue(time.time() - start < 1.2)
+        self.assertEqual([c.wait() for c in calls], [[0.3]] * 5)
+
+    def test_max_connections(self):
+        gw = self.getService(max_connections=2)
+        service = gw.getService('echo')
+
+        calls = [service(i) for i in xrange(6)]
+
+        self.assertEqual(len(gw.queue), 4)
+        self.assertTrue(gw.run(5))
+        self.assertEqual([c.wait() for c in calls], [[i] for i in xrange(6)])
+
+        # the connections are kept alive and reused
+        self.assertEqual(len(self.server.connections), 2)
+        self.assertEqual(len(gw.idle), 2)
+
+    def test_batch(self):
+        gw = self.getService()
+        service = gw.getService('echo', auto_execute=False)
+
+        a = service('a')
+        b = service('b')
+        done = []
+
+        a.addCallback(done.append)
+
+        self.assertEqual(gw.execute(), [a, b])
+        self.assertTrue(gw.run(5))
+        self.assertEqual([a.wait(), b.wait()], [['a'], ['b']])
+        self.assertEqual(done, [a])
+
+    def test_many_services(self):
+        services = [self.getService().getService('sleep') for i in xrange(3)]
+        calls = [s(0.2) for s in services]
+
+        start = time.time()
+
+        self.assertEqual([c.wait(5) for c in calls], [[0.2]] * 3)
+        self.assertTrue(time.time() - start < 0.55)
+
+    def test_chunked(self):
+        service = self.getService('/chunked').getService('echo')
+
+        self.assertEqual(service('spam' * 20).wait(5), ['spam' * 20])
+
+    def test_gzip(self):
+        service = self.getService('/gzip').getService('echo')
+
+        self.assertEqual(service('spam' * 20).wait(5), ['spam' * 20])
+
+    def test_http_error(self):
+        service = self.getService('/error').getService('echo')
+
+        self.assertRaises(remoting.RemotingError, service().wait, 5)
+
+    def test_connection_refused(self):
+        s = socket.socket()
+        s.bind(('127.0.0.1', 0))
+        port = s.getsockname()[1]
+        s.close()
+
+        gw = asynchronous.AsyncRemotingService('http://127.0.0.1:%d/' % (
+            port,), map=self.map)
+
+        self.assertRaises(remoting.RemotingError,
+            gw.getService('echo')().wait, 5)
+
+
+class ChunkedDecoderTestCase(unittest.TestCase):
+    def test_feed(self):
+        decoder = asynchronous.ChunkedDecoder()
+        data = '5\r\nhello\r\n6;ext=1\r\n world\r\n0\r\n\r\n'
+
+        ret = [decoder.feed(c) for c in data]
+
+        self.assertEqual(''.join(ret), 'hello world')
+        self.assertTrue(decoder.finished)
@@ -15,6 +15,7 @@ import urllib2
 import pyamf
 from pyamf import remoting, util
 from pyamf.remoting import client
+from pyamf.remoting.client import pool
 
 
 class ServiceMethodProxyTestCase(unittest.TestCase):
@@ -244,12 +245,19 @@ class MockResponse(object):
 
     headers = None
     body = None
+    offset = 0
 
     def info(self):
         return MockHeaderCollection(self.headers)
 
     def read(self, amount):
-        return self.body[0:amount]
+        if amount < 0:
+            amount = len(self.body)
+
+        data = self.body[self.offset:self.offset + amount]
+        self.offset += len(data)
+
+        return data
 
 
 class BaseServiceTestCase(unittest.TestCase):
@@ -281,6 +289,7 @@ class BaseServiceTestCase(unittest.TestCase):
     def setResponse(self, status, body, headers=None):
         self.response.code = status
         self.response.body = body
+        self.response.offset = 0
         self.response.headers = headers or {
             'Content-Type': remoting.CONTENT_TYPE
         }
@@ -431,7 +440,8 @@ class RemotingServiceTestCase(BaseServiceTestCase):
 
         self.assertEqual(r.headers, {
             'Content-type': remoting.CONTENT_TYPE,
-            'User-agent': client.DEFAULT_USER_AGENT
+            'User-agent': client.DEFAULT_USER_AGENT,
+            'Accept-encoding': 'gzip, deflate'
         })
         self.assertEqual(r.get_method(), 'POST')
         self.assertEqual(r.get_full_url(), 'http://example.org/amf-gateway')
@@ -459,7 +469,8 @@ class RemotingServiceTestCase(BaseServiceTestCase):
 
         self.assertEqual(r.headers, {
             'Content-type': remoting.CONTENT_TYPE,
-            'User-agent': client.DEFAULT_USER_AGENT
+            'User-agent': client.DEFAULT_USER_AGENT,
+            'Accept-encoding': 'gzip, deflate'
         })
         self.assertEqual(r.get_method(), 'POST')
         self.assertEqual(r.get_full_url(), 'http://example.org/amf-gateway')
@@ -541,7 +552,8 @@ class RemotingServiceTestCase(BaseServiceTestCase):
         expected_headers = {
             'Etag': '29083457239804752309485',
             'Content-type': 'application/x-amf',
-            'User-agent': self.gw.user_agent
+            'User-agent': self.gw.user_agent,
+            'Accept-encoding': 'gzip, deflate'
         }
 
         self.setResponse(200, '\x00\x00\x00\x01\x00\x11ReplaceGatewayUrl'
@@ -624,3 +636,485 @@ class GZipTestCase(BaseServiceTestCase):
         self.setResponse(200, 'foobar', self.headers)
 
         self.assertRaises(IOError, self.gw._getResponse, None)
+
+
+class FakeConnection(object):
+    closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    """
+    Tests for L{pool.ConnectionPool}.
+    """
+
+    def setUp(self):
+        self.now = 0.0
+        self.pool = pool.ConnectionPool(size=2, idle_timeout=10,
+            clock=lambda: self.now)
+
+    def test_acquire(self):
+        self.assertEqual(self.pool.acquire('a'), None)
+
+        c = FakeConnection()
+        self.pool.release('a', c)
+
+        self.assertEqual(len(self.pool), 1)
+        self.assertEqual(self.pool.acquire('b'), None)
+        self.assertTrue(self.pool.acquire('a') is c)
+        self.assertEqual(self.pool.acquire('a'), None)
+        self.assertEqual(len(self.pool), 0)
+        self.assertFalse(c.closed)
+
+    def test_size(self):
+        connections = [FakeConnection() for i in range(3)]
+
+        for c in connections:
+            self.pool.release('a', c)
+
+        self.assertEqual(len(self.pool), 2)
+        self.assertEqual([c.closed for c in connections],
+            [False, False, True])
+
+    def test_idle_timeout(self):
+        old = FakeConnection()
+        self.pool.release('a', old)
+
+        self.now = 5
+        new = FakeConnection()
+        self.pool.release('a', new)
+
+        self.now = 12
+
+        self.assertTrue(self.pool.acquire('a') is new)
+        self.assertEqual(self.pool.acquire('a'), None)
+        self.assertTrue(old.closed)
+        self.assertFalse(new.closed)
+
+    def test_clear(self):
+        c = FakeConnection()
+        self.pool.release('a', c)
+        self.pool.clear()
+
+        self.assertEqual(len(self.pool), 0)
+        self.assertTrue(c.closed)
+
+
+class FakeHTTPResponse(object):
+    status = 200
+    reason = 'OK'
+    msg = {}
+    will_close = False
+
+    def read(self, amt=None):
+        return ''
+
+    def isclosed(self):
+        return True
+
+
+class ScriptedConnection(FakeConnection):
+    """
+    Raises C{error} from C{request} or C{getresponse} (as C{stage}
+    dictates), or answers with a L{FakeHTTPResponse}.
+    """
+
+    def __init__(self, stage=None, error=None):
+        self.stage = stage
+        self.error = error
+        self.requests = 0
+
+    def request(self, *args):
+        self.requests += 1
+
+        if self.stage == 'request':
+            raise self.error
+
+    def getresponse(self):
+        if self.stage == 'response':
+            raise self.error
+
+        return FakeHTTPResponse()
+
+
+class RetryTestCase(unittest.TestCase):
+    """
+    Requests on idle connections are only sent again if the server cannot
+    have seen them.
+    """
+
+    def setUp(self):
+        self.pool = pool.ConnectionPool()
+        self.handler = pool.PooledHTTPHandler(self.pool)
+        self.new = []
+
+        self.handler.connect = self.connect
+
+    def connect(self, req):
+        c = ScriptedConnection()
+        self.new.append(c)
+
+        return c
+
+    def open(self, stage, error):
+        idle = ScriptedConnection(stage, error)
+        self.pool.release(self.handler.getKey(self.request()), idle)
+
+        return idle
+
+    def request(self):
+        return urllib2.Request('http://example.org/gw', 'data')
+
+    def assertRetried(self, stage, error):
+        idle = self.open(stage, error)
+
+        self.assertEqual(self.handler.do_open(self.request()).code, 200)
+        self.assertTrue(idle.closed)
+        self.assertEqual([c.requests for c in self.new], [1])
+
+    def assertNotRetried(self, stage, error):
+        idle = self.open(stage, error)
+
+        self.assertRaises(urllib2.URLError, self.handler.do_open,
+            self.request())
+        self.assertTrue(idle.closed)
+        self.assertEqual(idle.requests, 1)
+        self.assertEqual(self.new, [])
+
+    def test_send_error(self):
+        import socket
+
+        self.assertRetried('request', socket.error(32, 'Broken pipe'))
+
+    def test_closed(self):
+        import httplib
+
+        self.assertRetried('response', httplib.BadStatusLine(''))
+
+    def test_send_timeout(self):
+        import socket
+
+        self.assertNotRetried('request', socket.timeout())
+
+    def test_response_timeout(self):
+        import socket
+
+        self.assertNotRetried('response', socket.timeout())
+
+    def test_response_error(self):
+        import httplib
+        import socket
+
+        self.assertNotRetried('response', socket.error(104, 'Reset'))
+        self.assertNotRetried('response', httplib.BadStatusLine('garbage'))
+
+    def test_new_connection(self):
+        """
+        Errors on a new connection are never retried.
+        """
+        import socket
+
+        def connect(req):
+            c = ScriptedConnection('request', socket.error(32, 'Broken'))
+            self.new.append(c)
+
+            return c
+
+        self.handler.connect = connect
+
+        self.assertRaises(urllib2.URLError, self.handler.do_open,
+            self.request())
+        self.assertEqual(len(self.new), 1)
+
+
+class KeepAliveTestCase(unittest.TestCase):
+    """
+    Consecutive calls reuse the connection to the server.
+    """
+
+    def setUp(self):
+        import BaseHTTPServer
+        import threading
+
+        self.connections = connections = []
+
+        class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+                connections.append(self.client_address)
+
+            def do_POST(self):
+                request = remoting.decode(
+                    self.rfile.read(int(self.headers['Content-Length'])))
+
+                env = remoting.Envelope(pyamf.AMF0)
+
+                for name, message in request:
+                    env[name] = remoting.Response('spam')
+
+                body = remoting.encode(env).getvalue()
+
+                self.send_response(200)
+                self.send_header('Content-Type', remoting.CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+        self.pool = pool.ConnectionPool()
+        self.gw = client.RemotingService('http://127.0.0.1:%d/' % (
+            self.server.server_address[1],), pool=self.pool)
+
+    def tearDown(self):
+        # closing the client side ends the keep-alive loop of the server
+        self.pool.clear()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_reuse(self):
+        service = self.gw.getService('echo')
+
+        for i in range(3):
+            self.assertEqual(service(), 'spam')
+
+        self.assertEqual(len(self.connections), 1)
+        self.assertEqual(len(self.pool), 1)
+
+    def test_stale(self):
+        service = self.gw.getService('echo')
+
+        self.assertEqual(service(), 'spam')
+
+        # the server drops the idle connection
+        for connection, released in self.pool.connections.values()[0]:
+            connection.sock.shutdown(2)
+
+        self.assertEqual(service(), 'spam')
+        self.assertEqual(len(self.connections), 2)
+
+
+class EchoOpener(object):
+    """
+    Responds to each request body with its arguments.
+    """
+
+    def __init__(self):
+        self.envelopes = []
+
+    def open(self, http_request):
+        request = remoting.decode(http_request.get_data())
+        self.envelopes.append([name for name, message in request])
+
+        env = remoting.Envelope(pyamf.AMF0)
+
+        for name, message in request:
+            if message.target == 'fail':
+                env[name] = remoting.Response(
+                    remoting.ErrorFault(code='TypeError'),
+                    status=remoting.STATUS_ERROR)
+            else:
+                env[name] = remoting.Response(message.body)
+
+        response = MockResponse()
+        response.body = remoting.encode(env).getvalue()
+        response.headers = {
+            'Content-Type': remoting.CONTENT_TYPE,
+            'Content-Length': len(response.body)
+        }
+
+        return response
+
+
+class CoalesceTestCase(unittest.TestCase):
+    """
+    Tests for L{client.Coalescer}.
+    """
+
+    def setUp(self):
+        self.opener = EchoOpener()
+
+    def getService(self, **kwargs):
+        self.gw = client.RemotingService('http://example.org/gw',
+            opener=self.opener.open, **kwargs)
+
+        return self.gw.getService('echo')
+
+    def test_disabled(self):
+        service = self.getService()
+
+        self.assertEqual(self.gw.coalescer, None)
+        self.assertEqual(service(1), [1])
+
+    def test_size(self):
+        service = self.getService(coalesce_size=3)
+
+        a = service(1)
+        b = service(2)
+
+        self.assertFalse(a.done())
+        self.assertEqual(self.opener.envelopes, [])
+        self.assertEqual(self.gw.requests, [])
+
+        c = service(3)
+
+        self.assertEqual(self.opener.envelopes, [['/1', '/2', '/3']])
+        self.assertEqual([x.wait() for x in (a, b, c)], [[1], [2], [3]])
+
+    def test_window(self):
+        service = self.getService(coalesce_window=0.01)
+
+        a = service(1)
+        b = service(2)
+
+        self.assertEqual(b.wait(1), [2])
+        self.assertEqual(a.wait(0), [1])
+        self.assertEqual(self.opener.envelopes, [['/1', '/2']])
+
+    def test_flush(self):
+        service = self.getService(coalesce_size=10)
+
+        a = service(1)
+
+        self.assertRaises(RuntimeError, a.wait, 0)
+
+        self.gw.flush()
+        self.gw.flush()
+
+        self.assertEqual(a.wait(), [1])
+        self.assertEqual(self.opener.envelopes, [['/1']])
+
+    def test_error(self):
+        self.getService(coalesce_size=2)
+
+        a = self.gw.getService('fail')()
+        b = self.gw.getService('echo')('spam')
+
+        self.assertRaises(TypeError, a.wait)
+        self.assertEqual(b.wait(), ['spam'])
+
+    def test_transport_error(self):
+        def opener(http_request):
+            raise urllib2.URLError('refused')
+
+        self.gw = client.RemotingService('http://example.org/gw',
+            opener=opener, coalesce_size=1)
+
+        a = self.gw.getService('echo')()
+
+        self.assertTrue(a.done())
+        self.assertRaises(remoting.RemotingError, a.wait)
+
+
+class StreamingResponse(MockResponse):
+    """
+    Returns the body a few bytes at a time and records the requests that
+    were done before each read.
+    """
+
+    def __init__(self, body, requests, headers=None):
+        self.body = body
+        self.requests = requests
+        self.headers = headers or {'Content-Type': remoting.CONTENT_TYPE}
+        self.done = []
+
+    def read(self, amount):
+        self.done.append([r.id for r in self.requests if r.done()])
+
+        return MockResponse.read(self, min(amount, 10))
+
+
+class StreamingTestCase(unittest.TestCase):
+    """
+    The response is decoded as it is read.
+    """
+
+    def setUp(self):
+        self.gw = client.RemotingService('http://example.org/gw',
+            opener=self.open)
+
+        self.requests = [self.gw.addRequest('echo', i) for i in xrange(2)]
+
+        env = remoting.Envelope(pyamf.AMF0)
+        env['/1'] = remoting.Response(u'spam')
+        env['/2'] = remoting.Response([u'eggs'] * 20)
+
+        self.body = remoting.encode(env).getvalue()
+        self.headers = None
+
+    def open(self, http_request):
+        self.response = StreamingResponse(self.body, self.requests,
+            self.headers)
+
+        return self.response
+
+    def test_bodies(self):
+        envelope = self.gw.execute()
+
+        self.assertEqual(envelope['/2'].body, [u'eggs'] * 20)
+        self.assertEqual([r.wait() for r in self.requests],
+            [u'spam', [u'eggs'] * 20])
+
+        # the first body was handed on before the second was read
+        self.assertTrue(['/1'] in self.response.done)
+
+    def test_deflate(self):
+        import zlib
+
+        self.body = zlib.compress(self.body)
+        self.headers = {
+            'Content-Type': remoting.CONTENT_TYPE,
+            'Content-Encoding': 'deflate',
+            'Content-Length': str(len(self.body))
+        }
+
+        self.gw.execute()
+
+        self.assertEqual(self.requests[0].wait(), u'spam')
+
+    def test_truncated(self):
+        self.body = self.body[:-5]
+
+        self.assertRaises(IOError, self.gw.execute)
+
+    def test_large_externalizable(self):
+        """
+        An externalizable value inside an AMF0 object that spans several
+        reads is decoded speculatively, with cpyamf if it is available.
+        """
+        from pyamf.flex import ArrayCollection
+
+        rows = [{'id': i, 'name': u'row %d' % i, 'value': i * 1.5}
+            for i in xrange(3000)]
+        summary = {'count': 3000, 'total': 1.5}
+
+        env = remoting.Envelope(pyamf.AMF0)
+        env['/1'] = remoting.Response({'rows': ArrayCollection(rows),
+            'summary': summary})
+        env['/2'] = remoting.Response(u'spam')
+
+        self.body = remoting.encode(env).getvalue()
+        self.assertTrue(len(self.body) > client.READ_SIZE)
+
+        response = MockResponse()
+        response.body = self.body
+        response.headers = {'Content-Type': remoting.CONTENT_TYPE}
+
+        self.gw.opener = lambda http_request: response
+        self.gw.execute()
+
+        result = self.requests[0].wait()
+
+        self.assertEqual(result['summary'], summary)
+        self.assertEqual(list(result['rows']), rows)
+        self.assertEqual(self.requests[1].wait(), u'spam')
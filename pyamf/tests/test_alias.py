@@ -223,6 +223,143 @@ class GetEncodableAttributesTestCase(unittest.TestCase):
         self.assertEquals(ret, {'bar': 'bar', 'spam': 'eggs'})
 
 
+class EncodePlanTestCase(unittest.TestCase):
+    """
+    Tests for L{ClassAlias.encode_plan} and L{ClassAlias.getDynamicAttributes}
+    """
+
+    def setUp(self):
+        self.alias = ClassAlias(Spam, 'foo', defer=True)
+        self.obj = Spam()
+
+    def test_default(self):
+        self.alias.compile()
+
+        self.assertEqual(self.alias.encode_plan, ((), (), True))
+
+    def test_static(self):
+        self.alias.static_attrs = ['foo', 'bar']
+        self.alias.dynamic = False
+        self.alias.compile()
+
+        self.assertEqual(self.alias.encode_plan, (('foo', 'bar'), (), False))
+
+    def test_sealed(self):
+        class A(object):
+            __slots__ = ('spam', 'eggs', 'foo')
+
+        alias = ClassAlias(A, static_attrs=['foo'])
+
+        self.assertEqual(alias.encode_plan, (('foo',), ('eggs', 'spam'), False))
+
+    def test_no_plan(self):
+        self.alias.proxy_attrs = ['foo']
+        self.alias.compile()
+
+        self.assertEqual(self.alias.encode_plan, None)
+
+        alias = ClassAlias(Spam, synonym_attrs={'foo': 'bar'})
+        self.assertEqual(alias.encode_plan, None)
+
+        alias = ClassAlias(dict)
+        self.assertEqual(alias.encode_plan, None)
+
+    def test_overridden(self):
+        class MyAlias(ClassAlias):
+            def getEncodableAttributes(self, obj, codec=None):
+                return {}
+
+        alias = MyAlias(Spam)
+
+        self.assertEqual(alias.encode_plan, None)
+
+    def test_dynamic_attributes(self):
+        self.alias.static_attrs = ['foo']
+        self.alias.exclude_attrs = ['baz']
+        self.alias.compile()
+
+        self.obj.foo = 'bar'
+        self.obj.spam = 'eggs'
+        self.obj.baz = 'gak'
+
+        self.assertEqual(self.alias.getDynamicAttributes(self.obj),
+            {'spam': 'eggs'})
+
+
+class DecodePlanTestCase(unittest.TestCase):
+    """
+    Tests for L{ClassAlias.getDecodePlan}
+    """
+
+    def setUp(self):
+        self.alias = ClassAlias(Spam, 'foo', defer=True)
+
+    def test_shortcut(self):
+        plan = self.alias.getDecodePlan(['foo', 'bar'])
+
+        self.assertEqual(plan, ('dict', (('foo', False), ('bar', False))))
+
+    def test_cached(self):
+        plan = self.alias.getDecodePlan(['foo', 'bar'])
+
+        self.assertTrue(self.alias.getDecodePlan(('foo', 'bar')) is plan)
+
+    def test_bounded(self):
+        from pyamf import alias as alias_module
+
+        for i in range(alias_module.MAX_DECODE_PLANS * 3):
+            self.alias.getDecodePlan(['foo%d' % (i,)])
+
+        self.assertTrue(
+            len(self.alias._decode_plans) <= alias_module.MAX_DECODE_PLANS)
+
+    def test_dict(self):
+        alias = ClassAlias(dict)
+
+        plan = alias.getDecodePlan(['foo'])
+
+        self.assertEqual(plan, ('item', (('foo', False),)))
+
+    def test_filtered(self):
+        self.alias.readonly_attrs = ['bar']
+        self.alias.exclude_attrs = ['baz']
+        self.alias.proxy_attrs = ['foo']
+
+        plan = self.alias.getDecodePlan(['foo', 'bar', 'baz', 'gak'])
+
+        self.assertEqual(plan, ('attr',
+            (('foo', True), None, None, ('gak', False))))
+
+    def test_synonym(self):
+        self.alias.synonym_attrs = {'foo': 'spam'}
+
+        plan = self.alias.getDecodePlan(['foo', 'gak'])
+
+        self.assertEqual(plan, ('attr', (('spam', False), ('gak', False))))
+
+    def test_missing_static(self):
+        self.alias.static_attrs = ['foo', 'bar']
+
+        self.assertEqual(self.alias.getDecodePlan(['foo']), None)
+
+    def test_static(self):
+        self.alias.static_attrs = ['foo', 'bar']
+        self.alias.proxy_attrs = ['foo']
+
+        plan = self.alias.getDecodePlan(['foo', 'bar'])
+
+        self.assertEqual(plan, ('attr', (('foo', False), ('bar', False))))
+
+    def test_overridden(self):
+        class MyAlias(ClassAlias):
+            def applyAttributes(self, obj, attrs, codec=None):
+                pass
+
+        alias = MyAlias(Spam)
+
+        self.assertEqual(alias.getDecodePlan(['foo']), None)
+
+
 class GetDecodableAttributesTestCase(unittest.TestCase):
     """
     Tests for L{ClassAlias.getDecodableAttributes}
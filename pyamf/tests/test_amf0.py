@@ -63,6 +63,20 @@ class EncoderTestCase(ClassCacheClearingTestCase, EncoderMixIn):
         self.assertEncoded(-123, '\x00\xc0\x5e\xc0\x00\x00\x00\x00\x00')
         self.assertEncoded(1.23456789, '\x00\x3f\xf3\xc0\xca\x42\x83\xde\x1b')
 
+    def test_raw_amf(self):
+        raw = pyamf.encode_raw({'a': 1}, encoding=pyamf.AMF0)
+        x = {'b': 1}
+
+        self.assertEqual(raw.references, (1, None))
+        self.assertEncoded([raw, x, x], '\n\x00\x00\x00\x03', raw.bytes,
+            '\x03\x00\x01b\x00?\xf0\x00\x00\x00\x00\x00\x00\x00\x00\t'
+            '\x07\x00\x02')
+
+    def test_raw_amf3(self):
+        raw = pyamf.encode_raw({'a': 'spam'}, encoding=pyamf.AMF3)
+
+        self.assertEncoded(raw, '\x11', raw.bytes)
+
     def test_boolean(self):
         self.assertEncoded(True, '\x01\x01')
         self.assertEncoded(False, '\x01\x00')
@@ -410,6 +424,20 @@ class EncoderTestCase(ClassCacheClearingTestCase, EncoderMixIn):
         self.assertEncoded(x, '\x03', ('\x00\x03bar\x02\x00\x03gak',
             '\x00\x03foo\x02\x00\x03baz'), '\x00\x00\t')
 
+    def test_sealed_attrs(self):
+        class Foo(object):
+            __slots__ = ('foo', 'bar')
+
+        alias = pyamf.register_class(Foo, 'abc')
+        alias.static_attrs = ['foo']
+
+        x = Foo()
+        x.foo = 'baz'
+        x.bar = 'gak'
+
+        self.assertEncoded(x, '\x10\x00\x03abc\x00\x03foo\x02\x00\x03baz'
+            '\x00\x03bar\x02\x00\x03gak\x00\x00\t')
+
     def test_class(self):
         class Classic:
             pass
@@ -1046,6 +1074,76 @@ class ExceptionEncodingTestCase(ClassCacheClearingTestCase):
             '\x07message\x02\x00\x05blarg\x00\x04name\x02\x00\x03XYZ\x00\x00\t')
 
 
+class ScannerTestCase(unittest.TestCase):
+    """
+    Tests for L{amf0.Scanner}
+    """
+
+    def test_object(self):
+        scanner = amf0.Scanner()
+        stream = util.BufferedByteStream('\x03\x00\x01a\x02\x00\x03fo')
+
+        self.assertEqual(scanner.scan(stream), None)
+
+        stream.append('o\x00\x00')
+        self.assertEqual(scanner.scan(stream), None)
+
+        stream.append('\x09')
+        self.assertEqual(scanner.scan(stream), 13)
+        self.assertEqual(stream.tell(), 0)
+
+    def test_amf3(self):
+        scanner = amf0.Scanner()
+        stream = util.BufferedByteStream('\x0a\x00\x00\x00\x02\x11\x06\x07foo'
+            '\x00\x00\x00\x00\x00\x00\x00\x00\x00')
+
+        self.assertEqual(scanner.scan(stream), 20)
+
+    def test_unsupported(self):
+        scanner = amf0.Scanner()
+
+        self.assertEqual(scanner.scan(util.BufferedByteStream('\x04')), -1)
+
+    def test_walk(self):
+        scanner = pyamf.get_scanner(pyamf.AMF0, index=True)
+        stream = util.BufferedByteStream('\x0a\x00\x00\x00\x01\x02\x00\x01'
+            'a\x11\x06\x07foo\x03\x00\x01a\x05')
+
+        self.assertEqual(scanner.walk(stream), [9, 15])
+        self.assertEqual(stream.tell(), 0)
+        self.assertEqual(scanner.objects, 1)
+        self.assertEqual(scanner.amf3.strings, 1)
+        self.assertEqual(list(scanner.index), [
+            ('\x0a', 0, 0), ('\x02', 5, 1), ('\x11', 9, 0)
+        ])
+
+        stream.seek(0, 2)
+        stream.write('\x00\x00\x09')
+        stream.seek(0)
+        scanner.clear()
+
+        self.assertEqual(scanner.walk(stream), [9, 15, 23])
+        self.assertEqual(scanner.objects, 2)
+        self.assertEqual(len(scanner.index), 5)
+
+    def test_implementations(self):
+        bytes = pyamf.encode([1, 'a'], {'b': None}, pyamf.MixedArray(c=1.5),
+            encoding=pyamf.AMF0).getvalue()
+        stream = util.BufferedByteStream()
+
+        pure = amf0.Scanner(index=True)
+        other = pyamf.get_scanner(pyamf.AMF0, index=True)
+
+        for size in range(len(bytes)):
+            stream.truncate()
+            stream.write(bytes[:size])
+            stream.seek(0)
+
+            self.assertEqual(pure.walk(stream), other.walk(stream))
+            self.assertEqual(list(pure.index), list(other.index))
+            self.assertEqual(pure.objects, other.objects)
+
+
 class AMF0ContextTestCase(unittest.TestCase):
     """
     """
@@ -66,6 +66,11 @@ class TypesTestCase(unittest.TestCase):
         self.assertEqual(amf3.TYPE_OBJECT, '\x0a')
         self.assertEqual(amf3.TYPE_XMLSTRING, '\x0b')
         self.assertEqual(amf3.TYPE_BYTEARRAY, '\x0c')
+        self.assertEqual(amf3.TYPE_VECTOR_INT, '\x0d')
+        self.assertEqual(amf3.TYPE_VECTOR_UINT, '\x0e')
+        self.assertEqual(amf3.TYPE_VECTOR_DOUBLE, '\x0f')
+        self.assertEqual(amf3.TYPE_VECTOR_OBJECT, '\x10')
+        self.assertEqual(amf3.TYPE_DICTIONARY, '\x11')
 
 
 class ContextTestCase(ClassCacheClearingTestCase):
@@ -198,6 +203,30 @@ class ContextTestCase(ClassCacheClearingTestCase):
         self.assertEqual(x.getClass(object()), None)
 
 
+    def test_rollback(self):
+        x = amf3.Context()
+
+        alias = pyamf.register_class(Spam, 'spam.eggs')
+        a = amf3.ClassDefinition(alias)
+        b = amf3.ClassDefinition(alias)
+
+        x.addString('abc')
+        x.addClass(a, Spam)
+        checkpoint = x.checkpoint()
+
+        x.addObject([])
+        x.addString('def')
+        x.addClass(b, Spam)
+
+        x.rollback(checkpoint)
+
+        self.assertEqual(x.getObject(0), None)
+        self.assertEqual(x.getString(1), None)
+        self.assertEqual(x.getStringReference('def'), -1)
+        self.assertEqual(x.getClassByReference(1), None)
+        self.assertEqual(x.addClass(b, Spam), 1)
+
+
 class ClassDefinitionTestCase(ClassCacheClearingTestCase):
 
     def setUp(self):
@@ -245,6 +274,124 @@ class ClassDefinitionTestCase(ClassCacheClearingTestCase):
         self.assertEqual(x.attr_len, 0)
 
 
+class ScannerTestCase(ClassCacheClearingTestCase):
+    """
+    Tests for L{amf3.Scanner}
+    """
+
+    def scan(self, bytes, scanner=None):
+        stream = util.BufferedByteStream(bytes)
+        scanner = scanner or amf3.Scanner()
+
+        return scanner.scan(stream)
+
+    def test_complete(self):
+        self.assertEqual(self.scan('\x06\x07foo\x01'), 5)
+        self.assertEqual(self.scan('\x09\x05\x03a\x04\x01\x01\x04\x02'
+            '\x01'), 10)
+        self.assertEqual(self.scan('\x0a\x0b\x01\x03a\x04\x01\x01'), 8)
+
+    def test_resume(self):
+        scanner = amf3.Scanner()
+        stream = util.BufferedByteStream('\x09\x05\x01\x06\x07f')
+
+        self.assertEqual(scanner.scan(stream), None)
+        self.assertEqual(stream.tell(), 0)
+        self.assertEqual(scanner.offset, 3)
+
+        stream.append('oo\x04')
+        self.assertEqual(scanner.scan(stream), None)
+
+        stream.append('\x01')
+        self.assertEqual(scanner.scan(stream), 10)
+
+    def test_trait_reference(self):
+        scanner = amf3.Scanner()
+
+        # sealed trait with 2 attributes, then a reference to it
+        self.assertEqual(self.scan('\x09\x05\x01\x0a\x23\x01\x03a\x03b'
+            '\x01\x01\x0a\x01\x01\x01', scanner), 16)
+        self.assertEqual(scanner.traits, [(0, 2)])
+
+    def test_vectors(self):
+        self.assertEqual(self.scan('\x0d\x05\x00\x00\x00\x00\x01\xff'
+            '\xff\xff\xfe'), 11)
+        self.assertEqual(self.scan('\x0e\x03\x01\x00\x00\x00\x01'), 7)
+        self.assertEqual(self.scan('\x0f\x03\x00?\xf8\x00\x00\x00\x00'
+            '\x00\x00'), 11)
+        self.assertEqual(self.scan('\x10\x05\x00\x01\x06\x03a\x10\x00'),
+            9)
+        self.assertEqual(self.scan('\x0d\x05\x00\x00\x00'), None)
+
+    def test_dictionary(self):
+        self.assertEqual(self.scan('\x11\x05\x00\x06\x03a\x04\x01\t\x01'
+            '\x01\x01'), 12)
+        self.assertEqual(self.scan('\x11\x05\x00\x06\x03a'), None)
+
+    def test_external(self):
+        self.assertEqual(self.scan('\x0a\x07\x07foo'), -1)
+        self.assertEqual(self.scan('\xff'), -1)
+
+    def test_walk(self):
+        scanner = pyamf.get_scanner(pyamf.AMF3)
+        stream = util.BufferedByteStream('\x04\x01\x06\x07foo\x09\x03'
+            '\x01\x06\x00\x09\x03')
+
+        self.assertEqual(scanner.walk(stream), [2, 7, 12])
+        self.assertEqual(stream.tell(), 0)
+        self.assertEqual(scanner.strings, 1)
+        self.assertEqual(scanner.objects, 1)
+
+        stream.seek(0, 2)
+        stream.write('\x01\x06\x00')
+        stream.seek(0)
+        scanner.clear()
+
+        self.assertEqual(scanner.walk(stream), [2, 7, 12, 17])
+        self.assertEqual(scanner.objects, 2)
+
+    def test_walk_error(self):
+        scanner = pyamf.get_scanner(pyamf.AMF3)
+        stream = util.BufferedByteStream('\x01\x0a\x07\x07foo')
+
+        self.assertRaises(pyamf.DecodeError, scanner.walk, stream)
+        self.assertEqual(stream.tell(), 0)
+
+    def test_index(self):
+        scanner = pyamf.get_scanner(pyamf.AMF3, index=True)
+        stream = util.BufferedByteStream('\x09\x05\x03a\x04\x01\x01\x06'
+            '\x07foo\x02')
+
+        self.assertEqual(scanner.walk(stream), [13])
+        self.assertEqual(list(scanner.index), [
+            ('\x09', 0, 0), ('\x04', 4, 1), ('\x06', 7, 1), ('\x02', 12, 1)
+        ])
+
+        self.assertEqual(scanner.walk(stream), [13])
+        self.assertEqual(len(scanner.index), 8)
+
+        scanner.clear()
+        self.assertEqual(len(scanner.index), 0)
+
+    def test_implementations(self):
+        f = pyamf.MixedArray(a=[1, 2.5, u'xyz'], b=amf3.IntVector([1, 2]))
+        bytes = pyamf.encode(f, 'xyz', {'a': f}, encoding=pyamf.AMF3)
+        stream = util.BufferedByteStream()
+
+        pure = amf3.Scanner(index=True)
+        other = pyamf.get_scanner(pyamf.AMF3, index=True)
+
+        for size in range(len(bytes)):
+            stream.truncate()
+            stream.write(bytes.getvalue()[:size])
+            stream.seek(0)
+
+            self.assertEqual(pure.walk(stream), other.walk(stream))
+            self.assertEqual(list(pure.index), list(other.index))
+            self.assertEqual(pure.objects, other.objects)
+            self.assertEqual(pure.strings, other.strings)
+
+
 class EncoderTestCase(ClassCacheClearingTestCase, EncoderMixIn):
     """
     Tests the output from the AMF3 L{Encoder<pyamf.amf3.Encoder>} class.
@@ -263,6 +410,23 @@ class EncoderTestCase(ClassCacheClearingTestCase, EncoderMixIn):
         self.assertEncoded(y, '\x09\x00', clear=False)
         self.assertEncoded(y, '\x09\x00', clear=False)
 
+    def test_raw_amf(self):
+        raw = pyamf.encode_raw({'a': 'spam'})
+        x = {'b': 1}
+
+        self.assertEqual(raw.references, (1, 2, 1))
+
+        # the decoder has seen raw's object, strings and trait so x and its
+        # trait are references 2 and 1, 'a' has to be written again.
+        self.assertEncoded([raw, x, {'c': 1}, x, 'a'], '\t\x0b\x01',
+            raw.bytes, '\n\x0b\x01\x03b\x04\x01\x01\n\x05\x03c\x04\x01'
+            '\x01\n\x04\x06\x03a')
+
+    def test_raw_amf0(self):
+        raw = pyamf.encode_raw({'a': 'spam'}, encoding=pyamf.AMF0)
+
+        self.assertRaises(pyamf.EncodeError, self.encode, raw)
+
     def test_list_proxy_references(self):
         self.encoder.use_proxies = True
         y = [0, 1, 2, 3]
@@ -547,6 +711,78 @@ class EncoderTestCase(ClassCacheClearingTestCase, EncoderMixIn):
 
         self.assertEqual(self.encoder.next(), '\t\x05\x01\x04\x01\x04\x02')
 
+    def test_int_vector(self):
+        x = amf3.IntVector([1, -2, 3], fixed=True)
+
+        self.assertEncoded(x, '\r\x07\x01\x00\x00\x00\x01\xff\xff\xff'
+            '\xfe\x00\x00\x00\x03')
+        self.assertEncoded(x, '\r\x00', clear=False)
+
+    def test_uint_vector(self):
+        self.assertEncoded(amf3.UintVector([1, 0xffffffff]),
+            '\x0e\x05\x00\x00\x00\x00\x01\xff\xff\xff\xff')
+
+    def test_double_vector(self):
+        self.assertEncoded(amf3.DoubleVector([1.5, -2.25]),
+            '\x0f\x05\x00?\xf8\x00\x00\x00\x00\x00\x00\xc0\x02\x00\x00'
+            '\x00\x00\x00\x00')
+        self.assertEncoded(amf3.DoubleVector(), '\x0f\x01\x00')
+
+    def test_object_vector(self):
+        x = amf3.ObjectVector(['a', 1, None], classname='String')
+
+        self.assertEncoded(x, '\x10\x07\x00\rString\x06\x03a\x04\x01'
+            '\x01')
+        self.assertEncoded(x, '\x10\x00', clear=False)
+
+    def test_dictionary(self):
+        x = amf3.Dictionary([('a', 1)], weak_keys=True)
+
+        self.assertEncoded(x, '\x11\x03\x01\x06\x03a\x04\x01')
+        self.assertEncoded(x, '\x11\x00', clear=False)
+
+    def test_dictionary_unhashable_key(self):
+        key = []
+        x = amf3.Dictionary([(key, 'a')])
+
+        self.assertEncoded([key, x],
+            '\t\x05\x01\t\x01\x01\x11\x03\x00\t\x02\x06\x03a')
+
+    def test_registered_dictionary_type(self):
+        class Mapping(dict):
+            pass
+
+        amf3.register_dictionary_type(Mapping)
+        self.addCleanup(amf3.unregister_dictionary_type, Mapping)
+
+        self.assertEncoded(Mapping(a=1), '\x11\x03\x00\x06\x03a\x04\x01')
+
+    def test_registered_old_style_dictionary_type(self):
+        import weakref
+
+        class Key(object):
+            pass
+
+        key = Key()
+        x = weakref.WeakKeyDictionary()
+        x[key] = 1
+
+        amf3.register_dictionary_type(weakref.WeakKeyDictionary)
+        self.addCleanup(amf3.unregister_dictionary_type,
+            weakref.WeakKeyDictionary)
+
+        self.assertEncoded(x, '\x11\x03\x00\n\x0b\x01\x01\x04\x01')
+
+    def test_registered_dict(self):
+        """
+        A registered dictionary type takes precedence over the builtin
+        handling of that type.
+        """
+        amf3.register_dictionary_type(dict)
+        self.addCleanup(amf3.unregister_dictionary_type, dict)
+
+        self.assertEncoded({'a': 1}, '\x11\x03\x00\x06\x03a\x04\x01')
+
 
 class DecoderTestCase(ClassCacheClearingTestCase, DecoderMixIn):
     """
@@ -834,6 +1070,256 @@ class DecoderTestCase(ClassCacheClearingTestCase, DecoderMixIn):
 
         f(**kwargs)
 
+    def assertVector(self, bytes, klass, items, fixed=False):
+        self.context.clear()
+
+        x = self.decode(bytes)
+
+        self.assertEqual(type(x), klass)
+        self.assertEqual(list(x), items)
+        self.assertEqual(x.fixed, fixed)
+        self.assertEqual(self.buf.remaining(), 0)
+
+        return x
+
+    def test_int_vector(self):
+        self.assertVector('\r\x07\x01\x00\x00\x00\x01\xff\xff\xff'
+            '\xfe\x00\x00\x00\x03', amf3.IntVector, [1, -2, 3], True)
+
+    def test_uint_vector(self):
+        self.assertVector('\x0e\x05\x00\x00\x00\x00\x01\xff\xff\xff'
+            '\xff', amf3.UintVector, [1, 0xffffffff])
+
+    def test_double_vector(self):
+        self.assertVector('\x0f\x05\x00?\xf8\x00\x00\x00\x00\x00\x00'
+            '\xc0\x02\x00\x00\x00\x00\x00\x00', amf3.DoubleVector,
+            [1.5, -2.25])
+
+    def test_object_vector(self):
+        x = self.assertVector('\x10\x07\x00\rString\x06\x03a\x04\x01'
+            '\x01', amf3.ObjectVector, ['a', 1, None])
+
+        self.assertEqual(x.classname, 'String')
+
+    def test_dictionary(self):
+        self.context.clear()
+
+        x = self.decode('\x11\x05\x01\x06\x03a\x04\x01\x04\x02\x02')
+
+        self.assertTrue(isinstance(x, amf3.Dictionary))
+        self.assertTrue(x.weak_keys)
+        self.assertEqual(x, {'a': 1, 2: False})
+
+    def test_dictionary_unhashable_key(self):
+        self.context.clear()
+
+        x = self.decode('\t\x05\x01\t\x01\x01\x11\x03\x00\t\x02\x06'
+            '\x03a')
+
+        self.assertEqual(x[1].keys(), [[]])
+        self.assertTrue(x[1].keys()[0] is x[0])
+        self.assertEqual(x[1][x[0]], 'a')
+        self.assertFalse([] in x[1])
+
+    def test_vector_references(self):
+        x = self.decode('\t\x05\x01\r\x03\x00\x00\x00\x00\x07\r\x02')
+
+        self.assertEqual(list(x[0]), [7])
+        self.assertTrue(x[0] is x[1])
+
+    def test_vector_memoryview(self):
+        """
+        Numeric vectors decode from a memoryview backed (zero-copy) stream.
+        """
+        for klass, items in ((amf3.IntVector, [1, -2]),
+                (amf3.UintVector, [1, 0xffffffff]),
+                (amf3.DoubleVector, [1.5, -2.25])):
+            bytes = pyamf.encode(klass(items), encoding=pyamf.AMF3).getvalue()
+            x = pyamf.decode(memoryview(bytes), encoding=pyamf.AMF3).next()
+
+            self.assertTrue(isinstance(x, klass))
+            self.assertEqual(list(x), items)
+
+
+class DictionaryTestCase(unittest.TestCase):
+    """
+    Tests for L{amf3.Dictionary}
+    """
+
+    def test_create(self):
+        x = amf3.Dictionary({'a': 1})
+
+        self.assertEqual(x, {'a': 1})
+        self.assertFalse(x.weak_keys)
+        self.assertRaises(KeyError, x.__getitem__, 'b')
+
+    def test_identity_keys(self):
+        a, b = {}, {}
+        x = amf3.Dictionary()
+
+        x[a] = 1
+        x[b] = 2
+
+        self.assertEqual(len(x), 2)
+        self.assertEqual(x[a], 1)
+        self.assertEqual(x[b], 2)
+
+        del x[a]
+
+        self.assertFalse(a in x)
+        self.assertEqual(x.items(), [(b, 2)])
+
+    def test_weak_keys(self):
+        class Key(object):
+            pass
+
+        key = Key()
+        x = amf3.Dictionary(weak_keys=True)
+
+        x[key] = 1
+        x['a'] = 2
+
+        self.assertEqual(x[key], 1)
+
+        del key
+
+        self.assertEqual(x.items(), [('a', 2)])
+
+    def test_hold(self):
+        class Key(object):
+            pass
+
+        key = Key()
+        x = amf3.Dictionary(weak_keys=True)
+
+        x.hold(key, 1)
+
+        self.assertEqual(x[key], 1)
+
+        del key
+
+        self.assertEqual(len(x), 1)
+        self.assertEqual(x.values(), [1])
+
+    def test_decoded_keys(self):
+        """
+        Nothing else refers to the keys of a decoded dictionary so they are
+        kept alive, even if C{weak_keys} is set.
+        """
+        class Key(object):
+            pass
+
+        key = Key()
+        pyamf.register_class(Key, 'amf3.Key')
+
+        try:
+            bytes = pyamf.encode(amf3.Dictionary({key: u'v', u's': u't'},
+                weak_keys=True), encoding=pyamf.AMF3).getvalue()
+            del key
+            x = pyamf.decode(bytes, encoding=pyamf.AMF3).next()
+        finally:
+            pyamf.unregister_class(Key)
+
+        self.assertTrue(x.weak_keys)
+        self.assertEqual(len(x), 2)
+        self.assertEqual(sorted(x.values()), [u't', u'v'])
+
+        key = [k for k in x.keys() if isinstance(k, Key)][0]
+
+        self.assertEqual(x[key], u'v')
+
+    def test_register(self):
+        class Mapping(dict):
+            pass
+
+        self.assertRaises(TypeError, amf3.register_dictionary_type, object())
+        self.assertRaises(KeyError, amf3.unregister_dictionary_type, Mapping)
+
+        amf3.register_dictionary_type(Mapping)
+
+        self.assertTrue(Mapping in amf3.DICTIONARY_TYPES)
+
+        amf3.unregister_dictionary_type(Mapping)
+
+        self.assertFalse(Mapping in amf3.DICTIONARY_TYPES)
+
+
+class LazyDecoderTestCase(ClassCacheClearingTestCase):
+    """
+    Tests for decoding with C{lazy=True}, see L{amf3.LazyProxy}.
+    """
+
+    def setUp(self):
+        ClassCacheClearingTestCase.setUp(self)
+
+        pyamf.register_class(Spam, 'spam.eggs')
+
+    def decode(self, data):
+        bytes = pyamf.encode(data, encoding=pyamf.AMF3).getvalue()
+        decoder = pyamf.get_decoder(pyamf.AMF3, bytes, lazy=True)
+
+        self.assertTrue(isinstance(decoder, amf3.Decoder))
+
+        return decoder.readElement(), bytes
+
+    def test_untouched(self):
+        x, bytes = self.decode([{'a': [1, 2]}, {'b': [3]}])
+
+        self.assertTrue(isinstance(x, amf3.LazyProxy))
+        self.assertFalse(x.materialized)
+
+        self.assertEqual(x[0]['a'], [1, 2])
+        self.assertTrue(x.materialized)
+        self.assertTrue(x[0].materialized)
+        self.assertFalse(x[1].materialized)
+
+    def test_references(self):
+        shared = {'s': u'hello'}
+        spam = Spam()
+        spam.name = u'hello'
+
+        x, bytes = self.decode([[shared, spam], shared, spam, u'hello'])
+
+        # the string and trait references are to the skipped first element
+        self.assertEqual(x[3], u'hello')
+        self.assertEqual(x[2].name, u'hello')
+        self.assertFalse(x[0].materialized)
+        self.assertTrue(x[1] is x[0][0])
+        self.assertTrue(x[2] is x[0][1])
+
+    def test_leaves(self):
+        x, bytes = self.decode([[datetime.datetime(2010, 1, 1),
+            amf3.ByteArray('foo'), amf3.IntVector([1, 2])]])
+
+        self.assertEqual(x[0][0], datetime.datetime(2010, 1, 1))
+        self.assertEqual(x[0][1], 'foo')
+        self.assertEqual(list(x[0][2]), [1, 2])
+
+    def test_external(self):
+        from pyamf.flex import ArrayCollection
+
+        x, bytes = self.decode([[ArrayCollection([u'a'])], u'a'])
+
+        self.assertEqual(x[1], u'a')
+        self.assertTrue(isinstance(x[0][0], ArrayCollection))
+        self.assertEqual(list(x[0][0]), [u'a'])
+
+    def test_encode(self):
+        x, bytes = self.decode([{'a': [1, 2]}, u'a', {'b': {'a': u'a'}}])
+
+        self.assertEqual(pyamf.encode(x, encoding=pyamf.AMF3).getvalue(),
+            bytes)
+
+    def test_context_cleared(self):
+        bytes = pyamf.encode([u'a', {'b': u'a'}],
+            encoding=pyamf.AMF3).getvalue()
+        decoder = pyamf.get_decoder(pyamf.AMF3, bytes, lazy=True)
+
+        x = decoder.readElement()
+        decoder.context.clear()
+
+        self.assertEqual(x[1], {'b': u'a'})
+
 
 class ObjectEncodingTestCase(ClassCacheClearingTestCase, EncoderMixIn):
     """
@@ -916,6 +1402,35 @@ class ObjectEncodingTestCase(ClassCacheClearingTestCase, EncoderMixIn):
 
         self.assertEqual(buf, '\n\x1b\x0fabc.xyz\tspam\x06\x07foo\teggs\x06\x07bar\x01')
 
+    def test_sealed(self):
+        class A(object):
+            __slots__ = ('spam', 'eggs')
+
+        alias = pyamf.register_class(A, 'abc.xyz')
+        alias.static_attrs = ['spam']
+
+        x = A()
+        x.spam = 'foo'
+        x.eggs = 'bar'
+
+        self.assertEncoded(x,
+            '\n\x1b\x0fabc.xyz\tspam\x06\x07foo\teggs\x06\x07bar\x01')
+
+    def test_overridden_encodable_attributes(self):
+        class MyAlias(pyamf.ClassAlias):
+            def getEncodableAttributes(self, obj, codec=None):
+                return {'spam': 'gak'}
+
+        pyamf.register_alias_type(MyAlias, Spam)
+        self.addCleanup(pyamf.unregister_alias_type, MyAlias)
+
+        alias = pyamf.register_class(Spam, 'abc.xyz')
+        alias.static_attrs = ['spam']
+
+        x = Spam({'spam': 'eggs'})
+
+        self.assertEncoded(x, '\n\x1b\x0fabc.xyz\tspam\x06\x07gak\x01')
+
     def test_external(self):
         alias = pyamf.register_class(Spam, 'abc.xyz')
 
@@ -1034,6 +1549,43 @@ class ObjectDecodingTestCase(ClassCacheClearingTestCase, DecoderMixIn):
         self.assertTrue(isinstance(obj, Spam))
         self.assertEqual(obj.__dict__, {'spam': 'eggs', 'baz': 'nat'})
 
+    def test_static_plan(self):
+        alias = pyamf.register_class(Spam, 'abc.xyz')
+        alias.exclude_attrs = ['baz']
+
+        self.buf.write('\x0a\x23\x0fabc.xyz\x09spam\x07baz\x06\x09eggs'
+            '\x06\x07nat')
+        self.buf.seek(0, 0)
+
+        obj = self.decoder.readElement()
+
+        class_def = self.context.getClass(Spam)
+
+        self.assertEqual(class_def.decode_plan,
+            ('attr', (('spam', False), None)))
+
+        self.assertTrue(isinstance(obj, Spam))
+        self.assertEqual(obj.__dict__, {'spam': 'eggs'})
+
+    def test_static_plan_slots(self):
+        class A(object):
+            __slots__ = ('spam', 'eggs')
+
+        pyamf.register_class(A, 'abc.xyz')
+
+        self.buf.write('\x0a\x23\x0fabc.xyz\x09spam\x09eggs\x06\x07foo'
+            '\x06\x07bar')
+        self.buf.seek(0, 0)
+
+        obj = self.decoder.readElement()
+
+        class_def = self.context.getClass(A)
+
+        self.assertEqual(class_def.decode_plan[0], 'attr')
+        self.assertTrue(isinstance(obj, A))
+        self.assertEqual(obj.spam, 'foo')
+        self.assertEqual(obj.eggs, 'bar')
+
     def test_external(self):
         alias = pyamf.register_class(Spam, 'abc.xyz')
         alias.external = True
@@ -1579,3 +2131,20 @@ class ByteArrayTestCase(unittest.TestCase):
         ba = amf3.ByteArray(z)
 
         self.assertTrue(ba.compressed)
+
+    def test_decode_compressed_memoryview(self):
+        """
+        A compressed ByteArray decodes from a memoryview backed stream.
+        """
+        try:
+            import zlib
+        except ImportError:
+            self.skipTest('zlib is missing')
+
+        z = zlib.compress('b' * 100)
+        bytes = '\x0c' + chr(len(z) << 1 | 1) + z
+
+        for source in (bytes, memoryview(bytes)):
+            ba = pyamf.decode(source, encoding=pyamf.AMF3).next()
+
+            self.assertEqual(ba.getvalue(), 'b' * 100)
@@ -231,6 +231,7 @@ class TypeMapTestCase(unittest.TestCase):
     def setUp(self):
         self.tm = pyamf.TYPE_MAP.copy()
 
+        self.addCleanup(pyamf._bump_type_generation)
         self.addCleanup(replace_dict, self.tm, pyamf.TYPE_MAP)
 
     def test_add_invalid(self):
@@ -299,6 +300,15 @@ class TypeMapTestCase(unittest.TestCase):
         td2 = pyamf.get_type([chr,])
         self.assertEqual(td, td2)
 
+    def test_generation(self):
+        generation = pyamf.TYPE_GENERATION
+
+        pyamf.add_type(chr)
+        self.assertEqual(pyamf.TYPE_GENERATION, generation + 1)
+
+        pyamf.remove_type(chr)
+        self.assertEqual(pyamf.TYPE_GENERATION, generation + 2)
+
     def test_remove(self):
         self.assertRaises(KeyError, pyamf.remove_type, chr)
         td = pyamf.add_type((chr,))
@@ -620,3 +630,59 @@ class UndefinedTestCase(unittest.TestCase):
         Truth test for L{pyamf.Undefined} == C{False}.
         """
         self.assertFalse(pyamf.Undefined)
+
+
+class RawAMFTestCase(unittest.TestCase):
+    """
+    Tests for L{pyamf.RawAMF} and L{pyamf.encode_raw}
+    """
+
+    def test_create(self):
+        raw = pyamf.RawAMF('\t\x05\x01\x06\x07foo\x06\x00')
+
+        self.assertEqual(raw.encoding, pyamf.AMF3)
+        self.assertEqual(raw.references, (1, 1, 0))
+        self.assertEqual(len(raw), 10)
+
+        raw = pyamf.RawAMF('\x0a\x00\x00\x00\x01\x11\x06\x07foo',
+            pyamf.AMF0)
+
+        self.assertEqual(raw.references, (1, (0, 1, 0)))
+
+    def test_bad_bytes(self):
+        self.assertRaises(ValueError, pyamf.RawAMF, '\x06\x07fo')
+        self.assertRaises(ValueError, pyamf.RawAMF, '\x01\x01')
+        self.assertRaises(pyamf.DecodeError, pyamf.RawAMF, '\x0a\x07\x07foo')
+        self.assertRaises(ValueError, pyamf.RawAMF, '\x01', 2)
+
+        for bytes in (u'\x06\x07foo', buffer('\x06\x07foo')):
+            self.assertRaises(TypeError, pyamf.RawAMF, bytes,
+                references=(0, 1, 0))
+
+    def test_encode_raw(self):
+        x = {'b': 1}
+        raw = pyamf.encode_raw([x, x])
+
+        # x is written twice
+        self.assertEqual(raw.bytes, '\t\x05\x01\n\x0b\x01\x03b\x04\x01\x01'
+            '\n\x0b\x01\x03b\x04\x01\x01')
+        self.assertEqual(raw.references, (3, 2, 2))
+        self.assertEqual(pyamf.RawAMF(raw.bytes).references, raw.references)
+
+    def test_cycle(self):
+        x = []
+        x.append([x])
+
+        self.assertRaises(pyamf.EncodeError, pyamf.encode_raw, x)
+        self.assertRaises(pyamf.EncodeError, pyamf.encode_raw, x,
+            encoding=pyamf.AMF0)
+
+    def test_decode(self):
+        x = {'a': [1, 2]}
+        raw = pyamf.encode_raw(x)
+
+        for encoding in pyamf.ENCODING_TYPES:
+            bytes = pyamf.encode([raw, x, raw], encoding=encoding).getvalue()
+
+            self.assertEqual(pyamf.decode(bytes, encoding=encoding).next(),
+                [x, x, x])
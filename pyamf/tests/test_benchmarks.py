@@ -0,0 +1,147 @@
+# Copyright (c) The PyAMF Project.
+# See LICENSE.txt for details.
+
+"""
+Tests for L{pyamf.benchmarks}.
+
+@since: 0.7
+"""
+
+import os
+import tempfile
+import unittest
+
+from pyamf import benchmarks
+from pyamf.benchmarks import workloads
+
+
+class WorkloadsTestCase(unittest.TestCase):
+    """
+    Every workload must survive a round trip through the codecs.
+    """
+
+    def test_unique_names(self):
+        names = [w.name for w in workloads.WORKLOADS]
+
+        self.assertEqual(len(names), len(set(names)))
+        self.assertRaises(ValueError, workloads.register,
+            workloads.WORKLOADS[0])
+
+    def test_round_trip(self):
+        for workload in workloads.WORKLOADS:
+            data = workload.setup()
+            bytes = workload.encode(data)
+
+            self.assertTrue(bytes)
+            self.assertTrue(workload.decode(bytes), workload)
+
+            # the payload is the same on every run
+            self.assertEqual(workload.encode(workload.setup()), bytes)
+
+    def test_get_workloads(self):
+        self.assertEqual(benchmarks.get_workloads(), workloads.WORKLOADS)
+        self.assertEqual(
+            [w.name for w in benchmarks.get_workloads(['flex', 'envelope'])],
+            ['flex', 'envelope'])
+        self.assertRaises(ValueError, benchmarks.get_workloads, ['foo'])
+
+
+class MeasureTestCase(unittest.TestCase):
+    def test_measure(self):
+        calls = []
+
+        ops, allocations = benchmarks.measure(lambda: calls.append([]),
+            min_time=0.001, repeat=2)
+
+        self.assertTrue(ops > 0)
+        self.assertTrue(allocations >= 1)
+        self.assertTrue(len(calls) > 2)
+
+        class Item(object):
+            pass
+
+        ops, allocations = benchmarks.measure(
+            lambda: [Item() for i in xrange(1000)], min_time=0.001, repeat=1)
+
+        self.assertTrue(allocations >= 1000)
+
+    def test_run_workload(self):
+        workload = benchmarks.get_workloads(['envelope'])[0]
+        results = benchmarks.run_workload(workload, 0.001, 1)
+
+        self.assertEqual([r['operation'] for r in results],
+            list(benchmarks.OPERATIONS))
+
+        for r in results:
+            self.assertEqual(r['workload'], 'envelope')
+            self.assertEqual(r['implementation'],
+                benchmarks.get_implementation())
+            self.assertEqual(r['bytes'], len(workload.encode(
+                workload.setup())))
+            self.assertAlmostEqual(r['mb_per_sec'],
+                r['ops_per_sec'] * r['bytes'] / 1e6)
+
+
+class ResultsTestCase(unittest.TestCase):
+    def make_results(self, ops):
+        return {
+            'version': benchmarks.RESULTS_VERSION,
+            'results': [{
+                'implementation': 'pure',
+                'workload': 'envelope',
+                'operation': 'encode',
+                'bytes': 100,
+                'ops_per_sec': ops,
+                'mb_per_sec': ops * 100 / 1e6,
+                'allocations': 10
+            }]
+        }
+
+    def test_compare(self):
+        old = self.make_results(100.0)
+        new = self.make_results(250.0)
+
+        new['results'].append(dict(new['results'][0], operation='decode'))
+
+        self.assertEqual(benchmarks.compare(old, new),
+            [('envelope', 'encode', 'pure', 100.0, 250.0, 2.5)])
+
+    def test_save_load(self):
+        fd, filename = tempfile.mkstemp()
+        os.close(fd)
+
+        try:
+            results = self.make_results(100.0)
+
+            benchmarks.save(results, filename)
+            self.assertEqual(benchmarks.load(filename), results)
+
+            results['version'] = -1
+            benchmarks.save(results, filename)
+            self.assertRaises(ValueError, benchmarks.load, filename)
+        finally:
+            os.remove(filename)
+
+    def test_run(self):
+        results = benchmarks.run(['pure'], ['envelope'], 0.001, 1)
+
+        self.assertEqual(
+            [(r['implementation'], r['operation']) for r in
+                results['results']],
+            [('pure', 'encode'), ('pure', 'decode')])
+        self.assertTrue('python' in results)
+        self.assertRaises(ValueError, benchmarks.run, ['foo'], ['envelope'])
+
+    def test_run_elsewhere(self):
+        """
+        The child interpreter finds pyamf when run outside the source root.
+        """
+        cwd = os.getcwd()
+        os.chdir(tempfile.gettempdir())
+
+        try:
+            results = benchmarks.run(['pure'], ['envelope'], 0.001, 1)
+        finally:
+            os.chdir(cwd)
+
+        self.assertEqual(len(results['results']), 2)
@@ -8,6 +8,7 @@ Tests for AMF utilities.
 """
 
 import unittest
+import types
 
 import pyamf
 from pyamf import codec
@@ -120,6 +121,21 @@ class IndexedCollectionTestCase(unittest.TestCase):
         self.assertEqual(self.collection, [])
         self.assertRaises(NotImplementedError, self.collection.__eq__, self)
 
+    def test_truncate(self):
+        a, b, c = TestObject(), TestObject(), TestObject()
+
+        for o in (a, b, c):
+            self.collection.append(o)
+
+        self.collection.truncate(1)
+
+        self.assertEqual(len(self.collection), 1)
+        self.assertEqual(self.collection.getReferenceTo(a), 0)
+        self.assertEqual(self.collection.getReferenceTo(b), -1)
+        self.assertEqual(self.collection.getByReference(1), None)
+
+        self.assertEqual(self.collection.append(c), 1)
+
     def test_hash(self):
         class A(object):
             def __hash__(self):
@@ -190,6 +206,20 @@ class ContextTestCase(unittest.TestCase):
         self.assertIdentical(self.context.getObjectReference(z), ref2)
         self.assertEqual(self.context.getObjectReference({}), -1)
 
+    def test_rollback(self):
+        y = [1, 2, 3]
+        z = {'spam': 'eggs'}
+
+        self.context.addObject(y)
+        checkpoint = self.context.checkpoint()
+        self.context.addObject(z)
+
+        self.context.rollback(checkpoint)
+
+        self.assertEqual(self.context.getObject(1), None)
+        self.assertEqual(self.context.getObjectReference(z), -1)
+        self.assertEqual(self.context.addObject(z), 1)
+
     def test_no_alias(self):
         class A:
             pass
@@ -245,11 +275,13 @@ class ContextTestCase(unittest.TestCase):
 
         self.assertIdentical(u, i)
 
+        # the cache is process wide and outlives the context
         self.context.clear()
 
         i = self.context.getStringForBytes(s)
 
-        self.assertFalse(u is i)
+        self.assertIdentical(u, i)
+        self.assertIdentical(codec.Context().getStringForBytes(s), u)
 
     def test_bytes(self):
         s = 'foo'.decode('ascii')
@@ -268,3 +300,623 @@ class ContextTestCase(unittest.TestCase):
         i = self.context.getBytesForString(s)
 
         self.assertNotIdentical(i, s)
+
+
+class ScanIndexTestCase(unittest.TestCase):
+    """
+    Tests for L{codec.ScanIndex}
+    """
+
+    def test_append(self):
+        index = codec.ScanIndex()
+
+        index.append('\x02', 0, 0)
+        index.append('\x06', 70000, 3)
+
+        self.assertEqual(len(index), 2)
+        self.assertEqual(index[1], ('\x06', 70000, 3))
+        self.assertEqual(list(index), [('\x02', 0, 0), ('\x06', 70000, 3)])
+
+    def test_truncate(self):
+        index = codec.ScanIndex()
+
+        for i in range(5):
+            index.append('\x04', i, 0)
+
+        index.truncate(2)
+
+        self.assertEqual(list(index), [('\x04', 0, 0), ('\x04', 1, 0)])
+
+        index.clear()
+
+        self.assertEqual(len(index), 0)
+
+
+class IncrementalDecoderTestCase(unittest.TestCase):
+    """
+    Tests for L{codec.IncrementalDecoder}
+    """
+
+    def feed(self, encoding, bytes, size=1):
+        decoder = pyamf.get_incremental_decoder(encoding)
+        ret = []
+
+        for i in range(0, len(bytes), size):
+            ret.append(decoder.feed(bytes[i:i + size]))
+
+        return decoder, ret
+
+    def test_amf0(self):
+        bytes = pyamf.encode(u'foo', [1, {'a': u'foo'}], 3.5,
+            encoding=pyamf.AMF0).getvalue()
+
+        decoder, ret = self.feed(pyamf.AMF0, bytes)
+
+        self.assertEqual([x for x in ret if x], [
+            [u'foo'], [[1, {'a': u'foo'}]], [3.5]])
+        self.assertEqual(len(decoder.decoder.stream), 0)
+
+    def test_amf3(self):
+        bytes = pyamf.encode(u'foo', [1, {'a': u'foo'}], u'foo',
+            encoding=pyamf.AMF3).getvalue()
+
+        decoder, ret = self.feed(pyamf.AMF3, bytes)
+
+        self.assertEqual([x for x in ret if x], [
+            [u'foo'], [[1, {'a': u'foo'}]], [u'foo']])
+        self.assertEqual(len(decoder.decoder.stream), 0)
+
+    def test_amf3_in_amf0(self):
+        bytes = ('\x11\x06\x07foo\x11\x09\x05\x01\x06\x00\x04\x01'
+            '\x02\x00\x03bar')
+
+        decoder, ret = self.feed(pyamf.AMF0, bytes)
+
+        self.assertEqual([x for x in ret if x], [
+            [u'foo'], [[u'foo', 1]], [u'bar']])
+
+    def test_multiple(self):
+        bytes = pyamf.encode(1, 2, 3, encoding=pyamf.AMF3).getvalue()
+
+        decoder, ret = self.feed(pyamf.AMF3, bytes + '\x06', len(bytes) + 1)
+
+        self.assertEqual(ret, [[1, 2, 3]])
+        self.assertEqual(decoder.decoder.stream.getvalue(), '\x06')
+
+        self.assertEqual(decoder.feed('\x07fo'), [])
+        self.assertEqual(decoder.feed('o'), [u'foo'])
+
+    def test_externalizable(self):
+        from pyamf.flex import ArrayCollection
+
+        bytes = pyamf.encode(ArrayCollection([u'foo', u'bar']), [u'bar'],
+            encoding=pyamf.AMF3).getvalue()
+
+        decoder, ret = self.feed(pyamf.AMF3, bytes)
+        ret = [x for x in ret if x]
+
+        self.assertEqual(len(ret), 2)
+        self.assertTrue(isinstance(ret[0][0], ArrayCollection))
+        self.assertEqual(list(ret[0][0]), [u'foo', u'bar'])
+        self.assertEqual(ret[1], [[u'bar']])
+
+    def test_externalizable_in_amf0_object(self):
+        """
+        The speculative decode of an AMF0 object must be rolled back when an
+        externalizable member is incomplete, with either implementation.
+        """
+        from pyamf.flex import ArrayCollection
+
+        bytes = pyamf.encode({'a': ArrayCollection([u'foo', u'bar']),
+            'b': 1}, encoding=pyamf.AMF0).getvalue()
+
+        for size in (1, 2, 3, 7):
+            decoder, ret = self.feed(pyamf.AMF0, bytes, size)
+            ret = [x for x in ret if x]
+
+            self.assertEqual(len(ret), 1)
+            self.assertEqual(ret[0][0]['b'], 1)
+            self.assertEqual(list(ret[0][0]['a']), [u'foo', u'bar'])
+
+    def test_error(self):
+        decoder = pyamf.get_incremental_decoder(pyamf.AMF3)
+
+        self.assertRaises(pyamf.DecodeError, decoder.feed, '\xff')
+
+    def test_unknown_encoding(self):
+        self.assertRaises(ValueError, pyamf.get_incremental_decoder, 99)
+
+
+class StringCacheTestCase(unittest.TestCase):
+    """
+    Tests for L{codec.StringCache}
+    """
+
+    def setUp(self):
+        self.cache = codec.StringCache(size=4, max_bytes=100, max_length=10)
+
+    def test_directions(self):
+        u = self.cache.getStringForBytes('foo')
+        b = self.cache.getBytesForString(u'foo')
+
+        self.assertTrue(type(u) is unicode)
+        self.assertTrue(type(b) is str)
+        self.assertEqual(self.cache.misses, 2)
+
+        self.assertIdentical(self.cache.getStringForBytes('foo'), u)
+        self.assertIdentical(self.cache.getBytesForString(u'foo'), b)
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_utf8(self):
+        b = u'\xe9t\xe9'.encode('utf-8')
+
+        self.assertEqual(self.cache.getStringForBytes(b), u'\xe9t\xe9')
+        self.assertEqual(self.cache.getBytesForString(u'\xe9t\xe9'), b)
+
+    def test_max_length(self):
+        self.cache.getStringForBytes('a' * 11)
+        self.cache.getStringForBytes('a' * 11)
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.misses, 2)
+
+    def test_size(self):
+        for i in range(10):
+            self.cache.getStringForBytes(str(i))
+
+        self.assertTrue(len(self.cache) <= 4)
+
+        # recently used entries survive
+        self.cache.getStringForBytes('8')
+        self.cache.getStringForBytes('9')
+
+        self.assertEqual(self.cache.hits, 2)
+
+    def test_max_bytes(self):
+        cache = codec.StringCache(max_bytes=20)
+
+        for c in 'abcdefgh':
+            cache.getBytesForString(unicode(c * 10))
+
+        self.assertTrue(cache.strings.bytes <= 10)
+        self.assertTrue(len(cache) <= 2)
+
+    def test_clear(self):
+        self.cache.getStringForBytes('foo')
+        self.cache.getStringForBytes('foo')
+        self.cache.clear()
+
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual((self.cache.hits, self.cache.misses), (0, 0))
+
+
+class TypeCacheTestCase(unittest.TestCase):
+    """
+    Tests for L{codec.TypeCache}
+    """
+
+    def setUp(self):
+        self.cache = codec.TypeCache()
+
+    def test_seeded(self):
+        self.assertEqual(self.cache.get(1), None)
+
+        self.assertTrue(dict in self.cache.entries)
+        self.assertTrue(pyamf.ASObject in self.cache.entries)
+        self.assertEqual(self.cache.generation, pyamf.TYPE_GENERATION)
+
+    def test_invalidate(self):
+        self.assertEqual(self.cache.get(TestObject()), None)
+        self.assertTrue(TestObject in self.cache.entries)
+
+        func = lambda x, encoder: x.name
+
+        pyamf.add_type(TestObject, func)
+        self.addCleanup(pyamf.remove_type, TestObject)
+
+        self.assertEqual(self.cache.get(TestObject()), func)
+
+    def test_shared(self):
+        """
+        A type added after an encoder has met it is seen by the next encoder.
+        """
+        for encoding in (pyamf.AMF0, pyamf.AMF3):
+            obj = TestObject()
+            bytes = pyamf.encode(obj, encoding=encoding).getvalue()
+
+            pyamf.add_type(TestObject, lambda x, encoder: x.name)
+
+            try:
+                self.assertEqual(
+                    pyamf.encode(obj, encoding=encoding).getvalue(),
+                    pyamf.encode('test', encoding=encoding).getvalue())
+            finally:
+                pyamf.remove_type(TestObject)
+
+            self.assertEqual(pyamf.encode(obj, encoding=encoding).getvalue(),
+                bytes)
+
+
+    def test_old_style(self):
+        """
+        Old style instances all share C{types.InstanceType}.
+        """
+        class OldA:
+            pass
+
+        class OldB:
+            pass
+
+        func = lambda x, encoder: 'converted-A'
+
+        pyamf.add_type(OldA, func)
+        self.addCleanup(pyamf.remove_type, OldA)
+
+        self.assertEqual(self.cache.get(OldA()), func)
+        self.assertEqual(self.cache.get(OldB()), None)
+        self.assertEqual(self.cache.get(OldA()), func)
+        self.assertFalse(types.InstanceType in self.cache.entries)
+
+        # nor may an encoder's own cache mix them up
+        for encoding in (pyamf.AMF0, pyamf.AMF3):
+            self.assertEqual(
+                pyamf.encode(OldA(), OldB(), encoding=encoding).getvalue(),
+                pyamf.encode('converted-A', encoding=encoding).getvalue() +
+                pyamf.encode(OldB(), encoding=encoding).getvalue())
+
+    def test_predicate(self):
+        """
+        The result of a callable predicate depends on the value, not the
+        type, and it is not run when the cache is seeded.
+        """
+        seen = []
+
+        def predicate(x):
+            seen.append(x)
+
+            return x == 5
+
+        func = lambda x, encoder: 'five'
+
+        pyamf.add_type(predicate, func)
+        self.addCleanup(pyamf.remove_type, predicate)
+
+        self.cache.reset()
+        self.assertEqual(seen, [])
+
+        self.assertEqual(self.cache.get(5), func)
+        self.assertEqual(self.cache.get(6), None)
+        self.assertEqual(self.cache.get(5), func)
+        self.assertFalse(int in self.cache.entries)
+
+
+class CodecPoolTestCase(unittest.TestCase):
+    """
+    Tests for L{codec.CodecPool}
+    """
+
+    def setUp(self):
+        self.pool = codec.CodecPool(pyamf.AMF3, size=2)
+
+    def test_shared(self):
+        self.assertTrue(pyamf.codec_pool(pyamf.AMF0) is
+            pyamf.codec_pool(pyamf.AMF0))
+        self.assertFalse(pyamf.codec_pool(pyamf.AMF0) is
+            pyamf.codec_pool(pyamf.AMF3))
+
+        self.assertRaises(ValueError, pyamf.codec_pool, 99)
+
+    def test_reuse(self):
+        encoder = self.pool.acquireEncoder()
+        encoder.writeElement({'foo': 'bar'})
+        self.pool.release(encoder)
+
+        stream = pyamf.util.BufferedByteStream()
+        x = self.pool.acquireEncoder(stream, strict=True, timezone_offset=5)
+
+        self.assertTrue(x is encoder)
+        self.assertTrue(x.stream is stream)
+        self.assertTrue(x.strict)
+        self.assertEqual(x.timezone_offset, 5)
+        self.assertEqual(x.context.getObjectReference({}), -1)
+
+        x.writeElement({'foo': 'bar'})
+
+        self.assertEqual(stream.getvalue(),
+            pyamf.encode({'foo': 'bar'}).getvalue())
+
+    def test_decoder(self):
+        bytes = pyamf.encode(u'foo', [1, 2]).getvalue()
+
+        decoder = self.pool.acquireDecoder(bytes)
+        self.assertEqual(list(decoder), [u'foo', [1, 2]])
+        self.pool.release(decoder)
+
+        x = self.pool.acquireDecoder(bytes)
+
+        self.assertTrue(x is decoder)
+        self.assertEqual(list(x), [u'foo', [1, 2]])
+
+    def test_release(self):
+        """
+        Released codecs do not keep their stream or sink alive.
+        """
+        chunks = []
+
+        for pool in (self.pool, codec.CodecPool(pyamf.AMF0)):
+            encoder = pool.acquireEncoder(sink=chunks.append)
+            encoder.writeElement('x' * 1000)
+            pool.release(encoder)
+
+            self.assertEqual(len(encoder.stream), 0)
+            self.assertEqual(encoder.sink, None)
+
+            decoder = pool.acquireDecoder('\x06\x03a' * 10)
+            decoder.readElement()
+            pool.release(decoder)
+
+            self.assertEqual(len(decoder.stream), 0)
+
+    def test_size(self):
+        encoders = [self.pool.acquireEncoder() for i in range(3)]
+
+        for encoder in encoders:
+            self.pool.release(encoder)
+
+        self.assertEqual(len(self.pool.encoders), 2)
+        self.assertEqual(self.pool.decoders, [])
+
+    def test_custom_type(self):
+        encoder = self.pool.acquireEncoder()
+        encoder.writeElement(TestObject())
+        self.pool.release(encoder)
+
+        pyamf.add_type(TestObject, lambda x, encoder: x.name)
+        self.addCleanup(pyamf.remove_type, TestObject)
+
+        encoder = self.pool.acquireEncoder()
+        encoder.writeElement(TestObject())
+
+        self.assertEqual(encoder.stream.getvalue(), '\x06\ttest')
+
+    def test_threads(self):
+        import threading
+
+        acquired = []
+
+        def run():
+            for i in range(50):
+                encoder = self.pool.acquireEncoder()
+                acquired.append(encoder)
+                encoder.writeElement([1, 2, 3])
+                self.pool.release(encoder)
+
+        threads = [threading.Thread(target=run) for i in range(4)]
+
+        for t in threads:
+            t.start()
+
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(acquired), 200)
+        self.assertTrue(len(self.pool.encoders) <= 2)
+
+
+class SinkTestCase(unittest.TestCase):
+    """
+    Tests for L{codec.Sink}
+    """
+
+    def test_targets(self):
+        from StringIO import StringIO
+
+        class Socket(object):
+            def __init__(self):
+                self.data = []
+
+            def sendall(self, data):
+                self.data.append(data)
+
+        f, sock, l = StringIO(), Socket(), []
+
+        for target in (f, sock, l.append):
+            sink = codec.Sink(target)
+            sink.write('foo')
+
+            self.assertEqual(sink.written, 3)
+
+        self.assertEqual(f.getvalue(), 'foo')
+        self.assertEqual(sock.data, ['foo'])
+        self.assertEqual(l, ['foo'])
+
+        self.assertRaises(TypeError, codec.Sink, object())
+
+    def test_chunks(self):
+        chunks = []
+        encoder = pyamf.get_encoder(pyamf.AMF3, sink=chunks.append,
+            chunk_size=16)
+
+        self.assertEqual(encoder.sink.chunk_size, 16)
+
+        l = [u'spam'] * 4 + [u'eggs%d' % i for i in range(10)]
+
+        encoder.writeElement(l)
+        encoder.flush()
+
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(len(encoder.stream), 0)
+        self.assertEqual(''.join(chunks),
+            pyamf.encode(l, encoding=pyamf.AMF3).getvalue())
+
+    def test_encode(self):
+        chunks = []
+
+        n = pyamf.encode(u'foo', u'bar', sink=chunks.append, chunk_size=1)
+
+        self.assertEqual(chunks, ['\x06\x07foo', '\x06\x07bar'])
+        self.assertEqual(n, 10)
+
+    def test_write_with_length(self):
+        chunks = []
+        encoder = pyamf.get_encoder(pyamf.AMF3, sink=chunks.append,
+            chunk_size=1)
+
+        encoder.writeElement(u'foo')
+        encoder.sink.writeWithLength(encoder, encoder.writeElement,
+            [u'foo', u'bar'])
+        encoder.flush()
+
+        self.assertEqual(''.join(chunks), '\x06\x07foo\x00\x00\x00\x0a'
+            '\x09\x05\x01\x06\x00\x06\x07bar')
+
+
+class StatsTestCase(unittest.TestCase):
+    """
+    Tests for the codec instrumentation, L{codec.Stats}.
+    """
+
+    def setUp(self):
+        pyamf.register_class(TestObject, 'org.pyamf.TestObject')
+
+    def tearDown(self):
+        pyamf.unregister_class(TestObject)
+        codec.enable_stats(False)
+        codec.get_stats(pyamf.AMF3).clear()
+
+    def counts(self, snapshot, key='types'):
+        return dict([(k, (v['count'], v['bytes']))
+            for k, v in snapshot[key].iteritems()])
+
+    def test_add(self):
+        a = codec.Stats()
+        b = codec.Stats()
+
+        a.types['TYPE_STRING'] = [1, 5, 0.5]
+        b.types['TYPE_STRING'] = [2, 10, 1.0]
+        b.aliases['foo'] = [1, 20, 2.0]
+
+        a.add(b)
+
+        self.assertEqual(a.getSnapshot(), {
+            'types': {'TYPE_STRING': {'count': 3, 'bytes': 15, 'time': 1.5}},
+            'aliases': {'foo': {'count': 1, 'bytes': 20, 'time': 2.0}}
+        })
+
+        a.clear()
+        self.assertEqual(a.getSnapshot(), {'types': {}, 'aliases': {}})
+
+    def test_disabled(self):
+        encoder = pyamf.get_encoder(pyamf.AMF3)
+
+        self.assertEqual(encoder.getStats(), None)
+
+        stats = encoder.enableStats()
+        encoder.writeElement(u'foo')
+
+        self.assertEqual(self.counts(stats.getSnapshot()),
+            {'TYPE_STRING': (1, 5)})
+
+        encoder.disableStats()
+        encoder.writeElement(u'bar')
+
+        self.assertEqual(encoder.getStats(), None)
+        self.assertEqual(self.counts(stats.getSnapshot()),
+            {'TYPE_STRING': (1, 5)})
+
+    def test_encode(self):
+        encoder = pyamf.get_encoder(pyamf.AMF3)
+        encoder.enableStats()
+
+        encoder.writeElement([u'foo', u'foo', 1])
+
+        self.assertEqual(encoder.stream.getvalue(),
+            '\t\x07\x01\x06\x07foo\x06\x00\x04\x01')
+        self.assertEqual(self.counts(encoder.getStats()), {
+            'TYPE_ARRAY': (1, 3),
+            'TYPE_STRING': (2, 7),
+            'TYPE_INTEGER': (1, 2)
+        })
+
+    def test_alias(self):
+        encoder = pyamf.get_encoder(pyamf.AMF0)
+        encoder.enableStats()
+
+        encoder.writeElement([TestObject(), {'a': 1}])
+        bytes = encoder.stream.getvalue()
+
+        stats = encoder.getStats()
+        self.assertEqual(self.counts(stats, 'aliases'),
+            {'org.pyamf.TestObject': (1, 39)})
+        self.assertEqual(stats['types']['TYPE_TYPEDOBJECT']['count'], 1)
+        self.assertEqual(stats['types']['TYPE_OBJECT']['count'], 1)
+
+        decoder = pyamf.get_decoder(pyamf.AMF0, bytes)
+        decoder.enableStats()
+        decoder.readElement()
+
+        self.assertEqual(self.counts(decoder.getStats()),
+            self.counts(stats))
+        self.assertEqual(self.counts(decoder.getStats(), 'aliases'),
+            {'org.pyamf.TestObject': (1, 39)})
+
+    def test_typed_object(self):
+        bytes = pyamf.encode(TestObject(), encoding=pyamf.AMF3).getvalue()
+        pyamf.unregister_class(TestObject)
+
+        decoder = pyamf.get_decoder(pyamf.AMF3, bytes)
+        decoder.enableStats()
+        decoder.readElement()
+
+        self.assertEqual(self.counts(decoder.getStats(), 'aliases'),
+            {'org.pyamf.TestObject': (1, len(bytes))})
+
+        pyamf.register_class(TestObject, 'org.pyamf.TestObject')
+
+    def test_sink(self):
+        l = [u'spam'] * 4 + [u'eggs%d' % i for i in range(10)]
+        encoder = pyamf.get_encoder(pyamf.AMF3)
+        encoder.enableStats()
+        encoder.writeElement(l)
+
+        chunks = []
+        sink = pyamf.get_encoder(pyamf.AMF3, sink=chunks.append,
+            chunk_size=8)
+        sink.enableStats()
+        sink.writeElement(l)
+        sink.flush()
+
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(self.counts(sink.getStats()),
+            self.counts(encoder.getStats()))
+
+    def test_error(self):
+        encoder = pyamf.get_encoder(pyamf.AMF3)
+        encoder.enableStats()
+
+        self.assertRaises(pyamf.EncodeError, encoder.writeElement,
+            [u'foo', pyamf])
+
+        encoder.stream.truncate()
+        encoder.writeElement(u'bar')
+
+        self.assertEqual(self.counts(encoder.getStats()),
+            {'TYPE_STRING': (1, 5)})
+
+    def test_process_wide(self):
+        codec.enable_stats()
+
+        pyamf.encode(u'foo', encoding=pyamf.AMF3)
+        encoder = pyamf.codec_pool(pyamf.AMF3).acquireEncoder()
+        encoder.writeElement(u'bar')
+        pyamf.codec_pool(pyamf.AMF3).release(encoder)
+
+        self.assertEqual(self.counts(codec.get_stats(
+            pyamf.AMF3).getSnapshot()), {'TYPE_STRING': (2, 10)})
+
+        codec.enable_stats(False)
+        pyamf.encode(u'foo', encoding=pyamf.AMF3)
+
+        self.assertEqual(self.counts(codec.get_stats(
+            pyamf.AMF3).getSnapshot()), {'TYPE_STRING': (2, 10)})
+        self.assertRaises(ValueError, codec.get_stats, 99)
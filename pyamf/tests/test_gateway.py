@@ -9,6 +9,7 @@ General gateway tests.
 
 import unittest
 import sys
+import zlib
 
 import pyamf
 from pyamf import remoting
@@ -773,3 +774,541 @@ class PreProcessingTestCase(unittest.TestCase):
 
         self.assertTrue(isinstance(response, remoting.Response))
         self.assertEqual(response.status, remoting.STATUS_ERROR)
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    """
+    Tests for L{gateway.ResponseCache}
+    """
+
+    def setUp(self):
+        self.now = 0
+        self.cache = gateway.ResponseCache(size=3, max_bytes=100,
+            clock=lambda: self.now)
+
+    def test_get(self):
+        raw = pyamf.encode_raw('spam')
+
+        self.assertEqual(self.cache.get('a'), None)
+
+        self.cache.set('a', raw)
+
+        self.assertIdentical(self.cache.get('a'), raw)
+        self.assertEqual(self.cache.hits, 1)
+        self.assertEqual(self.cache.misses, 1)
+        self.assertEqual(self.cache.bytes, len(raw))
+
+    def test_ttl(self):
+        self.cache.set('a', pyamf.encode_raw('spam'), 10)
+
+        self.now = 9
+        self.assertNotEqual(self.cache.get('a'), None)
+
+        self.now = 10
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_lru(self):
+        for key in 'abc':
+            self.cache.set(key, pyamf.encode_raw(key))
+
+        self.cache.get('a')
+        self.cache.set('d', pyamf.encode_raw('d'))
+
+        self.assertEqual(self.cache.get('b'), None)
+        self.assertNotEqual(self.cache.get('a'), None)
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_max_bytes(self):
+        self.cache.set('a', pyamf.encode_raw('x' * 60))
+        self.cache.set('b', pyamf.encode_raw('x' * 60))
+
+        self.assertEqual(self.cache.get('a'), None)
+        self.assertEqual(len(self.cache), 1)
+
+        self.cache.set('c', pyamf.encode_raw('x' * 200))
+
+        self.assertEqual(self.cache.get('c'), None)
+        self.assertNotEqual(self.cache.get('b'), None)
+
+    def test_invalidate(self):
+        for key in 'abc':
+            self.cache.set(key, pyamf.encode_raw(key))
+
+        self.assertEqual(self.cache.invalidate(lambda k: k == 'b'), 1)
+        self.assertEqual(len(self.cache), 2)
+
+        self.assertEqual(self.cache.invalidate(), 2)
+        self.assertEqual(self.cache.bytes, 0)
+
+    def test_stats(self):
+        self.cache.set('a', pyamf.encode_raw('a'))
+        self.cache.get('a')
+        self.cache.get('b')
+
+        stats = self.cache.getStats()
+
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+
+class CacheTestCase(unittest.TestCase):
+    """
+    Tests for L{gateway.cache}
+    """
+
+    def setUp(self):
+        self.calls = []
+
+        def echo(x, y=None):
+            self.calls.append(x)
+
+            return [x]
+
+        self.gw = gateway.BaseGateway()
+        self.gw.addService(gateway.cache(echo, key=lambda x, y=None: x),
+            'echo')
+
+    def call(self, *args, **kwargs):
+        envelope = remoting.Envelope(kwargs.get('amfVersion', pyamf.AMF0))
+        request = remoting.Request('echo', body=list(args),
+            envelope=envelope)
+
+        return self.gw.getProcessor(request)(request)
+
+    def test_hit(self):
+        response = self.call('spam')
+
+        self.assertTrue(isinstance(response.body, pyamf.RawAMF))
+        self.assertEqual(response.body.encoding, pyamf.AMF0)
+
+        self.assertIdentical(self.call('spam', 'eggs').body, response.body)
+        self.assertEqual(self.calls, ['spam'])
+
+        self.call('eggs')
+        self.assertEqual(self.calls, ['spam', 'eggs'])
+
+    def test_encoding(self):
+        amf0_body = self.call('spam').body
+        amf3_body = self.call('spam', amfVersion=pyamf.AMF3).body
+
+        self.assertEqual(amf3_body.encoding, pyamf.AMF3)
+        self.assertEqual(self.calls, ['spam', 'spam'])
+        self.assertEqual(self.gw.response_cache.hits, 0)
+
+        envelope = remoting.Envelope(pyamf.AMF3)
+        envelope['/1'] = remoting.Response(amf3_body)
+
+        bytes = remoting.encode(envelope).getvalue()
+
+        self.assertEqual(remoting.decode(bytes)['/1'].body, ['spam'])
+
+    def test_unhashable(self):
+        self.gw.services['echo'].service._pyamf_cache.key = None
+
+        self.call(['spam'])
+        self.call(['spam'])
+
+        self.assertEqual(len(self.calls), 2)
+
+    def test_service_policy(self):
+        gw = gateway.BaseGateway()
+        gw.addService(TestService, 'test', cache=gateway.CachePolicy())
+
+        request = remoting.Request('test.spam', envelope=remoting.Envelope())
+        gw.getProcessor(request)(request)
+
+        self.assertEqual(len(gw.response_cache), 1)
+
+    def test_invalidate(self):
+        self.call('spam')
+        self.call('eggs')
+
+        self.assertEqual(self.gw.invalidateResponses('echo', 'spam'), 1)
+
+        self.call('spam')
+        self.call('eggs')
+
+        self.assertEqual(self.calls, ['spam', 'eggs', 'spam'])
+        self.assertEqual(self.gw.invalidateResponses(), 2)
+
+    def test_disabled(self):
+        self.gw.response_cache = None
+
+        self.assertEqual(self.call('spam').body, ['spam'])
+        self.assertEqual(self.call('spam').body, ['spam'])
+        self.assertEqual(len(self.calls), 2)
+
+
+class HistogramTestCase(unittest.TestCase):
+    """
+    Tests for L{gateway.Histogram}
+    """
+
+    def test_empty(self):
+        h = gateway.Histogram((1, 2, 4))
+
+        self.assertEqual(h.getPercentile(50), None)
+        self.assertEqual(h.getSnapshot(), {'count': 0, 'sum': 0,
+            'mean': None, 'min': None, 'max': None, 'p50': None,
+            'p90': None, 'p99': None})
+
+    def test_add(self):
+        h = gateway.Histogram((1, 2, 4))
+
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            h.add(value)
+
+        self.assertEqual(h.counts, [1, 2, 1, 1])
+        self.assertEqual(h.getPercentile(10), 1)
+        self.assertEqual(h.getPercentile(50), 2)
+        self.assertEqual(h.getPercentile(80), 4)
+        self.assertEqual(h.getPercentile(99), 10)
+
+        snapshot = h.getSnapshot()
+
+        self.assertEqual(snapshot['count'], 5)
+        self.assertEqual(snapshot['sum'], 16.5)
+        self.assertEqual(snapshot['mean'], 3.3)
+        self.assertEqual((snapshot['min'], snapshot['max']), (0.5, 10))
+
+        h.clear()
+        self.assertEqual(h.count, 0)
+
+    def test_max(self):
+        h = gateway.Histogram((1, 2, 4))
+        h.add(2.5)
+
+        self.assertEqual(h.getPercentile(50), 2.5)
+
+
+class MetricsTestCase(unittest.TestCase):
+    """
+    Tests for L{gateway.GatewayMetrics}
+    """
+
+    def setUp(self):
+        self.gw = gateway.BaseGateway()
+        self.gw.addService(TestService, 'test')
+
+    def call(self, target, *args):
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/1'] = request = remoting.Request(target, body=list(args))
+
+        return self.gw.getProcessor(request)(request)
+
+    def test_call(self):
+        self.call('test.spam')
+        self.call('test.echo', 'foo')
+        self.call('test.echo', 'bar')
+
+        metrics = self.gw.getMetrics()
+
+        self.assertEqual(sorted(metrics.keys()), ['test.echo', 'test.spam'])
+        self.assertEqual(metrics['test.echo']['call']['count'], 2)
+        self.assertEqual(metrics['test.echo']['errors'], 0)
+        self.assertFalse('authenticate' in metrics['test.echo'])
+
+        self.assertEqual(self.gw.getMetrics('test.spam')['call']['count'],
+            1)
+        self.assertEqual(self.gw.getMetrics('foo'), None)
+
+    def test_error(self):
+        response = self.call('test.echo')
+
+        self.assertEqual(response.status, remoting.STATUS_ERROR)
+        self.assertEqual(self.gw.getMetrics('test.echo')['errors'], 1)
+        self.assertFalse('call' in self.gw.getMetrics('test.echo'))
+
+    def test_authenticate_preprocess(self):
+        self.gw.authenticator = lambda u, p: True
+        self.gw.preprocessor = lambda service_request: None
+
+        self.call('test.spam')
+
+        metrics = self.gw.getMetrics('test.spam')
+
+        self.assertEqual(metrics['authenticate']['count'], 1)
+        self.assertEqual(metrics['preprocess']['count'], 1)
+
+        def preprocessor(service_request):
+            raise IndexError
+
+        self.gw.preprocessor = preprocessor
+        self.call('test.spam')
+
+        self.assertEqual(self.gw.getMetrics('test.spam')['errors'], 1)
+
+    def test_envelope(self):
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/1'] = remoting.Request('test.spam')
+        envelope['/2'] = remoting.Request('test.echo', body=['foo'])
+        envelope['/3'] = remoting.Request('test.echo', body=['bar'])
+
+        body = remoting.encode(envelope).getvalue()
+        request = self.gw.decodeRequest(body)
+
+        self.assertEqual(self.gw.getTargets(request),
+            ['test.spam', 'test.echo'])
+
+        stream = self.gw.encodeResponse(remoting.Envelope(pyamf.AMF0),
+            request)
+
+        metrics = self.gw.getMetrics()
+
+        for target in (gateway.ALL_TARGETS, 'test.spam', 'test.echo'):
+            self.assertEqual(metrics[target]['decode']['count'], 1)
+            self.assertEqual(metrics[target]['encode']['count'], 1)
+            self.assertEqual(metrics[target]['bytes_in']['sum'], len(body))
+            self.assertEqual(metrics[target]['bytes_out']['sum'],
+                len(stream))
+
+        self.assertRaises(pyamf.DecodeError, self.gw.decodeRequest, 'foo')
+        self.assertEqual(
+            self.gw.getMetrics(gateway.ALL_TARGETS)['errors'], 1)
+
+    def test_flex_target(self):
+        from pyamf.flex import messaging
+
+        envelope = remoting.Envelope(pyamf.AMF3)
+        envelope['/1'] = remoting.Request('null', body=[
+            messaging.RemotingMessage(destination='test', operation='spam')])
+        envelope['/2'] = remoting.Request('null', body=[
+            messaging.CommandMessage()])
+
+        self.assertEqual(self.gw.getTargets(envelope), ['test.spam'])
+
+    def test_unknown_target(self):
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/0'] = remoting.Request('test.spam')
+
+        for i in range(100):
+            envelope['/%d' % (i + 1,)] = remoting.Request('foo%d' % (i,))
+
+        envelope['/a'] = remoting.Request('test.foo')
+        envelope['/b'] = remoting.Request('test._private')
+        envelope['/c'] = remoting.Request('test')
+
+        self.assertEqual(self.gw.getTargets(envelope),
+            ['test.spam', gateway.UNKNOWN_TARGET, 'test'])
+
+        self.gw.decodeRequest(remoting.encode(envelope).getvalue())
+        self.call('test.foo')
+
+        metrics = self.gw.getMetrics()
+
+        self.assertEqual(sorted(metrics.keys()),
+            [gateway.ALL_TARGETS, gateway.UNKNOWN_TARGET, 'test',
+                'test.spam'])
+        self.assertEqual(metrics[gateway.UNKNOWN_TARGET]['decode']['count'],
+            1)
+        self.assertEqual(metrics[gateway.UNKNOWN_TARGET]['errors'], 1)
+
+    def test_disabled(self):
+        self.gw.metrics = None
+
+        self.assertEqual(self.call('test.spam').body, 'spam')
+        self.assertEqual(self.gw.getMetrics(), None)
+
+    def test_clear(self):
+        self.call('test.spam')
+        self.gw.metrics.clear()
+
+        self.assertEqual(self.gw.getMetrics(), {})
+
+
+class ThreadPoolTestCase(unittest.TestCase):
+    """
+    Tests for L{gateway.ThreadPool}
+    """
+
+    def setUp(self):
+        self.pool = gateway.ThreadPool(2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def test_result(self):
+        future = self.pool.submit(lambda x, y=1: x + y, 1, y=2)
+
+        self.assertEqual(future.result(5), 3)
+        self.assertTrue(future.done())
+
+    def test_exception(self):
+        def fail():
+            raise IndexError('foo')
+
+        self.assertRaises(IndexError, self.pool.submit(fail).result, 5)
+
+    def test_size(self):
+        import threading
+
+        event = threading.Event()
+        futures = [self.pool.submit(event.wait, 5) for i in range(5)]
+
+        self.assertEqual(len(self.pool.workers), 2)
+        self.assertFalse(futures[-1].done())
+
+        event.set()
+
+        for future in futures:
+            future.result(5)
+
+        self.assertRaises(ValueError, gateway.ThreadPool, 0)
+
+    def test_timeout(self):
+        import threading
+
+        event = threading.Event()
+        future = self.pool.submit(event.wait, 5)
+
+        self.assertRaises(RuntimeError, future.result, 0.01)
+        event.set()
+
+
+class ProcessEnvelopeTestCase(unittest.TestCase):
+    """
+    Tests for L{gateway.BaseGateway.processEnvelope}
+    """
+
+    def makeEnvelope(self, n):
+        envelope = remoting.Envelope(pyamf.AMF0)
+
+        for i in range(n):
+            envelope['/%d' % (i,)] = remoting.Request('sleep', body=[i])
+
+        return envelope
+
+    def process(self, message):
+        import time
+
+        time.sleep(0.1)
+
+        return remoting.Response(message.body[0])
+
+    def test_sequential(self):
+        gw = gateway.BaseGateway()
+        response = gw.processEnvelope(self.makeEnvelope(3), self.process)
+
+        self.assertEqual(response.keys(), ['/0', '/1', '/2'])
+        self.assertEqual([r.body for n, r in response], [0, 1, 2])
+
+    def test_concurrent(self):
+        import time
+
+        gw = gateway.BaseGateway(executor=5)
+
+        self.assertTrue(isinstance(gw.executor, gateway.ThreadPool))
+
+        start = time.time()
+        response = gw.processEnvelope(self.makeEnvelope(5), self.process)
+
+        self.assertTrue(time.time() - start < 0.4)
+        self.assertEqual(response.keys(), ['/0', '/1', '/2', '/3', '/4'])
+        self.assertEqual([r.body for n, r in response], [0, 1, 2, 3, 4])
+
+        gw.executor.shutdown()
+
+    def test_exception(self):
+        gw = gateway.BaseGateway(executor=2)
+
+        def process(message):
+            if message.body[0] == 2:
+                raise IndexError
+
+            return remoting.Response(None)
+
+        self.assertRaises(IndexError, gw.processEnvelope,
+            self.makeEnvelope(3), process)
+
+        gw.executor.shutdown()
+
+
+class CompressionTestCase(unittest.TestCase):
+    def test_accepted_encoding(self):
+        f = gateway.get_accepted_encoding
+
+        self.assertEqual(f(None), None)
+        self.assertEqual(f(''), None)
+        self.assertEqual(f('identity'), None)
+        self.assertEqual(f('gzip'), 'gzip')
+        self.assertEqual(f('x-gzip'), 'gzip')
+        self.assertEqual(f('deflate'), 'deflate')
+        self.assertEqual(f('deflate, gzip'), 'gzip')
+        self.assertEqual(f('gzip;q=0.5, deflate'), 'deflate')
+        self.assertEqual(f('gzip;q=0, deflate;q=0'), None)
+        self.assertEqual(f('*'), 'gzip')
+        self.assertEqual(f('gzip;q=0, *'), 'deflate')
+        self.assertEqual(f('GZIP; q=foo'), None)
+
+    def test_compress(self):
+        data = 'spam' * 100000
+
+        self.assertEqual(zlib.decompress(gateway.compress(data, 'gzip'),
+            16 + zlib.MAX_WBITS), data)
+        self.assertEqual(zlib.decompress(gateway.compress(data, 'deflate')),
+            data)
+
+        chunks = list(gateway.iter_compress(data, 'deflate', chunk_size=1024))
+
+        self.assertTrue(len(chunks) > 1)
+        self.assertEqual(zlib.decompress(''.join(chunks)), data)
+
+        self.assertRaises(IOError, gateway.compress, data, 'br')
+
+    def test_decompress(self):
+        data = 'spam' * 100
+
+        self.assertEqual(gateway.decompress(data, None), data)
+        self.assertEqual(gateway.decompress(data, 'identity'), data)
+        self.assertEqual(gateway.decompress(
+            gateway.compress(data, 'gzip'), 'x-gzip'), data)
+        self.assertEqual(gateway.decompress(zlib.compress(data), 'Deflate'),
+            data)
+
+        self.assertRaises(IOError, gateway.decompress, data, 'gzip')
+        self.assertRaises(IOError, gateway.decompress, data, 'br')
+
+    def test_decompress_limit(self):
+        data = 'spam' * 100
+
+        for encoding in ('gzip', 'deflate'):
+            compressed = gateway.compress(data, encoding)
+
+            self.assertEqual(gateway.decompress(compressed, encoding, 400),
+                data)
+            self.assertRaises(IOError, gateway.decompress, compressed,
+                encoding, 399)
+
+        # uncompressed bodies have already been read in full
+        self.assertEqual(gateway.decompress(data, None, 10), data)
+
+    def test_response_encoding(self):
+        gw = gateway.BaseGateway()
+
+        self.assertEqual(gw.compress_threshold, gateway.COMPRESS_THRESHOLD)
+        self.assertEqual(gw.compress_level, gateway.COMPRESS_LEVEL)
+        self.assertEqual(gw.max_request_size, gateway.MAX_REQUEST_SIZE)
+
+        self.assertEqual(gw.getResponseEncoding('gzip', 1023), None)
+        self.assertEqual(gw.getResponseEncoding('gzip', 1024), 'gzip')
+        self.assertEqual(gw.getResponseEncoding(None, 1024), None)
+
+        gw = gateway.BaseGateway(compress_threshold=None, compress_level=1)
+
+        self.assertEqual(gw.getResponseEncoding('gzip', 100000), None)
+        self.assertEqual(gw.compress_level, 1)
+
+    def test_decode_request(self):
+        gw = gateway.BaseGateway()
+        envelope = remoting.Envelope(pyamf.AMF0)
+        envelope['/1'] = remoting.Request('echo', body=['spam'])
+
+        body = remoting.encode(envelope).getvalue()
+        request = gw.decodeRequest(gateway.compress(body, 'gzip'),
+            content_encoding='gzip')
+
+        self.assertEqual(request['/1'].body, ['spam'])
+        # the uncompressed size is recorded
+        self.assertEqual(gw.getMetrics()[gateway.ALL_TARGETS]['bytes_in'][
+            'sum'], len(body))
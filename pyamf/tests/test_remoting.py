@@ -59,6 +59,15 @@ class DecoderTestCase(unittest.TestCase):
 
         self.assertEqual(y, [])
 
+    def test_buffer(self):
+        data = ('\x00\x00\x00\x01\x00\x04name\x00\x00\x00\x00'
+            '\x05\x0a\x00\x00\x00\x00\x00\x00')
+
+        for t in (buffer, bytearray, memoryview):
+            msg = remoting.decode(t(data))
+
+            self.assertEqual(msg.headers['name'], [])
+
     def test_required_header(self):
         msg = remoting.decode('\x00\x00\x00\x01\x00\x04name\x01\x00\x00\x00'
             '\x05\x0a\x00\x00\x00\x00\x00\x00')
@@ -325,6 +334,225 @@ class StrictEncodingTestCase(unittest.TestCase):
             '\x00\x0c\n\x00\x00\x00\x01\x02\x00\x04spam')
 
 
+class SinkEncodingTestCase(unittest.TestCase):
+    """
+    Tests for encoding remoting messages to a sink.
+    """
+
+    def build(self, amfVersion):
+        msg = remoting.Envelope(amfVersion)
+
+        msg.headers['spam'] = ['eggs'] * 5
+        msg['/1'] = remoting.Request('test.test', body=[u'hello'] * 100)
+        msg['/2'] = remoting.Response([{'a': u'hello'}] * 100)
+
+        return msg
+
+    def test_encode(self):
+        for amfVersion in (pyamf.AMF0, pyamf.AMF3):
+            for strict in (False, True):
+                msg = self.build(amfVersion)
+                chunks = []
+
+                n = remoting.encode(msg, strict=strict, sink=chunks.append,
+                    chunk_size=64)
+
+                bytes = remoting.encode(msg, strict=strict).getvalue()
+
+                self.assertEqual(''.join(chunks), bytes)
+                self.assertEqual(n, len(bytes))
+                self.assertTrue(len(chunks) > 1)
+
+    def test_generator(self):
+        def gen():
+            yield u'spam'
+
+        msg = remoting.Envelope(pyamf.AMF0)
+        msg['/1'] = remoting.Response(gen())
+
+        self.assertRaises(pyamf.EncodeError, remoting.encode, msg, strict=True,
+            sink=[].append)
+
+
+class PoolTestCase(unittest.TestCase):
+    """
+    Tests for the codec pooling in L{remoting.encode} and L{remoting.decode}.
+    """
+
+    def test_reuse(self):
+        pool = pyamf.codec_pool(pyamf.AMF0)
+
+        for amfVersion in (pyamf.AMF0, pyamf.AMF3, pyamf.AMF0):
+            msg = remoting.Envelope(amfVersion)
+            msg['/1'] = remoting.Response([{'a': u'hello'}] * 3)
+
+            bytes = remoting.encode(msg).getvalue()
+            encoder = pool.encoders[-1]
+
+            self.assertEqual(remoting.encode(msg).getvalue(), bytes)
+            self.assertTrue(pool.encoders[-1] is encoder)
+
+            for i in range(2):
+                x = remoting.decode(bytes)
+                decoder = pool.decoders[-1]
+
+                self.assertEqual(x.amfVersion, amfVersion)
+                self.assertEqual(x['/1'].body, [{'a': u'hello'}] * 3)
+
+            self.assertTrue(pool.decoders[-1] is decoder)
+
+    def test_error(self):
+        pool = pyamf.codec_pool(pyamf.AMF0)
+        msg = remoting.Envelope(pyamf.AMF0)
+        msg['/1'] = remoting.Response(lambda: None)
+
+        self.assertRaises(pyamf.EncodeError, remoting.encode, msg)
+
+        encoder = pool.acquireEncoder()
+        self.addCleanup(pool.release, encoder)
+
+        self.assertEqual(encoder.context.getObjectReference(msg['/1'].body),
+            -1)
+
+
+class LazyDecodeTestCase(unittest.TestCase):
+    """
+    Tests for L{remoting.decode} with C{lazy=True}.
+    """
+
+    def test_message(self):
+        from pyamf.flex import messaging
+
+        msg = remoting.Envelope(pyamf.AMF3)
+        msg['/1'] = remoting.Request('null', [messaging.RemotingMessage(
+            destination=u'dest', operation=u'op', body=[[1, 2, 3]],
+            headers={u'DSId': u'foo'})])
+
+        x = remoting.decode(remoting.encode(msg).getvalue(), lazy=True)
+        message = x['/1'].body[0]
+
+        self.assertEqual(message.destination, u'dest')
+        self.assertEqual(message.operation, u'op')
+        self.assertFalse(message.body.materialized)
+        self.assertEqual(message.headers[u'DSId'], u'foo')
+        self.assertEqual(message.body[0], [1, 2, 3])
+
+
+class IncrementalDecoderTestCase(unittest.TestCase):
+    """
+    Tests for L{remoting.IncrementalDecoder}.
+    """
+
+    def make_envelope(self, amf_version):
+        env = remoting.Envelope(amf_version)
+
+        env.headers['spam'] = 'eggs'
+        env.headers.set_required('spam')
+
+        env['/1'] = remoting.Response([{'a': i} for i in xrange(20)])
+        env['/2'] = remoting.Request('foo.bar', [1, u'baz', [None]])
+        env['/3'] = remoting.Response(remoting.ErrorFault(code='X'),
+            status=remoting.STATUS_ERROR)
+
+        return env
+
+    def assertBodies(self, bodies, data):
+        expected = remoting.decode(data)
+
+        self.assertEqual([name for name, message in bodies],
+            [name for name, message in expected])
+
+        for (name, message), (name2, expected_message) in zip(bodies,
+                expected):
+            self.assertEqual(repr(message), repr(expected_message))
+
+    def test_feed(self):
+        for amf_version in (pyamf.AMF0, pyamf.AMF3):
+            data = remoting.encode(self.make_envelope(amf_version)).getvalue()
+
+            for size in (1, 5, len(data)):
+                decoder = remoting.IncrementalDecoder()
+                bodies = []
+
+                for i in xrange(0, len(data), size):
+                    self.assertFalse(decoder.done())
+
+                    bodies.extend(decoder.feed(data[i:i + size]))
+
+                self.assertTrue(decoder.done())
+                self.assertBodies(bodies, data)
+
+                self.assertEqual(decoder.envelope.amfVersion, amf_version)
+                self.assertEqual(decoder.envelope.headers, {'spam': 'eggs'})
+                self.assertTrue(decoder.envelope.headers.is_required('spam'))
+
+                # consumed bytes are discarded
+                self.assertEqual(len(decoder.stream), 0)
+
+    def test_headers(self):
+        """
+        Headers are scanned structurally, only externalizable values are
+        decoded speculatively.
+        """
+        from pyamf.flex import ArrayCollection
+
+        for amf_version in (pyamf.AMF0, pyamf.AMF3):
+            env = remoting.Envelope(amf_version)
+            shared = {'a': [1, 2], 'b': u'spam'}
+
+            env.headers['dict'] = shared
+            env.headers['again'] = shared
+            env.headers['ext'] = {'c': ArrayCollection([u'eggs']), 'd': 1}
+            env['/1'] = remoting.Response(u'done')
+
+            data = remoting.encode(env).getvalue()
+
+            for size in (1, 3, 7):
+                decoder = remoting.IncrementalDecoder()
+                bodies = []
+
+                for i in xrange(0, len(data), size):
+                    bodies.extend(decoder.feed(data[i:i + size]))
+
+                self.assertTrue(decoder.done())
+                self.assertBodies(bodies, data)
+
+                headers = decoder.envelope.headers
+
+                self.assertEqual(headers['dict'], shared)
+                self.assertTrue(headers['again'] is headers['dict'])
+                self.assertEqual(headers['ext']['d'], 1)
+                self.assertEqual(list(headers['ext']['c']), [u'eggs'])
+
+        decoder = remoting.IncrementalDecoder()
+        decoder._attempt = None
+
+        env = remoting.Envelope(pyamf.AMF0)
+        env.headers['dict'] = shared
+        data = remoting.encode(env).getvalue()
+
+        for c in data:
+            decoder.feed(c)
+
+        self.assertTrue(decoder.done())
+        self.assertEqual(decoder.envelope.headers['dict'], shared)
+
+    def test_body_at_a_time(self):
+        data = remoting.encode(self.make_envelope(pyamf.AMF0)).getvalue()
+        decoder = remoting.IncrementalDecoder()
+
+        bodies = decoder.feed(data[:-1])
+
+        self.assertEqual([name for name, message in bodies], ['/1', '/2'])
+        self.assertEqual(decoder.feed(data[-1:])[0][0], '/3')
+
+    def test_malformed(self):
+        decoder = remoting.IncrementalDecoder()
+
+        self.assertRaises(pyamf.DecodeError, decoder.feed,
+            '\x00\x10\x00\x00')
+
+
 class FaultTestCase(unittest.TestCase):
     def test_exception(self):
         x = remoting.get_fault({'level': 'error', 'code': 'Server.Call.Failed'})
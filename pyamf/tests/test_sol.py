@@ -99,6 +99,19 @@ class EncoderTestCase(unittest.TestCase):
         self.assertTrue(check_buffer(stream.getvalue(), bytes))
 
 
+    def test_sink(self):
+        for strict in (True, False):
+            out = StringIO()
+            values = {'name': 'value', 'spam': ['eggs'] * 10}
+
+            n = sol.encode('hello', values, strict=strict, sink=out,
+                chunk_size=8)
+
+            self.assertEqual(out.getvalue(),
+                sol.encode('hello', values, strict=strict).getvalue())
+            self.assertEqual(n, len(out.getvalue()))
+
+
 class HelperTestCase(unittest.TestCase):
     contents = (
         '\x00\xbf\x00\x00\x002TCSO\x00\x04\x00\x00\x00\x00\x00\x05hello\x00\x00\x00\x00', (
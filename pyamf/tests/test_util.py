@@ -683,6 +683,67 @@ class BufferedByteStreamTestCase(unittest.TestCase):
         self.assertEqual(a.tell(), 0)
         self.assertEqual(len(a), 3)
 
+    def test_buffer_types(self):
+        for t in (buffer, bytearray, memoryview):
+            x = util.BufferedByteStream(t('abcdef'))
+
+            self.assertEqual(x.getvalue(), 'abcdef')
+            self.assertEqual(x.tell(), 0)
+            self.assertEqual(len(x), 6)
+            self.assertEqual(x.read(2), 'ab')
+            self.assertEqual(x.read_utf8_string(2), u'cd')
+
+    def test_zero_copy(self):
+        source = bytearray('abcdef')
+        x = util.BufferedByteStream(source)
+
+        source[0] = 'z'
+
+        self.assertEqual(x.read(1), 'z')
+
+    def test_copy_on_write(self):
+        source = bytearray('abcdef')
+        x = util.BufferedByteStream(source)
+
+        x.seek(2)
+        x.write('gh')
+
+        self.assertEqual(x.tell(), 4)
+        self.assertEqual(x.getvalue(), 'abghef')
+        self.assertEqual(source, bytearray('abcdef'))
+
+        source[0] = 'z'
+
+        self.assertEqual(x.getvalue(), 'abghef')
+
+    def test_read_buffer(self):
+        x = util.BufferedByteStream('abcdef')
+
+        x.seek(1)
+        b = x.read_buffer(3)
+
+        self.assertTrue(isinstance(b, buffer))
+        self.assertEqual(str(b), 'bcd')
+        self.assertEqual(x.tell(), 4)
+        self.assertRaises(IOError, x.read_buffer, 3)
+
+        x = util.BufferedByteStream(memoryview('abcdef'))
+        b = x.read_buffer(2)
+
+        self.assertTrue(isinstance(b, memoryview))
+        self.assertEqual(b.tobytes(), 'ab')
+
+        x = util.BufferedByteStream()
+        x.write('abc')
+        x.seek(0)
+
+        self.assertEqual(x.read_buffer(2), 'ab')
+
+    def test_decode(self):
+        x = pyamf.decode(bytearray('\x06\x07foo'), encoding=pyamf.AMF3)
+
+        self.assertEqual(x.next(), u'foo')
+
     def test_append_unicode(self):
         """
         Test L{util.BufferedByteStream.append} with C{unicode} objects.
@@ -23,6 +23,8 @@ from pyamf import python
 # worked out a little further down
 SYSTEM_ENDIAN = None
 
+_memoryview = getattr(python.builtins, 'memoryview', ())
+
 
 class StringIOProxy(object):
     """
@@ -36,30 +38,64 @@ class StringIOProxy(object):
 
     def __init__(self, buf=None):
         """
+        C{str} and buffer objects (C{buffer}, C{bytearray}, C{memoryview}) are
+        not copied, the stream is a read only view on them until the first
+        write.
+
         @raise TypeError: Unable to coerce C{buf} to C{StringIO}.
         """
-        self._buffer = StringIO()
+        self._source = None
 
-        if isinstance(buf, python.str_types):
-            self._buffer.write(buf)
+        if buf is None:
+            data = None
+        elif isinstance(buf, python.str_types + python.buffer_types):
+            data = buf
         elif hasattr(buf, 'getvalue'):
-            self._buffer.write(buf.getvalue())
+            data = buf.getvalue()
         elif hasattr(buf, 'read') and hasattr(buf, 'seek') and hasattr(buf, 'tell'):
             old_pos = buf.tell()
             buf.seek(0)
-            self._buffer.write(buf.read())
+            data = buf.read()
             buf.seek(old_pos)
-        elif buf is not None:
+        else:
             raise TypeError("Unable to coerce buf->StringIO got %r" % (buf,))
 
+        if data is None or isinstance(data, unicode):
+            self._buffer = StringIO()
+
+            if data:
+                self._buffer.write(data)
+        else:
+            # cStringIO does not copy the data when given a buffer object
+            self._buffer = StringIO(data)
+            self._source = data
+
         self._get_len()
         self._len_changed = False
         self._buffer.seek(0, 0)
 
+    def _own_buffer(self):
+        """
+        Copies the data of a borrowed buffer so that it can be written to.
+        """
+        if self._source is None:
+            return
+
+        pos = self._buffer.tell()
+        data = self._buffer.getvalue()
+
+        self._buffer = StringIO()
+        self._buffer.write(data)
+        self._buffer.seek(pos)
+        self._source = None
+
     def getvalue(self):
         """
         Get raw data from buffer.
         """
+        if type(self._source) is str:
+            return self._source
+
         return self._buffer.getvalue()
 
     def read(self, n=-1):
@@ -100,6 +136,7 @@ class StringIOProxy(object):
         """
         if size == 0:
             self._buffer = StringIO()
+            self._source = None
             self._len_changed = True
 
             return
@@ -108,6 +145,7 @@ class StringIOProxy(object):
         self.seek(0)
         buf = self.read(size)
         self._buffer = StringIO()
+        self._source = None
 
         self._buffer.write(buf)
         self.seek(cur_pos)
@@ -119,6 +157,9 @@ class StringIOProxy(object):
 
         @param s: Raw bytes
         """
+        if self._source is not None:
+            self._own_buffer()
+
         self._buffer.write(s)
         self._len_changed = True
 
@@ -483,9 +524,7 @@ class DataTypeMixIn(object):
 
         @rtype: C{unicode}
         """
-        s = struct.unpack("%s%ds" % (self.endian, length), self.read(length))[0]
-
-        return s.decode('utf-8')
+        return self._read(length).decode('utf-8')
 
     def write_utf8_string(self, u):
         """
@@ -538,6 +577,35 @@ class BufferedByteStream(StringIOProxy, DataTypeMixIn):
 
         return StringIOProxy.read(self, length)
 
+    def read_buffer(self, length):
+        """
+        Reads C{length} bytes from the stream. If this stream is a view on
+        another object, a zero-copy slice of that object is returned (a
+        C{buffer}, or a C{memoryview} if that is what the stream wraps),
+        otherwise a C{str}.
+
+        @raise IOError: Attempted to read past the end of the buffer.
+        @since: 0.7
+        """
+        if self._source is None:
+            return self._read(length)
+
+        pos = self.tell()
+
+        if length < 0:
+            raise IOError('Cannot read backwards')
+
+        if pos + length > len(self):
+            raise IOError('Attempted to read %d bytes from the buffer but '
+                'only %d remain' % (length, len(self) - pos))
+
+        self.seek(length, 1)
+
+        if isinstance(self._source, _memoryview):
+            return self._source[pos:pos + length]
+
+        return buffer(self._source, pos, length)
+
     def peek(self, size=1):
         """
         Looks C{size} bytes ahead in the stream, returning what it finds,